@@ -18,10 +18,9 @@ from claude_agent_sdk import (
     UserMessage,
     query
 )
-from utils import  (get_global_server_configs,
-                    get_user_server_configs,
-                    session_lock,
-                    save_user_server_config)
+from utils import  (get_user_server_configs,
+                    load_user_mcp_configs,
+                    mcp_config_cache)
 from pydantic import BaseModel, Field
 from typing import Dict, Any, List, Optional, Literal, AsyncGenerator, Union
 from bedrock_agentcore import BedrockAgentCoreApp
@@ -41,69 +40,261 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 app = BedrockAgentCoreApp()
-claude_client = None
-cleanup_signal = None
-class StreamingQueue:
-    """Simple async stream_queue for streaming responses."""
-    
-    def __init__(self,get_timeout=2):
-        self._queue = asyncio.Queue()
-        self._finished = False
-        self._get_timeout = get_timeout
-        
-    async def put(self, item: str) -> None:
-        """Add an item to the stream_queue."""
-        if self._finished:
-            self.reset()
-        await self._queue.put(item)
-
-    def reset(self) -> None:
-        old_size = self._queue.qsize()
-        self._finished = False
-        # 清空队列
-        cleared_count = 0
+
+# 每个 user_id 一个常驻的 Claude CLI 进程，空闲超时或超过上限时回收
+CLAUDE_POOL_MAX_CLIENTS = int(os.getenv('CLAUDE_POOL_MAX_CLIENTS', '8'))
+CLAUDE_POOL_IDLE_TTL = float(os.getenv('CLAUDE_POOL_IDLE_TTL', '600'))
+
+HEARTBEAT = {"type": "heatbeat"}
+
+class ChannelCancelled(Exception):
+    """The channel's stream was cancelled; the producing turn should stop."""
+
+
+class EventChannel:
+    """Bounded async channel carrying one turn's events to one stream.
+
+    ``put`` waits while the channel is full (backpressure) and drops items once
+    the channel is closed. ``close`` lets the consumer drain what is queued and
+    then stop; ``cancel`` also discards pending items, e.g. when the client went
+    away, and makes every later or blocked ``put`` raise ``ChannelCancelled`` so
+    the producer stops instead of running its turn to completion. A heartbeat is
+    injected only after ``heartbeat_interval`` seconds without any event, so a
+    busy stream never waits on a timer.
+    """
+
+    _CLOSED = object()
+
+    def __init__(self, maxsize=256, heartbeat_interval=2.0):
+        # 队列本身不设上限，容量由 put 控制，这样关闭信号总能放进去
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._maxsize = maxsize
+        self._space = asyncio.Event()
+        self._space.set()
+        self._closed = False
+        self._cancelled = False
+        self._heartbeat_interval = heartbeat_interval
+        self._last_activity = time.monotonic()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    async def put(self, item) -> bool:
+        """Add an item, waiting while the channel is full; False once closed.
+
+        Raises ``ChannelCancelled`` once the channel has been cancelled.
+        """
+        while not self._closed and self._queue.qsize() >= self._maxsize:
+            self._space.clear()
+            await self._space.wait()
+        if self._cancelled:
+            raise ChannelCancelled()
+        if self._closed:
+            return False
+        self._queue.put_nowait(item)
+        self._last_activity = time.monotonic()
+        return True
+
+    def close(self) -> None:
+        """No more items will be accepted; the stream ends once drained."""
+        if self._closed:
+            return
+        self._closed = True
+        self._space.set()
+        self._queue.put_nowait(self._CLOSED)
+
+    def cancel(self) -> None:
+        """Close and discard anything not yet consumed, unblocking producers."""
+        self._cancelled = True
         while not self._queue.empty():
-            try:
-                self._queue.get_nowait()
-                cleared_count += 1
-            except asyncio.QueueEmpty:
-                break
-            
-    async def finish(self) -> None:
-        """Mark the stream_queue as finished and add sentinel value."""
-        self._finished = True
-        await self._queue.put(None)
+            self._queue.get_nowait()
+        self._closed = True
+        self._space.set()
+        self._queue.put_nowait(self._CLOSED)
+
+    async def _heartbeat(self):
+        while not self._closed:
+            delay = self._last_activity + self._heartbeat_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            if self._queue.empty():
+                self._queue.put_nowait(HEARTBEAT)
+            self._last_activity = time.monotonic()
 
     async def stream(self):
-        """Stream items from the stream_queue until finished."""
-        while True:
-            try:
-                if self._get_timeout:
-                    item = await asyncio.wait_for(
-                        self._queue.get(), 
-                        timeout=self._get_timeout
-                    )
-                else:
-                    item = await self._queue.get()
-                    
-                if item is None and self._finished:
+        """Yield items until the channel is closed and drained."""
+        heartbeat = None
+        if self._heartbeat_interval:
+            heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            while True:
+                item = await self._queue.get()
+                if item is self._CLOSED or self._cancelled:
                     break
+                if self._queue.qsize() < self._maxsize:
+                    self._space.set()
+                self._last_activity = time.monotonic()
                 yield item
-            except asyncio.TimeoutError:
-                # 可以选择继续等待或退出
-                if self._finished:
-                    break
-                yield {"type":"heatbeat"}
-                continue  
+        finally:
+            if heartbeat:
+                heartbeat.cancel()
+
+
+class PoolFullError(Exception):
+    """Every pooled client is busy and the pool is at CLAUDE_POOL_MAX_CLIENTS."""
+
+
+class UserSession:
+    """One user's connected Claude client with its own event queue and task handle."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.client: Optional[ClaudeSDKClient] = None
+        self.cleanup_signal: Optional[asyncio.Event] = None
+        self.monitor_task: Optional[asyncio.Task] = None
+        self.options_key = None
+        self.stream_queue = EventChannel()
+        self.agent_task: Optional[asyncio.Task] = None
+        self.last_used = time.monotonic()
+        # 串行化同一用户的连接/重建，不同用户之间互不阻塞
+        self.lock = asyncio.Lock()
+        # acquire 返回后、agent_task 建立前的请求数，期间不能被回收
+        self.pins = 0
+
+    def busy(self):
+        return self.agent_task is not None and not self.agent_task.done()
+
+    def evictable(self):
+        return not self.busy() and not self.lock.locked() and not self.pins
+
+    def unpin(self):
+        """Release the hold ``ClientPool.acquire`` took once the turn has started."""
+        self.pins -= 1
+        self.last_used = time.monotonic()
+
+    async def cancel_task(self, task=None, timeout=3.0):
+        """Cancel ``task`` (default: the running agent task) and wait briefly for it to stop."""
+        task = task or self.agent_task
+        if task and not task.done():
+            task.cancel()
+            try:
+                await asyncio.wait_for(task, timeout=timeout)
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                pass
+            except Exception as e:
+                logger.error(f"Agent task failed while cancelling: {e}")
+
+
+class ClientPool:
+    """Connected Claude clients keyed by user_id, with idle TTL eviction and a global cap."""
+
+    def __init__(self, max_clients=CLAUDE_POOL_MAX_CLIENTS, idle_ttl=CLAUDE_POOL_IDLE_TTL):
+        self.max_clients = max_clients
+        self.idle_ttl = idle_ttl
+        self.sessions: Dict[str, UserSession] = {}
+        self._reaper: Optional[asyncio.Task] = None
+
+    def get(self, user_id) -> Optional[UserSession]:
+        return self.sessions.get(user_id)
+
+    def connected(self):
+        return sum(1 for session in self.sessions.values() if session.client)
+
+    async def acquire(self, user_id, system=None, model=None, mcp_configs=None,
+                      allowed_tools: Optional[list[str]] = None) -> UserSession:
+        """Return the user's session with a connected client, creating one if needed.
+
+        The session comes back pinned so it cannot be evicted before the caller
+        starts its turn; the caller must ``unpin()`` it once ``agent_task`` is set.
+        """
+        allowed_tools = list(allowed_tools or [])
+        self._ensure_reaper()
+        session = self.sessions.get(user_id)
+        if session is None:
+            session = self.sessions[user_id] = UserSession(user_id)
+        session.last_used = time.monotonic()
+
+        options_key = json.dumps([system, model, mcp_configs, sorted(allowed_tools)], sort_keys=True, default=str)
+        async with session.lock:
+            if session.client and session.options_key != options_key:
+                # system/model/MCP 变了，CLI 进程需要用新的 options 重建
+                logger.info(f"Options changed for user {user_id}, reconnecting client")
+                await session.cancel_task()
+                await disconnect_session(session)
+            if not session.client:
+                try:
+                    victims = self._make_room(session)
+                except PoolFullError:
+                    if not session.busy() and not session.pins and self.sessions.get(user_id) is session:
+                        self.sessions.pop(user_id)
+                    raise
+                for victim in victims:
+                    await self._close(victim)
+                await initialize_claude_client(session, system=system, model=model,
+                                               mcp_configs=mcp_configs, allowed_tools=allowed_tools)
+                session.options_key = options_key
+            session.pins += 1
+        return session
+
+    def _make_room(self, session):
+        """Pick least recently used idle sessions to evict so ``session`` fits under the cap."""
+        others = [s for s in self.sessions.values()
+                  if s is not session and (s.client or s.lock.locked())]
+        victims = []
+        idle = sorted((s for s in others if s.evictable()), key=lambda s: s.last_used)
+        while len(others) - len(victims) >= self.max_clients:
+            if not idle:
+                raise PoolFullError(f"all {self.max_clients} Claude clients are busy, try again later")
+            victim = idle.pop(0)
+            # 先从池中摘掉，释放名额后再异步断开
+            self.sessions.pop(victim.user_id, None)
+            victims.append(victim)
+        return victims
+
+    async def remove(self, user_id):
+        """Drop a user's session: cancel its task and disconnect its client."""
+        session = self.sessions.pop(user_id, None)
+        if session:
+            await self._close(session)
+        return session is not None
+
+    async def _close(self, session):
+        await session.cancel_task()
+        await disconnect_session(session)
+        logger.info(f"Released Claude client for user {session.user_id}, {self.connected()} still connected")
+
+    async def evict_idle(self):
+        now = time.monotonic()
+        expired = [s for s in self.sessions.values()
+                   if s.evictable() and now - s.last_used >= self.idle_ttl]
+        for session in expired:
+            if self.sessions.get(session.user_id) is session and session.evictable():
+                self.sessions.pop(session.user_id)
+                logger.info(f"Evicting idle Claude client for user {session.user_id}")
+                await self._close(session)
+        return len(expired)
+
+    async def _reap(self):
+        while True:
+            await asyncio.sleep(max(1.0, min(self.idle_ttl / 2, 60.0)))
+            try:
+                await self.evict_idle()
+            except Exception as e:
+                logger.error(f"Idle client eviction failed: {e}")
+
+    def _ensure_reaper(self):
+        if self.idle_ttl > 0 and (self._reaper is None or self._reaper.done()):
+            self._reaper = asyncio.create_task(self._reap())
 
 
-# Initialize streaming stream_queue
-stream_queue = StreamingQueue()
-# stream_queue = queue.Queue()
+client_pool = ClientPool()
 
-# Global variable to track current running agent task
-current_agent_task: Optional[asyncio.Task] = None
-     
 def get_aws_account_id():
     """Get AWS account ID from STS."""
     try:
@@ -185,7 +376,7 @@ DEFAULT_SYSTEM = """You are an expert web application developer specializing in
 - Ensure version compatibility across all project components
 """
 
-async def process_query(prompt,claude_client,session_id):
+async def process_query(prompt,claude_client,session_id,stream_queue):
     text_started = False
     text_ended = False
     content_block_index = 0
@@ -268,19 +459,47 @@ async def process_query(prompt,claude_client,session_id):
         
     
     
-async def agent_task(prompt,session_id):
-    global claude_client
+async def interrupt_turn(session: UserSession, claude_client, timeout=2.0):
+    """Interrupt the CLI's current turn and drain it, so the next query starts clean.
+
+    Without this the rest of an abandoned turn would be read by the user's next
+    ``receive_response``. If the CLI does not settle in time the client is marked
+    stale and ``ClientPool.acquire`` reconnects it on the next request.
+    """
+    async def drain():
+        await claude_client.interrupt()
+        async for _ in claude_client.receive_response():
+            pass
+    try:
+        await asyncio.wait_for(drain(), timeout=timeout)
+    except Exception as e:
+        logger.warning(f"Could not interrupt turn for user {session.user_id}, reconnecting next time: {e}")
+        if session.client is claude_client:
+            session.options_key = None
+
+async def agent_task(prompt,session_id,session: UserSession):
+    claude_client = session.client
+    stream_queue = session.stream_queue
     try:
         # Ensure Claude client is initialized (but don't create it here)
         if not claude_client:
             raise RuntimeError("Claude client not initialized. Call initialize_claude_client first.")
         # Monitor tool usage and responses
-        await process_query(prompt=prompt,claude_client=claude_client,session_id=session_id)
+        await process_query(prompt=prompt,claude_client=claude_client,session_id=session_id,stream_queue=stream_queue)
         
     except asyncio.CancelledError:
         logger.info("Agent task was cancelled")
-        await stream_queue.put({"type": "stopped"})
+        try:
+            await stream_queue.put({"type": "stopped"})
+        except ChannelCancelled:
+            pass  # nobody is reading the stream any more
+        if claude_client:
+            await interrupt_turn(session, claude_client)
         raise  # Re-raise to properly propagate cancellation
+    except ChannelCancelled:
+        # 流已经没人读了，停止这一轮而不是把它跑完
+        logger.info(f"Stream for user {session.user_id} was cancelled, stopping agent task")
+        await interrupt_turn(session, claude_client)
     except CLINotFoundError:
         print("Install CLI: npm install -g @anthropic-ai/claude-code")
         await stream_queue.put("Install CLI: npm install -g @anthropic-ai/claude-code")
@@ -300,10 +519,10 @@ async def agent_task(prompt,session_id):
         print(f"Unexpected error: {e}")
         await stream_queue.put(f"Unexpected error: {e}")
     finally:
-        await stream_queue.finish()
+        stream_queue.close()
 
 
-async def pull_queue_stream(model):
+async def pull_queue_stream(model, stream_queue: EventChannel):
     current_content = ""
     thinking_start = False
     thinking_text_index = 0
@@ -414,7 +633,10 @@ async def pull_queue_stream(model):
 async def initialize_mcp_servers(user_id: str,mcp_server_ids = []):
     """初始化用户特有的MCP服务器"""
     mcp_configs = {}
-    # 获取用户服务器配置（现在是异步方法）
+    # 首次请求时预热一次所有用户的配置缓存（加锁，只扫描一次表）
+    if not mcp_config_cache.loaded:
+        await load_user_mcp_configs()
+    # 获取用户服务器配置（命中缓存时不访问DynamoDB）
     total_configs = await get_user_server_configs(user_id)
     for server_id, config in total_configs.items():
         if server_id not in mcp_server_ids:
@@ -423,42 +645,52 @@ async def initialize_mcp_servers(user_id: str,mcp_server_ids = []):
             mcp_configs[server_id] = config
     return mcp_configs
 
-async def cleanup_monitor():
+async def cleanup_monitor(session: UserSession):
     """Monitor for cleanup signals and handle disconnect in correct context"""
-    global claude_client, cleanup_signal
-
     try:
-        while claude_client and cleanup_signal:
+        if session.client and session.cleanup_signal:
             # Wait for cleanup signal
-            await cleanup_signal.wait()
+            await session.cleanup_signal.wait()
 
-            if claude_client:
+            if session.client:
                 try:
-                    await claude_client.interrupt()
-                    await claude_client.disconnect()
-                    logger.info("Client disconnected by cleanup monitor")
+                    await session.client.interrupt()
+                    await session.client.disconnect()
+                    logger.info(f"Client for user {session.user_id} disconnected by cleanup monitor")
                 except Exception as e:
                     logger.error(f"Cleanup monitor disconnect failed: {e}")
-                finally:
-                    claude_client = None
-                    cleanup_signal = None
-
-            # Exit the monitoring loop after cleanup
-            break
 
     except asyncio.CancelledError:
         logger.info("Cleanup monitor cancelled")
-        # Ensure cleanup even if cancelled
-        if claude_client:
-            claude_client = None
-            cleanup_signal = None
-
-async def initialize_claude_client(system=None, model=None, mcp_configs=None, allowed_tools=[]):
-    """Initialize Claude client with given configuration"""
-    global claude_client, cleanup_signal
-
+    finally:
+        session.client = None
+        session.cleanup_signal = None
+
+async def disconnect_session(session: UserSession, timeout=5.0):
+    """Signal the session's cleanup monitor and wait for the client to disconnect"""
+    monitor = session.monitor_task
+    if session.client and session.cleanup_signal:
+        # Signal cleanup to owner task via cleanup monitor
+        session.cleanup_signal.set()
+        if monitor:
+            try:
+                await asyncio.wait_for(asyncio.shield(monitor), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Cleanup signal sent but client for user {session.user_id} still exists")
+                monitor.cancel()
+    elif monitor and not monitor.done():
+        monitor.cancel()
+    # Force cleanup as fallback
+    session.client = None
+    session.cleanup_signal = None
+    session.monitor_task = None
+    session.options_key = None
+
+async def initialize_claude_client(session: UserSession, system=None, model=None, mcp_configs=None,
+                                   allowed_tools: Optional[list[str]] = None):
+    """Initialize the session's Claude client with given configuration"""
     # Only create client if it doesn't exist
-    if not claude_client:
+    if not session.client:
         # Get MCP servers configuration with dynamic bucket creation
         # mcp_servers = get_prebuilt_mcp_servers()
         mcp_servers = {}
@@ -468,7 +700,7 @@ async def initialize_claude_client(system=None, model=None, mcp_configs=None, al
         options = ClaudeAgentOptions(
             model=model if model else "global.anthropic.claude-sonnet-4-5-20250929-v1:0",
             mcp_servers=mcp_servers,
-            allowed_tools=["TodoWrite","Task","WebFetch","WebSearch"]+allowed_tools,
+            allowed_tools=["TodoWrite","Task","WebFetch","WebSearch"]+(allowed_tools or []),
             disallowed_tools=["Bash","KillBash","Read","Write","LS","Glob","Grep","NotebookEditCell","Edit","MultiEdit"],
             permission_mode='acceptEdits',
             system_prompt=system if system else {"type": "preset", "preset": "claude_code"},
@@ -477,22 +709,23 @@ async def initialize_claude_client(system=None, model=None, mcp_configs=None, al
             # cwd="app/workspace"
         )
 
-        claude_client = ClaudeSDKClient(options)
-        await claude_client.connect()
+        client = ClaudeSDKClient(options)
+        await client.connect()
+        session.client = client
 
         # Create cleanup signal for cross-task communication
-        cleanup_signal = asyncio.Event()
+        session.cleanup_signal = asyncio.Event()
 
         # Start background cleanup monitor in owner task
-        asyncio.create_task(cleanup_monitor())
+        session.monitor_task = asyncio.create_task(cleanup_monitor(session))
 
-        logger.info("Claude client initialized and connected with cleanup monitor")
+        logger.info(f"Claude client initialized for user {session.user_id} "
+                    f"({client_pool.connected()}/{client_pool.max_clients} connected)")
 
-    return claude_client
+    return session.client
 
 @app.entrypoint
 async def agent_invocation(payload:OperationsRequest):
-    global current_agent_task, claude_client, cleanup_signal
     request = OperationsRequest(**payload)
     
     user_id = request.user_id
@@ -501,9 +734,6 @@ async def agent_invocation(payload:OperationsRequest):
     logger.info(f"=====request data:{data}=======\n")
     prompt = ""
     if request.request_type == 'chatcompletion':
-        if stream_queue._queue.qsize() > 0 or stream_queue._finished:
-            stream_queue.reset()
-
         server_configs = await initialize_mcp_servers(user_id=user_id,mcp_server_ids=data.mcp_server_ids)
         logger.info(f"server_configs:{server_configs}")
 
@@ -523,17 +753,34 @@ async def agent_invocation(payload:OperationsRequest):
             if content_item.type == "text":
                 prompt = content_item.text
         if prompt:
-            # Initialize Claude client first (outside of agent_task)
-            await initialize_claude_client(system=system, model=data.model, mcp_configs=server_configs, allowed_tools=allowed_tools)
+            # Get (or connect) this user's pooled client first (outside of agent_task)
+            try:
+                session = await client_pool.acquire(user_id, system=system, model=data.model,
+                                                    mcp_configs=server_configs, allowed_tools=allowed_tools)
+            except PoolFullError as e:
+                logger.warning(f"Rejecting request from user {user_id}: {e}")
+                return {"status": "error", "message": str(e)}
 
-            # Create and start the agent task
-            task = asyncio.create_task(agent_task(prompt=prompt,session_id=user_id))
-            current_agent_task = task  # Store reference to current task
+            try:
+                # 同一用户的新请求会打断上一轮，避免两个 turn 交错写入同一个队列
+                if session.busy():
+                    logger.info(f"Cancelling previous agent task for user {user_id}")
+                    await session.cancel_task()
+                # 每一轮使用新的队列，被打断的上一轮仍然能在自己的队列里收到结束事件
+                stream_queue = session.stream_queue = EventChannel()
+
+                # Create and start the agent task
+                task = asyncio.create_task(agent_task(prompt=prompt,session_id=user_id,session=session))
+                # 任务在开始运行前就被取消时不会执行自己的 finally，这里保证流能结束
+                task.add_done_callback(lambda _: stream_queue.close())
+                session.agent_task = task  # Store reference to this user's task
+            finally:
+                session.unpin()
             
             async def stream_with_task():
                 """Stream results while ensuring task completion."""
                 try:
-                    async for item in pull_queue_stream(model):
+                    async for item in pull_queue_stream(model, stream_queue):
                         yield item
                         # logger.info(item)
                     await task
@@ -541,17 +788,25 @@ async def agent_invocation(payload:OperationsRequest):
                     logger.info("Agent task was cancelled")
                     # Don't re-raise, just complete the stream gracefully
                 finally:
-                    current_agent_task = None  # Clear task reference when done
+                    # 客户端断开时也要释放队列，避免 agent_task 阻塞在满队列上
+                    stream_queue.cancel()
+                    if not task.done():
+                        # 流提前结束：先停掉这一轮，池才能安全地回收或重建这个 client
+                        logger.info(f"Stream for user {user_id} ended early, cancelling its agent task")
+                        await session.cancel_task(task)
+                    if session.agent_task is task and task.done():
+                        session.agent_task = None  # Clear task reference when done
+                    session.last_used = time.monotonic()
 
             return stream_with_task()
     elif request.request_type == 'stopstream':
-        # Stop agent_task
+        # Stop this user's agent_task
         logger.info("=====STOP STREAM REQUEST RECEIVED=======")
-        if current_agent_task and not current_agent_task.done():
-            logger.info("Cancelling current agent task")
-            current_agent_task.cancel()
-            # Add stopped event to queue to trigger proper stream termination
-            await stream_queue.put({"type": "stopped"})
+        session = client_pool.get(user_id)
+        if session and session.busy():
+            logger.info(f"Cancelling agent task for user {user_id}")
+            # agent_task 的 CancelledError 处理会发出唯一的 stopped 事件
+            session.agent_task.cancel()
             logger.info("Agent task cancellation requested")
         else:
             logger.info("No active agent task to cancel")
@@ -561,42 +816,11 @@ async def agent_invocation(payload:OperationsRequest):
     elif request.request_type == 'removehistory':
         logger.info("=====REMOVE HISTORY REQUEST RECEIVED=======")
 
-        # Cancel any running agent tasks first
-        if current_agent_task and not current_agent_task.done():
-            current_agent_task.cancel()
-            try:
-                await asyncio.wait_for(current_agent_task, timeout=3.0)
-            except (asyncio.CancelledError, asyncio.TimeoutError):
-                pass
-
-        if claude_client and cleanup_signal:
-            # Signal cleanup to owner task via cleanup monitor
-            logger.info("Signaling cleanup to owner task")
-            cleanup_signal.set()
-
-            # Wait briefly for cleanup to complete
-            try:
-                # Give the cleanup monitor time to process the signal
-                await asyncio.sleep(0.2)
-
-                # Check if cleanup completed
-                if claude_client is None:
-                    logger.info("Cleanup completed successfully via signal")
-                else:
-                    logger.warning("Cleanup signal sent but client still exists")
-                    # Force cleanup as fallback
-                    claude_client = None
-                    cleanup_signal = None
-            except Exception as e:
-                logger.error(f"Error during signal-based cleanup: {e}")
-                # Force cleanup as fallback
-                claude_client = None
-                cleanup_signal = None
-        elif claude_client:
-            # No cleanup signal available, force cleanup
-            logger.info("No cleanup signal available, forcing cleanup")
-            claude_client = None
-            cleanup_signal = None
+        # Cancel this user's running task and disconnect only this user's client
+        if await client_pool.remove(user_id):
+            logger.info(f"Client for user {user_id} removed from pool")
+        else:
+            logger.info(f"No client in pool for user {user_id}")
 
         return {"status": "success", "message": "Remove history requested"}
         
@@ -0,0 +1,186 @@
+"""Unit tests for the per-user client pool in claude_code_agent_2.py; no Claude CLI is started."""
+
+import asyncio
+import dataclasses
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import claude_code_agent_2 as agent  # noqa: E402
+from claude_agent_sdk import AssistantMessage, ResultMessage, TextBlock  # noqa: E402
+
+
+def result_message():
+    message = ResultMessage.__new__(ResultMessage)
+    for field in dataclasses.fields(ResultMessage):
+        setattr(message, field.name, None)
+    message.total_cost_usd = 0.0
+    return message
+
+
+def text_message(text):
+    message = AssistantMessage.__new__(AssistantMessage)
+    for field in dataclasses.fields(AssistantMessage):
+        setattr(message, field.name, None)
+    message.content = [TextBlock(text=text)]
+    return message
+
+
+class FakeClient:
+    """Stands in for ClaudeSDKClient; the test feeds each turn's messages."""
+
+    instances = []
+
+    def __init__(self, options):
+        self.options = options
+        self.prompts = []
+        self.interrupts = 0
+        self.disconnected = False
+        self.messages = asyncio.Queue()
+        FakeClient.instances.append(self)
+
+    async def connect(self):
+        pass
+
+    async def query(self, prompt, session_id):
+        self.prompts.append(prompt)
+
+    async def receive_response(self):
+        while True:
+            message = await self.messages.get()
+            yield message
+            if isinstance(message, ResultMessage):
+                return
+
+    async def interrupt(self):
+        self.interrupts += 1
+        self.messages.put_nowait(result_message())
+
+    async def disconnect(self):
+        self.disconnected = True
+
+
+def chat(user_id, prompt):
+    return {
+        "user_id": user_id,
+        "request_type": "chatcompletion",
+        "data": {"model": "test-model", "messages": [{"role": "user", "content": prompt}]},
+    }
+
+
+class TestClientPool(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        FakeClient.instances = []
+        patcher = mock.patch.object(agent, "ClaudeSDKClient", FakeClient)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = agent.ClientPool(max_clients=2, idle_ttl=0)
+        pool_patcher = mock.patch.object(agent, "client_pool", self.pool)
+        pool_patcher.start()
+        self.addCleanup(pool_patcher.stop)
+
+    async def asyncTearDown(self):
+        for user_id in list(self.pool.sessions):
+            await self.pool.remove(user_id)
+
+    async def test_turn_streams_and_releases_the_task(self):
+        stream = await agent.agent_invocation(chat("alice", "hi"))
+        client = FakeClient.instances[0]
+        client.messages.put_nowait(text_message("hello"))
+        client.messages.put_nowait(result_message())
+        chunks = [chunk async for chunk in stream]
+        self.assertTrue(any("hello" in chunk for chunk in chunks))
+        self.assertEqual(chunks[-1], "data: [DONE]\n\n")
+        session = self.pool.get("alice")
+        self.assertIsNone(session.agent_task)
+        self.assertTrue(session.evictable())
+
+    async def test_disconnect_cancels_the_turn_before_the_session_goes_idle(self):
+        stream = await agent.agent_invocation(chat("alice", "hi"))
+        session = self.pool.get("alice")
+        client = session.client
+        task = session.agent_task
+        client.messages.put_nowait(text_message("partial"))
+        await stream.__anext__()
+        # The client goes away mid-turn.
+        await stream.aclose()
+        self.assertTrue(task.cancelled())
+        self.assertEqual(client.interrupts, 1)
+        self.assertIsNone(session.agent_task)
+        self.assertTrue(session.evictable())
+        # The interrupted turn was drained, so the next one reads only its own messages.
+        stream = await agent.agent_invocation(chat("alice", "again"))
+        client.messages.put_nowait(text_message("fresh"))
+        client.messages.put_nowait(result_message())
+        chunks = [chunk async for chunk in stream]
+        self.assertTrue(any("fresh" in chunk for chunk in chunks))
+        self.assertIs(self.pool.get("alice").client, client)
+
+    async def test_cancelled_channel_stops_the_turn(self):
+        await agent.agent_invocation(chat("alice", "hi"))
+        session = self.pool.get("alice")
+        client = session.client
+        task = session.agent_task
+        session.stream_queue.cancel()
+        client.messages.put_nowait(text_message("nobody is listening"))
+        await asyncio.wait_for(task, 5)
+        self.assertFalse(task.cancelled())
+        self.assertEqual(client.interrupts, 1)
+        self.assertFalse(session.busy())
+
+    async def test_stop_stream_emits_one_stopped_event(self):
+        stream = await agent.agent_invocation(chat("alice", "hi"))
+        session = self.pool.get("alice")
+        channel = session.stream_queue
+        put = channel.put
+        stopped = []
+
+        async def spy(item):
+            if isinstance(item, dict) and item.get("type") == "stopped":
+                stopped.append(item)
+            return await put(item)
+
+        channel.put = spy
+        session.client.messages.put_nowait(text_message("partial"))
+        await stream.__anext__()
+        stop = {"user_id": "alice", "request_type": "stopstream", "data": {"stream_id": "s"}}
+        await agent.agent_invocation(stop)
+        chunks = [chunk async for chunk in stream]
+        self.assertEqual(len(stopped), 1)
+        self.assertEqual(sum("stop_requested" in chunk for chunk in chunks), 1)
+        self.assertEqual(chunks[-1], "data: [DONE]\n\n")
+
+    async def test_stream_ends_when_the_turn_is_stopped_before_it_starts(self):
+        stream = await agent.agent_invocation(chat("alice", "hi"))
+        stop = {"user_id": "alice", "request_type": "stopstream", "data": {"stream_id": "s"}}
+        await agent.agent_invocation(stop)
+        # The task never ran its own handlers, so the stream must still end on its own.
+        started = asyncio.get_running_loop().time()
+        await asyncio.wait_for(self._collect(stream), 5)
+        self.assertLess(asyncio.get_running_loop().time() - started, 1)
+        self.assertFalse(self.pool.get("alice").busy())
+
+    async def _collect(self, stream):
+        return [chunk async for chunk in stream]
+
+    async def test_acquired_session_is_pinned_until_its_turn_starts(self):
+        session = await self.pool.acquire("alice")
+        self.assertFalse(session.evictable())
+        self.assertEqual(await self.pool.evict_idle(), 0)
+        await self.pool.acquire("bob")
+        with self.assertRaises(agent.PoolFullError):
+            await self.pool.acquire("carol")
+        session.unpin()
+        self.assertTrue(session.evictable())
+        self.pool.get("bob").unpin()
+        carol = await self.pool.acquire("carol")
+        carol.unpin()
+        self.assertEqual(len(self.pool.sessions), 2)
+        self.assertIn("carol", self.pool.sessions)
+
+
+if __name__ == "__main__":
+    unittest.main()
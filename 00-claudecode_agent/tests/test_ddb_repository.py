@@ -0,0 +1,198 @@
+"""Unit tests for DdbRepository and DynamoConfigStore in utils.py, against a fake DynamoDB client."""
+
+import asyncio
+import json
+import sys
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from botocore.exceptions import ClientError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import utils  # noqa: E402
+from utils import ConfigConflictError, DdbRepository, DynamoConfigStore  # noqa: E402
+
+TABLE = "configs"
+
+
+class FakeDynamoClient:
+    """The slice of the boto3 low-level client DdbRepository uses, over a dict."""
+
+    def __init__(self):
+        self.items = {}
+        self.calls = []
+        self.unprocessed_gets = 0  # keys held back from the next BatchGetItem responses
+        self.unprocessed_writes = 0
+        self._lock = threading.Lock()
+
+    def seed(self, key, data, version=None):
+        item = {"userId": {"S": key}, "data": {"S": json.dumps(data)}}
+        if version is not None:
+            item["version"] = {"N": str(version)}
+        self.items[key] = item
+
+    def data(self, key):
+        return json.loads(self.items[key]["data"]["S"])
+
+    def batch_get_item(self, RequestItems):
+        with self._lock:
+            keys = RequestItems[TABLE]["Keys"]
+            self.calls.append(("batch_get_item", [key["userId"]["S"] for key in keys]))
+            held, self.unprocessed_gets = keys[: self.unprocessed_gets], 0
+            found = [self.items[key["userId"]["S"]] for key in keys[len(held):] if key["userId"]["S"] in self.items]
+            response = {"Responses": {TABLE: found}}
+            if held:
+                response["UnprocessedKeys"] = {TABLE: {"Keys": held}}
+            return response
+
+    def batch_write_item(self, RequestItems):
+        with self._lock:
+            requests = RequestItems[TABLE]
+            self.calls.append(("batch_write_item", len(requests)))
+            held, self.unprocessed_writes = requests[: self.unprocessed_writes], 0
+            for request in requests[len(held):]:
+                if "PutRequest" in request:
+                    item = request["PutRequest"]["Item"]
+                    self.items[item["userId"]["S"]] = item
+                else:
+                    self.items.pop(request["DeleteRequest"]["Key"]["userId"]["S"], None)
+            return {"UnprocessedItems": {TABLE: held}} if held else {}
+
+    def put_item(self, TableName, Item, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues):
+        with self._lock:
+            self.calls.append(("put_item", Item["userId"]["S"]))
+            current = self.items.get(Item["userId"]["S"], {})
+            expected = ExpressionAttributeValues[":v"]["N"]
+            stored = current.get("version", {}).get("N")
+            if not (stored == expected or (stored is None and ConditionExpression.startswith("attribute_not_exists"))):
+                raise ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "PutItem")
+            self.items[Item["userId"]["S"]] = Item
+
+    def get_paginator(self, name):
+        client = self
+
+        class Paginator:
+            def paginate(self, TableName, Segment, TotalSegments):
+                client.calls.append(("scan", Segment, TotalSegments))
+                keys = sorted(client.items)[Segment::TotalSegments]
+                yield {"Items": [client.items[key] for key in keys[:1]]}
+                yield {"Items": [client.items[key] for key in keys[1:]]}
+
+        return Paginator()
+
+
+class TestDdbRepository(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.client = FakeDynamoClient()
+        self.repository = DdbRepository(TABLE, self.client, batch_window=0.01, scan_segments=3)
+        self.repository._backoff = self._no_backoff
+
+    async def _no_backoff(self, attempt):
+        await asyncio.sleep(0)
+
+    def calls(self, name):
+        return [call for call in self.client.calls if call[0] == name]
+
+    async def test_gets_in_one_window_share_a_batch(self):
+        self.client.seed("alice", {"a": 1})
+        self.client.seed("bob", {"b": 2})
+        results = await asyncio.gather(*(self.repository.get(key) for key in ("alice", "bob", "alice", "nobody")))
+        self.assertEqual(results, [{"a": 1}, {"b": 2}, {"a": 1}, {}])
+        self.assertEqual(self.calls("batch_get_item"), [("batch_get_item", ["alice", "bob", "nobody"])])
+        # Callers get their own copies.
+        results[0]["a"] = 99
+        self.assertEqual(results[2], {"a": 1})
+
+    async def test_writes_in_one_window_share_a_batch_and_the_last_write_wins(self):
+        await asyncio.gather(
+            self.repository.put("alice", {"v": 1}),
+            self.repository.put("bob", {"v": 1}),
+            self.repository.put("alice", {"v": 2}),
+            self.repository.delete("carol"),
+        )
+        self.assertEqual(self.calls("batch_write_item"), [("batch_write_item", 3)])
+        self.assertEqual(self.client.data("alice"), {"v": 2})
+
+    async def test_unprocessed_keys_are_retried(self):
+        for key in ("alice", "bob", "carol"):
+            self.client.seed(key, {"user": key})
+        self.client.unprocessed_gets = 2
+        results = await asyncio.gather(*(self.repository.get(key) for key in ("alice", "bob", "carol")))
+        self.assertEqual([result["user"] for result in results], ["alice", "bob", "carol"])
+        self.assertEqual(
+            self.calls("batch_get_item"),
+            [("batch_get_item", ["alice", "bob", "carol"]), ("batch_get_item", ["alice", "bob"])],
+        )
+
+    async def test_unprocessed_items_are_retried(self):
+        self.client.unprocessed_writes = 1
+        await asyncio.gather(self.repository.put("alice", {"v": 1}), self.repository.put("bob", {"v": 1}))
+        self.assertEqual(self.calls("batch_write_item"), [("batch_write_item", 2), ("batch_write_item", 1)])
+        self.assertEqual((self.client.data("alice"), self.client.data("bob")), ({"v": 1}, {"v": 1}))
+
+    async def test_still_unprocessed_after_max_attempts_fails_every_caller(self):
+        repository = DdbRepository(TABLE, self.client, batch_window=0.01, max_attempts=2)
+        repository._backoff = self._no_backoff
+        self.client.batch_write_item = lambda RequestItems: {"UnprocessedItems": RequestItems}
+        results = await asyncio.gather(repository.put("alice", {}), repository.put("bob", {}), return_exceptions=True)
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+
+    async def test_reads_see_pending_writes(self):
+        self.client.seed("alice", {"v": 1})
+        write = asyncio.create_task(self.repository.put("alice", {"v": 2}))
+        await asyncio.sleep(0)
+        self.assertEqual(await self.repository.get("alice"), {"v": 2})
+        await write
+        delete = asyncio.create_task(self.repository.delete("alice"))
+        await asyncio.sleep(0)
+        self.assertEqual(await self.repository.get("alice"), {})
+        await delete
+
+    async def test_scan_reads_every_segment(self):
+        for i in range(7):
+            self.client.seed(f"user-{i}", {"i": i}, version=i)
+        self.client.seed("user-0_messages", {"messages": []})
+        items = await self.repository.scan_all(keep=lambda key: not key.endswith("_messages"))
+        self.assertEqual(items, {f"user-{i}": ({"i": i}, i) for i in range(7)})
+        self.assertEqual(sorted(call[1] for call in self.calls("scan")), [0, 1, 2])
+
+    async def test_scan_all_from_ddb_returns_data_by_key(self):
+        self.client.seed("alice", {"a": {}}, version=2)
+        self.client.seed("stream-1", {"user_id": "alice"})
+        with mock.patch.object(utils, "ddb_repository", self.repository):
+            self.assertEqual(await utils.scan_all_from_ddb(), {"alice": {"a": {}}, "stream-1": {"user_id": "alice"}})
+        self.assertEqual(len(self.calls("scan")), 3)
+
+
+class TestDynamoConfigStore(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.client = FakeDynamoClient()
+        self.repository = DdbRepository(TABLE, self.client, batch_window=0.01, scan_segments=2)
+        self.store = DynamoConfigStore(self.repository)
+
+    async def test_versioned_puts_are_conditional(self):
+        self.assertEqual(await self.store.get("alice"), ({}, 0))
+        self.assertEqual(await self.store.put("alice", {"a": {}}, 0), 1)
+        self.assertEqual(await self.store.get("alice"), ({"a": {}}, 1))
+        with self.assertRaises(ConfigConflictError):
+            await self.store.put("alice", {"b": {}}, 0)
+        self.assertEqual(await self.store.put("alice", {"b": {}}, 1), 2)
+        self.assertEqual(await self.store.get("alice"), ({"b": {}}, 2))
+
+    async def test_items_written_before_versioning_start_at_version_zero(self):
+        self.client.seed("alice", {"a": {}})
+        self.assertEqual(await self.store.get("alice"), ({"a": {}}, 0))
+        self.assertEqual(await self.store.put("alice", {}, 0), 1)
+
+    async def test_scan_skips_message_and_session_rows(self):
+        self.client.seed("alice", {"a": {}}, version=3)
+        self.client.seed("alice_messages", {"messages": []})
+        self.client.seed("alice_session", {"session_id": "s"})
+        self.assertEqual(await self.store.scan(), {"alice": ({"a": {}}, 3)})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""Unit tests for EventChannel in claude_code_agent_2.py."""
+
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from claude_code_agent_2 import HEARTBEAT, ChannelCancelled, EventChannel  # noqa: E402
+
+
+async def collect(channel):
+    return [item async for item in channel.stream()]
+
+
+class TestEventChannel(unittest.IsolatedAsyncioTestCase):
+    async def test_put_waits_while_the_channel_is_full(self):
+        channel = EventChannel(maxsize=2, heartbeat_interval=0)
+        self.assertTrue(await channel.put(1))
+        self.assertTrue(await channel.put(2))
+        blocked = asyncio.create_task(channel.put(3))
+        await asyncio.sleep(0.01)
+        self.assertFalse(blocked.done())
+        stream = channel.stream()
+        self.assertEqual(await stream.__anext__(), 1)
+        self.assertTrue(await asyncio.wait_for(blocked, 1))
+        channel.close()
+        self.assertEqual([item async for item in stream], [2, 3])
+
+    async def test_heartbeats_only_when_idle(self):
+        channel = EventChannel(heartbeat_interval=0.05)
+
+        async def busy():
+            for i in range(10):
+                await channel.put(i)
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.12)
+            channel.close()
+
+        producer = asyncio.create_task(busy())
+        items = await asyncio.wait_for(collect(channel), 2)
+        await producer
+        self.assertEqual(items[:10], list(range(10)))
+        self.assertTrue(items[10:])
+        self.assertTrue(all(item is HEARTBEAT for item in items[10:]))
+
+    async def test_close_drains_queued_items_and_drops_later_puts(self):
+        channel = EventChannel(heartbeat_interval=0)
+        await channel.put("a")
+        await channel.put("b")
+        channel.close()
+        self.assertFalse(await channel.put("c"))
+        self.assertEqual(await collect(channel), ["a", "b"])
+
+    async def test_cancel_discards_pending_items_and_stops_producers(self):
+        channel = EventChannel(maxsize=1, heartbeat_interval=0)
+        await channel.put("a")
+        blocked = asyncio.create_task(channel.put("b"))
+        await asyncio.sleep(0.01)
+        channel.cancel()
+        with self.assertRaises(ChannelCancelled):
+            await asyncio.wait_for(blocked, 1)
+        with self.assertRaises(ChannelCancelled):
+            await channel.put("c")
+        self.assertTrue(channel.cancelled)
+        self.assertEqual(await collect(channel), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
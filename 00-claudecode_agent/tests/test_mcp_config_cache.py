@@ -0,0 +1,123 @@
+"""Unit tests for McpConfigCache in utils.py, backed by LocalConfigStore."""
+
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import utils  # noqa: E402
+from utils import ConfigConflictError, LocalConfigStore, McpConfigCache  # noqa: E402
+
+SERVER = {"command": "uvx", "args": ["server"]}
+
+
+class CountingStore(LocalConfigStore):
+    def __init__(self):
+        super().__init__()
+        self.gets = 0
+        self.puts = 0
+
+    async def get(self, user_id):
+        self.gets += 1
+        await asyncio.sleep(0)
+        return await super().get(user_id)
+
+    async def put(self, user_id, configs, expected_version):
+        self.puts += 1
+        return await super().put(user_id, configs, expected_version)
+
+
+def add(server_id, config=SERVER):
+    def mutate(configs):
+        configs[server_id] = config
+        return True
+    return mutate
+
+
+class TestMcpConfigCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.store = CountingStore()
+        self.cache = McpConfigCache(self.store, ttl=60)
+
+    async def test_updates_write_through_with_the_next_version(self):
+        self.assertTrue(await self.cache.update("alice", add("a")))
+        self.assertTrue(await self.cache.update("alice", add("b")))
+        self.assertEqual(await self.store.get("alice"), ({"a": SERVER, "b": SERVER}, 2))
+        self.assertFalse(await self.cache.update("alice", lambda configs: False))
+        self.assertEqual(self.store.puts, 2)
+        gets = self.store.gets
+        self.assertEqual(set(await self.cache.get("alice")), {"a", "b"})
+        self.assertEqual(self.store.gets, gets)
+
+    async def test_conflicting_write_is_reread_and_retried(self):
+        await self.cache.update("alice", add("a"))
+        # Another container writes behind this cache's back.
+        await self.store.put("alice", {"a": SERVER, "other": SERVER}, 1)
+        self.assertTrue(await self.cache.update("alice", add("b")))
+        self.assertEqual(self.cache.stats["conflicts"], 1)
+        configs, version = await self.store.get("alice")
+        self.assertEqual((set(configs), version), ({"a", "other", "b"}, 3))
+        self.assertEqual(set(await self.cache.get("alice")), {"a", "other", "b"})
+
+    async def test_gives_up_after_max_retries(self):
+        cache = McpConfigCache(self.store, ttl=60, max_retries=2)
+        with mock.patch.object(self.store, "put", side_effect=ConfigConflictError("alice")):
+            with self.assertRaises(ConfigConflictError):
+                await cache.update("alice", add("a"))
+        self.assertEqual(cache.stats["conflicts"], 2)
+
+    async def test_reads_hit_until_the_ttl_expires(self):
+        cache = McpConfigCache(self.store, ttl=0.05)
+        await self.store.put("alice", {"a": SERVER}, 0)
+        results = await asyncio.gather(*(cache.get("alice") for _ in range(5)))
+        self.assertTrue(all(result == {"a": SERVER} for result in results))
+        self.assertEqual(self.store.gets, 1)
+        await self.store.put("alice", {"b": SERVER}, 1)
+        self.assertEqual(await cache.get("alice"), {"a": SERVER})
+        await asyncio.sleep(0.06)
+        self.assertEqual(await cache.get("alice"), {"b": SERVER})
+        self.assertEqual(self.store.gets, 2)
+
+    async def test_load_all_keeps_only_config_items(self):
+        await self.store.put("alice", {"a": SERVER}, 0)
+        await self.store.put("alice_messages", {"messages": [{"role": "user"}]}, 0)
+        await self.store.put("alice_session", {"session_id": "s1"}, 0)
+        await self.store.put("stream-1", {"user_id": "alice"}, 0)
+        self.assertEqual(await self.cache.load_all(), 1)
+        self.assertEqual(set(self.cache._entries), {"alice"})
+        self.assertEqual(await self.cache.get("alice"), {"a": SERVER})
+        self.assertEqual(self.store.gets, 0)
+
+
+class TestFirstRequestLoad(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.cache = McpConfigCache(LocalConfigStore(), ttl=60)
+        for name, value in (("mcp_config_cache", self.cache), ("mcp_config_load_lock", asyncio.Lock())):
+            patcher = mock.patch.object(utils, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_concurrent_first_requests_scan_once(self):
+        import claude_code_agent_2 as agent
+
+        load_all = mock.AsyncMock(return_value=0)
+        with mock.patch.object(agent, "mcp_config_cache", self.cache), \
+                mock.patch.object(self.cache, "load_all", load_all):
+            await asyncio.gather(*(agent.initialize_mcp_servers("alice", ["a"]) for _ in range(5)))
+            await agent.initialize_mcp_servers("bob", ["a"])
+        self.assertEqual(load_all.await_count, 1)
+
+    async def test_failed_load_is_not_retried(self):
+        load_all = mock.AsyncMock(side_effect=RuntimeError("boom"))
+        with mock.patch.object(self.cache, "load_all", load_all):
+            await utils.load_user_mcp_configs()
+            await utils.load_user_mcp_configs()
+        self.assertEqual(load_all.await_count, 1)
+        self.assertTrue(self.cache.loaded)
+
+
+if __name__ == "__main__":
+    unittest.main()
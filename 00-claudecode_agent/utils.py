@@ -16,8 +16,11 @@ import re
 import threading
 from dotenv import load_dotenv
 from urllib.parse import urlparse
+from botocore.config import Config
 from botocore.exceptions import ClientError
 import asyncio
+import copy
+import time
 # Initialize logger
 
 logging.basicConfig(
@@ -30,13 +33,11 @@ load_dotenv()  # load env vars from .env
 # DynamoDB 客户端
 dynamodb_client = None
 DDB_TABLE = os.environ.get("ddb_table","agent_user_config_table")  # DynamoDB表名，用于存储用户配置
-user_mcp_server_configs = {}  # 用户特有的MCP服务器配置 user_id -> {server_id: config}
 global_mcp_server_configs = {}  # 全局MCP服务器配置 server_id -> config
 # 活跃流式请求的字典，用于跟踪可以停止的请求
 active_streams = {}
 # 使用独立的锁来保护active_streams字典
 active_streams_lock = threading.RLock()
-session_lock = threading.RLock()
 
 def get_secret(secret_name):
     # Create a Secrets Manager client
@@ -63,7 +64,9 @@ def get_secret(secret_name):
 if DDB_TABLE:
     try:
         region = os.environ.get('AWS_REGION', 'us-east-1')
-        dynamodb_client = boto3.resource('dynamodb', region_name=region)
+        # 所有请求共用一个底层 client 的连接池
+        dynamodb_client = boto3.resource('dynamodb', region_name=region,
+                                         config=Config(max_pool_connections=int(os.environ.get('DDB_MAX_CONNECTIONS', '32'))))
         logger.info(f"已连接到DynamoDB, 表名: {DDB_TABLE}")
     except Exception as e:
         logger.error(f"DynamoDB连接失败: {e}")
@@ -91,20 +94,276 @@ async def get_user_session(user_id: str) ->dict:
 async def delete_user_session(user_id: str) ->dict:
     return await delete_from_ddb(f"{user_id}_session")
     
+class ConfigConflictError(Exception):
+    """The stored configs changed since they were read (version mismatch)."""
+
+
+class DdbRepository:
+    """Async access to the agent's DynamoDB items, one JSON ``data`` blob per ``userId``.
+
+    boto3 is blocking, so calls run in worker threads on one shared low-level
+    client and reuse its connection pool. Point reads and writes that arrive
+    within ``batch_window`` seconds are coalesced into BatchGetItem and
+    BatchWriteItem calls; repeated keys in a window share one request and the
+    last write wins. A read of a key with a pending or in-flight write waits
+    for that write, so callers still read their own writes.
+
+    Items may also carry a numeric ``version`` attribute; ``get_versioned`` and
+    ``put_versioned`` read it and write conditionally on it, for callers that
+    need optimistic concurrency instead of last-write-wins.
+    """
+
+    MAX_BATCH_GET = 100
+    MAX_BATCH_WRITE = 25
+
+    def __init__(self, table_name, client, batch_window=0.005, scan_segments=4, max_attempts=5):
+        self.table_name = table_name
+        self.client = client
+        self.batch_window = batch_window
+        self.scan_segments = scan_segments
+        self.max_attempts = max_attempts
+        self._gets = {}  # key -> future
+        self._writes = {}  # key -> [request, future]
+        self._inflight_writes = {}  # key -> future of the batch writing it
+        self._get_timer = None
+        self._write_timer = None
+        self._tasks = set()
+        self.stats = {"get_calls": 0, "get_batches": 0, "write_calls": 0, "write_batches": 0}
+
+    @staticmethod
+    def _key(key):
+        return {'userId': {'S': key}}
+
+    @staticmethod
+    def _decode(item):
+        return json.loads(item.get('data', {}).get('S', '{}'))
+
+    @staticmethod
+    def _version(item):
+        return int(item.get('version', {}).get('N', '0'))
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _backoff(self, attempt):
+        await asyncio.sleep(min(1.0, 0.05 * 2 ** attempt))
+
+    async def _wait_for_writes(self, key):
+        write = self._writes.get(key) or [None, self._inflight_writes.get(key)]
+        if write[1] is not None:
+            await asyncio.gather(asyncio.shield(write[1]), return_exceptions=True)
+
+    async def _get_item(self, key):
+        self.stats["get_calls"] += 1
+        await self._wait_for_writes(key)
+        future = self._gets.get(key)
+        if future is None:
+            future = self._gets[key] = asyncio.get_running_loop().create_future()
+            if len(self._gets) >= self.MAX_BATCH_GET:
+                self._flush_gets()
+            elif self._get_timer is None:
+                self._get_timer = asyncio.get_running_loop().call_later(self.batch_window, self._flush_gets)
+        return await asyncio.shield(future)
+
+    async def get(self, key):
+        """Return the decoded data for ``key``, or {} if there is none."""
+        return (await self.get_versioned(key))[0]
+
+    async def get_versioned(self, key):
+        """Return ``(data, version)`` for ``key``; ``({}, 0)`` if there is none."""
+        item = await self._get_item(key)
+        if item is None:
+            return {}, 0
+        try:
+            return self._decode(item), self._version(item)
+        except json.JSONDecodeError as e:
+            logger.error(f"解析 {key} 的DynamoDB数据失败: {e}")
+            return {}, self._version(item)
+
+    def _flush_gets(self):
+        if self._get_timer:
+            self._get_timer.cancel()
+            self._get_timer = None
+        batch, self._gets = self._gets, {}
+        if batch:
+            self._spawn(self._batch_get(batch))
+
+    async def _batch_get(self, batch):
+        self.stats["get_batches"] += 1
+        results = {}
+        try:
+            keys = [self._key(key) for key in batch]
+            for attempt in range(self.max_attempts):
+                response = await asyncio.to_thread(
+                    self.client.batch_get_item,
+                    RequestItems={self.table_name: {'Keys': keys, 'ConsistentRead': True}},
+                )
+                for item in response.get('Responses', {}).get(self.table_name, []):
+                    results[item['userId']['S']] = item
+                keys = response.get('UnprocessedKeys', {}).get(self.table_name, {}).get('Keys', [])
+                if not keys:
+                    break
+                await self._backoff(attempt)
+            if keys:
+                raise RuntimeError(f"BatchGetItem left {len(keys)} keys unprocessed")
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(results.get(key))
+
+    async def put(self, key, data):
+        item = {
+            'userId': {'S': key},
+            'data': {'S': json.dumps(data)},
+            'timestamp': {'S': datetime.now().isoformat()},
+        }
+        await self._write(key, {'PutRequest': {'Item': item}})
+
+    async def delete(self, key):
+        await self._write(key, {'DeleteRequest': {'Key': self._key(key)}})
+
+    async def put_versioned(self, key, data, expected_version):
+        """Write ``data`` as version ``expected_version + 1`` if the stored version still matches.
+
+        Conditional writes cannot go through BatchWriteItem, so this is a single
+        PutItem; it waits for any batched write of the same key first. Raises
+        ``ConfigConflictError`` when another writer got there first.
+        """
+        await self._wait_for_writes(key)
+        # 旧数据没有 version 字段，视为版本 0
+        if expected_version:
+            condition = '#v = :v'
+        else:
+            condition = 'attribute_not_exists(#v) OR #v = :v'
+        try:
+            await asyncio.to_thread(
+                self.client.put_item,
+                TableName=self.table_name,
+                Item={
+                    'userId': {'S': key},
+                    'data': {'S': json.dumps(data)},
+                    'timestamp': {'S': datetime.now().isoformat()},
+                    'version': {'N': str(expected_version + 1)},
+                },
+                ConditionExpression=condition,
+                ExpressionAttributeNames={'#v': 'version'},
+                ExpressionAttributeValues={':v': {'N': str(expected_version)}},
+            )
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+                raise ConfigConflictError(key) from e
+            raise
+        return expected_version + 1
+
+    async def _write(self, key, request):
+        self.stats["write_calls"] += 1
+        pending = self._writes.get(key)
+        if pending:
+            # 同一窗口内对同一个 key 的写入合并，以最后一次为准
+            pending[0] = request
+        else:
+            pending = self._writes[key] = [request, asyncio.get_running_loop().create_future()]
+            if len(self._writes) >= self.MAX_BATCH_WRITE:
+                self._flush_writes()
+            elif self._write_timer is None:
+                self._write_timer = asyncio.get_running_loop().call_later(self.batch_window, self._flush_writes)
+        await asyncio.shield(pending[1])
+
+    def _flush_writes(self):
+        if self._write_timer:
+            self._write_timer.cancel()
+            self._write_timer = None
+        batch, self._writes = self._writes, {}
+        if not batch:
+            return
+        # 上一批还在写同一个 key 时要等它完成，保证写入顺序
+        prior = {self._inflight_writes[key] for key in batch if key in self._inflight_writes}
+        for key, (_, future) in batch.items():
+            self._inflight_writes[key] = future
+        self._spawn(self._batch_write(batch, prior))
+
+    async def _batch_write(self, batch, prior):
+        self.stats["write_batches"] += 1
+        try:
+            if prior:
+                await asyncio.gather(*prior, return_exceptions=True)
+            requests = [request for request, _ in batch.values()]
+            for attempt in range(self.max_attempts):
+                response = await asyncio.to_thread(
+                    self.client.batch_write_item,
+                    RequestItems={self.table_name: requests},
+                )
+                requests = response.get('UnprocessedItems', {}).get(self.table_name, [])
+                if not requests:
+                    break
+                await self._backoff(attempt)
+            if requests:
+                raise RuntimeError(f"BatchWriteItem left {len(requests)} items unprocessed")
+        except Exception as e:
+            for _, future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for _, future in batch.values():
+                if not future.done():
+                    future.set_result(True)
+        finally:
+            for key, (_, future) in batch.items():
+                if self._inflight_writes.get(key) is future:
+                    del self._inflight_writes[key]
+
+    async def scan_all(self, keep=None):
+        """Read every item as ``{key: (data, version)}`` with ``scan_segments`` parallel segment scans.
+
+        ``keep(key)`` can skip items before their data is decoded.
+        """
+        total = max(1, self.scan_segments)
+
+        def scan_segment(segment):
+            paginator = self.client.get_paginator('scan')
+            items = []
+            for page in paginator.paginate(TableName=self.table_name, Segment=segment, TotalSegments=total):
+                items.extend(page.get('Items', []))
+            return items
+
+        segments = await asyncio.gather(*(asyncio.to_thread(scan_segment, i) for i in range(total)))
+        results = {}
+        for items in segments:
+            for item in items:
+                if 'userId' not in item or 'data' not in item:
+                    continue
+                key = item['userId']['S']
+                if keep and not keep(key):
+                    continue
+                try:
+                    results[key] = (self._decode(item), self._version(item))
+                except json.JSONDecodeError as e:
+                    logger.error(f"解析用户 {key} 的DynamoDB数据失败: {e}")
+        return results
+
+
+ddb_repository = None
+if DDB_TABLE and dynamodb_client:
+    ddb_repository = DdbRepository(
+        DDB_TABLE,
+        dynamodb_client.meta.client,
+        batch_window=float(os.environ.get('DDB_BATCH_WINDOW_MS', '5')) / 1000,
+        scan_segments=int(os.environ.get('DDB_SCAN_SEGMENTS', '4')),
+    )
+
 async def save_to_ddb(user_id: str, data: dict):
     """将用户配置保存到DynamoDB"""
-    if not dynamodb_client or not DDB_TABLE:
+    if not ddb_repository:
         return False
     
     try:
-        table = dynamodb_client.Table(DDB_TABLE)
-        response = table.put_item(
-            Item={
-                'userId': user_id,
-                'data': json.dumps(data),
-                'timestamp': datetime.now().isoformat()
-            }
-        )
+        await ddb_repository.put(user_id, data)
         logger.info(f"保存用户 {user_id} 配置到DynamoDB成功")
         return True
     except Exception as e:
@@ -113,20 +372,18 @@ async def save_to_ddb(user_id: str, data: dict):
 
 def get_from_ddb_sync(user_id: str) -> dict:
     """从DynamoDB获取用户配置"""
-    if not dynamodb_client or not DDB_TABLE:
+    if not ddb_repository:
         return {}
     
     try:
-        table = dynamodb_client.Table(DDB_TABLE)
-        response = table.get_item(
-            Key={
-                'userId': user_id
-            }
+        response = ddb_repository.client.get_item(
+            TableName=DDB_TABLE,
+            Key=DdbRepository._key(user_id),
+            ConsistentRead=True,
         )
         
         if 'Item' in response:
-            data = json.loads(response['Item'].get('data', '{}'))
-            return data
+            return DdbRepository._decode(response['Item'])
         else:
             logger.info(f"id {user_id} 在DynamoDB中无配置")
             return {}
@@ -136,135 +393,72 @@ def get_from_ddb_sync(user_id: str) -> dict:
     
 async def get_from_ddb(user_id: str) -> dict:
     """从DynamoDB获取用户配置"""
-    if not dynamodb_client or not DDB_TABLE:
+    if not ddb_repository:
         return {}
     
     try:
-        table = dynamodb_client.Table(DDB_TABLE)
-        response = table.get_item(
-            Key={
-                'userId': user_id
-            }
-        )
-        
-        if 'Item' in response:
-            data = json.loads(response['Item'].get('data', '{}'))
-            # logger.info(f"从DynamoDB获取用户 {user_id} 配置成功")
-            return data
-        else:
-            logger.info(f"用户 {user_id} 在DynamoDB中无配置")
-            return {}
+        return await ddb_repository.get(user_id)
     except Exception as e:
         logger.warning(f"从DynamoDB获取用户 {user_id} 配置失败: {e}")
         return {}
         
 async def delete_from_ddb(user_id: str) -> bool:
     """从DynamoDB删除用户配置"""
-    if not dynamodb_client or not DDB_TABLE:
+    if not ddb_repository:
         return False
     
     try:
-        table = dynamodb_client.Table(DDB_TABLE)
-        response = table.delete_item(
-            Key={
-                'userId': user_id
-            }
-        )
+        await ddb_repository.delete(user_id)
         return True
     except Exception as e:
         logger.warning(f"delete_from_ddb failed: {e}")
         return False
 
 async def scan_all_from_ddb() -> dict:
-    """从DynamoDB扫描所有用户配置，处理分页"""
-    if not dynamodb_client or not DDB_TABLE:
+    """从DynamoDB并行分段扫描所有记录，返回 key -> data"""
+    if not ddb_repository:
         return {}
     
     try:
-        # 使用scan操作获取所有用户的配置，并处理分页
-        table = dynamodb_client.Table(DDB_TABLE)
-        configs = {}
-        
-        # 初始化扫描参数
-        scan_params = {}
-        done = False
-        start_key = None
-        
-        # 处理分页
-        while not done:
-            if start_key:
-                scan_params['ExclusiveStartKey'] = start_key
-            
-            response = table.scan(**scan_params)
-            items = response.get('Items', [])
-            
-            # 处理当前页的结果
-            for item in items:
-                if 'userId' in item and 'data' in item:
-                    user_id = item['userId']
-                    try:
-                        user_data = json.loads(item['data'])
-                        configs[user_id] = user_data
-                    except json.JSONDecodeError as e:
-                        logger.error(f"解析用户 {user_id} 的DynamoDB数据失败: {e}")
-            
-            # 检查是否有更多页
-            start_key = response.get('LastEvaluatedKey')
-            done = start_key is None
-        
-        logger.info(f"已从DynamoDB扫描到 {len(configs)} 个用户的配置")
-        return configs
+        items = await ddb_repository.scan_all()
+        logger.info(f"已从DynamoDB扫描到 {len(items)} 条记录")
+        return {key: data for key, (data, _) in items.items()}
     except Exception as e:
         logger.error(f"从DynamoDB扫描用户配置失败: {e}")
         return {}
-    
+
 # Save stream id
 async def save_stream_id(stream_id:str,user_id:str):
-    global active_streams
+    # 锁只保护本地字典，不跨越 await
     with active_streams_lock:
-        if DDB_TABLE and dynamodb_client:
-            # 获取当前用户的所有配置
-            await save_to_ddb(stream_id, dict(user_id=user_id))
-            active_streams[stream_id]=user_id
-        else:
-            active_streams[stream_id]=user_id
+        active_streams[stream_id]=user_id
+    if ddb_repository:
+        await save_to_ddb(stream_id, dict(user_id=user_id))
 
 # Get stream id
 async def get_stream_id(stream_id:str):
+    if ddb_repository:
+        # 尝试从DynamoDB获取
+        ddb_config = await get_from_ddb(stream_id)
+        return ddb_config.get('user_id') if ddb_config else None
     with active_streams_lock:
-        if DDB_TABLE and dynamodb_client:
-            # 尝试从DynamoDB获取
-            ddb_config = await get_from_ddb(stream_id)
-            if ddb_config:
-                return ddb_config.get('user_id')
-            else:
-                return None
-        else:
-            return active_streams.get(stream_id)
+        return active_streams.get(stream_id)
     
 def get_stream_id_sync(stream_id:str):
+    if ddb_repository:
+        # 尝试从DynamoDB获取
+        ddb_config = get_from_ddb_sync(stream_id)
+        return ddb_config.get('user_id') if ddb_config else None
     with active_streams_lock:
-        if DDB_TABLE and dynamodb_client:
-            # 尝试从DynamoDB获取
-            ddb_config = get_from_ddb_sync(stream_id)
-            if ddb_config:
-                return ddb_config.get('user_id')
-            else:
-                return None
-        else:
-            return active_streams.get(stream_id)    
+        return active_streams.get(stream_id)
 
 
 # delete stream id
 async def delete_stream_id(stream_id:str):
     with active_streams_lock:
-        if DDB_TABLE and dynamodb_client:
-            # 尝试从DynamoDB获取
-            await delete_from_ddb(stream_id)
-
-        else:
-            if stream_id in active_streams:
-                active_streams.pop(stream_id, None)
+        active_streams.pop(stream_id, None)
+    if ddb_repository:
+        await delete_from_ddb(stream_id)
 
         
 
@@ -276,99 +470,222 @@ def save_global_server_config( server_id: str, config: dict):
     # 在实际应用中，这里应该将配置持久化到数据库或文件系统
     logger.info(f"保存Global服务器配置 {server_id}")
 
+# 同一张表里还存着消息、会话和 stream id，这些不是 MCP 配置
+NON_CONFIG_KEY_SUFFIXES = ('_messages', '_session')
+
+
+def is_user_config_item(key, data):
+    """True if a stored item holds a user's MCP configs (server_id -> config)."""
+    if key.endswith(NON_CONFIG_KEY_SUFFIXES) or not isinstance(data, dict):
+        return False
+    # stream id 的数据是 {"user_id": ...}，值不是配置字典
+    return all(isinstance(config, dict) for config in data.values())
+
+
+class DynamoConfigStore:
+    """Per-user MCP configs in DynamoDB, one versioned item per user.
+
+    A thin layer over ``DdbRepository``, so config reads share its client,
+    batching and read-your-writes ordering, and the startup load uses its
+    parallel segment scan. Writes are conditional on the version that was read,
+    so two containers cannot silently overwrite each other's read-modify-write.
+    """
+
+    def __init__(self, repository):
+        self.repository = repository
+
+    async def get(self, user_id):
+        return await self.repository.get_versioned(user_id)
+
+    async def put(self, user_id, configs, expected_version):
+        return await self.repository.put_versioned(user_id, configs, expected_version)
+
+    async def scan(self):
+        return await self.repository.scan_all(keep=lambda key: not key.endswith(NON_CONFIG_KEY_SUFFIXES))
+
+
+class LocalConfigStore:
+    """In-process stand-in for DynamoConfigStore, optionally persisted to a JSON file.
+
+    Used when no DynamoDB table is configured, and handy in tests since it has
+    the same versioned get/put/scan contract.
+    """
+
+    def __init__(self, config_file=None):
+        self.config_file = config_file
+        self._items = {}  # user_id -> (configs, version)
+        if config_file and os.path.exists(config_file):
+            with open(config_file, 'r') as f:
+                self._items = {user_id: (configs, 0) for user_id, configs in json.load(f).items()}
+
+    async def get(self, user_id):
+        configs, version = self._items.get(user_id, ({}, 0))
+        return copy.deepcopy(configs), version
+
+    async def put(self, user_id, configs, expected_version):
+        if self._items.get(user_id, ({}, 0))[1] != expected_version:
+            raise ConfigConflictError(user_id)
+        self._items[user_id] = (copy.deepcopy(configs), expected_version + 1)
+        if self.config_file:
+            try:
+                save_configs_to_json({uid: data for uid, (data, _) in self._items.items()})
+            except Exception as e:
+                logger.error(f"保存用户MCP配置到文件失败: {e}")
+        return expected_version + 1
+
+    async def scan(self):
+        return {user_id: (copy.deepcopy(configs), version)
+                for user_id, (configs, version) in self._items.items()}
+
+
+class McpConfigCache:
+    """TTL cache of per-user MCP configs in front of a config store.
+
+    Reads within ``ttl`` seconds never touch the store; concurrent misses for
+    the same user share one read. Updates are write-through: they go to the
+    store conditioned on the cached version, and on a version conflict the
+    configs are re-read and the change is applied again.
+    """
+
+    def __init__(self, store, ttl=300.0, max_retries=3):
+        self.store = store
+        self.ttl = ttl
+        self.max_retries = max_retries
+        self._entries = {}  # user_id -> (configs, version, loaded_at)
+        self._locks = {}
+        self.loaded = False
+        self.stats = {"hits": 0, "misses": 0, "conflicts": 0}
+
+    def _lock(self, user_id):
+        if user_id not in self._locks:
+            self._locks[user_id] = asyncio.Lock()
+        return self._locks[user_id]
+
+    def _fresh(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry and time.monotonic() - entry[2] < self.ttl:
+            return entry
+        return None
+
+    async def load_all(self):
+        """Prime the cache with every user's configs; other items in the store are skipped."""
+        now = time.monotonic()
+        items = await self.store.scan()
+        count = 0
+        for user_id, (configs, version) in items.items():
+            if not is_user_config_item(user_id, configs):
+                continue
+            count += 1
+            # 扫描期间已经读过或写过的用户以缓存中的为准
+            if user_id not in self._entries:
+                self._entries[user_id] = (configs, version, now)
+        self.loaded = True
+        return count
+
+    async def _read(self, user_id, refresh=False):
+        entry = None if refresh else self._fresh(user_id)
+        if entry:
+            self.stats["hits"] += 1
+            return entry
+        self.stats["misses"] += 1
+        configs, version = await self.store.get(user_id)
+        entry = self._entries[user_id] = (configs, version, time.monotonic())
+        return entry
+
+    async def get(self, user_id):
+        entry = self._fresh(user_id)
+        if entry is None:
+            # 同一用户并发的未命中只读一次存储
+            async with self._lock(user_id):
+                entry = await self._read(user_id)
+        else:
+            self.stats["hits"] += 1
+        return copy.deepcopy(entry[0])
+
+    async def update(self, user_id, mutate):
+        """Apply ``mutate(configs) -> bool`` and write it through; False if nothing changed."""
+        async with self._lock(user_id):
+            refresh = False
+            for _ in range(self.max_retries):
+                configs, version, _ = await self._read(user_id, refresh=refresh)
+                configs = copy.deepcopy(configs)
+                if not mutate(configs):
+                    return False
+                try:
+                    version = await self.store.put(user_id, configs, version)
+                except ConfigConflictError:
+                    self.stats["conflicts"] += 1
+                    logger.info(f"用户 {user_id} 的MCP配置版本冲突，重新读取后重试")
+                    refresh = True
+                    continue
+                self._entries[user_id] = (configs, version, time.monotonic())
+                return True
+            raise ConfigConflictError(user_id)
+
+    def invalidate(self, user_id=None):
+        if user_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(user_id, None)
+
+
+if ddb_repository:
+    mcp_config_store = DynamoConfigStore(ddb_repository)
+else:
+    mcp_config_store = LocalConfigStore(os.environ.get('USER_MCP_CONFIG_FILE', 'conf/user_mcp_configs.json'))
+mcp_config_cache = McpConfigCache(mcp_config_store, ttl=float(os.environ.get('MCP_CONFIG_CACHE_TTL', '300')))
+
+
 # 删除用户MCP服务器配置 
 async def delete_user_server_config(user_id: str, server_id: str):
     """删除用户的MCP服务器配置"""
-    with session_lock: 
-        if user_id in user_mcp_server_configs and server_id in user_mcp_server_configs[user_id]:
-            del user_mcp_server_configs[user_id][server_id]
-            # 如果配置了DynamoDB，也从DDB中更新用户配置
-            if DDB_TABLE and dynamodb_client:
-                # 获取当前用户的所有配置
-                user_configs = await get_user_server_configs(user_id)
-                if server_id in user_configs:
-                    del user_configs[server_id]
-                    # 保存更新后的配置到DynamoDB
-                    await save_to_ddb(user_id, user_configs)
-                    logger.info(f"已更新用户 {user_id} 在DynamoDB中的配置")
-            else:
-                try:
-                    save_configs_to_json(user_mcp_server_configs)
-                    logger.info(f"为用户 {user_id} 删除服务器配置 {server_id}")
-                except Exception as e:
-                    logger.error(f"保存用户MCP配置到文件失败: {e}")
+    def remove(configs):
+        return configs.pop(server_id, None) is not None
+
+    try:
+        if await mcp_config_cache.update(user_id, remove):
+            logger.info(f"为用户 {user_id} 删除服务器配置 {server_id}")
+    except Exception as e:
+        logger.error(f"删除用户 {user_id} 的MCP配置失败: {e}")
 
 
 # 保存用户MCP服务器配置
 async def save_user_server_config(user_id: str, server_id: str, config: dict):
     """保存用户的MCP服务器配置"""
-    global user_mcp_server_configs
-    
-    with session_lock:
-        if user_id not in user_mcp_server_configs:
-            user_mcp_server_configs[user_id] = {}
-        
-        user_mcp_server_configs[user_id][server_id] = config
-        # 如果配置了DynamoDB，也保存到DDB中
-        if DDB_TABLE and dynamodb_client:
-            #获取原有的记录
-            ddb_config = await get_from_ddb(user_id)
-            ddb_config[server_id] = config
-            await save_to_ddb(user_id, ddb_config)
-            logger.info(f"已保存用户 {user_id} 配置到DynamoDB")
-        else:
-            try:
-                save_configs_to_json(user_mcp_server_configs)
-                logger.info(f"已保存用户 {user_id} 配置到config_file")
-            except Exception as e:
-                logger.error(f"保存用户MCP配置到文件失败: {e}")
+    def add(configs):
+        configs[server_id] = config
+        return True
+
+    try:
+        await mcp_config_cache.update(user_id, add)
+        logger.info(f"已保存用户 {user_id} 的MCP服务器配置 {server_id}")
+    except Exception as e:
+        logger.error(f"保存用户 {user_id} 的MCP配置失败: {e}")
 
 # 获取用户MCP服务器配置
 async def get_user_server_configs(user_id: str) -> dict:
-    """获取指定用户的所有MCP服务器配置"""
-    # 如果设置了DynamoDB表名，优先从DynamoDB读取
-    if DDB_TABLE and dynamodb_client:
-        # 尝试从DynamoDB获取
-        ddb_config = await get_from_ddb(user_id)
-        if ddb_config:
-            # 如果DynamoDB中有数据，更新内存缓存并返回
-            with session_lock:
-                user_mcp_server_configs[user_id] = ddb_config
-            return ddb_config
-        else:
-            return {}
-    else: 
-        # 如果没有设置DynamoDB或无法从DynamoDB获取，从内存中读取
-        return user_mcp_server_configs.get(user_id, {})
+    """获取指定用户的所有MCP服务器配置（带TTL的内存缓存）"""
+    try:
+        return await mcp_config_cache.get(user_id)
+    except Exception as e:
+        logger.warning(f"获取用户 {user_id} 的MCP配置失败: {e}")
+        return {}
     
+mcp_config_load_lock = asyncio.Lock()
+
 async def load_user_mcp_configs():
-    """加载用户MCP服务器配置"""
-    global user_mcp_server_configs
-    # 如果设置了DynamoDB表名，从DynamoDB加载所有用户配置
-    if DDB_TABLE and dynamodb_client:
-        logger.info(f"从DynamoDB加载所有用户MCP配置")
-        try:
-            # 使用scan_all_from_ddb扫描所有用户配置
-            ddb_configs = await scan_all_from_ddb()
-            if ddb_configs:
-                # 如果DynamoDB中有数据，更新内存缓存
-                with session_lock:
-                    user_mcp_server_configs = ddb_configs
-                    logger.info(f"已从DynamoDB加载 {len(ddb_configs)} 个用户的MCP服务器配置")
-        except Exception as e:
-            logger.error(f"从DynamoDB加载用户MCP配置失败: {e}")
-    else:
-        # 如果没有设置DynamoDB或从DynamoDB加载失败，从文件加载
+    """加载所有用户MCP服务器配置到内存缓存（只执行一次，并发调用等待同一次加载）"""
+    async with mcp_config_load_lock:
+        if mcp_config_cache.loaded:
+            return
         try:
-            config_file = os.environ.get('USER_MCP_CONFIG_FILE', 'conf/user_mcp_configs.json')
-            if os.path.exists(config_file):
-                with session_lock:
-                    with open(config_file, 'r') as f:
-                        configs = json.load(f)
-                        user_mcp_server_configs = configs
-                        logger.info(f"已从文件加载 {len(configs)} 个用户的MCP服务器配置")
+            count = await mcp_config_cache.load_all()
+            logger.info(f"已加载 {count} 个用户的MCP服务器配置")
         except Exception as e:
             logger.error(f"加载用户MCP配置失败: {e}")
+        finally:
+            # 加载失败时不再重复全表扫描，之后按用户读取
+            mcp_config_cache.loaded = True
             
 
 # 获取global服务器配置
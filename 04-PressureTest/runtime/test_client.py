@@ -3,6 +3,11 @@
 Concurrent test client for AgentCore Runtime
 Performs load testing with configurable concurrency and request parameters
 Supports both HTTP and AWS Bedrock AgentCore Runtime invocation
+
+Requests are issued on an intended timeline (see arrival.py): each result
+records how late it actually started and its latency measured from the
+intended start, so queueing behind busy workers is not hidden
+(coordinated omission).
 """
 
 import asyncio
@@ -10,14 +15,17 @@ import aiohttp
 import time
 import argparse
 import json
+import random
 from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional
-from dataclasses import dataclass, asdict
-import statistics
+from dataclasses import dataclass, asdict, field
 import uuid
 import boto3
 from botocore.config import Config
 
+from arrival import arrival_offsets, run_async
+from histogram import Histogram
+
 
 try:
     import boto3
@@ -45,6 +53,9 @@ class RequestResult:
     error_message: str = ""
     response_data: Dict[str, Any] | None = None
     metrics: RequestMetrics | None = None
+    intended_offset: float = 0.0  # seconds from test start
+    start_lag: float = 0.0  # seconds between intended and actual start
+    corrected_duration: float = 0.0  # seconds from intended start to completion
 
 
 @dataclass
@@ -60,8 +71,22 @@ class TestStatistics:
     median_response_time: float
     p95_response_time: float
     p99_response_time: float
+    p999_response_time: float
     requests_per_second: float
     concurrent_workers: int
+    # Latency from the intended start (coordinated-omission corrected)
+    offered_rate: float = 0
+    avg_start_lag: float = 0
+    max_start_lag: float = 0
+    median_corrected_time: float = 0
+    p95_corrected_time: float = 0
+    p99_corrected_time: float = 0
+    p999_corrected_time: float = 0
+    max_corrected_time: float = 0
+    # Mergeable log-bucketed histograms (seconds), see histogram.py
+    response_time_histogram: Dict[str, Any] = field(default_factory=dict)
+    corrected_time_histogram: Dict[str, Any] = field(default_factory=dict)
+    start_lag_histogram: Dict[str, Any] = field(default_factory=dict)
     # Metrics statistics
     total_input_tokens: int = 0
     total_output_tokens: int = 0
@@ -354,7 +379,10 @@ class ConcurrentTestClient:
         num_requests: int,
         concurrent_workers: int,
         prompt: str,
-        delay_between_requests: float = 0
+        delay_between_requests: float = 0,
+        rate: float = 0,
+        arrival: str = "constant",
+        seed: Optional[int] = None
     ) -> TestStatistics:
         """
         Run concurrent load test
@@ -364,6 +392,9 @@ class ConcurrentTestClient:
             concurrent_workers: Number of concurrent workers
             prompt: Prompt to send in each request
             delay_between_requests: Delay in seconds between launching requests
+            rate: Offered requests per second (overrides the delay when > 0)
+            arrival: "constant" or "poisson" spacing when a rate is given
+            seed: Random seed for poisson arrivals
 
         Returns:
             TestStatistics object
@@ -379,6 +410,8 @@ class ConcurrentTestClient:
             print(f"Target URL: {self.base_url}")
         print(f"Total Requests: {num_requests}")
         print(f"Concurrent Workers: {concurrent_workers}")
+        if rate > 0:
+            print(f"Arrivals: {arrival} at {rate:g} req/s")
         print(f"Prompt: {prompt[:50]}..." if len(prompt) > 50 else f"Prompt: {prompt}")
         print(f"{'='*70}\n")
 
@@ -390,44 +423,41 @@ class ConcurrentTestClient:
                 print(f"Active Tasks: {health.get('activeTasks')}")
             print()
 
+        # Fix every request's intended start up front; the delay keeps its
+        # old meaning of a fixed gap between launches.
+        if rate > 0:
+            offsets = arrival_offsets(
+                arrival, count=num_requests, rate=rate, rng=random.Random(seed)
+            )
+        else:
+            offsets = [i * delay_between_requests for i in range(num_requests)]
+
         self.results = []
         test_start_time = time.time()
 
         if self.use_agentcore:
             # Use AgentCore invocation with thread pool
             loop = asyncio.get_event_loop()
-            semaphore = asyncio.Semaphore(concurrent_workers)
 
             async def limited_agentcore_request(req_id: int):
-                async with semaphore:
-                    print(f"start request:[{req_id}]")
-                    return await loop.run_in_executor(
-                        None,
-                        self.invoke_agentcore_sync,
-                        req_id,
-                        prompt,
-                        False
-                    )
-
-            # Create tasks with optional delay
-            tasks = []
-            for i in range(num_requests):
-                if delay_between_requests > 0 and i > 0:
-                    await asyncio.sleep(delay_between_requests)
-                task = asyncio.create_task(limited_agentcore_request(i + 1))
-                tasks.append(task)
+                print(f"start request:[{req_id}]")
+                return await loop.run_in_executor(
+                    None,
+                    self.invoke_agentcore_sync,
+                    req_id,
+                    prompt,
+                    False
+                )
 
-            # Wait for all requests to complete
-            self.results = await asyncio.gather(*tasks)
+            self.results = await self._run_on_timeline(
+                offsets, concurrent_workers, limited_agentcore_request
+            )
 
         else:
             # Use HTTP invocation
-            semaphore = asyncio.Semaphore(concurrent_workers)
-
             async def limited_request(req_id: int):
-                async with semaphore:
-                    print(f"start request:[{req_id}]")
-                    return await self.send_request(session, req_id, prompt)
+                print(f"start request:[{req_id}]")
+                return await self.send_request(session, req_id, prompt)
 
             # Create session and run all requests
             connector = aiohttp.TCPConnector(limit=concurrent_workers * 2)
@@ -435,16 +465,9 @@ class ConcurrentTestClient:
                 timeout=self.timeout,
                 connector=connector
             ) as session:
-                # Create tasks with optional delay
-                tasks = []
-                for i in range(num_requests):
-                    if delay_between_requests > 0 and i > 0:
-                        await asyncio.sleep(delay_between_requests)
-                    task = asyncio.create_task(limited_request(i + 1))
-                    tasks.append(task)
-
-                # Wait for all requests to complete
-                self.results = await asyncio.gather(*tasks)
+                self.results = await self._run_on_timeline(
+                    offsets, concurrent_workers, limited_request
+                )
 
         test_duration = time.time() - test_start_time
 
@@ -454,6 +477,10 @@ class ConcurrentTestClient:
             test_duration,
             concurrent_workers
         )
+        if rate > 0:
+            stats.offered_rate = rate
+        elif delay_between_requests > 0:
+            stats.offered_rate = 1 / delay_between_requests
 
         # Get final server stats (HTTP only)
         if not self.use_agentcore:
@@ -463,6 +490,28 @@ class ConcurrentTestClient:
 
         return stats
 
+    async def _run_on_timeline(
+        self,
+        offsets: List[float],
+        concurrent_workers: int,
+        request
+    ) -> List[RequestResult]:
+        """Start request(req_id) at each intended offset, at most
+        concurrent_workers at a time, and record start lag on each result"""
+        async def call(index: int) -> Dict[str, Any]:
+            result = await request(index + 1)
+            return {"result": result, "latency_ms": result.duration * 1000}
+
+        records = await run_async(offsets, call, limit=concurrent_workers)
+        results = []
+        for record in records:
+            result = record["result"]
+            result.intended_offset = record["intended_offset_s"]
+            result.start_lag = record["start_lag_ms"] / 1000
+            result.corrected_duration = record["corrected_latency_ms"] / 1000
+            results.append(result)
+        return results
+
     def _calculate_statistics(
         self,
         results: List[RequestResult],
@@ -473,13 +522,12 @@ class ConcurrentTestClient:
         successful = [r for r in results if r.success]
         failed = [r for r in results if not r.success]
 
-        success_durations = [r.duration for r in successful]
-
-        if not success_durations:
-            success_durations = [0]
+        durations = Histogram.of(r.duration for r in successful)
+        corrected = Histogram.of(r.corrected_duration for r in successful)
+        start_lags = Histogram.of(r.start_lag for r in results)
 
-        sorted_durations = sorted(success_durations)
-        n = len(sorted_durations)
+        def pct(histogram: Histogram, p: float) -> float:
+            return histogram.percentile(p) or 0
 
         # Calculate metrics statistics
         results_with_metrics = [r for r in successful if r.metrics is not None]
@@ -510,14 +558,25 @@ class ConcurrentTestClient:
             successful_requests=len(successful),
             failed_requests=len(failed),
             total_duration=total_duration,
-            avg_response_time=statistics.mean(success_durations),
-            min_response_time=min(success_durations),
-            max_response_time=max(success_durations),
-            median_response_time=statistics.median(success_durations),
-            p95_response_time=sorted_durations[int(n * 0.95)] if n > 0 else 0,
-            p99_response_time=sorted_durations[int(n * 0.99)] if n > 0 else 0,
+            avg_response_time=durations.mean or 0,
+            min_response_time=pct(durations, 0),
+            max_response_time=pct(durations, 100),
+            median_response_time=pct(durations, 50),
+            p95_response_time=pct(durations, 95),
+            p99_response_time=pct(durations, 99),
+            p999_response_time=pct(durations, 99.9),
             requests_per_second=len(results) / total_duration if total_duration > 0 else 0,
             concurrent_workers=concurrent_workers,
+            avg_start_lag=start_lags.mean or 0,
+            max_start_lag=pct(start_lags, 100),
+            median_corrected_time=pct(corrected, 50),
+            p95_corrected_time=pct(corrected, 95),
+            p99_corrected_time=pct(corrected, 99),
+            p999_corrected_time=pct(corrected, 99.9),
+            max_corrected_time=pct(corrected, 100),
+            response_time_histogram=durations.to_dict(),
+            corrected_time_histogram=corrected.to_dict(),
+            start_lag_histogram=start_lags.to_dict(),
             # Metrics
             total_input_tokens=total_input_tokens,
             total_output_tokens=total_output_tokens,
@@ -546,6 +605,17 @@ class ConcurrentTestClient:
         print(f"  Max:               {stats.max_response_time:.3f}s")
         print(f"  P95:               {stats.p95_response_time:.3f}s")
         print(f"  P99:               {stats.p99_response_time:.3f}s")
+        print(f"  P99.9:             {stats.p999_response_time:.3f}s")
+        print(f"\nFrom Intended Start (coordinated-omission corrected):")
+        if stats.offered_rate:
+            print(f"  Offered Rate:      {stats.offered_rate:.2f} req/s")
+        print(f"  Start Lag Avg:     {stats.avg_start_lag:.3f}s")
+        print(f"  Start Lag Max:     {stats.max_start_lag:.3f}s")
+        print(f"  Median:            {stats.median_corrected_time:.3f}s")
+        print(f"  P95:               {stats.p95_corrected_time:.3f}s")
+        print(f"  P99:               {stats.p99_corrected_time:.3f}s")
+        print(f"  P99.9:             {stats.p999_corrected_time:.3f}s")
+        print(f"  Max:               {stats.max_corrected_time:.3f}s")
 
         # Print metrics if available
         if stats.total_tokens > 0:
@@ -638,6 +708,23 @@ async def main():
         default=0,
         help="Delay between launching requests in seconds (default: 0)"
     )
+    parser.add_argument(
+        "-r", "--rate",
+        type=float,
+        default=0,
+        help="Offered request rate in req/s; overrides --delay (default: 0, off)"
+    )
+    parser.add_argument(
+        "--arrival",
+        choices=["constant", "poisson"],
+        default="constant",
+        help="Spacing of requests when --rate is set (default: constant)"
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="Random seed for poisson arrivals"
+    )
     parser.add_argument(
         "-t", "--timeout",
         type=int,
@@ -682,7 +769,10 @@ async def main():
         num_requests=args.num_requests,
         concurrent_workers=args.concurrency,
         prompt=args.prompt,
-        delay_between_requests=args.delay
+        delay_between_requests=args.delay,
+        rate=args.rate,
+        arrival=args.arrival,
+        seed=args.seed
     )
     client.stop_session()
     # Print results
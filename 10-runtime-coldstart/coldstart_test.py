@@ -48,7 +48,13 @@ written to <out>/raw/<UTCts>_<size>_c<N>.json:
 
 summary.json: {"cells": [{"size", "concurrency", "samples", "success",
 "throttles", "other_errors", "fresh_boots", "cold_p50_ms", "cold_p90_ms",
-"cold_max_ms", "cold_mean_ms", "warm_p50_ms"}, ...], "generated_iso": str}
+"cold_p99_ms", "cold_p99_9_ms", "cold_max_ms", "cold_mean_ms",
+"cold_histogram", "warm_p50_ms", ..., "warm_histogram"}, ...],
+"generated_iso": str}
+
+The *_histogram fields are mergeable log-bucketed histograms (histogram.py);
+`python histogram.py a/summary.json b/summary.json` merges cells measured from
+several client hosts and prints any percentile.
 
 "fresh_boots" counts probes whose agent process started DURING the request
 (request_ts - proc_start_ts < cold_ms): a genuine microVM boot. Other
@@ -68,6 +74,8 @@ import boto3
 from botocore.config import Config
 from botocore.exceptions import BotoCoreError, ClientError
 
+from histogram import Histogram
+
 HERE = Path(__file__).resolve().parent
 THROTTLE_CODES = {
     "ThrottlingException",
@@ -210,8 +218,9 @@ def run_cell(client, dep: dict, size: str, concurrency: int, rounds: int,
             round_recs = [r for r in results if r is not None]
             requests.extend(round_recs)
             colds = [r["cold_ms"] for r in round_recs if r["success"]]
+            hist = Histogram.of(colds)
             print(f"  round {rnd}/{rounds}: ok={len(colds)}/{concurrency} "
-                  f"cold_ms={sorted(colds) if len(colds) <= 4 else f'p50={percentile(colds, 50):.0f} max={max(colds):.0f}'}")
+                  f"cold_ms={sorted(colds) if len(colds) <= 4 else f'p50={hist.percentile(50):.0f} max={hist.max:.0f}'}")
             if rnd < rounds:
                 time.sleep(pause)
     finally:
@@ -233,19 +242,6 @@ def run_cell(client, dep: dict, size: str, concurrency: int, rounds: int,
     return summarize_cell(size, concurrency, requests)
 
 
-def percentile(values: list[float], pct: float) -> float:
-    """Linear-interpolated percentile; works for small n."""
-    if not values:
-        return float("nan")
-    s = sorted(values)
-    if len(s) == 1:
-        return s[0]
-    k = (len(s) - 1) * pct / 100.0
-    lo = int(k)
-    hi = min(lo + 1, len(s) - 1)
-    return s[lo] + (s[hi] - s[lo]) * (k - lo)
-
-
 def is_fresh_boot(r: dict) -> bool:
     """True when the agent process started during this request (a genuine
     boot), not on a pre-warmed instance provisioned before the request."""
@@ -256,21 +252,19 @@ def is_fresh_boot(r: dict) -> bool:
 
 
 def summarize_cell(size: str, concurrency: int, requests: list[dict]) -> dict:
-    colds = [r["cold_ms"] for r in requests if r["success"]]
-    warms = [r["warm_ms"] for r in requests if r["warm_ms"] is not None]
+    cold = Histogram.of(r["cold_ms"] for r in requests if r["success"])
+    warm = Histogram.of(r["warm_ms"] for r in requests if r["warm_ms"] is not None)
     return {
         "size": size,
         "concurrency": concurrency,
         "samples": len(requests),
-        "success": len(colds),
+        "success": cold.count,
         "throttles": sum(1 for r in requests if r["error_type"] == "throttle"),
         "other_errors": sum(1 for r in requests if r["error_type"] in ("timeout", "other")),
         "fresh_boots": sum(1 for r in requests if is_fresh_boot(r)),
-        "cold_p50_ms": round(percentile(colds, 50), 1) if colds else None,
-        "cold_p90_ms": round(percentile(colds, 90), 1) if colds else None,
-        "cold_max_ms": round(max(colds), 1) if colds else None,
-        "cold_mean_ms": round(sum(colds) / len(colds), 1) if colds else None,
-        "warm_p50_ms": round(percentile(warms, 50), 1) if warms else None,
+        **cold.summary("cold"),
+        "cold_mean_ms": round(cold.mean, 1) if cold.count else None,
+        **warm.summary("warm"),
     }
 
 
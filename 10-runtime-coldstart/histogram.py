@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""Mergeable log-bucketed latency histogram (HDR-style).
+
+Each value is counted in a bucket whose width grows geometrically, so any
+percentile is reported within ``RELATIVE_ERROR`` of a real sample at every
+magnitude while memory stays a few hundred counters however many samples are
+recorded. Histograms merge exactly by adding bucket counts, so per-level,
+per-worker and per-host results can be combined after the run;
+``to_dict``/``from_dict`` carry them in the result JSON.
+
+Run as a script to merge the histograms of several result files (for example
+one per client host) and print their percentiles::
+
+    python3 histogram.py results/host-a.json results/host-b.json
+
+Histograms are matched by their place in the JSON; list items are matched by
+their ``label``/``level``/``size``/``concurrency`` fields when present.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import sys
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+RELATIVE_ERROR = 0.005
+DEFAULT_PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+HISTOGRAM_SUFFIX = "_histogram"
+IDENTITY_KEYS = ("label", "level", "size", "concurrency")
+
+
+def percentile_key(pct: float) -> str:
+    """``99.9`` -> ``"p99_9"``, ``50`` -> ``"p50"``."""
+    return "p" + f"{pct:g}".replace(".", "_")
+
+
+class Histogram:
+    """Counts of non-negative values in geometric buckets.
+
+    Bucket ``i`` holds values in ``(gamma**(i-1), gamma**i]`` and reports them
+    as ``2 * gamma**i / (gamma + 1)``, which is within ``relative_error`` of
+    every value in it. Zero lands in a separate exact bucket. Percentiles use
+    the nearest-rank definition; ``min``/``max`` are kept exactly.
+    """
+
+    def __init__(self, relative_error: float = RELATIVE_ERROR) -> None:
+        if not 0 < relative_error < 1:
+            raise ValueError("relative_error must be between 0 and 1")
+        self.relative_error = relative_error
+        self._gamma = (1 + relative_error) / (1 - relative_error)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets: dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min: float | None = None
+        self.max: float | None = None
+
+    @classmethod
+    def of(
+        cls, values: Iterable[float], relative_error: float = RELATIVE_ERROR
+    ) -> "Histogram":
+        histogram = cls(relative_error)
+        for value in values:
+            histogram.record(value)
+        return histogram
+
+    def __len__(self) -> int:
+        return self.count
+
+    def record(self, value: float, count: int = 1) -> None:
+        if value < 0 or math.isnan(value):
+            raise ValueError(f"histogram values must be non-negative: {value!r}")
+        if count < 1:
+            return
+        if value == 0:
+            self.zero_count += count
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+        self.total += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "Histogram") -> "Histogram":
+        """Add ``other``'s counts into this histogram and return it."""
+        if other.relative_error != self.relative_error:
+            raise ValueError("cannot merge histograms with different relative_error")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        for bound in (other.min, other.max):
+            if bound is not None:
+                self.min = bound if self.min is None else min(self.min, bound)
+                self.max = bound if self.max is None else max(self.max, bound)
+        return self
+
+    @property
+    def mean(self) -> float | None:
+        return self.total / self.count if self.count else None
+
+    def percentile(self, pct: float) -> float | None:
+        if not self.count:
+            return None
+        if pct >= 100:
+            return self.max
+        if pct <= 0:
+            return self.min
+        rank = max(1, math.ceil(self.count * pct / 100.0))
+        seen = self.zero_count
+        if rank <= seen:
+            return 0.0
+        low, high = self.min or 0.0, self.max or 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                value = 2 * self._gamma**index / (self._gamma + 1)
+                return min(max(value, low), high)
+        return high
+
+    def summary(
+        self,
+        name: str,
+        unit: str = "ms",
+        percentiles: Iterable[float] = DEFAULT_PERCENTILES,
+        digits: int = 1,
+    ) -> dict[str, Any]:
+        """Flat report fields such as ``latency_p99_9_ms`` plus the histogram."""
+
+        def rounded(value: float | None) -> float | None:
+            return None if value is None else round(value, digits)
+
+        fields: dict[str, Any] = {
+            f"{name}_{percentile_key(pct)}_{unit}": rounded(self.percentile(pct))
+            for pct in percentiles
+        }
+        fields[f"{name}_max_{unit}"] = rounded(self.max)
+        fields[f"{name}{HISTOGRAM_SUFFIX}"] = self.to_dict()
+        return fields
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "relative_error": self.relative_error,
+            "count": self.count,
+            "sum": self.total,
+            "min": self.min,
+            "max": self.max,
+            "zero_count": self.zero_count,
+            "buckets": {
+                str(index): self.buckets[index] for index in sorted(self.buckets)
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "Histogram":
+        histogram = cls(float(data["relative_error"]))
+        histogram.buckets = {
+            int(index): int(count) for index, count in data["buckets"].items()
+        }
+        histogram.zero_count = int(data.get("zero_count", 0))
+        histogram.count = int(data["count"])
+        histogram.total = float(data.get("sum", 0.0))
+        histogram.min = data.get("min")
+        histogram.max = data.get("max")
+        return histogram
+
+
+def _identity(item: dict[str, Any], index: int) -> str:
+    keys = [f"{key}={item[key]}" for key in IDENTITY_KEYS if key in item]
+    return ",".join(keys) if keys else str(index)
+
+
+def iter_histograms(
+    node: Any, path: str = ""
+) -> Iterator[tuple[str, Histogram]]:
+    """Yield ``(path, Histogram)`` for every serialized histogram in ``node``."""
+    if isinstance(node, dict):
+        for key, value in node.items():
+            child = f"{path}.{key}" if path else key
+            if key.endswith(HISTOGRAM_SUFFIX) and isinstance(value, dict):
+                yield child, Histogram.from_dict(value)
+            else:
+                yield from iter_histograms(value, child)
+    elif isinstance(node, list):
+        for index, item in enumerate(node):
+            if isinstance(item, dict):
+                yield from iter_histograms(item, f"{path}[{_identity(item, index)}]")
+
+
+def merge_results(documents: Iterable[Any]) -> dict[str, Histogram]:
+    merged: dict[str, Histogram] = {}
+    for document in documents:
+        for path, histogram in iter_histograms(document):
+            if path in merged:
+                merged[path].merge(histogram)
+            else:
+                merged[path] = histogram
+    return merged
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Merge latency histograms from result JSON files."
+    )
+    parser.add_argument("results", nargs="+", type=Path)
+    parser.add_argument(
+        "--percentiles",
+        default="50,90,99,99.9",
+        help="Comma-separated percentiles to print (default: 50,90,99,99.9)",
+    )
+    parser.add_argument("--output", type=Path, help="Write merged histograms as JSON")
+    args = parser.parse_args(argv)
+    try:
+        percentiles = [float(item) for item in args.percentiles.split(",")]
+    except ValueError:
+        parser.error("--percentiles must be comma-separated numbers")
+
+    merged = merge_results(json.loads(path.read_text()) for path in args.results)
+    if not merged:
+        print("no histograms found", file=sys.stderr)
+        return 1
+    for path, histogram in merged.items():
+        if not histogram.count:
+            print(f"{path}: n=0")
+            continue
+        values = " ".join(
+            f"{percentile_key(pct)}={histogram.percentile(pct):.1f}"
+            for pct in percentiles
+        )
+        print(f"{path}: n={histogram.count} {values} max={histogram.max:.1f}")
+    if args.output:
+        args.output.write_text(
+            json.dumps(
+                {path: histogram.to_dict() for path, histogram in merged.items()},
+                indent=2,
+            )
+            + "\n"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
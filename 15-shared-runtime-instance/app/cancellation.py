@@ -0,0 +1,158 @@
+"""Per-request cancellation for streamed agent turns.
+
+Each ``/invocations`` stream registers a ``RequestHandle`` under its request
+id. The handle is cancelled when the caller asks for it (an ``/invocations``
+cancel operation naming the same user and request id) or when the HTTP client
+is seen to disconnect. ``run_until_cancelled`` drives the turn in one helper
+task and cancels that task as soon as the handle fires, so the turn's own
+cleanup runs: the Claude CLI subprocess is closed, the agent slot and the
+user's lock are released, and nothing keeps running for a caller who left.
+
+The turn runs in a single task from start to end because the Claude SDK
+enters anyio task groups that must be exited by the task that entered them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+from contextlib import suppress
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._:-]{0,127}$")
+_END = object()
+
+
+class DuplicateRequestId(ValueError):
+    """A request with the same id is still running."""
+
+
+@dataclass
+class RequestHandle:
+    request_id: str
+    user_id: str
+    started: float = field(default_factory=time.monotonic)
+    reason: str | None = None
+    _cancelled: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self, reason: str) -> bool:
+        """Request cancellation; returns False if it was already cancelled."""
+        if self._cancelled.is_set():
+            return False
+        self.reason = reason
+        self._cancelled.set()
+        return True
+
+    async def wait(self) -> None:
+        await self._cancelled.wait()
+
+
+class RequestRegistry:
+    """Running requests by id, so a later call can cancel one of them."""
+
+    def __init__(self) -> None:
+        self._handles: dict[str, RequestHandle] = {}
+        self.counters = {"cancelled": 0, "disconnected": 0}
+
+    def running(self, request_id: str) -> bool:
+        return request_id in self._handles
+
+    def register(self, request_id: str, user_id: str) -> RequestHandle:
+        if request_id in self._handles:
+            raise DuplicateRequestId(f"request {request_id} is already running")
+        handle = RequestHandle(request_id, user_id)
+        self._handles[request_id] = handle
+        return handle
+
+    def unregister(self, handle: RequestHandle) -> None:
+        if self._handles.get(handle.request_id) is handle:
+            del self._handles[handle.request_id]
+        if handle.reason in self.counters:
+            self.counters[handle.reason] += 1
+
+    def cancel(self, request_id: str, user_id: str) -> bool:
+        """Cancel ``request_id`` if ``user_id`` owns it.
+
+        Another user's request is reported exactly like an unknown one.
+        """
+        handle = self._handles.get(request_id)
+        if handle is None or handle.user_id != user_id:
+            return False
+        return handle.cancel("cancelled")
+
+    def stats(self) -> dict[str, int]:
+        return {"running": len(self._handles), **self.counters}
+
+
+class _Failure:
+    def __init__(self, exc: BaseException) -> None:
+        self.exc = exc
+
+
+async def run_until_cancelled(
+    source: AsyncIterator[T], handle: RequestHandle
+) -> AsyncIterator[T]:
+    """Yield ``source`` items until it ends or ``handle`` is cancelled.
+
+    On cancellation the helper task consuming ``source`` is cancelled and
+    awaited, so its cleanup has finished when this generator returns. Closing
+    this generator early does the same.
+    """
+    queue: asyncio.Queue[Any] = asyncio.Queue(1)
+
+    async def pump() -> None:
+        try:
+            async for item in source:
+                await queue.put(item)
+        except Exception as exc:
+            await queue.put(_Failure(exc))
+            return
+        await queue.put(_END)
+
+    task = asyncio.create_task(pump())
+    stop = asyncio.create_task(handle.wait())
+    getter: asyncio.Future[Any] | None = None
+    try:
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.wait({getter, stop}, return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                return
+            item = getter.result()
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                raise item.exc
+            yield item
+    finally:
+        for waiter in (getter, stop, task):
+            if waiter is not None:
+                waiter.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+
+async def watch_disconnect(
+    is_disconnected: Callable[[], Awaitable[bool]],
+    handle: RequestHandle,
+    interval: float,
+) -> None:
+    """Cancel ``handle`` once ``is_disconnected()`` reports the client gone."""
+    while not handle.cancelled:
+        if await is_disconnected():
+            handle.cancel("disconnected")
+            return
+        await asyncio.sleep(interval)
+
+
+def validate_request_id(request_id: object) -> str:
+    if not isinstance(request_id, str) or not REQUEST_ID_RE.fullmatch(request_id):
+        raise ValueError("request_id must match ^[A-Za-z0-9][A-Za-z0-9._:-]{0,127}$")
+    return request_id
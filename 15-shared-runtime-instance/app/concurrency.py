@@ -0,0 +1,340 @@
+"""Pressure-driven adaptive limit for concurrent agent processes.
+
+The server samples Linux pressure stall information (PSI) and memory usage,
+preferring the cgroup v2 files for its own cgroup and falling back to the
+system-wide ``/proc`` files when the cgroup does not expose them. An AIMD
+controller raises the agent-slot limit by one while there is queued demand and
+no pressure, and halves it as soon as memory stalls or usage crosses its high
+watermark. ``AdjustableLimiter`` is the semaphore whose limit it drives, and
+``UserLocks`` serializes each user without keeping a lock per user ever seen.
+
+Pure asyncio / standard library so it can be unit-tested without the SDK.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, Callable
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+PROC_ROOT = Path("/proc")
+
+
+def parse_psi(text: str) -> dict[str, float]:
+    """Return ``{"some_avg10": ..., "full_avg10": ...}`` from a PSI file."""
+    values: dict[str, float] = {}
+    for line in text.splitlines():
+        kind, _, fields = line.partition(" ")
+        for pair in fields.split():
+            name, _, raw = pair.partition("=")
+            if name in {"avg10", "avg60"}:
+                try:
+                    values[f"{kind}_{name}"] = float(raw)
+                except ValueError:
+                    continue
+    return values
+
+
+def _read_text(path: Path) -> str | None:
+    try:
+        return path.read_text()
+    except OSError:
+        return None
+
+
+def _read_psi(*paths: Path) -> dict[str, float]:
+    for path in paths:
+        text = _read_text(path)
+        if text is not None:
+            return parse_psi(text)
+    return {}
+
+
+def _cgroup_bytes(path: Path) -> int | None:
+    text = _read_text(path)
+    if text is None or text.strip() == "max":
+        return None
+    try:
+        return int(text.strip())
+    except ValueError:
+        return None
+
+
+def _meminfo_used_ratio(path: Path) -> float | None:
+    text = _read_text(path)
+    if text is None:
+        return None
+    fields: dict[str, int] = {}
+    for line in text.splitlines():
+        name, _, rest = line.partition(":")
+        parts = rest.split()
+        if parts:
+            try:
+                fields[name] = int(parts[0])
+            except ValueError:
+                continue
+    total = fields.get("MemTotal")
+    available = fields.get("MemAvailable")
+    if not total or available is None:
+        return None
+    return 1.0 - available / total
+
+
+@dataclass(frozen=True)
+class PressureSample:
+    """One reading of memory and CPU pressure; ``None`` means unavailable."""
+
+    memory_some_avg10: float | None = None
+    memory_full_avg10: float | None = None
+    cpu_some_avg10: float | None = None
+    memory_used_ratio: float | None = None
+
+    @property
+    def available(self) -> bool:
+        return any(value is not None for value in asdict(self).values())
+
+
+def read_pressure(
+    cgroup_root: Path = CGROUP_ROOT, proc_root: Path = PROC_ROOT
+) -> PressureSample:
+    """Sample PSI and memory usage for this cgroup, or the whole host."""
+    memory = _read_psi(cgroup_root / "memory.pressure", proc_root / "pressure/memory")
+    cpu = _read_psi(cgroup_root / "cpu.pressure", proc_root / "pressure/cpu")
+    current = _cgroup_bytes(cgroup_root / "memory.current")
+    limit = _cgroup_bytes(cgroup_root / "memory.max")
+    if current is not None and limit:
+        used_ratio: float | None = current / limit
+    else:
+        used_ratio = _meminfo_used_ratio(proc_root / "meminfo")
+    return PressureSample(
+        memory_some_avg10=memory.get("some_avg10"),
+        memory_full_avg10=memory.get("full_avg10"),
+        cpu_some_avg10=cpu.get("some_avg10"),
+        memory_used_ratio=used_ratio,
+    )
+
+
+class AimdController:
+    """Additive-increase, multiplicative-decrease limit between two bounds.
+
+    ``update`` is called once per sampling interval. Memory pressure above a
+    threshold cuts the limit by ``decrease`` and starts a ``cooldown`` of
+    intervals without increases, so the next agents have time to show their
+    real footprint. CPU pressure only holds the limit: CPU contention slows
+    agents down but does not get them OOM-killed. The limit grows only while
+    ``saturated`` (every slot busy or requests queued), so an idle server does
+    not drift to its ceiling and then admit a burst it cannot hold.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        *,
+        minimum: int = 1,
+        maximum: int,
+        decrease: float = 0.5,
+        memory_some_high: float = 10.0,
+        memory_full_high: float = 1.0,
+        memory_used_high: float = 0.85,
+        cpu_some_high: float = 80.0,
+        cooldown: int = 3,
+    ) -> None:
+        if not 1 <= minimum <= initial <= maximum:
+            raise ValueError("need 1 <= minimum <= initial <= maximum")
+        if not 0 < decrease < 1:
+            raise ValueError("decrease must be between 0 and 1")
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.memory_some_high = memory_some_high
+        self.memory_full_high = memory_full_high
+        self.memory_used_high = memory_used_high
+        self.cpu_some_high = cpu_some_high
+        self.cooldown = cooldown
+        self._hold = 0
+        self.last_reason = "initial"
+        self.last_sample = PressureSample()
+        self.counters = {"increases": 0, "decreases": 0}
+
+    def _memory_pressure(self, sample: PressureSample) -> str | None:
+        if (sample.memory_full_avg10 or 0.0) >= self.memory_full_high:
+            return "memory_full"
+        if (sample.memory_some_avg10 or 0.0) >= self.memory_some_high:
+            return "memory_some"
+        if (sample.memory_used_ratio or 0.0) >= self.memory_used_high:
+            return "memory_used"
+        return None
+
+    def update(self, sample: PressureSample, *, saturated: bool) -> int:
+        """Apply one sample and return the new limit."""
+        self.last_sample = sample
+        reason = self._memory_pressure(sample)
+        if reason is not None:
+            self._hold = self.cooldown
+            lowered = max(self.minimum, int(self.limit * self.decrease))
+            if lowered < self.limit:
+                self.limit = lowered
+                self.counters["decreases"] += 1
+            self.last_reason = reason
+            return self.limit
+        if self._hold:
+            self._hold -= 1
+            self.last_reason = "cooldown"
+        elif (sample.cpu_some_avg10 or 0.0) >= self.cpu_some_high:
+            self.last_reason = "cpu_some"
+        elif not saturated:
+            self.last_reason = "idle"
+        elif self.limit < self.maximum:
+            self.limit += 1
+            self.counters["increases"] += 1
+            self.last_reason = "increase"
+        else:
+            self.last_reason = "ceiling"
+        return self.limit
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "minimum": self.minimum,
+            "maximum": self.maximum,
+            "last_reason": self.last_reason,
+            "pressure": asdict(self.last_sample),
+            **self.counters,
+        }
+
+
+async def run_controller(
+    controller: AimdController,
+    *,
+    saturated: Callable[[], bool],
+    apply: Callable[[int], None],
+    interval: float,
+    sample: Callable[[], PressureSample] = read_pressure,
+) -> None:
+    """Sample forever, feeding each new limit to ``apply``."""
+    while True:
+        await asyncio.sleep(interval)
+        previous = controller.limit
+        limit = controller.update(sample(), saturated=saturated())
+        if limit != previous:
+            apply(limit)
+
+
+class AdjustableLimiter:
+    """FIFO async semaphore whose limit can change while it is held.
+
+    Lowering the limit never interrupts holders; new acquirers wait until
+    enough of them release.
+    """
+
+    def __init__(self, limit: int) -> None:
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        self._limit = limit
+        self._active = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    def set_limit(self, limit: int) -> None:
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        self._limit = limit
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self._active < self._limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._active += 1
+                waiter.set_result(None)
+
+    async def acquire(self) -> None:
+        if self._active < self._limit and not self._waiters:
+            self._active += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self) -> None:
+        self._active -= 1
+        self._wake()
+
+    async def __aenter__(self) -> None:
+        await self.acquire()
+
+    async def __aexit__(self, *_exc: object) -> None:
+        self.release()
+
+
+@dataclass
+class _UserLock:
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    refs: int = 0
+
+
+class UserLocks:
+    """Per-user locks that exist only while someone holds or awaits them.
+
+    Every holder and waiter counts as a reference; the entry is dropped when
+    the last one leaves, so the table is bounded by in-flight users. All
+    bookkeeping happens between awaits on the event loop thread, so lookups
+    need no global guard lock.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[str, _UserLock] = {}
+        self.peak = 0
+
+    @asynccontextmanager
+    async def hold(self, user_id: str) -> AsyncIterator[None]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            entry = self._entries[user_id] = _UserLock()
+            self.peak = max(self.peak, len(self._entries))
+        entry.refs += 1
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.refs -= 1
+            if entry.refs == 0:
+                del self._entries[user_id]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "live": len(self._entries),
+            "waiting": sum(
+                entry.refs - entry.lock.locked() for entry in self._entries.values()
+            ),
+            "peak": self.peak,
+        }
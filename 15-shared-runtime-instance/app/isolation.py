@@ -14,14 +14,22 @@ Isolation is enforced at the application layer:
    into another user's directory.
 3. ``guard_tool_call``   — PreToolUse inspection: every path-like argument
    must resolve (symlinks and ``..`` included) to a location inside the
-   caller's workspace, otherwise the tool call is denied.
+   caller's workspace, otherwise the tool call is denied. ``PathGuard`` is
+   the per-request form the server hook uses: root resolved once, decisions
+   cached.
+4. ``write_size``        — estimate of what a write tool adds, so the guard can
+   also deny writes past a per-workspace disk quota.
 """
 
 from __future__ import annotations
 
 import hashlib
+import os
 import re
+import stat
+from collections import OrderedDict
 from pathlib import Path
+from typing import Callable
 
 USER_ID_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$")
 
@@ -33,6 +41,12 @@ _PATH_KEYS = frozenset(
 # Tools that operate purely on in-memory state and carry no filesystem paths.
 _PATHLESS_TOOLS = frozenset({"TodoWrite"})
 
+# Tools that add bytes to the workspace; checked against the quota, if any.
+_WRITE_TOOLS = frozenset({"Write", "Edit", "MultiEdit", "NotebookEdit"})
+
+# (added_bytes, added_inodes) -> deny reason or None.
+QuotaCheck = Callable[[int, int], str | None]
+
 
 class IsolationError(ValueError):
     """Raised when a user id fails validation."""
@@ -79,46 +93,143 @@ def _iter_path_candidates(tool_input: dict) -> list[str]:
     return candidates
 
 
-def _resolves_inside(candidate: str, workspace: Path) -> bool:
-    """True iff ``candidate`` resolves strictly inside ``workspace``.
+def _text_size(value: object) -> int:
+    return len(value.encode("utf-8")) if isinstance(value, str) else 0
+
+
+def write_size(tool_name: str, tool_input: dict) -> tuple[int, int]:
+    """Estimate the bytes and files a write tool call adds to the workspace."""
+    if tool_name == "Write":
+        return _text_size(tool_input.get("content")), 1
+    if tool_name == "NotebookEdit":
+        return _text_size(tool_input.get("new_source")), 0
+    edits = tool_input.get("edits") if tool_name == "MultiEdit" else [tool_input]
+    grown = sum(
+        max(0, _text_size(edit.get("new_string")) - _text_size(edit.get("old_string")))
+        for edit in edits or ()
+        if isinstance(edit, dict)
+    )
+    return grown, 0
+
+
+class PathGuard:
+    """Per-request path guard: the workspace root is resolved once.
 
     ``Path.resolve()`` collapses ``..`` and follows existing symlinks, so a
     symlink planted inside the workspace pointing elsewhere is also caught.
     Relative paths are interpreted against the workspace (the Claude ``cwd``).
     ``~`` is expanded to the workspace itself, because each agent subprocess
     runs with ``HOME`` set to its workspace.
-    """
-    if candidate == "~" or candidate.startswith("~/"):
-        candidate = str(workspace) + candidate[1:]
-    elif candidate.startswith("~"):
-        return False  # ~otheruser — never legitimate here
-    path = Path(candidate)
-    if not path.is_absolute():
-        path = workspace / path
-    resolved = path.resolve()
-    ws = workspace.resolve()
-    return resolved == ws or ws in resolved.parents
 
+    Fast path: a candidate that is lexically under the root with no ``..``
+    only needs an ``lstat`` of each component below the root; if none is a
+    symlink the full ``resolve()`` is skipped. Decisions go into a small LRU
+    so the many repeated ``Read``/``Glob`` paths of one turn are dict hits.
+    Caching assumes symlinks in the workspace do not change during one
+    request, which holds while ``Bash`` is disallowed.
 
-def guard_tool_call(
-    tool_name: str, tool_input: dict, workspace: Path
-) -> str | None:
-    """Validate one tool call. Returns None if allowed, else a deny reason.
-
-    Deny-by-default posture:
-    - unknown path-like keys are covered by ``_PATH_KEYS``;
-    - tools without any path argument are only allowed when they are known
-      to be path-less (``TodoWrite``); ``Glob``/``Grep`` default their search
-      root to ``cwd`` (the workspace) when no path is given, which is safe.
+    With ``quota`` set, write tools whose paths pass are also checked against
+    the bytes and files they would add.
     """
-    if tool_name in _PATHLESS_TOOLS:
+
+    def __init__(
+        self,
+        workspace: Path,
+        *,
+        cache_size: int = 256,
+        quota: QuotaCheck | None = None,
+    ) -> None:
+        self.root = workspace.resolve()
+        self.quota = quota
+        self._real = str(self.root)
+        self._lexical = str(workspace.absolute())
+        self._cache_size = cache_size
+        self._decisions: OrderedDict[str, bool] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def allows(self, candidate: str) -> bool:
+        """True iff ``candidate`` resolves inside the workspace."""
+        decision = self._decisions.get(candidate)
+        if decision is not None:
+            self._decisions.move_to_end(candidate)
+            self.hits += 1
+            return decision
+        self.misses += 1
+        decision = self._decide(candidate)
+        self._decisions[candidate] = decision
+        if len(self._decisions) > self._cache_size:
+            self._decisions.popitem(last=False)
+        return decision
+
+    def check(self, tool_name: str, tool_input: dict) -> str | None:
+        """Validate one tool call. Returns None if allowed, else a deny reason.
+
+        Deny-by-default posture:
+        - unknown path-like keys are covered by ``_PATH_KEYS``;
+        - tools without any path argument are only allowed when they are known
+          to be path-less (``TodoWrite``); ``Glob``/``Grep`` default their
+          search root to ``cwd`` (the workspace) when no path is given, which
+          is safe.
+        """
+        if tool_name in _PATHLESS_TOOLS:
+            return None
+
+        for raw in _iter_path_candidates(tool_input):
+            if not self.allows(raw):
+                return (
+                    f"path '{raw}' resolves outside the per-user workspace; "
+                    "cross-user access is forbidden"
+                )
+        if self.quota is not None and tool_name in _WRITE_TOOLS:
+            return self.quota(*write_size(tool_name, tool_input))
         return None
 
-    candidates = _iter_path_candidates(tool_input)
-    for raw in candidates:
-        if not _resolves_inside(raw, workspace):
-            return (
-                f"path '{raw}' resolves outside the per-user workspace; "
-                "cross-user access is forbidden"
-            )
-    return None
+    def _decide(self, candidate: str) -> bool:
+        if candidate == "~" or candidate.startswith("~/"):
+            candidate = self._real + candidate[1:]
+        elif candidate.startswith("~"):
+            return False  # ~otheruser — never legitimate here
+        parts = self._lexical_parts(candidate)
+        if parts is not None and not self._crosses_symlink(parts):
+            return True
+        path = Path(candidate)
+        if not path.is_absolute():
+            path = self.root / path
+        resolved = path.resolve()
+        return resolved == self.root or self.root in resolved.parents
+
+    def _lexical_parts(self, candidate: str) -> list[str] | None:
+        """Components below the root, or None if not lexically inside it."""
+        if os.path.isabs(candidate):
+            for prefix in (self._real, self._lexical):
+                if candidate == prefix or candidate.startswith(prefix + os.sep):
+                    candidate = candidate[len(prefix):]
+                    break
+            else:
+                return None
+        parts = [p for p in candidate.split(os.sep) if p not in ("", ".")]
+        return None if ".." in parts else parts
+
+    def _crosses_symlink(self, parts: list[str]) -> bool:
+        current = self._real
+        for part in parts:
+            current = os.path.join(current, part)
+            try:
+                mode = os.lstat(current).st_mode
+            except OSError:
+                return False  # missing component: nothing below it can link
+            if stat.S_ISLNK(mode):
+                return True
+        return False
+
+
+def guard_tool_call(
+    tool_name: str,
+    tool_input: dict,
+    workspace: Path,
+    *,
+    quota: QuotaCheck | None = None,
+) -> str | None:
+    """One-shot ``PathGuard(workspace, quota=quota).check(tool_name, tool_input)``."""
+    return PathGuard(workspace, quota=quota).check(tool_name, tool_input)
@@ -5,8 +5,13 @@ users share it concurrently; per-user isolation is enforced by:
 
 - a per-user workspace under USERS_ROOT used as the Claude ``cwd``;
 - a PreToolUse hook denying any tool call whose paths escape that workspace;
-- per-user Claude session resume (conversation memory never crosses users);
-- a per-user asyncio lock (same user serialized, different users parallel).
+- per-user Claude session resume (conversation memory never crosses users),
+  with session ids cached in memory and written behind to a durable store;
+- a per-user asyncio lock (same user serialized, different users parallel);
+- an agent-slot limit that adapts to cgroup memory/CPU pressure (PSI).
+
+With ``SERVER_WORKERS`` > 1 this script starts ``supervisor.py`` instead, which
+runs that many copies of this server and shards users across them.
 
 Endpoints (AgentCore runtime HTTP protocol):
 - ``GET  /ping``         → health check
@@ -21,19 +26,41 @@ import logging
 import os
 import socket
 import sys
+import time
 import uuid
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import AsyncIterator
 
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse, StreamingResponse
 
 sys.path.insert(0, str(Path(__file__).resolve().parent))
+from accounting import UsageLedger, prefix_fingerprint, turn_usage  # noqa: E402
+from cancellation import (  # noqa: E402
+    DuplicateRequestId,
+    RequestRegistry,
+    run_until_cancelled,
+    validate_request_id,
+    watch_disconnect,
+)
+from concurrency import (  # noqa: E402
+    AdjustableLimiter,
+    AimdController,
+    UserLocks,
+    read_pressure,
+    run_controller,
+)
 from isolation import (  # noqa: E402
     IsolationError,
+    PathGuard,
     ensure_workspace,
-    guard_tool_call,
     validate_user_id,
+    workspace_for,
 )
+from session_store import SessionStore, open_backend  # noqa: E402
+from sse import StreamStats, coalesce, frame  # noqa: E402
+from workspace_janitor import Quota, WorkspaceJanitor  # noqa: E402
 
 from claude_agent_sdk import (  # noqa: E402
     AssistantMessage,
@@ -55,9 +82,56 @@ MODEL = os.environ.get(
 MAX_TURNS = int(os.environ.get("MAX_TURNS", "12"))
 # Tune the subprocess cap for the selected instance size and workload.
 MAX_PARALLEL_AGENTS = int(os.environ.get("MAX_PARALLEL_AGENTS", "4"))
+# Adaptive mode treats MAX_PARALLEL_AGENTS as the starting point and moves the
+# limit between MIN_ and CEILING_PARALLEL_AGENTS based on pressure.
+ADAPTIVE_CONCURRENCY = os.environ.get("ADAPTIVE_CONCURRENCY", "1") == "1"
+MIN_PARALLEL_AGENTS = int(os.environ.get("MIN_PARALLEL_AGENTS", "1"))
+CEILING_PARALLEL_AGENTS = int(
+    os.environ.get("CEILING_PARALLEL_AGENTS", str(2 * MAX_PARALLEL_AGENTS))
+)
+PRESSURE_INTERVAL_S = float(os.environ.get("PRESSURE_INTERVAL_S", "2"))
+MEMORY_HIGH_RATIO = float(os.environ.get("MEMORY_HIGH_RATIO", "0.85"))
+SESSION_STORE = os.environ.get("SESSION_STORE", "sqlite")
+SESSION_STORE_PATH = Path(
+    os.environ.get("SESSION_STORE_PATH", str(USERS_ROOT / ".sessions.sqlite3"))
+)
+SESSION_STORE_TABLE = os.environ.get("SESSION_STORE_TABLE")
+SESSION_CACHE_SIZE = int(os.environ.get("SESSION_CACHE_SIZE", "4096"))
+# A shared table may be written by another session between two of our turns.
+SESSION_CACHE_TTL_S = float(
+    os.environ.get("SESSION_CACHE_TTL_S", "30" if SESSION_STORE == "dynamodb" else "0")
+)
+SESSION_FLUSH_INTERVAL_S = float(os.environ.get("SESSION_FLUSH_INTERVAL_S", "0.5"))
+# Batch SSE frames produced within this window into one write (0 = per frame).
+SSE_COALESCE_MS = float(os.environ.get("SSE_COALESCE_MS", "0"))
+SSE_COALESCE_BYTES = int(os.environ.get("SSE_COALESCE_BYTES", "16384"))
+DISCONNECT_POLL_S = float(os.environ.get("DISCONNECT_POLL_S", "1"))
+# Rolling window reported by /stats.
+USAGE_WINDOW_S = float(os.environ.get("USAGE_WINDOW_S", "3600"))
+USAGE_MAX_USERS = int(os.environ.get("USAGE_MAX_USERS", "1024"))
+# Per-user disk quotas and workspace eviction; 0 turns a limit off.
+WORKSPACE_MAX_BYTES = int(os.environ.get("WORKSPACE_MAX_BYTES", str(256 * 1024 * 1024)))
+WORKSPACE_MAX_INODES = int(os.environ.get("WORKSPACE_MAX_INODES", "20000"))
+WORKSPACE_IDLE_S = float(os.environ.get("WORKSPACE_IDLE_S", "0"))
+USERS_ROOT_MAX_BYTES = int(os.environ.get("USERS_ROOT_MAX_BYTES", "0"))
+JANITOR_INTERVAL_S = float(os.environ.get("JANITOR_INTERVAL_S", "60"))
 USER_ID_HEADER = "x-amzn-bedrock-agentcore-runtime-user-id"
+# Supervisor mode: worker processes behind one front, users sharded by hash.
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", "1"))
+WORKER_SOCKET_DIR = Path(os.environ.get("WORKER_SOCKET_DIR", "/tmp/agentcore-workers"))
+# Set by the supervisor for each worker it starts.
+WORKER_INDEX = int(os.environ["WORKER_INDEX"]) if "WORKER_INDEX" in os.environ else None
+WORKER_SOCKET = os.environ.get("WORKER_SOCKET")
+if WORKER_INDEX is not None and SESSION_STORE == "sqlite":
+    # Workers are separate processes: one SQLite file each, so their write-behind
+    # flushes never contend on a database lock. A user always reaches the same worker.
+    SESSION_STORE_PATH = SESSION_STORE_PATH.with_name(
+        f"{SESSION_STORE_PATH.stem}.worker{WORKER_INDEX}{SESSION_STORE_PATH.suffix}"
+    )
 
-SERVER_RUN_ID = uuid.uuid4().hex  # proves "same container process"
+# Proves "same container process"; workers inherit the supervisor's values.
+SERVER_RUN_ID = os.environ.get("SERVER_RUN_ID") or uuid.uuid4().hex
+SERVER_PID = int(os.environ.get("SERVER_PID") or os.getpid())
 ALLOWED_TOOLS = ["Read", "Write", "Edit", "Glob", "Grep", "LS", "TodoWrite"]
 DISALLOWED_TOOLS = ["Bash", "WebFetch", "WebSearch", "Task", "KillBash"]
 
@@ -69,12 +143,101 @@ Rules:
 - Use relative paths for all file operations.
 - Be concise: answer in at most three short sentences unless writing files.
 """
+# Everything the model reads before a user's conversation. It is the same bytes
+# for every user so the Bedrock prompt cache one user writes serves the others;
+# per-user values (cwd, HOME, resume) are passed separately.
+CACHE_PREFIX = {
+    "model": MODEL,
+    "system_prompt": SYSTEM_PROMPT,
+    "allowed_tools": ALLOWED_TOOLS,
+    "disallowed_tools": DISALLOWED_TOOLS,
+    "permission_mode": "acceptEdits",
+    "setting_sources": [],  # never read host/project Claude settings
+}
+CACHE_PREFIX_ID = prefix_fingerprint(**CACHE_PREFIX)
+
+_user_locks = UserLocks()
+_agent_slots = AdjustableLimiter(MAX_PARALLEL_AGENTS)
+_controller = AimdController(
+    MAX_PARALLEL_AGENTS,
+    minimum=min(MIN_PARALLEL_AGENTS, MAX_PARALLEL_AGENTS),
+    maximum=max(CEILING_PARALLEL_AGENTS, MAX_PARALLEL_AGENTS),
+    memory_used_high=MEMORY_HIGH_RATIO,
+)
+
+
+def _slots_saturated() -> bool:
+    return _agent_slots.waiting > 0 or _agent_slots.active >= _agent_slots.limit
+
+
+def _apply_limit(limit: int) -> None:
+    log.info("agent limit %d -> %d (%s)", _agent_slots.limit, limit, _controller.last_reason)
+    _agent_slots.set_limit(limit)
+
+
+_session_store = SessionStore(
+    open_backend(
+        SESSION_STORE,
+        path=SESSION_STORE_PATH,
+        table=SESSION_STORE_TABLE,
+        region=os.environ.get("AWS_REGION", "us-west-2"),
+    ),
+    cache_size=SESSION_CACHE_SIZE,
+    cache_ttl=SESSION_CACHE_TTL_S or None,
+)
+
 
-app = FastAPI()
+_janitor = WorkspaceJanitor(
+    USERS_ROOT,
+    quota=Quota(WORKSPACE_MAX_BYTES or None, WORKSPACE_MAX_INODES or None),
+    idle_s=WORKSPACE_IDLE_S or None,
+    max_total_bytes=USERS_ROOT_MAX_BYTES or None,
+    # Workers share USERS_ROOT; each only evicts the users routed to it.
+    held_only=WORKER_INDEX is not None,
+)
+
+
+async def _flush_sessions() -> None:
+    try:
+        await asyncio.to_thread(_session_store.flush)
+    except Exception as exc:
+        log.warning("failed to persist session ids: %s", exc)
+
+
+async def _write_behind() -> None:
+    while True:
+        await asyncio.sleep(SESSION_FLUSH_INTERVAL_S)
+        await _flush_sessions()
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    tasks = [
+        asyncio.create_task(_write_behind()),
+        asyncio.create_task(_janitor.run(JANITOR_INTERVAL_S)),
+    ]
+    if ADAPTIVE_CONCURRENCY and read_pressure().available:
+        tasks.append(
+            asyncio.create_task(
+                run_controller(
+                    _controller,
+                    saturated=_slots_saturated,
+                    apply=_apply_limit,
+                    interval=PRESSURE_INTERVAL_S,
+                )
+            )
+        )
+    elif ADAPTIVE_CONCURRENCY:
+        log.warning("no PSI or memory readings; agent limit stays fixed")
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await _flush_sessions()
 
-_user_locks: dict[str, asyncio.Lock] = {}
-_locks_guard = asyncio.Lock()
-_agent_slots = asyncio.Semaphore(MAX_PARALLEL_AGENTS)
+
+app = FastAPI(lifespan=lifespan)
 
 
 def _read_boot_id() -> str:
@@ -91,51 +254,74 @@ def instance_fingerprint() -> dict:
     return {
         "boot_id": BOOT_ID,
         "server_run_id": SERVER_RUN_ID,
-        "pid": os.getpid(),
+        "pid": SERVER_PID,
         "hostname": socket.gethostname(),
     }
 
 
-async def _lock_for(user_id: str) -> asyncio.Lock:
-    async with _locks_guard:
-        if user_id not in _user_locks:
-            _user_locks[user_id] = asyncio.Lock()
-        return _user_locks[user_id]
-
-
-def _session_meta_path(workspace: Path) -> Path:
-    return workspace / ".session_meta.json"
-
-
-def _load_prev_session(workspace: Path) -> str | None:
+def _legacy_session(workspace: Path) -> str | None:
+    """Session id from the per-workspace file used before the session store."""
     try:
-        meta = json.loads(_session_meta_path(workspace).read_text())
+        meta = json.loads((workspace / ".session_meta.json").read_text())
         value = meta.get("claude_session_id")
         return value if isinstance(value, str) and value else None
-    except (OSError, json.JSONDecodeError):
+    except (OSError, json.JSONDecodeError, AttributeError):
         return None
 
 
-def _store_session(workspace: Path, session_id: str | None) -> None:
-    if not session_id:
-        return
+async def _load_prev_session(user_id: str, workspace: Path) -> str | None:
+    # Hot path: answered from memory; only a miss reads the backend (off-loop).
+    found, session_id = _session_store.cached(user_id)
+    if found:
+        return session_id
     try:
-        _session_meta_path(workspace).write_text(
-            json.dumps({"claude_session_id": session_id})
-        )
-    except OSError as exc:
-        log.warning("failed to persist session meta: %s", exc)
+        session_id = await asyncio.to_thread(_session_store.load, user_id)
+    except Exception as exc:
+        log.warning("session store lookup failed: %s", exc)
+        return None
+    if session_id is None:
+        session_id = _legacy_session(workspace)
+        if session_id is not None:
+            _session_store.put(user_id, session_id)
+    return session_id
+
+
+def _store_session(user_id: str, session_id: str | None) -> None:
+    if session_id:
+        _session_store.put(user_id, session_id)
+
 
+def _sse(payload: dict) -> bytes:
+    return frame(payload)
 
-def _sse(payload: dict) -> str:
-    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+_output_totals = StreamStats()
+_requests = RequestRegistry()
+_usage = UsageLedger(window_s=USAGE_WINDOW_S, max_users=USAGE_MAX_USERS)
+
+
+async def _write_stream(
+    frames: AsyncIterator[bytes], coalesce_ms: float
+) -> AsyncIterator[bytes]:
+    stats = StreamStats()
+    try:
+        async for chunk in coalesce(
+            frames, stats, window=coalesce_ms / 1000.0, max_bytes=SSE_COALESCE_BYTES
+        ):
+            yield chunk
+    finally:
+        _output_totals.add(stats)
+        log.info("stream frames=%d writes=%d bytes=%d", stats.frames, stats.writes, stats.bytes)
 
 
 def _build_options(workspace: Path, resume: str | None, denials: list[str]) -> ClaudeAgentOptions:
+    # Options are built per request, so the guard's cache lives for one request.
+    guard = PathGuard(workspace, quota=_janitor.quota_for(workspace))
+
     async def path_guard(input_data, _tool_use_id, _context):
         tool_name = input_data.get("tool_name", "")
         tool_input = input_data.get("tool_input") or {}
-        reason = guard_tool_call(tool_name, tool_input, workspace)
+        reason = guard.check(tool_name, tool_input)
         if reason is None:
             return {}
         denials.append(f"{tool_name}: {reason}")
@@ -149,14 +335,9 @@ def _build_options(workspace: Path, resume: str | None, denials: list[str]) -> C
         }
 
     return ClaudeAgentOptions(
-        model=MODEL,
+        **CACHE_PREFIX,
         cwd=str(workspace),
-        allowed_tools=ALLOWED_TOOLS,
-        disallowed_tools=DISALLOWED_TOOLS,
-        permission_mode="acceptEdits",
-        system_prompt=SYSTEM_PROMPT,
         max_turns=MAX_TURNS,
-        setting_sources=[],  # never read host/project Claude settings
         resume=resume,
         hooks={
             "PreToolUse": [HookMatcher(matcher=None, hooks=[path_guard])]
@@ -171,16 +352,29 @@ def _build_options(workspace: Path, resume: str | None, denials: list[str]) -> C
     )
 
 
-async def _run_agent(user_id: str, prompt: str, reset: bool):
+async def _run_agent(user_id: str, prompt: str, reset: bool, request_id: str):
     """Async generator yielding SSE strings for one user request."""
+    # Held for the whole turn, so the janitor never evicts a workspace in use.
+    async with _janitor.hold(workspace_for(USERS_ROOT, user_id)):
+        async for payload in _run_turn(user_id, prompt, reset, request_id):
+            yield payload
+
+
+async def _run_turn(user_id: str, prompt: str, reset: bool, request_id: str):
+    started = time.monotonic()
     workspace = ensure_workspace(USERS_ROOT, user_id)
-    resume = None if reset else _load_prev_session(workspace)
+    await _janitor.refresh(workspace)
+    resume = None if reset else await _load_prev_session(user_id, workspace)
+    if resume and not any(workspace.iterdir()):
+        # An evicted workspace no longer holds the CLI transcript to resume.
+        resume = None
     denials: list[str] = []
     options = _build_options(workspace, resume, denials)
 
     result_text = None
     new_session_id = None
     is_error = False
+    usage = turn_usage(None)
 
     async for message in query(prompt=prompt, options=options):
         if isinstance(message, AssistantMessage):
@@ -195,11 +389,21 @@ async def _run_agent(user_id: str, prompt: str, reset: bool):
             result_text = message.result
             new_session_id = message.session_id
             is_error = bool(message.is_error)
+            usage = turn_usage(
+                message.usage,
+                total_cost_usd=message.total_cost_usd,
+                num_turns=message.num_turns,
+                duration_ms=message.duration_ms,
+                duration_api_ms=message.duration_api_ms,
+            )
 
     for reason in denials:
         yield _sse({"event": "denied", "reason": reason})
 
-    _store_session(workspace, new_session_id)
+    _store_session(user_id, new_session_id)
+    await _janitor.refresh(workspace)
+    latency_s = time.monotonic() - started
+    _usage.record(user_id, usage, latency_s, success=not is_error)
     yield _sse(
         {
             "event": "complete",
@@ -208,8 +412,12 @@ async def _run_agent(user_id: str, prompt: str, reset: bool):
             "user_id": user_id,
             "workspace": str(workspace),
             "claude_session_id": new_session_id,
+            "request_id": request_id,
             "resumed_from": resume,
             "denied_count": len(denials),
+            "usage": {**usage, "cache_prefix": CACHE_PREFIX_ID},
+            "latency_ms": round(latency_s * 1000.0, 1),
+            "worker": WORKER_INDEX,
             "instance": instance_fingerprint(),
         }
     )
@@ -217,7 +425,32 @@ async def _run_agent(user_id: str, prompt: str, reset: bool):
 
 @app.get("/ping")
 async def ping() -> JSONResponse:
-    return JSONResponse({"status": "healthy", **instance_fingerprint()})
+    return JSONResponse(
+        {
+            "status": "healthy",
+            **instance_fingerprint(),
+            "user_locks": _user_locks.stats(),
+            "concurrency": {
+                "adaptive": ADAPTIVE_CONCURRENCY,
+                "active": _agent_slots.active,
+                "waiting": _agent_slots.waiting,
+                **_controller.stats(),
+            },
+            "sessions": _session_store.stats(),
+            "output": {"coalesce_ms": SSE_COALESCE_MS, **_output_totals.to_dict()},
+            "requests": _requests.stats(),
+            "workspaces": _janitor.stats(),
+            "worker": WORKER_INDEX,
+        }
+    )
+
+
+@app.get("/stats")
+async def stats() -> JSONResponse:
+    """Rolling token, cost and latency totals per user and for this server."""
+    return JSONResponse(
+        {**instance_fingerprint(), "cache_prefix": CACHE_PREFIX_ID, "usage": _usage.stats()}
+    )
 
 
 @app.post("/invocations")
@@ -233,22 +466,54 @@ async def invocations(request: Request):
     except IsolationError as exc:
         return JSONResponse({"error": str(exc)}, status_code=400)
 
+    try:
+        request_id = validate_request_id(payload.get("request_id") or uuid.uuid4().hex)
+    except ValueError as exc:
+        return JSONResponse({"error": f"payload.{exc}"}, status_code=400)
+    action = payload.get("action", "invoke")
+    if action == "cancel":  # stop a running turn of this same user
+        cancelled = _requests.cancel(request_id, user_id)
+        return JSONResponse(
+            {"cancelled": cancelled, "request_id": request_id},
+            status_code=200 if cancelled else 404,
+        )
+    if action != "invoke":
+        return JSONResponse(
+            {"error": "payload.action must be 'invoke' or 'cancel'"}, status_code=400
+        )
+    if _requests.running(request_id):
+        return JSONResponse(
+            {"error": f"request {request_id} is already running"}, status_code=409
+        )
+
     prompt = payload.get("prompt")
     if not isinstance(prompt, str) or not prompt.strip():
         return JSONResponse({"error": "payload.prompt is required"}, status_code=400)
     reset = bool(payload.get("reset", False))
+    coalesce_ms = payload.get("coalesce_ms", SSE_COALESCE_MS)
+    if (
+        isinstance(coalesce_ms, bool)
+        or not isinstance(coalesce_ms, (int, float))
+        or not 0 <= coalesce_ms <= 1000
+    ):
+        return JSONResponse(
+            {"error": "payload.coalesce_ms must be a number from 0 to 1000"}, status_code=400
+        )
 
     log.info("request user=%s prompt=%.60r", user_id, prompt)
 
-    async def stream():
-        lock = await _lock_for(user_id)
-        async with lock:  # same user serialized; different users run in parallel
+    async def turn():
+        async with _user_locks.hold(user_id):  # same user serialized only
             async with _agent_slots:  # cap total Claude subprocesses
+                started = time.monotonic()
                 try:
-                    async for chunk in _run_agent(user_id, prompt, reset):
+                    async for chunk in _run_agent(user_id, prompt, reset, request_id):
                         yield chunk
                 except Exception as exc:  # surface errors into the SSE stream
                     log.exception("agent failure for user %s", user_id)
+                    _usage.record(
+                        user_id, turn_usage(None), time.monotonic() - started, success=False
+                    )
                     yield _sse(
                         {
                             "event": "error",
@@ -258,11 +523,75 @@ async def invocations(request: Request):
                         }
                     )
 
-    return StreamingResponse(stream(), media_type="text/event-stream")
+    async def stream():
+        try:
+            handle = _requests.register(request_id, user_id)
+        except DuplicateRequestId as exc:
+            yield _sse({"event": "error", "user_id": user_id, "message": str(exc)})
+            return
+        watcher = asyncio.create_task(
+            watch_disconnect(request.is_disconnected, handle, DISCONNECT_POLL_S)
+        )
+        try:
+            # Cancel or disconnect cancels the turn task: the CLI subprocess is
+            # closed and the user lock and agent slot are released.
+            async for chunk in run_until_cancelled(turn(), handle):
+                yield chunk
+            if handle.cancelled:
+                log.info("request %s for user %s %s", request_id, user_id, handle.reason)
+                yield _sse(
+                    {
+                        "event": "cancelled",
+                        "reason": handle.reason,
+                        "user_id": user_id,
+                        "request_id": request_id,
+                        "instance": instance_fingerprint(),
+                    }
+                )
+        finally:
+            watcher.cancel()
+            _requests.unregister(handle)
+
+    return StreamingResponse(
+        _write_stream(stream(), coalesce_ms), media_type="text/event-stream"
+    )
+
+
+def _worker_env() -> dict[str, str]:
+    """Environment for one worker: a 1/N share of agent slots and disk budget."""
+
+    def share(total: int) -> str:
+        return str(max(1, -(-total // SERVER_WORKERS)))
+
+    return {
+        **os.environ,
+        "SERVER_WORKERS": "1",
+        "SERVER_RUN_ID": SERVER_RUN_ID,
+        "SERVER_PID": str(SERVER_PID),
+        "MAX_PARALLEL_AGENTS": share(MAX_PARALLEL_AGENTS),
+        "CEILING_PARALLEL_AGENTS": share(CEILING_PARALLEL_AGENTS),
+        "MIN_PARALLEL_AGENTS": share(MIN_PARALLEL_AGENTS),
+        "USERS_ROOT_MAX_BYTES": str(-(-USERS_ROOT_MAX_BYTES // SERVER_WORKERS)),
+    }
 
 
 if __name__ == "__main__":
     import uvicorn
 
     USERS_ROOT.mkdir(parents=True, exist_ok=True)
-    uvicorn.run(app, host="0.0.0.0", port=8080)
+    if SERVER_WORKERS > 1:
+        from supervisor import Supervisor
+
+        supervisor = Supervisor(
+            count=SERVER_WORKERS,
+            socket_dir=WORKER_SOCKET_DIR,
+            command=[sys.executable, str(Path(__file__).resolve())],
+            env=_worker_env(),
+            fingerprint=instance_fingerprint,
+            user_header=USER_ID_HEADER,
+        )
+        asyncio.run(supervisor.serve("0.0.0.0", 8080))
+    elif WORKER_SOCKET:
+        uvicorn.run(app, uds=WORKER_SOCKET)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8080)
@@ -0,0 +1,271 @@
+"""Per-user Claude session-id store with an in-memory front and write-behind.
+
+Resuming a user's conversation needs the Claude session id of their previous
+turn. The store answers that lookup from an LRU dict on the hot path, queues
+new ids as dirty entries, and writes them to a durable backend in batches
+(``flush``, run periodically off the event loop and once at shutdown). A crash
+loses at most the writes queued since the last flush; the next turn then
+starts a fresh conversation instead of resuming.
+
+Backends implement ``get(key)`` and ``put_many(items)``:
+
+- ``MemoryBackend``: process-local, for tests and throwaway runs;
+- ``SqliteBackend``: the default, one WAL-mode file (stdlib ``sqlite3``);
+- ``DynamoBackend``: a DynamoDB table shared by every runtime session, so the
+  id survives the user moving to another session. boto3 is imported lazily.
+
+With a shared backend a user may be served elsewhere between two turns here;
+``cache_ttl`` bounds how long a clean cached entry is trusted before it is
+re-read. Dirty entries are always authoritative.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Protocol
+
+DYNAMO_BATCH_LIMIT = 25
+
+
+class Backend(Protocol):
+    def get(self, key: str) -> str | None: ...
+
+    def put_many(self, items: list[tuple[str, str]]) -> None: ...
+
+
+class MemoryBackend:
+    def __init__(self) -> None:
+        self.items: dict[str, str] = {}
+        self.batches = 0
+
+    def get(self, key: str) -> str | None:
+        return self.items.get(key)
+
+    def put_many(self, items: list[tuple[str, str]]) -> None:
+        self.items.update(items)
+        self.batches += 1
+
+
+class SqliteBackend:
+    """One ``sessions`` table; each batch is a single upsert transaction."""
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "key TEXT PRIMARY KEY, session_id TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT session_id FROM sessions WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_many(self, items: list[tuple[str, str]]) -> None:
+        now = time.time()
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO sessions (key, session_id, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET "
+                "session_id = excluded.session_id, updated = excluded.updated",
+                [(key, session_id, now) for key, session_id in items],
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class DynamoBackend:
+    """Items ``{pk: "SESSION#<key>", sk: "CLAUDE", session_id, updated}``.
+
+    ``client`` is a boto3 ``dynamodb`` client; ``from_region`` builds one.
+    """
+
+    def __init__(self, client: Any, table_name: str) -> None:
+        self.client = client
+        self.table_name = table_name
+
+    @classmethod
+    def from_region(cls, table_name: str, region: str) -> "DynamoBackend":
+        import boto3
+
+        return cls(boto3.client("dynamodb", region_name=region), table_name)
+
+    @staticmethod
+    def _key(key: str) -> dict[str, Any]:
+        return {"pk": {"S": f"SESSION#{key}"}, "sk": {"S": "CLAUDE"}}
+
+    def get(self, key: str) -> str | None:
+        response = self.client.get_item(
+            TableName=self.table_name, Key=self._key(key), ConsistentRead=True
+        )
+        value = response.get("Item", {}).get("session_id", {}).get("S")
+        return value or None
+
+    def put_many(self, items: list[tuple[str, str]]) -> None:
+        updated = {"N": str(time.time())}
+        requests = [
+            {
+                "PutRequest": {
+                    "Item": {
+                        **self._key(key),
+                        "session_id": {"S": session_id},
+                        "updated": updated,
+                    }
+                }
+            }
+            for key, session_id in items
+        ]
+        for start in range(0, len(requests), DYNAMO_BATCH_LIMIT):
+            pending = requests[start : start + DYNAMO_BATCH_LIMIT]
+            for attempt in range(5):
+                response = self.client.batch_write_item(
+                    RequestItems={self.table_name: pending}
+                )
+                pending = response.get("UnprocessedItems", {}).get(self.table_name)
+                if not pending:
+                    break
+                time.sleep(0.05 * 2**attempt)
+            else:
+                raise RuntimeError(f"{len(pending)} session writes left unprocessed")
+
+
+class SessionStore:
+    """LRU of ``key -> session id`` in front of a backend, with write-behind.
+
+    All methods are thread-safe. ``get`` reads through to the backend on a
+    miss; async callers try ``cached`` first and run ``load`` in a thread.
+    """
+
+    def __init__(
+        self,
+        backend: Backend,
+        *,
+        cache_size: int = 4096,
+        cache_ttl: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if cache_size < 1:
+            raise ValueError("cache_size must be at least 1")
+        self.backend = backend
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._clock = clock
+        self._cache: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._dirty: dict[str, str] = {}
+        self._flushing: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+        self.flush_errors = 0
+
+    def cached(self, key: str) -> tuple[bool, str | None]:
+        """Return ``(True, id)`` when memory answers without the backend."""
+        with self._lock:
+            for pending in (self._dirty, self._flushing):
+                if key in pending:
+                    self.hits += 1
+                    return True, pending[key]
+            entry = self._cache.get(key)
+            if entry is not None:
+                session_id, loaded = entry
+                if self.cache_ttl is None or self._clock() - loaded < self.cache_ttl:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return True, session_id
+                del self._cache[key]
+            self.misses += 1
+            return False, None
+
+    def get(self, key: str) -> str | None:
+        found, session_id = self.cached(key)
+        return session_id if found else self.load(key)
+
+    def load(self, key: str) -> str | None:
+        """Read ``key`` from the backend and cache it; used after a miss."""
+        session_id = self.backend.get(key)
+        if session_id is not None:
+            with self._lock:
+                if key not in self._dirty:
+                    self._remember(key, session_id)
+        return session_id
+
+    def put(self, key: str, session_id: str) -> None:
+        """Record ``session_id`` now; it reaches the backend on the next flush."""
+        with self._lock:
+            self._dirty[key] = session_id
+            self._remember(key, session_id)
+
+    def _remember(self, key: str, session_id: str) -> None:
+        self._cache[key] = (session_id, self._clock())
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def flush(self) -> int:
+        """Write queued ids in one backend batch; return how many were written.
+
+        Entries stay readable from memory while the batch is in flight, and a
+        failed batch is re-queued unless the key was updated meanwhile.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._dirty = self._dirty, {}
+                self._flushing = batch
+            if not batch:
+                return 0
+            try:
+                self.backend.put_many(list(batch.items()))
+            except Exception:
+                with self._lock:
+                    for key, session_id in batch.items():
+                        self._dirty.setdefault(key, session_id)
+                    self.flush_errors += 1
+                raise
+            finally:
+                with self._lock:
+                    self._flushing = {}
+            self.flushes += 1
+            return len(batch)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": type(self.backend).__name__,
+                "cached": len(self._cache),
+                "dirty": len(self._dirty),
+                "hits": self.hits,
+                "misses": self.misses,
+                "flushes": self.flushes,
+                "flush_errors": self.flush_errors,
+            }
+
+
+def open_backend(
+    kind: str, *, path: Path, table: str | None = None, region: str = "us-west-2"
+) -> Backend:
+    """Build the backend named by ``SESSION_STORE``-style configuration."""
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "sqlite":
+        return SqliteBackend(path)
+    if kind == "dynamodb":
+        if not table:
+            raise ValueError("the dynamodb session store needs a table name")
+        return DynamoBackend.from_region(table, region)
+    raise ValueError(f"unknown session store: {kind!r}")
@@ -0,0 +1,123 @@
+"""SSE output stage for the shared runtime server: encoding, coalescing, counters.
+
+Every agent event becomes one ``data:`` frame. With coalescing off (the
+default, best for interactive users) each frame is written as soon as it is
+produced. With a window, frames produced within ``window`` seconds of the
+first pending one are joined into a single write of at most about
+``max_bytes``, so chatty agents cost fewer socket writes and proxy chunks per
+second. Frame boundaries are unchanged, so SSE clients see the same events.
+
+JSON is encoded with the standard library as compact UTF-8.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import Any, AsyncIterator
+
+DEFAULT_MAX_BYTES = 16 * 1024
+QUEUE_FRAMES = 256
+_END = object()
+
+
+def encode(payload: Any) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode(
+        "utf-8"
+    )
+
+
+def frame(payload: Any) -> bytes:
+    return b"data: " + encode(payload) + b"\n\n"
+
+
+@dataclass
+class StreamStats:
+    """Frames produced and writes/bytes handed to the server for one stream."""
+
+    frames: int = 0
+    writes: int = 0
+    bytes: int = 0
+
+    def add(self, other: "StreamStats") -> None:
+        self.frames += other.frames
+        self.writes += other.writes
+        self.bytes += other.bytes
+
+    def to_dict(self) -> dict[str, int]:
+        return {"frames": self.frames, "writes": self.writes, "bytes": self.bytes}
+
+
+class _Failure:
+    def __init__(self, exc: BaseException) -> None:
+        self.exc = exc
+
+
+async def coalesce(
+    frames: AsyncIterator[bytes],
+    stats: StreamStats,
+    *,
+    window: float = 0.0,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+) -> AsyncIterator[bytes]:
+    """Yield ``frames`` joined into writes, counting into ``stats``.
+
+    With a window the source is drained by a helper task into a bounded
+    queue, so a slow client still applies backpressure; closing this
+    generator cancels that task and with it the source.
+    """
+    if window <= 0:
+        async for chunk in frames:
+            stats.frames += 1
+            stats.writes += 1
+            stats.bytes += len(chunk)
+            yield chunk
+        return
+
+    queue: asyncio.Queue[Any] = asyncio.Queue(QUEUE_FRAMES)
+
+    async def pump() -> None:
+        try:
+            async for chunk in frames:
+                await queue.put(chunk)
+        except Exception as exc:
+            await queue.put(_Failure(exc))
+            return
+        await queue.put(_END)
+
+    loop = asyncio.get_running_loop()
+    task = asyncio.create_task(pump())
+    try:
+        end: Any = None
+        while end is None:
+            item = await queue.get()
+            if item is _END or isinstance(item, _Failure):
+                end = item
+                continue
+            batch, size = [item], len(item)
+            deadline = loop.time() + window
+            while size < max_bytes and end is None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), remaining)
+                except TimeoutError:
+                    break
+                if item is _END or isinstance(item, _Failure):
+                    end = item
+                else:
+                    batch.append(item)
+                    size += len(item)
+            stats.frames += len(batch)
+            stats.writes += 1
+            stats.bytes += size
+            yield b"".join(batch)
+        if isinstance(end, _Failure):
+            raise end.exc
+    finally:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
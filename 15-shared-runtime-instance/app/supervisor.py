@@ -0,0 +1,478 @@
+"""Supervisor mode: user-sharded worker processes behind one port.
+
+A single uvicorn process runs one event loop that parses the SSE output of
+every Claude subprocess and evaluates every PreToolUse hook; on large instance
+sizes that loop saturates before the CPU does. With ``SERVER_WORKERS`` > 1 the
+server instead runs N copies of itself, each on its own Unix socket, behind
+the small front defined here, which owns the AgentCore port.
+
+The front reads each request, picks the worker that owns the user on a
+consistent-hash ring, forwards the request bytes unchanged and pipes the
+response back. All requests of one user reach the same worker, so the per-user
+lock, the session cache and the cancel registry keep a single owner. Workers
+share the supervisor's ``server_run_id`` and pid, so ``instance_fingerprint``
+is the same whichever worker answers. A worker that exits is restarted; its
+users get HTTP 503 with ``Retry-After`` meanwhile, and ``/ping`` reports
+``degraded`` (or ``unhealthy`` with a 503 once no worker answers).
+
+The front speaks a deliberately small subset of HTTP/1.1: one request per
+connection (every response carries ``Connection: close``, there is no
+keep-alive), request bodies of at most ``MAX_BODY_BYTES`` sent with
+``Content-Length`` or ``Transfer-Encoding: chunked`` (other transfer codings
+get 501), and no pipelining or upgrades.
+
+Standard library only, so it can be unit-tested without the app dependencies.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import os
+import signal
+from contextlib import suppress
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Mapping
+
+log = logging.getLogger("shared-runtime.supervisor")
+
+MAX_HEAD_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+# Not forwarded to workers. ``Expect`` is answered by the front, which has
+# already read the whole body by the time it forwards the request.
+HOP_BY_HOP = {"connection", "keep-alive", "transfer-encoding", "content-length", "expect"}
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    413: "Content Too Large",
+    417: "Expectation Failed",
+    501: "Not Implemented",
+    503: "Service Unavailable",
+}
+
+
+class BadRequest(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hashing of user ids onto ``nodes`` workers.
+
+    Each worker owns ``replicas`` points on the ring, so users spread evenly
+    and changing the worker count moves only about 1/N of them.
+    """
+
+    def __init__(self, nodes: int, *, replicas: int = 64) -> None:
+        if nodes < 1:
+            raise ValueError("a ring needs at least one node")
+        points = sorted(
+            (_hash(f"worker-{node}:{replica}"), node)
+            for node in range(nodes)
+            for replica in range(replicas)
+        )
+        self._points = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def owner(self, key: str) -> int:
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._nodes[index]
+
+
+@dataclass
+class HttpRequest:
+    method: str
+    target: str
+    version: str
+    headers: list[tuple[str, str]]
+    body: bytes
+
+    @property
+    def path(self) -> str:
+        return self.target.split("?", 1)[0]
+
+    def header(self, name: str) -> str | None:
+        name = name.lower()
+        return next((value for key, value in self.headers if key.lower() == name), None)
+
+    def encode(self) -> bytes:
+        """The request for a worker: same headers, one body, then close."""
+        lines = [f"{self.method} {self.target} HTTP/1.1"]
+        lines += [f"{key}: {value}" for key, value in self.headers if key.lower() not in HOP_BY_HOP]
+        lines += [f"Content-Length: {len(self.body)}", "Connection: close"]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + self.body
+
+
+async def read_request(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter | None = None
+) -> HttpRequest | None:
+    """Read one request, or return None if the client closed without one.
+
+    With ``writer`` given, ``Expect: 100-continue`` is answered before the body
+    is read, so clients that wait for it do not stall until their timeout.
+    """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as exc:
+        if not exc.partial.strip():
+            return None
+        raise BadRequest(400, "incomplete request head") from None
+    except asyncio.LimitOverrunError:
+        raise BadRequest(400, "request head too large") from None
+    lines = head[:-4].decode("latin-1").split("\r\n")
+    try:
+        method, target, version = lines[0].split(" ")
+        headers = [
+            (key.strip(), value.strip())
+            for key, value in (line.split(":", 1) for line in lines[1:])
+        ]
+    except ValueError:
+        raise BadRequest(400, "malformed request head") from None
+    request = HttpRequest(method, target, version, headers, b"")
+    coding = request.header("transfer-encoding")
+    chunked = coding is not None
+    if chunked:
+        if coding.lower() != "chunked":
+            raise BadRequest(501, f"unsupported Transfer-Encoding: {coding}")
+        if request.header("content-length") is not None:
+            raise BadRequest(400, "both Content-Length and Transfer-Encoding")
+    try:
+        length = int(request.header("content-length") or 0)
+    except ValueError:
+        raise BadRequest(400, "invalid Content-Length") from None
+    if not 0 <= length <= MAX_BODY_BYTES:
+        raise BadRequest(413, "request body too large")
+    expect = request.header("expect")
+    if expect is not None:
+        if expect.lower() != "100-continue":
+            raise BadRequest(417, f"unsupported Expect: {expect}")
+        if writer is not None and (length or chunked) and version == "HTTP/1.1":
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            await writer.drain()
+    try:
+        if chunked:
+            request.body = await _read_chunked(reader)
+        else:
+            request.body = await reader.readexactly(length)
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        raise BadRequest(400, "request body ended early") from None
+    return request
+
+
+async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+    """A chunked request body, joined; trailers are read and dropped."""
+    body = bytearray()
+    while True:
+        line = await reader.readuntil(b"\r\n")
+        try:
+            size = int(line.split(b";", 1)[0].strip(), 16)
+        except ValueError:
+            raise BadRequest(400, "invalid chunk size") from None
+        if size < 0:
+            raise BadRequest(400, "invalid chunk size")
+        if size == 0:
+            break
+        if len(body) + size > MAX_BODY_BYTES:
+            raise BadRequest(413, "request body too large")
+        chunk = await reader.readexactly(size + 2)
+        if not chunk.endswith(b"\r\n"):
+            raise BadRequest(400, "malformed chunk")
+        body += chunk[:-2]
+    while await reader.readuntil(b"\r\n") != b"\r\n":
+        pass
+    return bytes(body)
+
+
+def shard_key(request: HttpRequest, user_header: str) -> str:
+    """The user id the worker will resolve: the runtime header, else payload."""
+    user_id = request.header(user_header)
+    if user_id:
+        return user_id
+    try:
+        payload = json.loads(request.body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return ""
+    value = payload.get("user_id") if isinstance(payload, dict) else None
+    return value if isinstance(value, str) else ""
+
+
+def json_response(status: int, payload: Any, headers: Mapping[str, str] | None = None) -> bytes:
+    body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    lines = [
+        f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}",
+        "Content-Type: application/json",
+        f"Content-Length: {len(body)}",
+        "Connection: close",
+        *(f"{key}: {value}" for key, value in (headers or {}).items()),
+    ]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+def _dechunk(body: bytes) -> bytes:
+    out = bytearray()
+    while body:
+        size_line, _, rest = body.partition(b"\r\n")
+        size = int(size_line.split(b";", 1)[0], 16)
+        if size == 0:
+            break
+        out += rest[:size]
+        body = rest[size + 2 :]
+    return bytes(out)
+
+
+async def fetch_json(socket_path: Path, path: str, timeout: float = 2.0) -> dict | None:
+    """GET ``path`` from a worker and decode its JSON body, or None."""
+
+    async def fetch() -> bytes:
+        reader, writer = await asyncio.open_unix_connection(str(socket_path))
+        try:
+            writer.write(HttpRequest("GET", path, "HTTP/1.1", [("Host", "worker")], b"").encode())
+            await writer.drain()
+            return await reader.read()
+        finally:
+            writer.close()
+
+    try:
+        raw = await asyncio.wait_for(fetch(), timeout)
+        head, _, body = raw.partition(b"\r\n\r\n")
+        if b"transfer-encoding: chunked" in head.lower():
+            body = _dechunk(body)
+        value = json.loads(body)
+    except (OSError, asyncio.TimeoutError, ValueError):
+        return None
+    return value if isinstance(value, dict) else None
+
+
+async def proxy(
+    socket_path: Path,
+    request: HttpRequest,
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+) -> None:
+    """Send ``request`` to the worker and pipe its response to the client.
+
+    If the client goes away first the worker connection is closed, which the
+    worker sees as a disconnect and cancels the turn.
+    """
+    upstream_reader, upstream_writer = await asyncio.open_unix_connection(str(socket_path))
+
+    async def pipe() -> None:
+        upstream_writer.write(request.encode())
+        await upstream_writer.drain()
+        while chunk := await upstream_reader.read(65536):
+            writer.write(chunk)
+            await writer.drain()
+
+    async def until_eof() -> None:
+        # Requests are one per connection; stray bytes after the body are
+        # discarded, and only EOF means the client went away.
+        while await reader.read(65536):
+            pass
+
+    piping = asyncio.create_task(pipe())
+    client_gone = asyncio.create_task(until_eof())
+    try:
+        await asyncio.wait({piping, client_gone}, return_when=asyncio.FIRST_COMPLETED)
+        if piping.done():
+            piping.result()
+    finally:
+        for task in (piping, client_gone):
+            task.cancel()
+        with suppress(asyncio.CancelledError, ConnectionError):
+            await piping
+        upstream_writer.close()
+
+
+@dataclass
+class Worker:
+    index: int
+    socket: Path
+    process: asyncio.subprocess.Process | None = None
+    restarts: int = 0
+    ready: bool = False
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+
+@dataclass
+class Supervisor:
+    """Run ``count`` worker processes and route requests to them by user."""
+
+    count: int
+    socket_dir: Path
+    command: list[str]
+    env: Mapping[str, str]
+    fingerprint: Callable[[], dict]
+    user_header: str
+    restart_delay: float = 1.0
+    ready_timeout: float = 60.0
+    workers: list[Worker] = field(init=False)
+    ring: HashRing = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.socket_dir.mkdir(parents=True, exist_ok=True, mode=0o700)
+        self.workers = [
+            Worker(i, self.socket_dir / f"worker-{i}.sock") for i in range(self.count)
+        ]
+        self.ring = HashRing(self.count)
+        self._stopping = False
+
+    def worker_for(self, user_id: str) -> Worker:
+        return self.workers[self.ring.owner(user_id)]
+
+    async def _spawn(self, worker: Worker) -> None:
+        with suppress(FileNotFoundError):
+            worker.socket.unlink()
+        worker.ready = False
+        worker.process = await asyncio.create_subprocess_exec(
+            *self.command,
+            env={
+                **self.env,
+                "WORKER_INDEX": str(worker.index),
+                "WORKER_SOCKET": str(worker.socket),
+            },
+        )
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.ready_timeout
+        while worker.alive and loop.time() < deadline:
+            if await fetch_json(worker.socket, "/ping", timeout=1.0) is not None:
+                worker.ready = True
+                log.info("worker %d ready pid=%d", worker.index, worker.process.pid)
+                return
+            await asyncio.sleep(0.1)
+        log.error("worker %d did not become ready", worker.index)
+
+    async def start(self) -> None:
+        await asyncio.gather(*(self._spawn(worker) for worker in self.workers))
+
+    async def watch(self) -> None:
+        """Restart any worker that exits until ``stop`` is called."""
+
+        async def keep(worker: Worker) -> None:
+            while not self._stopping:
+                if worker.process is None:
+                    await self._spawn(worker)
+                code = await worker.process.wait()
+                worker.ready = False
+                if self._stopping:
+                    return
+                log.warning("worker %d exited with %s; restarting", worker.index, code)
+                await asyncio.sleep(self.restart_delay)
+                worker.restarts += 1
+                await self._spawn(worker)
+
+        await asyncio.gather(*(keep(worker) for worker in self.workers))
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        self._stopping = True
+        running = [worker.process for worker in self.workers if worker.alive]
+        for process in running:
+            with suppress(ProcessLookupError):
+                process.send_signal(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(asyncio.gather(*(p.wait() for p in running)), timeout)
+        except asyncio.TimeoutError:
+            for process in running:
+                with suppress(ProcessLookupError):
+                    process.kill()
+
+    async def _collect(self, path: str) -> list[dict]:
+        replies = await asyncio.gather(
+            *(fetch_json(worker.socket, path) for worker in self.workers)
+        )
+        return [
+            {
+                "index": worker.index,
+                "pid": worker.process.pid if worker.process else None,
+                "alive": worker.alive,
+                "ready": worker.ready,
+                "restarts": worker.restarts,
+                path.strip("/"): reply,
+            }
+            for worker, reply in zip(self.workers, replies)
+        ]
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            try:
+                request = await asyncio.wait_for(read_request(reader, writer), 30.0)
+            except BadRequest as exc:
+                writer.write(json_response(exc.status, {"error": str(exc)}))
+                return
+            except asyncio.TimeoutError:
+                return
+            if request is None:
+                return
+            if request.method == "GET" and request.path in ("/ping", "/stats"):
+                workers = await self._collect(request.path)
+                payload = {**self.fingerprint(), "workers": workers}
+                status = 200
+                if request.path == "/ping":
+                    up = sum(1 for w in workers if w["alive"] and w["ready"] and w["ping"])
+                    if up == len(workers):
+                        health = "healthy"
+                    elif up:
+                        # Users of the other workers are still served.
+                        health = "degraded"
+                    else:
+                        health, status = "unhealthy", 503
+                    payload = {"status": health, "workers_up": up, **payload}
+                writer.write(json_response(status, payload))
+                return
+            if request.method != "POST" or request.path != "/invocations":
+                writer.write(json_response(404, {"error": "not found"}))
+                return
+            worker = self.worker_for(shard_key(request, self.user_header))
+            unavailable = json_response(
+                503, {"error": f"worker {worker.index} is restarting"}, {"Retry-After": "1"}
+            )
+            if not (worker.ready and worker.alive):
+                writer.write(unavailable)
+                return
+            try:
+                await proxy(worker.socket, request, reader, writer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # The worker died after the check; nothing was sent yet.
+                writer.write(unavailable)
+        except ConnectionError:
+            pass
+        except Exception:
+            log.exception("front request failed")
+        finally:
+            with suppress(ConnectionError):
+                await writer.drain()
+            writer.close()
+
+    async def serve(self, host: str, port: int) -> None:
+        """Start the workers, listen on ``host:port`` and run until signalled."""
+        await self.start()
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEAD_BYTES)
+        log.info(
+            "supervisor pid=%d listening on %s:%d with %d workers",
+            os.getpid(), host, port, self.count,
+        )
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, stop.set)
+        watcher = asyncio.create_task(self.watch())
+        try:
+            await stop.wait()
+        finally:
+            server.close()
+            await self.stop()
+            watcher.cancel()
+            with suppress(asyncio.CancelledError):
+                await watcher
@@ -0,0 +1,278 @@
+"""Per-user disk quotas and idle-workspace eviction under ``USERS_ROOT``.
+
+``ensure_workspace`` creates a directory per user and nothing else removes
+it, so a long-lived instance slowly fills its scratch volume.
+``WorkspaceJanitor`` measures workspaces, answers the path guard's quota
+question before a write tool runs, and periodically evicts workspaces that
+have been idle for ``idle_s`` or, least recently used first, whatever is
+needed to bring the whole root under ``max_total_bytes``.
+
+A workspace is never evicted while a turn holds it, and a turn that starts
+during an eviction waits for it to finish. ``before_evict`` runs first (for
+example to copy the workspace elsewhere); if it returns False the workspace
+is kept. Sizes are apparent file sizes, the quantity a ``Write`` adds to.
+
+With ``held_only`` a janitor manages only workspaces a turn has held in this
+process, so several worker processes can share one root without evicting
+each other's users.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import shutil
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable
+
+log = logging.getLogger("shared-runtime.janitor")
+
+
+@dataclass(frozen=True)
+class Quota:
+    """Per-workspace limits; ``None`` means unlimited."""
+
+    max_bytes: int | None = None
+    max_inodes: int | None = None
+
+
+@dataclass
+class _Workspace:
+    path: Path
+    bytes: int = 0
+    inodes: int = 0
+    last_used: float = 0.0
+    active: int = 0
+
+
+def measure(path: Path) -> tuple[int, int]:
+    """Return bytes and inodes below ``path`` without following symlinks."""
+    total = inodes = 0
+    pending = [str(path)]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    inodes += 1
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        else:
+                            total += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return total, inodes
+
+
+def _scan(root: Path) -> list[tuple[Path, int, int, float]]:
+    found = []
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return found
+    for entry in entries:
+        # Dot entries are the server's own files, such as the session store.
+        if entry.name.startswith(".") or not entry.is_dir(follow_symlinks=False):
+            continue
+        path = Path(entry.path)
+        size, inodes = measure(path)
+        try:
+            mtime = entry.stat(follow_symlinks=False).st_mtime
+        except OSError:
+            continue
+        found.append((path, size, inodes, mtime))
+    return found
+
+
+class WorkspaceJanitor:
+    def __init__(
+        self,
+        users_root: Path,
+        *,
+        quota: Quota | None = None,
+        idle_s: float | None = None,
+        max_total_bytes: int | None = None,
+        before_evict: Callable[[Path], Awaitable[bool]] | None = None,
+        held_only: bool = False,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.users_root = users_root
+        self.quota = quota if quota is not None else Quota()
+        self.idle_s = idle_s
+        self.max_total_bytes = max_total_bytes
+        self.before_evict = before_evict
+        self.held_only = held_only
+        self._clock = clock
+        self._workspaces: dict[str, _Workspace] = {}
+        self._evicting: set[str] = set()
+        self._changed = asyncio.Condition()
+        self.counters = {
+            "sweeps": 0,
+            "evicted": 0,
+            "evict_skipped": 0,
+            "reclaimed_bytes": 0,
+            "reclaimed_inodes": 0,
+            "quota_denials": 0,
+        }
+
+    def _state(self, workspace: Path) -> _Workspace:
+        state = self._workspaces.get(workspace.name)
+        if state is None:
+            state = self._workspaces[workspace.name] = _Workspace(workspace)
+        return state
+
+    @asynccontextmanager
+    async def hold(self, workspace: Path) -> AsyncIterator[None]:
+        """Keep ``workspace`` from eviction for the duration of a turn."""
+        async with self._changed:
+            await self._changed.wait_for(lambda: workspace.name not in self._evicting)
+        state = self._state(workspace)
+        state.active += 1
+        state.last_used = self._clock()
+        try:
+            yield
+        finally:
+            state.active -= 1
+            state.last_used = self._clock()
+
+    async def refresh(self, workspace: Path) -> None:
+        """Re-measure one workspace, e.g. when a turn starts or ends."""
+        size, inodes = await asyncio.to_thread(measure, workspace)
+        state = self._state(workspace)
+        state.bytes, state.inodes = size, inodes
+
+    def quota_denial(
+        self, workspace: Path, added_bytes: int = 0, added_inodes: int = 0
+    ) -> str | None:
+        """Return a denial reason if a write would exceed the workspace quota."""
+        state = self._workspaces.get(workspace.name)
+        if state is None:
+            return None
+        reason = None
+        if (
+            self.quota.max_bytes is not None
+            and state.bytes + added_bytes > self.quota.max_bytes
+        ):
+            reason = (
+                f"workspace quota exceeded: {state.bytes + added_bytes} bytes "
+                f"> {self.quota.max_bytes}"
+            )
+        elif (
+            self.quota.max_inodes is not None
+            and state.inodes + added_inodes > self.quota.max_inodes
+        ):
+            reason = (
+                f"workspace quota exceeded: {state.inodes + added_inodes} files "
+                f"> {self.quota.max_inodes}"
+            )
+        if reason is not None:
+            self.counters["quota_denials"] += 1
+        return reason
+
+    def quota_for(self, workspace: Path) -> Callable[[int, int], str | None]:
+        """The path guard's quota check for ``workspace``.
+
+        An allowed write is counted at once, so several writes in one turn
+        cannot each pass against the size measured when the turn started.
+        """
+
+        def check(added_bytes: int, added_inodes: int) -> str | None:
+            reason = self.quota_denial(workspace, added_bytes, added_inodes)
+            if reason is None:
+                state = self._state(workspace)
+                state.bytes += added_bytes
+                state.inodes += added_inodes
+            return reason
+
+        return check
+
+    async def sweep(self) -> dict[str, int]:
+        """Measure every workspace, then evict idle or over-budget ones."""
+        found = await asyncio.to_thread(_scan, self.users_root)
+        seen = set()
+        for path, size, inodes, mtime in found:
+            if self.held_only and path.name not in self._workspaces:
+                continue
+            state = self._state(path)
+            state.bytes, state.inodes = size, inodes
+            state.last_used = max(state.last_used, mtime)
+            seen.add(path.name)
+        for name in list(self._workspaces):
+            state = self._workspaces[name]
+            if name not in seen and not state.active and name not in self._evicting:
+                del self._workspaces[name]
+
+        now = self._clock()
+        idle = sorted(
+            (
+                state
+                for state in self._workspaces.values()
+                if not state.active and state.path.name not in self._evicting
+            ),
+            key=lambda state: state.last_used,
+        )
+        total = sum(state.bytes for state in self._workspaces.values())
+        evicted = reclaimed = 0
+        for state in idle:
+            expired = self.idle_s is not None and now - state.last_used >= self.idle_s
+            over = self.max_total_bytes is not None and total > self.max_total_bytes
+            if not (expired or over):
+                continue
+            size = state.bytes
+            if await self._evict(state):
+                evicted += 1
+                reclaimed += size
+                total -= size
+        self.counters["sweeps"] += 1
+        return {"evicted": evicted, "reclaimed_bytes": reclaimed, "total_bytes": total}
+
+    async def _evict(self, state: _Workspace) -> bool:
+        name = state.path.name
+        if state.active:
+            return False
+        self._evicting.add(name)
+        try:
+            if self.before_evict is not None and not await self.before_evict(
+                state.path
+            ):
+                self.counters["evict_skipped"] += 1
+                return False
+            await asyncio.to_thread(shutil.rmtree, state.path, True)
+            self.counters["evicted"] += 1
+            self.counters["reclaimed_bytes"] += state.bytes
+            self.counters["reclaimed_inodes"] += state.inodes
+            self._workspaces.pop(name, None)
+            log.info("evicted an idle workspace, reclaimed %d bytes", state.bytes)
+            return True
+        finally:
+            self._evicting.discard(name)
+            async with self._changed:
+                self._changed.notify_all()
+
+    async def run(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sweep()
+            except Exception as exc:
+                log.warning("workspace sweep failed: %s", type(exc).__name__)
+
+    def stats(self) -> dict[str, object]:
+        states = self._workspaces.values()
+        return {
+            "workspaces": len(self._workspaces),
+            "active": sum(1 for state in states if state.active),
+            "bytes": sum(state.bytes for state in states),
+            "inodes": sum(state.inodes for state in states),
+            "max_bytes": self.quota.max_bytes,
+            "max_inodes": self.quota.max_inodes,
+            "idle_s": self.idle_s,
+            "max_total_bytes": self.max_total_bytes,
+            **self.counters,
+        }
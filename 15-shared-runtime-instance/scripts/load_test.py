@@ -10,7 +10,10 @@ Phases:
   1. locate      — find the managed EC2 instance and start the SSM sampler.
   2. ramp        — for each level in LEVELS fire N simultaneous user requests
                    (all sharing the session); stop early when the success
-                   rate drops below SUCCESS_FLOOR.
+                   rate drops below SUCCESS_FLOOR. With ARRIVAL=constant or
+                   poisson each level is an offered rate (requests/s) held for
+                   LEVEL_DURATION_S, issued open-loop on an intended timeline;
+                   levels then also report start lag and corrected latency.
   3. collect     — fetch the sampler CSV, correlate per-level time windows.
 
 Output: results/load_test_<ts>.json + console summary table.
@@ -19,9 +22,9 @@ Output: results/load_test_<ts>.json + console summary table.
 from __future__ import annotations
 
 import base64
-import concurrent.futures
 import json
 import os
+import random
 import sys
 import threading
 import time
@@ -32,6 +35,10 @@ from pathlib import Path
 import boto3
 from botocore.config import Config
 
+from arrival import arrival_offsets, lag_summary, run_threaded
+from histogram import Histogram
+from runtime_session import usage_summary
+
 ROOT = Path(__file__).resolve().parent.parent
 RUNTIME = json.loads((ROOT / "runtime.json").read_text())
 REGION = RUNTIME["region"]
@@ -40,6 +47,9 @@ CAPACITY_PROVIDER_ID = RUNTIME["capacityProviderArn"].split("/")[-1]
 LEVELS = json.loads(os.environ.get("LEVELS", "[2, 4, 6, 8, 12, 16, 20]"))
 SUCCESS_FLOOR = float(os.environ.get("SUCCESS_FLOOR", "0.8"))
 LEVEL_PAUSE_S = int(os.environ.get("LEVEL_PAUSE_S", "10"))
+ARRIVAL = os.environ.get("ARRIVAL", "burst")
+LEVEL_DURATION_S = float(os.environ.get("LEVEL_DURATION_S", "30"))
+SEED = int(os.environ["SEED"]) if os.environ.get("SEED") else None
 MONITOR_DURATION_S = int(os.environ.get("MONITOR_DURATION_S", "2100"))
 TASK_READ_TIMEOUT_S = int(os.environ.get("TASK_READ_TIMEOUT_S", "900"))
 SERVER_MAX_PARALLEL_AGENTS = int(
@@ -85,15 +95,6 @@ def utc_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
-def percentile(vals: list[float], pct: float) -> float | None:
-    if not vals:
-        return None
-    s = sorted(vals)
-    k = (len(s) - 1) * pct / 100.0
-    lo, hi = int(k), min(int(k) + 1, len(s) - 1)
-    return round(s[lo] + (s[hi] - s[lo]) * (k - lo), 1)
-
-
 def invoke_once(user_id: str, barrier: threading.Barrier | None) -> dict:
     if barrier is not None:
         barrier.wait()
@@ -126,6 +127,7 @@ def invoke_once(user_id: str, barrier: threading.Barrier | None) -> dict:
             error=(error or {}).get("message"),
             fingerprint=(complete.get("instance") or {}).get("server_run_id"),
             hostname=(complete.get("instance") or {}).get("hostname"),
+            usage=complete.get("usage"),
         )
         if not rec["success"] and not rec.get("error"):
             rec["error"] = "complete event or result missing"
@@ -137,40 +139,48 @@ def invoke_once(user_id: str, barrier: threading.Barrier | None) -> dict:
     return rec
 
 
-def run_level(level: int) -> dict:
-    barrier = threading.Barrier(level)
+def run_level(level: int, rng: random.Random | None = None) -> dict:
+    if ARRIVAL == "burst":
+        offsets = arrival_offsets("burst", count=level)
+    else:
+        offsets = arrival_offsets(
+            ARRIVAL, rate=level, duration=LEVEL_DURATION_S, rng=rng
+        )
     started = time.time()
-    with concurrent.futures.ThreadPoolExecutor(max_workers=level) as pool:
-        futures = [
-            pool.submit(
-                invoke_once,
-                f"load-{RUN_ID}-l{level}-u{i:02d}",
-                barrier,
-            )
-            for i in range(level)
-        ]
-        requests = [f.result() for f in futures]
+    requests = run_threaded(
+        offsets,
+        lambda i: invoke_once(f"load-{RUN_ID}-l{level}-u{i:02d}", None),
+    )
     finished = time.time()
-    lat_ok = [r["latency_ms"] for r in requests if r["success"]]
+    count = len(requests)
+    latency = Histogram.of(r["latency_ms"] for r in requests if r["success"])
     errors = [r["error"] for r in requests if not r["success"]]
     fingerprints = {r["fingerprint"] for r in requests if r.get("fingerprint")}
     summary = {
         "level": level,
+        "arrival": ARRIVAL,
         "window": [started, finished],
-        "success": len(lat_ok),
-        "failed": level - len(lat_ok),
-        "success_rate": round(len(lat_ok) / level, 3),
-        "latency_p50_ms": percentile(lat_ok, 50),
-        "latency_p90_ms": percentile(lat_ok, 90),
-        "latency_max_ms": percentile(lat_ok, 100),
+        "requests_sent": count,
+        "success": latency.count,
+        "failed": count - latency.count,
+        "success_rate": round(latency.count / count, 3) if count else 0.0,
+        **latency.summary("latency"),
+        **lag_summary(requests),
+        **usage_summary(
+            [r.get("usage") for r in requests], latency.count, finished - started
+        ),
         "distinct_instances": len(fingerprints),
         "errors": errors[:5],
         "requests": requests,
     }
     print(
-        f"  level {level:>2}: ok={summary['success']}/{level} "
+        f"  level {level:>2}: ok={summary['success']}/{count} "
         f"p50={summary['latency_p50_ms']} p90={summary['latency_p90_ms']} "
-        f"max={summary['latency_max_ms']} ms "
+        f"max={summary['latency_max_ms']} "
+        f"corrected_p90={summary['corrected_p90_ms']} ms "
+        f"cost/ok=${summary['cost_per_success_usd']} "
+        f"out_tok/s={summary['output_tokens_per_s']} "
+        f"cache_hit={summary['cache_hit_ratio']} "
         f"instances={summary['distinct_instances']}"
     )
     return summary
@@ -295,6 +305,9 @@ def write_results(
             "levels": LEVELS,
             "success_floor": SUCCESS_FLOOR,
             "level_pause_s": LEVEL_PAUSE_S,
+            "arrival": ARRIVAL,
+            "level_duration_s": None if ARRIVAL == "burst" else LEVEL_DURATION_S,
+            "seed": SEED,
             "monitor_duration_s": MONITOR_DURATION_S,
             "task_read_timeout_s": TASK_READ_TIMEOUT_S,
             "server_max_parallel_agents": SERVER_MAX_PARALLEL_AGENTS,
@@ -318,7 +331,7 @@ def main() -> int:
     print(f"runtime        : {RUNTIME['runtimeArn']}")
     print(f"shared session : {SHARED_SESSION_ID}")
     print(f"run id         : {RUN_ID}")
-    print(f"levels         : {LEVELS}\n")
+    print(f"levels         : {LEVELS} ({ARRIVAL})\n")
 
     wall_started = time.perf_counter()
     print("== phase 0: warmup ==")
@@ -347,10 +360,11 @@ def main() -> int:
 
     print("\n== phase 2: concurrency ramp ==")
     levels: list[dict] = []
+    rng = random.Random(SEED)
     latest_samples: list[dict] = []
     latest_monitor_error: str | None = None
     for level_index, level in enumerate(LEVELS):
-        summary = run_level(level)
+        summary = run_level(level, rng)
         levels.append(summary)
         write_results(
             path,
@@ -428,7 +442,7 @@ def main() -> int:
           f"{'cpu avg':>8} {'cpu max':>8} {'mem min avail':>14} {'nodes':>6}")
     for s in levels:
         r = s.get("resources", {})
-        print(f"{s['level']:>5} {s['success']:>3}/{s['level']:<2} "
+        print(f"{s['level']:>5} {s['success']:>3}/{s['requests_sent']:<2} "
               f"{s['latency_p50_ms'] or '-':>8} {s['latency_p90_ms'] or '-':>8} "
               f"{s['latency_max_ms'] or '-':>8} "
               f"{r.get('cpu_avg_pct','-'):>7}% {r.get('cpu_max_pct','-'):>7}% "
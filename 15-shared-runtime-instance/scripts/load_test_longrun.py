@@ -29,6 +29,9 @@ from pathlib import Path
 import boto3
 from botocore.config import Config
 
+from histogram import Histogram
+from runtime_session import usage_summary
+
 ROOT = Path(__file__).resolve().parent.parent
 RUNTIME_CONFIG = Path(os.environ.get("RUNTIME_CONFIG", "runtime.json"))
 if not RUNTIME_CONFIG.is_absolute():
@@ -260,20 +263,6 @@ def log(message: str) -> None:
         print(message, flush=True)
 
 
-def percentile(values: list[float], pct: float) -> float | None:
-    if not values:
-        return None
-    sorted_values = sorted(values)
-    position = (len(sorted_values) - 1) * pct / 100.0
-    low = int(position)
-    high = min(low + 1, len(sorted_values) - 1)
-    return round(
-        sorted_values[low]
-        + (sorted_values[high] - sorted_values[low]) * (position - low),
-        1,
-    )
-
-
 def project_phases(run_token: str) -> list[dict[str, str]]:
     expected_json = json.dumps(list(EXPECTED_FILES))
     return [
@@ -378,6 +367,7 @@ def invoke_prompt(
             resumed_from=complete.get("resumed_from"),
             fingerprint=(complete.get("instance") or {}).get("server_run_id"),
             hostname=(complete.get("instance") or {}).get("hostname"),
+            usage=complete.get("usage"),
         )
         if not record["success"] and not record.get("error"):
             record["error"] = (
@@ -481,10 +471,10 @@ def run_level(level: int) -> dict:
         requests = [future.result() for future in futures]
     finished = time.time()
 
-    successful_latencies = [
-        request["latency_ms"] for request in requests if request["agent_success"]
-    ]
-    agent_success_count = len(successful_latencies)
+    task = Histogram.of(
+        request["latency_ms"] / 1000 for request in requests if request["agent_success"]
+    )
+    agent_success_count = task.count
     summary = {
         "level": level,
         "window": [started, finished],
@@ -494,9 +484,13 @@ def run_level(level: int) -> dict:
         "success": agent_success_count,
         "failed": level - agent_success_count,
         "success_rate": round(agent_success_count / level, 3),
-        "task_p50_s": round((percentile(successful_latencies, 50) or 0) / 1000, 1),
-        "task_p90_s": round((percentile(successful_latencies, 90) or 0) / 1000, 1),
-        "task_max_s": round((percentile(successful_latencies, 100) or 0) / 1000, 1),
+        **task.summary("task", unit="s"),
+        # A success is a user whose whole two-phase project passed.
+        **usage_summary(
+            [phase.get("usage") for request in requests for phase in request["phases"]],
+            agent_success_count,
+            finished - started,
+        ),
         "tool_calls_avg": round(
             sum(request["tool_call_count"] for request in requests) / level, 1
         ),
@@ -518,6 +512,9 @@ def run_level(level: int) -> dict:
         f"  level {level:>2}: agent_ok={agent_success_count}/{level} "
         f"p50={summary['task_p50_s']}s p90={summary['task_p90_s']}s "
         f"max={summary['task_max_s']}s tools_avg={summary['tool_calls_avg']} "
+        f"cost/ok=${summary['cost_per_success_usd']} "
+        f"out_tok/s={summary['output_tokens_per_s']} "
+        f"cache_hit={summary['cache_hit_ratio']} "
         f"instances={summary['distinct_instances']}"
     )
     return summary
@@ -910,8 +907,8 @@ def main() -> int:
             f"{summary['level']:>5} "
             f"{summary['agent_success']:>3}/{summary['level']:<4} "
             f"{verified:>9} "
-            f"{summary['task_p50_s']:>7} {summary['task_p90_s']:>7} "
-            f"{summary['task_max_s']:>7} "
+            f"{summary['task_p50_s'] or '-':>7} {summary['task_p90_s'] or '-':>7} "
+            f"{summary['task_max_s'] or '-':>7} "
             f"{resources.get('cpu_avg_pct', '-'):>7}% "
             f"{resources.get('mem_avail_min_mb', '-'):>8} "
             f"{resources.get('agent_procs_max', '-'):>6}"
@@ -0,0 +1,58 @@
+"""Helpers for reading what the shared runtime session's invocations return.
+
+Like ``arrival.py`` and ``histogram.py`` this has no third-party dependencies,
+so every load tool can import it without AWS credentials.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Iterable
+
+USAGE_TOKEN_FIELDS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+)
+
+
+def usage_summary(
+    usages: Iterable[dict[str, Any] | None], successes: int, elapsed_s: float
+) -> dict[str, Any]:
+    """Total the ``complete`` events' usage into cost, throughput and caching.
+
+    Cost per success divides everything spent, failed turns included, by the
+    successful ones. Tokens per second use the phase's wall-clock window. The
+    cache hit ratio is the share of input tokens read from the prompt cache;
+    users only share cache entries when they report one ``cache_prefix``.
+    """
+    usages = [usage for usage in usages if isinstance(usage, dict)]
+    totals = {
+        name: sum(int(usage.get(name) or 0) for usage in usages)
+        for name in USAGE_TOKEN_FIELDS
+    }
+    costs = [
+        usage["total_cost_usd"]
+        for usage in usages
+        if isinstance(usage.get("total_cost_usd"), (int, float))
+    ]
+    cost = round(sum(costs), 6) if costs else None
+    elapsed_s = max(elapsed_s, 1e-9)
+    cached = totals["cache_read_input_tokens"]
+    all_input = cached + totals["input_tokens"] + totals["cache_creation_input_tokens"]
+    return {
+        "usage_reported": len(usages),
+        **{f"{name}_total": value for name, value in totals.items()},
+        "cache_hit_ratio": round(cached / all_input, 4) if all_input else None,
+        "distinct_cache_prefixes": len(
+            {usage["cache_prefix"] for usage in usages if usage.get("cache_prefix")}
+        ),
+        "total_cost_usd": cost,
+        "cost_per_success_usd": (
+            round(cost / successes, 6) if cost is not None and successes else None
+        ),
+        "tokens_per_s": round(
+            (totals["input_tokens"] + totals["output_tokens"]) / elapsed_s, 1
+        ),
+        "output_tokens_per_s": round(totals["output_tokens"] / elapsed_s, 1),
+    }
@@ -0,0 +1,115 @@
+"""Unit tests for app/accounting.py."""
+
+from __future__ import annotations
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from accounting import UsageLedger, prefix_fingerprint, turn_usage  # noqa: E402
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestTurnUsage(unittest.TestCase):
+    def test_normalizes_sdk_usage(self):
+        usage = turn_usage(
+            {"input_tokens": 12, "output_tokens": 5, "cache_read_input_tokens": 300},
+            total_cost_usd=0.004,
+            num_turns=2,
+            duration_ms=900,
+            duration_api_ms=700,
+        )
+        self.assertEqual(usage["input_tokens"], 12)
+        self.assertEqual(usage["cache_creation_input_tokens"], 0)
+        self.assertEqual(usage["cache_read_input_tokens"], 300)
+        self.assertEqual(usage["total_cost_usd"], 0.004)
+        self.assertEqual(usage["duration_api_ms"], 700)
+        self.assertEqual(usage["cache_hit_ratio"], round(300 / 312, 4))
+
+    def test_missing_or_malformed_usage_is_zero(self):
+        usage = turn_usage({"input_tokens": "many"}, total_cost_usd=float("nan"))
+        self.assertEqual(usage["input_tokens"], 0)
+        self.assertIsNone(usage["total_cost_usd"])
+        self.assertEqual(turn_usage(None)["output_tokens"], 0)
+        self.assertIsNone(turn_usage(None)["cache_hit_ratio"])
+
+    def test_prefix_fingerprint_is_order_independent(self):
+        first = prefix_fingerprint(system_prompt="S", allowed_tools=["Read", "Write"])
+        second = prefix_fingerprint(allowed_tools=["Read", "Write"], system_prompt="S")
+        self.assertEqual(first, second)
+        self.assertNotEqual(
+            first,
+            prefix_fingerprint(system_prompt="S ", allowed_tools=["Read", "Write"]),
+        )
+
+
+class TestUsageLedger(unittest.TestCase):
+    def test_rolls_up_per_user_and_in_total(self):
+        ledger = UsageLedger(window_s=60, clock=Clock())
+        ledger.record(
+            "alice", turn_usage({"output_tokens": 100}, total_cost_usd=0.02), 2.0, True
+        )
+        ledger.record("alice", turn_usage(None, total_cost_usd=0.01), 1.0, False)
+        ledger.record(
+            "bob", turn_usage({"output_tokens": 50}, total_cost_usd=0.03), 1.0, True
+        )
+        alice = ledger.user("alice")
+        self.assertEqual((alice["requests"], alice["success"]), (2, 1))
+        self.assertEqual(alice["total_cost_usd"], 0.03)
+        self.assertEqual(alice["cost_per_success_usd"], 0.03)
+        self.assertEqual(alice["output_tokens_per_s"], 33.33)
+        self.assertEqual(alice["latency_p50_ms"], 2000.0)
+        total = ledger.stats()["total"]
+        self.assertEqual(total["output_tokens"], 150)
+        self.assertEqual(total["cost_per_success_usd"], 0.03)
+        self.assertEqual(ledger.user("carol")["cost_per_success_usd"], None)
+
+    def test_reports_prompt_cache_hits_and_savings(self):
+        ledger = UsageLedger(clock=Clock())
+        ledger.record(
+            "alice",
+            turn_usage({"input_tokens": 10, "cache_creation_input_tokens": 1000}),
+            1.0,
+            True,
+        )
+        ledger.record(
+            "bob",
+            turn_usage({"input_tokens": 10, "cache_read_input_tokens": 1000}),
+            1.0,
+            True,
+        )
+        total = ledger.stats()["total"]
+        self.assertEqual(total["cache_hit_ratio"], round(1000 / 2020, 4))
+        self.assertEqual(total["input_tokens_saved"], 900)
+        self.assertEqual(ledger.user("alice")["cache_hit_ratio"], 0.0)
+        self.assertEqual(ledger.user("bob")["cache_hit_ratio"], round(1000 / 1010, 4))
+
+    def test_window_expires_entries_but_lifetime_keeps_them(self):
+        clock = Clock()
+        ledger = UsageLedger(window_s=10, clock=clock)
+        ledger.record("alice", turn_usage(None, total_cost_usd=0.5), 1.0, True)
+        clock.now = 11
+        stats = ledger.stats()
+        self.assertEqual(stats["total"]["requests"], 0)
+        self.assertEqual(stats["users"], {})
+        self.assertEqual(stats["lifetime"]["total_cost_usd"], 0.5)
+
+    def test_least_recently_active_user_is_dropped(self):
+        ledger = UsageLedger(max_users=2, clock=Clock())
+        for user_id in ("alice", "bob", "alice", "carol"):
+            ledger.record(user_id, turn_usage(None), 1.0, True)
+        self.assertEqual(sorted(ledger.stats()["users"]), ["alice", "carol"])
+        self.assertEqual(ledger.stats()["total"]["requests"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""Unit tests for app/cancellation.py."""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from cancellation import (  # noqa: E402
+    DuplicateRequestId,
+    RequestRegistry,
+    run_until_cancelled,
+    validate_request_id,
+    watch_disconnect,
+)
+
+
+class TestRequestRegistry(unittest.IsolatedAsyncioTestCase):
+    async def test_only_the_owner_can_cancel(self):
+        registry = RequestRegistry()
+        handle = registry.register("r1", "alice")
+        with self.assertRaises(DuplicateRequestId):
+            registry.register("r1", "bob")
+        self.assertFalse(registry.cancel("r1", "bob"))
+        self.assertFalse(registry.cancel("r2", "alice"))
+        self.assertTrue(registry.cancel("r1", "alice"))
+        self.assertFalse(registry.cancel("r1", "alice"))
+        self.assertEqual(handle.reason, "cancelled")
+        registry.unregister(handle)
+        self.assertEqual(
+            registry.stats(), {"running": 0, "cancelled": 1, "disconnected": 0}
+        )
+
+    def test_request_ids_are_validated(self):
+        self.assertEqual(validate_request_id("req-1:a"), "req-1:a")
+        for bad in ("", "-x", "a/b", 7, "x" * 129):
+            with self.assertRaises(ValueError):
+                validate_request_id(bad)
+
+
+class TestRunUntilCancelled(unittest.IsolatedAsyncioTestCase):
+    async def test_cancel_stops_the_turn_and_runs_its_cleanup(self):
+        registry = RequestRegistry()
+        handle = registry.register("r1", "alice")
+        state = {"cleaned": False, "task": None}
+
+        async def turn():
+            state["task"] = asyncio.current_task()
+            try:
+                yield "first"
+                await asyncio.sleep(3600)
+                yield "never"
+            finally:
+                state["cleaned"] = True
+
+        received = []
+        async for item in run_until_cancelled(turn(), handle):
+            received.append(item)
+            registry.cancel("r1", "alice")
+        self.assertEqual(received, ["first"])
+        self.assertTrue(state["cleaned"])
+        self.assertIsNot(state["task"], asyncio.current_task())
+
+    async def test_items_and_errors_pass_through(self):
+        handle = RequestRegistry().register("r1", "alice")
+
+        async def turn():
+            yield 1
+            yield 2
+            raise RuntimeError("boom")
+
+        received = []
+        with self.assertRaises(RuntimeError):
+            async for item in run_until_cancelled(turn(), handle):
+                received.append(item)
+        self.assertEqual(received, [1, 2])
+        self.assertFalse(handle.cancelled)
+
+    async def test_closing_the_consumer_cancels_the_turn(self):
+        handle = RequestRegistry().register("r1", "alice")
+        cleaned = asyncio.Event()
+
+        async def turn():
+            try:
+                while True:
+                    yield "tick"
+                    await asyncio.sleep(0.001)
+            finally:
+                cleaned.set()
+
+        stream = run_until_cancelled(turn(), handle)
+        await stream.__anext__()
+        await stream.aclose()
+        self.assertTrue(cleaned.is_set())
+
+    async def test_disconnect_watcher_cancels_the_handle(self):
+        handle = RequestRegistry().register("r1", "alice")
+        polls = iter([False, False, True])
+
+        async def is_disconnected() -> bool:
+            return next(polls)
+
+        await asyncio.wait_for(watch_disconnect(is_disconnected, handle, 0.001), 1)
+        self.assertEqual(handle.reason, "disconnected")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+"""Unit tests for app/concurrency.py (standard library only)."""
+
+import asyncio
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from concurrency import (  # noqa: E402
+    AdjustableLimiter,
+    AimdController,
+    PressureSample,
+    UserLocks,
+    read_pressure,
+)
+
+
+class TestAdjustableLimiter(unittest.IsolatedAsyncioTestCase):
+    async def test_raising_limit_wakes_waiters_in_order(self):
+        limiter = AdjustableLimiter(1)
+        await limiter.acquire()
+        order = []
+
+        async def worker(name):
+            async with limiter:
+                order.append(name)
+                await asyncio.sleep(0)
+
+        tasks = [asyncio.create_task(worker(name)) for name in "ab"]
+        await asyncio.sleep(0)
+        self.assertEqual(limiter.waiting, 2)
+        limiter.set_limit(3)
+        await asyncio.gather(*tasks)
+        self.assertEqual(order, ["a", "b"])
+        self.assertEqual(limiter.active, 1)
+
+    async def test_lowering_limit_keeps_holders_and_blocks_new(self):
+        limiter = AdjustableLimiter(2)
+        await limiter.acquire()
+        await limiter.acquire()
+        limiter.set_limit(1)
+        waiter = asyncio.create_task(limiter.acquire())
+        limiter.release()
+        await asyncio.sleep(0)
+        self.assertFalse(waiter.done())
+        limiter.release()
+        await waiter
+        self.assertEqual(limiter.active, 1)
+
+    async def test_cancelled_waiter_does_not_leak_a_slot(self):
+        limiter = AdjustableLimiter(1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+        limiter.release()
+        self.assertEqual((limiter.active, limiter.waiting), (0, 0))
+
+
+class TestUserLocks(unittest.IsolatedAsyncioTestCase):
+    async def test_serializes_one_user_and_drops_entry_after_last_holder(self):
+        locks = UserLocks()
+        events = []
+
+        async def turn(user, name):
+            async with locks.hold(user):
+                events.append(f"start {name}")
+                await asyncio.sleep(0.01)
+                events.append(f"end {name}")
+
+        task = asyncio.gather(turn("alice", "a1"), turn("alice", "a2"), turn("bob", "b1"))
+        await asyncio.sleep(0)
+        self.assertEqual(locks.stats(), {"live": 2, "waiting": 1, "peak": 2})
+        await task
+        self.assertLess(events.index("end a1"), events.index("start a2"))
+        self.assertLess(events.index("start b1"), events.index("end a1"))
+        self.assertEqual(len(locks), 0)
+
+    async def test_cancelled_waiter_releases_its_reference(self):
+        locks = UserLocks()
+        async with locks.hold("alice"):
+            waiter = asyncio.create_task(locks.hold("alice").__aenter__())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+            self.assertEqual(locks.stats()["waiting"], 0)
+        self.assertEqual(len(locks), 0)
+
+
+class TestAimdController(unittest.TestCase):
+    def test_grows_under_demand_and_halves_on_memory_stall(self):
+        controller = AimdController(4, maximum=8, cooldown=1)
+        calm = PressureSample(0.0, 0.0, 0.0, 0.3)
+        self.assertEqual(controller.update(calm, saturated=True), 5)
+        self.assertEqual(controller.update(calm, saturated=False), 5)
+        stalled = PressureSample(memory_some_avg10=25.0)
+        self.assertEqual(controller.update(stalled, saturated=True), 2)
+        self.assertEqual(controller.update(calm, saturated=True), 2)
+        self.assertEqual(controller.update(calm, saturated=True), 3)
+
+    def test_reads_cgroup_memory_ratio(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "memory.current").write_text("900\n")
+            (root / "memory.max").write_text("1000\n")
+            sample = read_pressure(root, root / "missing")
+        self.assertEqual(sample.memory_used_ratio, 0.9)
+        self.assertIsNone(sample.memory_some_avg10)
+
+
+if __name__ == "__main__":
+    unittest.main()
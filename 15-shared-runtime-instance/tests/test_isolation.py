@@ -5,16 +5,19 @@ import sys
 import tempfile
 import unittest
 from pathlib import Path
+from unittest import mock
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
 
 from isolation import (  # noqa: E402
     IsolationError,
+    PathGuard,
     ensure_workspace,
     guard_tool_call,
     user_slug,
     validate_user_id,
     workspace_for,
+    write_size,
 )
 
 
@@ -132,5 +135,68 @@ class TestGuardToolCall(unittest.TestCase):
         self.assertIsNone(guard_tool_call("LS", {"path": "."}, self.alice))
 
 
+class TestPathGuard(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.alice = ensure_workspace(self.root, "alice")
+        self.bob = ensure_workspace(self.root, "bob")
+        (self.alice / "src").mkdir()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_plain_paths_skip_resolve(self):
+        guard = PathGuard(self.alice)
+        with mock.patch.object(Path, "resolve", side_effect=AssertionError):
+            for candidate in ["src/app.py", str(self.alice / "new.txt"), "~/x"]:
+                self.assertTrue(guard.allows(candidate), candidate)
+
+    def test_decisions_are_cached(self):
+        guard = PathGuard(self.alice)
+        for _ in range(3):
+            self.assertIsNone(guard.check("Read", {"file_path": "src/a.py"}))
+            self.assertIsNotNone(guard.check("Read", {"file_path": "/etc/passwd"}))
+        self.assertEqual((guard.misses, guard.hits), (2, 4))
+
+    def test_symlink_inside_workspace_still_resolved(self):
+        os.symlink(self.bob, self.alice / "src" / "linked")
+        guard = PathGuard(self.alice)
+        self.assertFalse(guard.allows("src/linked/secret.txt"))
+        self.assertFalse(guard.allows(f"src/../../{self.bob.name}/x"))
+        self.assertTrue(guard.allows("src/../notes.txt"))
+
+
+class TestWriteQuota(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.alice = ensure_workspace(Path(self._tmp.name), "alice")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_write_size_estimates(self):
+        self.assertEqual(write_size("Write", {"content": "héllo"}), (6, 1))
+        self.assertEqual(write_size("Edit", {"old_string": "ab", "new_string": "abcd"}), (2, 0))
+        self.assertEqual(write_size("Edit", {"old_string": "abcd", "new_string": ""}), (0, 0))
+
+    def test_quota_applies_to_write_tools_after_the_path_check(self):
+        calls = []
+
+        def quota(added_bytes, added_inodes):
+            calls.append((added_bytes, added_inodes))
+            return "workspace quota exceeded" if added_bytes > 4 else None
+
+        guard = PathGuard(self.alice, quota=quota)
+        self.assertIsNone(guard.check("Write", {"file_path": "a", "content": "1234"}))
+        self.assertEqual(
+            guard.check("Write", {"file_path": "a", "content": "12345"}),
+            "workspace quota exceeded",
+        )
+        self.assertIsNotNone(guard.check("Write", {"file_path": "/etc/x", "content": ""}))
+        self.assertIsNone(guard.check("Read", {"file_path": "a"}))
+        self.assertEqual(calls, [(4, 1), (5, 1)])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,46 @@
+"""Unit tests for scripts/runtime_session.py."""
+
+from __future__ import annotations
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from runtime_session import usage_summary  # noqa: E402
+
+
+class TestUsageSummary(unittest.TestCase):
+    def test_reports_cost_per_success_and_throughput(self):
+        usages = [
+            {"input_tokens": 100, "output_tokens": 50, "total_cost_usd": 0.02},
+            {"input_tokens": 40, "output_tokens": 10, "total_cost_usd": 0.01},
+            None,
+        ]
+        summary = usage_summary(usages, successes=2, elapsed_s=2.0)
+        self.assertEqual(summary["usage_reported"], 2)
+        self.assertEqual(summary["output_tokens_total"], 60)
+        self.assertEqual(summary["total_cost_usd"], 0.03)
+        self.assertEqual(summary["cost_per_success_usd"], 0.015)
+        self.assertEqual(summary["tokens_per_s"], 100.0)
+        self.assertEqual(summary["output_tokens_per_s"], 30.0)
+
+    def test_cache_hits_and_empty_phases(self):
+        cached = usage_summary(
+            [
+                {"input_tokens": 5, "cache_read_input_tokens": 15, "cache_prefix": "p"},
+                {"input_tokens": 5, "cache_creation_input_tokens": 15, "cache_prefix": "p"},
+            ],
+            successes=2,
+            elapsed_s=1.0,
+        )
+        self.assertEqual(cached["cache_hit_ratio"], 0.375)
+        self.assertEqual(cached["distinct_cache_prefixes"], 1)
+        empty = usage_summary([None], successes=0, elapsed_s=1.0)
+        self.assertIsNone(empty["total_cost_usd"])
+        self.assertIsNone(empty["cost_per_success_usd"])
+
+
+if __name__ == "__main__":
+    unittest.main()
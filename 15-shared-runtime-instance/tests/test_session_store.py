@@ -0,0 +1,139 @@
+"""Unit tests for app/session_store.py; DynamoDB is replaced by a fake client."""
+
+from __future__ import annotations
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from session_store import (  # noqa: E402
+    DynamoBackend,
+    MemoryBackend,
+    SessionStore,
+    SqliteBackend,
+    open_backend,
+)
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FailingBackend(MemoryBackend):
+    def __init__(self) -> None:
+        super().__init__()
+        self.fail = True
+
+    def put_many(self, items: list[tuple[str, str]]) -> None:
+        if self.fail:
+            raise OSError("disk full")
+        super().put_many(items)
+
+
+class TestSessionStore(unittest.TestCase):
+    def test_puts_are_served_from_memory_and_flushed_in_one_batch(self):
+        backend = MemoryBackend()
+        store = SessionStore(backend)
+        for index in range(5):
+            store.put(f"user-{index}", f"s{index}")
+        store.put("user-0", "s0b")
+        self.assertEqual(store.cached("user-0"), (True, "s0b"))
+        self.assertEqual(backend.items, {})
+        self.assertEqual(store.flush(), 5)
+        self.assertEqual(store.flush(), 0)
+        self.assertEqual(backend.batches, 1)
+        self.assertEqual(backend.items["user-0"], "s0b")
+        self.assertEqual(store.stats()["dirty"], 0)
+
+    def test_miss_reads_through_and_is_cached(self):
+        backend = MemoryBackend()
+        backend.items["alice"] = "s1"
+        store = SessionStore(backend, cache_size=1)
+        self.assertEqual(store.cached("alice"), (False, None))
+        self.assertEqual(store.get("alice"), "s1")
+        self.assertEqual(store.cached("alice"), (True, "s1"))
+        self.assertIsNone(store.get("bob"))
+        store.put("carol", "s2")
+        self.assertEqual(store.cached("alice"), (False, None))
+        self.assertEqual(store.stats()["cached"], 1)
+
+    def test_clean_entries_expire_but_dirty_entries_do_not(self):
+        clock = Clock()
+        backend = MemoryBackend()
+        store = SessionStore(backend, cache_ttl=30, clock=clock)
+        store.put("alice", "s1")
+        clock.now = 60
+        self.assertEqual(store.cached("alice"), (True, "s1"))
+        store.flush()
+        backend.items["alice"] = "s2"
+        self.assertEqual(store.cached("alice"), (False, None))
+        self.assertEqual(store.get("alice"), "s2")
+
+    def test_failed_flush_requeues_without_overwriting_newer_ids(self):
+        backend = FailingBackend()
+        store = SessionStore(backend)
+        store.put("alice", "s1")
+        store.put("bob", "s1")
+        with self.assertRaises(OSError):
+            store.flush()
+        store.put("alice", "s2")
+        backend.fail = False
+        self.assertEqual(store.flush(), 2)
+        self.assertEqual(backend.items, {"alice": "s2", "bob": "s1"})
+        self.assertEqual(store.stats()["flush_errors"], 1)
+
+
+class TestBackends(unittest.TestCase):
+    def test_sqlite_upserts_and_survives_reopen(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "state" / "sessions.sqlite3"
+            backend = SqliteBackend(path)
+            backend.put_many([("alice", "s1"), ("bob", "s2")])
+            backend.put_many([("alice", "s3")])
+            backend.close()
+            store = SessionStore(open_backend("sqlite", path=path))
+            self.assertEqual(store.get("alice"), "s3")
+            self.assertEqual(store.get("bob"), "s2")
+            self.assertIsNone(store.get("carol"))
+
+    def test_dynamo_batches_and_retries_unprocessed_items(self):
+        class Client:
+            def __init__(self) -> None:
+                self.calls: list[int] = []
+                self.items: dict[str, str] = {}
+
+            def batch_write_item(self, RequestItems):
+                (requests,) = RequestItems.values()
+                self.calls.append(len(requests))
+                first, rest = requests[0], requests[1:]
+                item = first["PutRequest"]["Item"]
+                self.items[item["pk"]["S"]] = item["session_id"]["S"]
+                return {"UnprocessedItems": {"pool": rest} if rest else {}}
+
+            def get_item(self, TableName, Key, ConsistentRead):
+                value = self.items.get(Key["pk"]["S"])
+                return {"Item": {"session_id": {"S": value}}} if value else {}
+
+        client = Client()
+        backend = DynamoBackend(client, "pool")
+        backend.put_many([("alice", "s1"), ("bob", "s2")])
+        self.assertEqual(client.calls, [2, 1])
+        self.assertEqual(backend.get("bob"), "s2")
+        self.assertIsNone(backend.get("carol"))
+
+    def test_unknown_backend_is_rejected(self):
+        with self.assertRaises(ValueError):
+            open_backend("lmdb", path=Path("unused"))
+        with self.assertRaises(ValueError):
+            open_backend("dynamodb", path=Path("unused"))
+
+
+if __name__ == "__main__":
+    unittest.main()
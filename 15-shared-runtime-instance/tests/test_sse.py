@@ -0,0 +1,94 @@
+"""Unit tests for app/sse.py."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+import sse  # noqa: E402
+
+
+async def produce(frames: list[bytes], gaps: list[float]):
+    for chunk, gap in zip(frames, gaps):
+        await asyncio.sleep(gap)
+        yield chunk
+
+
+async def collect(source, stats: sse.StreamStats, **kwargs) -> list[bytes]:
+    return [chunk async for chunk in sse.coalesce(source, stats, **kwargs)]
+
+
+class TestEncoding(unittest.TestCase):
+    def test_frames_are_compact_utf8(self):
+        payload = {"event": "delta", "text": "héllo\n", "n": [1, None]}
+        expected = b'data: {"event":"delta","text":"h\xc3\xa9llo\\n","n":[1,null]}\n\n'
+        self.assertEqual(sse.frame(payload), expected)
+
+
+class TestCoalesce(unittest.IsolatedAsyncioTestCase):
+    async def test_window_off_writes_every_frame(self):
+        stats = sse.StreamStats()
+        frames = [sse.frame({"i": i}) for i in range(3)]
+        writes = await collect(produce(frames, [0, 0, 0]), stats)
+        self.assertEqual(writes, frames)
+        self.assertEqual((stats.frames, stats.writes), (3, 3))
+
+    async def test_frames_within_the_window_share_one_write(self):
+        stats = sse.StreamStats()
+        frames = [sse.frame({"i": i}) for i in range(5)]
+        writes = await collect(produce(frames, [0, 0, 0, 0.2, 0]), stats, window=0.05)
+        self.assertEqual(writes, [b"".join(frames[:3]), b"".join(frames[3:])])
+        self.assertEqual(
+            stats.to_dict(), {"frames": 5, "writes": 2, "bytes": sum(map(len, frames))}
+        )
+        events = [
+            json.loads(block[len(b"data: ") :])
+            for block in b"".join(writes).split(b"\n\n")
+            if block
+        ]
+        self.assertEqual([event["i"] for event in events], [0, 1, 2, 3, 4])
+
+    async def test_size_cap_flushes_early(self):
+        stats = sse.StreamStats()
+        frames = [sse.frame({"pad": "x" * 40}) for _ in range(4)]
+        writes = await collect(
+            produce(frames, [0] * 4), stats, window=1.0, max_bytes=len(frames[0]) * 2
+        )
+        self.assertEqual(len(writes), 2)
+
+    async def test_source_errors_propagate_after_pending_frames(self):
+        async def failing():
+            yield sse.frame({"i": 0})
+            raise RuntimeError("boom")
+
+        stats = sse.StreamStats()
+        received = []
+        with self.assertRaises(RuntimeError):
+            async for chunk in sse.coalesce(failing(), stats, window=0.05):
+                received.append(chunk)
+        self.assertEqual(len(received), 1)
+
+    async def test_closing_early_cancels_the_source(self):
+        closed = asyncio.Event()
+
+        async def endless():
+            try:
+                while True:
+                    yield sse.frame({"tick": True})
+                    await asyncio.sleep(0.001)
+            finally:
+                closed.set()
+
+        stream = sse.coalesce(endless(), sse.StreamStats(), window=0.01)
+        await stream.__anext__()
+        await stream.aclose()
+        self.assertTrue(closed.is_set())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,304 @@
+"""Unit tests for app/supervisor.py (standard library only)."""
+
+import asyncio
+import json
+import os
+import signal
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from supervisor import (  # noqa: E402
+    BadRequest,
+    HashRing,
+    Supervisor,
+    fetch_json,
+    proxy,
+    read_request,
+    shard_key,
+)
+
+HEADER = "x-amzn-bedrock-agentcore-runtime-user-id"
+
+# A stand-in worker: answers /ping and streams its index back as SSE.
+FAKE_WORKER = r"""
+import asyncio, json, os
+
+INDEX = int(os.environ["WORKER_INDEX"])
+
+async def handle(reader, writer):
+    head = await reader.readuntil(b"\r\n\r\n")
+    length = 0
+    for line in head.decode().split("\r\n"):
+        if line.lower().startswith("content-length:"):
+            length = int(line.split(":", 1)[1])
+    body = await reader.readexactly(length)
+    if head.startswith(b"GET /ping"):
+        payload = json.dumps({"status": "healthy", "worker": INDEX}).encode()
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n" % len(payload) + payload)
+    else:
+        user = json.loads(body).get("user_id")
+        event = json.dumps({"event": "complete", "worker": INDEX, "user": user}).encode()
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n\r\n")
+        writer.write(b"data: " + event + b"\n\n")
+    await writer.drain()
+    writer.close()
+
+async def main():
+    server = await asyncio.start_unix_server(handle, os.environ["WORKER_SOCKET"])
+    async with server:
+        await server.serve_forever()
+
+asyncio.run(main())
+"""
+
+
+def stream(data: bytes) -> asyncio.StreamReader:
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+def invocation(user_id: str, *, header: bool = False) -> bytes:
+    body = json.dumps({"prompt": "hi", "user_id": user_id}).encode()
+    extra = f"{HEADER}: {user_id}\r\n" if header else ""
+    return (
+        f"POST /invocations HTTP/1.1\r\nHost: x\r\n{extra}"
+        f"Content-Length: {len(body)}\r\n\r\n"
+    ).encode() + body
+
+
+class TestHashRing(unittest.TestCase):
+    def test_spreads_users_and_moves_few_when_growing(self):
+        users = [f"user-{i}" for i in range(4000)]
+        four, five = HashRing(4), HashRing(5)
+        counts = [0] * 4
+        for user in users:
+            counts[four.owner(user)] += 1
+        self.assertGreater(min(counts), 500)
+        moved = sum(four.owner(user) != five.owner(user) for user in users)
+        self.assertLess(moved / len(users), 0.35)
+        self.assertEqual(HashRing(4).owner("alice"), four.owner("alice"))
+
+
+class TestRequests(unittest.IsolatedAsyncioTestCase):
+    async def test_reads_request_and_finds_the_shard_key(self):
+        request = await read_request(stream(invocation("alice")))
+        self.assertEqual((request.method, request.path), ("POST", "/invocations"))
+        self.assertEqual(shard_key(request, HEADER), "alice")
+        headed = await read_request(stream(invocation("bob", header=True)))
+        self.assertEqual(shard_key(headed, HEADER), "bob")
+        forwarded = headed.encode()
+        self.assertIn(b"Connection: close\r\n", forwarded)
+        self.assertTrue(forwarded.endswith(headed.body))
+        self.assertIsNone(await read_request(stream(b"")))
+
+    async def test_reads_chunked_bodies_and_forwards_them_with_a_length(self):
+        body = json.dumps({"prompt": "hi", "user_id": "alice"}).encode()
+        raw = (
+            b"POST /invocations HTTP/1.1\r\nHost: x\r\nTransfer-Encoding: chunked\r\n\r\n"
+            + b"%x;ext=1\r\n" % 5 + body[:5] + b"\r\n"
+            + b"%x\r\n" % (len(body) - 5) + body[5:] + b"\r\n"
+            + b"0\r\nX-Trailer: t\r\n\r\n"
+        )
+        request = await read_request(stream(raw))
+        self.assertEqual(request.body, body)
+        self.assertEqual(shard_key(request, HEADER), "alice")
+        forwarded = request.encode()
+        self.assertNotIn(b"Transfer-Encoding", forwarded)
+        self.assertIn(f"Content-Length: {len(body)}\r\n".encode(), forwarded)
+
+    async def test_rejects_unsupported_and_malformed_requests(self):
+        head = b"POST /invocations HTTP/1.1\r\n"
+        cases = (
+            (head + b"Transfer-Encoding: gzip\r\n\r\n", 501),
+            (head + b"Transfer-Encoding: chunked\r\nContent-Length: 3\r\n\r\nabc", 400),
+            (head + b"Transfer-Encoding: chunked\r\n\r\nzz\r\n", 400),
+            (head + b"Transfer-Encoding: chunked\r\n\r\n5\r\nab", 400),
+            (b"nonsense\r\n\r\n", 400),
+        )
+        for raw, status in cases:
+            with self.assertRaises(BadRequest) as caught:
+                await read_request(stream(raw))
+            self.assertEqual(caught.exception.status, status)
+
+    async def test_answers_expect_100_continue_before_the_body(self):
+        body = json.dumps({"prompt": "hi", "user_id": "alice"}).encode()
+        head = (
+            "POST /invocations HTTP/1.1\r\nHost: x\r\nExpect: 100-continue\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n"
+        ).encode()
+        reader = asyncio.StreamReader()
+        reader.feed_data(head)
+        sent = bytearray()
+
+        class Writer:
+            def write(self, data: bytes) -> None:
+                sent.extend(data)
+                reader.feed_data(body)
+                reader.feed_eof()
+
+            async def drain(self) -> None:
+                pass
+
+        request = await asyncio.wait_for(read_request(reader, Writer()), 5)
+        self.assertEqual(bytes(sent), b"HTTP/1.1 100 Continue\r\n\r\n")
+        self.assertEqual(request.body, body)
+        self.assertNotIn(b"Expect", request.encode())
+        with self.assertRaises(BadRequest) as caught:
+            await read_request(stream(head.replace(b"100-continue", b"magic")))
+        self.assertEqual(caught.exception.status, 417)
+
+    async def test_stray_client_bytes_do_not_end_the_stream(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            socket_path = Path(tmp) / "worker.sock"
+            resume = asyncio.Event()
+
+            async def worker(reader, writer):
+                await reader.readuntil(b"\r\n\r\n")
+                writer.write(b"HTTP/1.1 200 OK\r\n\r\ndata: 1\n\n")
+                await writer.drain()
+                await resume.wait()
+                writer.write(b"data: 2\n\n")
+                await writer.drain()
+                writer.close()
+
+            async def front(reader, writer):
+                request = await read_request(reader)
+                await proxy(socket_path, request, reader, writer)
+                writer.close()
+
+            upstream = await asyncio.start_unix_server(worker, str(socket_path))
+            server = await asyncio.start_server(front, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(invocation("alice"))
+            self.assertIn(b"data: 1", await reader.readuntil(b"\n\n"))
+            writer.write(b"\r\n")
+            await writer.drain()
+            await asyncio.sleep(0.05)
+            resume.set()
+            self.assertIn(b"data: 2", await asyncio.wait_for(reader.read(), 5))
+            writer.close()
+            server.close()
+            upstream.close()
+
+    async def test_client_disconnect_closes_the_worker_connection(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            socket_path = Path(tmp) / "worker.sock"
+            upstream_closed = asyncio.Event()
+
+            async def worker(reader, writer):
+                await reader.readuntil(b"\r\n\r\n")
+                writer.write(b"HTTP/1.1 200 OK\r\n\r\ndata: {}\n\n")
+                await writer.drain()
+                await reader.read()  # returns once the front closes
+                upstream_closed.set()
+
+            async def front(reader, writer):
+                request = await read_request(reader)
+                await proxy(socket_path, request, reader, writer)
+                writer.close()
+
+            upstream = await asyncio.start_unix_server(worker, str(socket_path))
+            server = await asyncio.start_server(front, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(invocation("alice"))
+            self.assertIn(b"data: {}", await reader.readuntil(b"\n\n"))
+            writer.close()
+            await asyncio.wait_for(upstream_closed.wait(), 5)
+            server.close()
+            upstream.close()
+
+
+class TestSupervisor(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        script = Path(self.tmp.name) / "worker.py"
+        script.write_text(FAKE_WORKER)
+        self.supervisor = Supervisor(
+            count=3,
+            socket_dir=Path(self.tmp.name) / "sockets",
+            command=[sys.executable, str(script)],
+            env=dict(os.environ),
+            fingerprint=lambda: {"server_run_id": "run-1", "pid": 1},
+            user_header=HEADER,
+            restart_delay=0.05,
+        )
+        await self.supervisor.start()
+        self.server = await asyncio.start_server(self.supervisor.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.watcher = asyncio.create_task(self.supervisor.watch())
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.supervisor.stop(timeout=5)
+        self.watcher.cancel()
+        self.tmp.cleanup()
+
+    async def call(self, raw: bytes) -> tuple[bytes, bytes]:
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        writer.write(raw)
+        response = await reader.read()
+        writer.close()
+        head, _, body = response.partition(b"\r\n\r\n")
+        return head, body
+
+    async def test_users_stick_to_their_worker(self):
+        for user in ("alice", "bob", "carol", "dave"):
+            expected = self.supervisor.ring.owner(user)
+            for header in (False, True):
+                _, body = await self.call(invocation(user, header=header))
+                event = json.loads(body.split(b"data: ", 1)[1])
+                self.assertEqual((event["worker"], event["user"]), (expected, user))
+
+    async def test_ping_reports_every_worker_under_one_fingerprint(self):
+        head, body = await self.call(b"GET /ping HTTP/1.1\r\nHost: x\r\n\r\n")
+        self.assertTrue(head.startswith(b"HTTP/1.1 200"))
+        ping = json.loads(body)
+        self.assertEqual(ping["status"], "healthy")
+        self.assertEqual(ping["server_run_id"], "run-1")
+        self.assertEqual([w["ping"]["worker"] for w in ping["workers"]], [0, 1, 2])
+        head, _ = await self.call(b"GET /nope HTTP/1.1\r\n\r\n")
+        self.assertTrue(head.startswith(b"HTTP/1.1 404"))
+
+    async def test_ping_follows_worker_liveness(self):
+        self.watcher.cancel()
+        workers = self.supervisor.workers
+        for worker in workers[:2]:
+            worker.process.send_signal(signal.SIGKILL)
+            await worker.process.wait()
+        head, body = await self.call(b"GET /ping HTTP/1.1\r\nHost: x\r\n\r\n")
+        self.assertTrue(head.startswith(b"HTTP/1.1 200"))
+        ping = json.loads(body)
+        self.assertEqual((ping["status"], ping["workers_up"]), ("degraded", 1))
+        workers[2].process.send_signal(signal.SIGKILL)
+        await workers[2].process.wait()
+        head, body = await self.call(b"GET /ping HTTP/1.1\r\nHost: x\r\n\r\n")
+        self.assertTrue(head.startswith(b"HTTP/1.1 503"))
+        self.assertEqual(json.loads(body)["status"], "unhealthy")
+
+    async def test_a_worker_that_dies_is_restarted(self):
+        worker = self.supervisor.worker_for("alice")
+        worker.process.send_signal(signal.SIGKILL)
+        await worker.process.wait()
+        head, _ = await self.call(invocation("alice"))
+        self.assertTrue(head.startswith(b"HTTP/1.1 503"))
+        self.assertIn(b"Retry-After: 1", head)
+        for _ in range(100):
+            if worker.ready:
+                break
+            await asyncio.sleep(0.05)
+        self.assertEqual(worker.restarts, 1)
+        self.assertIsNotNone(await fetch_json(worker.socket, "/ping"))
+        head, _ = await self.call(invocation("alice"))
+        self.assertTrue(head.startswith(b"HTTP/1.1 200"))
+
+
+if __name__ == "__main__":
+    unittest.main()
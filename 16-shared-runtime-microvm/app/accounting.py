@@ -0,0 +1,197 @@
+"""Token, cost and latency accounting for agent turns.
+
+``turn_usage`` normalizes what the Claude SDK's ``ResultMessage`` reports
+(``usage`` token counts, ``total_cost_usd``, turn and API durations) into the
+flat ``usage`` object of the ``complete`` SSE event. ``UsageLedger`` keeps a
+rolling window of those per user and for the whole server, which ``/stats``
+reports: requests, successes, tokens, cost, cost per success, output tokens
+per second of agent time, and latency percentiles.
+
+Prompt caching is reported alongside: the share of input tokens read from the
+cache and how many full-price input tokens that saved. Those reads only happen
+across users when every user's cacheable prefix (system prompt, tools, model)
+is byte-identical, which ``prefix_fingerprint`` lets the server show.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Mapping
+
+TOKEN_FIELDS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+)
+# Bedrock bills a cache read at a tenth of the input-token price.
+CACHE_READ_PRICE_RATIO = 0.1
+
+
+def prefix_fingerprint(**values: Any) -> str:
+    """Return a stable id for the request fields that form the cached prefix."""
+    encoded = json.dumps(values, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+def cache_hit_ratio(tokens: Mapping[str, Any]) -> float | None:
+    """Share of all input tokens, cached or not, that were cache reads."""
+    read = tokens.get("cache_read_input_tokens") or 0
+    total = (
+        (tokens.get("input_tokens") or 0)
+        + read
+        + (tokens.get("cache_creation_input_tokens") or 0)
+    )
+    return round(read / total, 4) if total else None
+
+
+def _number(value: Any) -> float | None:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def turn_usage(
+    usage: Mapping[str, Any] | None,
+    *,
+    total_cost_usd: float | None = None,
+    num_turns: int | None = None,
+    duration_ms: int | None = None,
+    duration_api_ms: int | None = None,
+) -> dict[str, Any]:
+    """Return token counts (0 when unreported) plus cost and durations."""
+    usage = usage if isinstance(usage, Mapping) else {}
+    summary: dict[str, Any] = {
+        name: int(_number(usage.get(name)) or 0) for name in TOKEN_FIELDS
+    }
+    summary["cache_hit_ratio"] = cache_hit_ratio(summary)
+    summary["total_cost_usd"] = _number(total_cost_usd)
+    summary["num_turns"] = num_turns
+    summary["duration_ms"] = duration_ms
+    summary["duration_api_ms"] = duration_api_ms
+    return summary
+
+
+@dataclass(frozen=True)
+class _Entry:
+    at: float
+    success: bool
+    latency_s: float
+    tokens: tuple[int, ...]
+    cost_usd: float
+
+
+def _percentile(values: list[float], pct: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(len(ordered) * pct / 100.0) - 1)]
+
+
+def _summarize(entries: Iterable[_Entry]) -> dict[str, Any]:
+    entries = list(entries)
+    successes = sum(entry.success for entry in entries)
+    totals = {
+        name: sum(entry.tokens[i] for entry in entries)
+        for i, name in enumerate(TOKEN_FIELDS)
+    }
+    cost = sum(entry.cost_usd for entry in entries)
+    agent_s = sum(entry.latency_s for entry in entries)
+    latencies = [entry.latency_s * 1000.0 for entry in entries if entry.success]
+    summary: dict[str, Any] = {
+        "requests": len(entries),
+        "success": successes,
+        **totals,
+        "cache_hit_ratio": cache_hit_ratio(totals),
+        "input_tokens_saved": round(
+            totals["cache_read_input_tokens"] * (1.0 - CACHE_READ_PRICE_RATIO)
+        ),
+        "total_cost_usd": round(cost, 6),
+        "cost_per_success_usd": round(cost / successes, 6) if successes else None,
+        "output_tokens_per_s": round(totals["output_tokens"] / agent_s, 2)
+        if agent_s
+        else None,
+    }
+    for pct in (50, 90, 99):
+        value = _percentile(latencies, pct)
+        summary[f"latency_p{pct}_ms"] = None if value is None else round(value, 1)
+    return summary
+
+
+class UsageLedger:
+    """Rolling ``window_s`` of finished turns, per user and in total.
+
+    At most ``max_users`` users are tracked; the least recently active user is
+    dropped first. Cost is counted for failed turns too, because it was spent.
+    """
+
+    def __init__(
+        self,
+        *,
+        window_s: float = 3600.0,
+        max_users: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if window_s <= 0 or max_users < 1:
+            raise ValueError("window_s and max_users must be positive")
+        self.window_s = window_s
+        self.max_users = max_users
+        self._clock = clock
+        self._users: OrderedDict[str, deque[_Entry]] = OrderedDict()
+        self._all: deque[_Entry] = deque()
+        self.lifetime = {"requests": 0, "success": 0, "total_cost_usd": 0.0}
+
+    def record(
+        self, user_id: str, usage: Mapping[str, Any], latency_s: float, success: bool
+    ) -> None:
+        entry = _Entry(
+            at=self._clock(),
+            success=success,
+            latency_s=max(0.0, latency_s),
+            tokens=tuple(int(usage.get(name) or 0) for name in TOKEN_FIELDS),
+            cost_usd=float(usage.get("total_cost_usd") or 0.0),
+        )
+        entries = self._users.pop(user_id, None) or deque()
+        entries.append(entry)
+        self._users[user_id] = entries
+        self._all.append(entry)
+        self.lifetime["requests"] += 1
+        self.lifetime["success"] += int(success)
+        self.lifetime["total_cost_usd"] += entry.cost_usd
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+        self._expire()
+
+    def _expire(self) -> None:
+        horizon = self._clock() - self.window_s
+        while self._all and self._all[0].at < horizon:
+            self._all.popleft()
+        for user_id in list(self._users):
+            entries = self._users[user_id]
+            while entries and entries[0].at < horizon:
+                entries.popleft()
+            if not entries:
+                del self._users[user_id]
+
+    def user(self, user_id: str) -> dict[str, Any]:
+        self._expire()
+        return _summarize(self._users.get(user_id, ()))
+
+    def stats(self) -> dict[str, Any]:
+        self._expire()
+        return {
+            "window_s": self.window_s,
+            "total": _summarize(self._all),
+            "users": {
+                user_id: _summarize(entries) for user_id, entries in self._users.items()
+            },
+            "lifetime": {
+                **self.lifetime,
+                "total_cost_usd": round(self.lifetime["total_cost_usd"], 6),
+            },
+        }
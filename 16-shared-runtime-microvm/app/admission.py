@@ -0,0 +1,250 @@
+"""Admission control and per-user fair queueing for agent slots.
+
+Requests are queued per ``runtimeUserId`` and granted one of ``limit`` agent
+slots by deficit round robin, so a burst from one user cannot hold the head of
+a global FIFO. Each user runs at most one request at a time, which keeps the
+per-workspace Claude session and pooled client single-owner. Queues are
+bounded per user and globally, and every queued request has a wait deadline.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable
+
+
+class AdmissionRejected(RuntimeError):
+    """Raised when a request cannot be queued or waited too long."""
+
+    def __init__(self, reason: str, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass(eq=False)
+class Ticket:
+    """One request's place in its user's queue."""
+
+    user_id: str
+    enqueued: float
+    granted: asyncio.Future[None] = field(repr=False)
+    started: float | None = None
+    released: bool = False
+
+    @property
+    def wait_s(self) -> float | None:
+        return None if self.started is None else self.started - self.enqueued
+
+
+class FairScheduler:
+    """Deficit-round-robin slot scheduler with bounded queues and deadlines.
+
+    ``weight(user_id)`` is the user's quantum per round and must be at least 1;
+    a user with weight 2 may be granted twice for each grant of a weight-1 user
+    while both have queued work.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        *,
+        max_queue: int,
+        max_user_queue: int,
+        queue_timeout: float,
+        weight: Callable[[str], float] = lambda _user_id: 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if limit < 1 or max_queue < 0 or max_user_queue < 1 or queue_timeout <= 0:
+            raise ValueError("scheduler limits must be positive")
+        self._limit = limit
+        self.max_queue = max_queue
+        self.max_user_queue = max_user_queue
+        self.queue_timeout = queue_timeout
+        self._weight = weight
+        self._clock = clock
+        self._queues: dict[str, deque[Ticket]] = {}
+        self._deficit: dict[str, float] = {}
+        self._running: dict[str, int] = {}
+        self._active: deque[str] = deque()
+        self._running_total = 0
+        self._queued_total = 0
+        self._wait_ewma_s = 0.0
+        self.last_update = time.time()
+        self.counters = {"granted": 0, "rejected_full": 0, "rejected_timeout": 0}
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    def set_limit(self, limit: int) -> None:
+        """Change the slot count; running requests above it finish normally."""
+        if limit < 1:
+            raise ValueError("scheduler limit must be positive")
+        self._limit = limit
+        self._dispatch()
+
+    def _touch(self) -> None:
+        self.last_update = time.time()
+
+    def _retry_after(self) -> float:
+        return round(max(1.0, self._wait_ewma_s), 1)
+
+    def admit(self, user_id: str) -> None:
+        """Raise ``AdmissionRejected`` if ``submit`` would reject ``user_id`` now."""
+        queue = self._queues.get(user_id)
+        queued_for_user = len(queue) if queue else 0
+        if queued_for_user >= self.max_user_queue:
+            self.counters["rejected_full"] += 1
+            raise AdmissionRejected(
+                "user_queue_full",
+                f"user already has {queued_for_user} queued requests",
+                self._retry_after(),
+            )
+        if self._queued_total >= self.max_queue and not self._can_start_now(user_id):
+            self.counters["rejected_full"] += 1
+            raise AdmissionRejected(
+                "queue_full",
+                f"server queue is full ({self._queued_total} waiting)",
+                self._retry_after(),
+            )
+
+    def submit(self, user_id: str) -> Ticket:
+        """Queue a request or raise ``AdmissionRejected`` immediately."""
+        self.admit(user_id)
+        queue = self._queues.get(user_id)
+        ticket = Ticket(
+            user_id=user_id,
+            enqueued=self._clock(),
+            granted=asyncio.get_running_loop().create_future(),
+        )
+        if queue is None:
+            queue = self._queues[user_id] = deque()
+            self._deficit[user_id] = 0.0
+            self._active.append(user_id)
+        queue.append(ticket)
+        self._queued_total += 1
+        self._touch()
+        self._dispatch()
+        return ticket
+
+    def _can_start_now(self, user_id: str) -> bool:
+        return (
+            self._running_total < self._limit
+            and not self._running.get(user_id)
+            and user_id not in self._queues
+        )
+
+    async def wait(self, ticket: Ticket) -> None:
+        """Wait for a slot until the queue deadline; cancellation dequeues."""
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(ticket.granted), timeout=self.queue_timeout
+            )
+        except asyncio.TimeoutError:
+            if ticket.granted.done():
+                return
+            self._remove(ticket)
+            self.counters["rejected_timeout"] += 1
+            raise AdmissionRejected(
+                "queue_timeout",
+                f"no agent slot within {self.queue_timeout:g}s",
+                self._retry_after(),
+            ) from None
+        except asyncio.CancelledError:
+            if ticket.granted.done():
+                self.release(ticket)
+            else:
+                self._remove(ticket)
+            raise
+
+    def _remove(self, ticket: Ticket) -> None:
+        queue = self._queues.get(ticket.user_id)
+        if queue is None or ticket not in queue:
+            return
+        queue.remove(ticket)
+        self._queued_total -= 1
+        if not queue:
+            self._drop_user_queue(ticket.user_id)
+        self._touch()
+
+    def _drop_user_queue(self, user_id: str) -> None:
+        del self._queues[user_id]
+        self._deficit.pop(user_id, None)
+        try:
+            self._active.remove(user_id)
+        except ValueError:
+            pass
+
+    def release(self, ticket: Ticket) -> None:
+        """Return a granted slot; safe to call more than once."""
+        if ticket.started is None or ticket.released:
+            return
+        ticket.released = True
+        self._running_total -= 1
+        remaining = self._running.get(ticket.user_id, 0) - 1
+        if remaining > 0:
+            self._running[ticket.user_id] = remaining
+        else:
+            self._running.pop(ticket.user_id, None)
+        self._touch()
+        self._dispatch()
+
+    def _grant(self, user_id: str) -> None:
+        queue = self._queues[user_id]
+        ticket = queue.popleft()
+        self._queued_total -= 1
+        self._deficit[user_id] -= 1.0
+        if not queue:
+            self._drop_user_queue(user_id)
+        now = self._clock()
+        ticket.started = now
+        self._wait_ewma_s += 0.2 * ((now - ticket.enqueued) - self._wait_ewma_s)
+        self._running_total += 1
+        self._running[user_id] = self._running.get(user_id, 0) + 1
+        self.counters["granted"] += 1
+        ticket.granted.set_result(None)
+
+    def _dispatch(self) -> None:
+        while self._running_total < self._limit and self._active:
+            for _ in range(len(self._active)):
+                user_id = self._active[0]
+                if self._running.get(user_id):
+                    self._active.rotate(-1)
+                    continue
+                if self._deficit[user_id] < 1.0:
+                    self._deficit[user_id] += max(1.0, self._weight(user_id))
+                self._grant(user_id)
+                if user_id in self._queues and self._deficit[user_id] < 1.0:
+                    self._active.rotate(-1)
+                break
+            else:
+                # Every queued user already has a running request.
+                return
+
+    def stats(self) -> dict[str, float | int]:
+        now = self._clock()
+        oldest = min(
+            (queue[0].enqueued for queue in self._queues.values() if queue),
+            default=None,
+        )
+        return {
+            "limit": self._limit,
+            "running": self._running_total,
+            "queued": self._queued_total,
+            "queued_users": len(self._queues),
+            # Per-user state exists only while a user is queued or running.
+            "live_users": len(self._running.keys() | self._queues.keys()),
+            "oldest_wait_ms": (
+                round((now - oldest) * 1000.0, 1) if oldest is not None else 0.0
+            ),
+            "wait_ewma_ms": round(self._wait_ewma_s * 1000.0, 1),
+            **self.counters,
+        }
+
+    @property
+    def busy(self) -> bool:
+        return bool(self._running_total or self._queued_total)
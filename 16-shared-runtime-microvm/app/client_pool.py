@@ -0,0 +1,221 @@
+"""Bounded pool of connected agent clients for the shared microVM server.
+
+Starting a ``ClaudeSDKClient`` spawns the Claude Code CLI and registers MCP
+servers and hooks before the first token. The pool keeps connected clients
+after a turn, keyed by a workspace/option fingerprint, and hands them back to
+the next request that continues the same Claude conversation. It has no Claude
+SDK dependency: callers provide async ``connect`` and ``close`` callables.
+
+The SDK enters an anyio task group in ``connect`` that must be exited by the
+same task, so each client is connected and closed inside a dedicated owner
+task rather than in whichever request task happens to retire it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+log = logging.getLogger("shared-runtime-microvm.pool")
+
+Connect = Callable[[str | None, list[str]], Awaitable[Any]]
+Close = Callable[[Any], Awaitable[None]]
+
+
+def options_fingerprint(**values: Any) -> str:
+    """Return a stable key for options that fix a client's CLI process."""
+    encoded = json.dumps(values, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class PooledClient:
+    """One connected client and the state its hooks share with the server.
+
+    ``denials`` is the list the client's PreToolUse hook appends to; the pool
+    clears it whenever the client is handed out so reasons never leak between
+    turns.
+    """
+
+    key: str
+    client: Any
+    session_id: str | None
+    created: float
+    uses: int = 0
+    denials: list[str] = field(default_factory=list)
+    closing: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+
+class ClientPool:
+    """Keyed idle pool with max-uses, max-age, and LRU capacity eviction.
+
+    At most one idle client is kept per key because the server already
+    serializes each user. ``max_idle=0`` disables pooling: every acquire
+    connects a new client and every release closes it.
+    """
+
+    def __init__(
+        self,
+        *,
+        close: Close,
+        max_idle: int = 8,
+        max_uses: int = 16,
+        max_age: float = 600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if max_idle < 0 or max_uses < 1 or max_age <= 0:
+            raise ValueError("pool limits must be positive")
+        self._close = close
+        self.max_idle = max_idle
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self._clock = clock
+        self._idle: OrderedDict[str, PooledClient] = OrderedDict()
+        self._owners: set[asyncio.Task[None]] = set()
+        self.counters = {
+            "connects": 0,
+            "reuses": 0,
+            "evicted_uses": 0,
+            "evicted_age": 0,
+            "evicted_capacity": 0,
+            "evicted_session": 0,
+            "discarded": 0,
+        }
+
+    def _expired(self, entry: PooledClient) -> str | None:
+        if entry.uses >= self.max_uses:
+            return "evicted_uses"
+        if self._clock() - entry.created >= self.max_age:
+            return "evicted_age"
+        return None
+
+    def _retire(self, entry: PooledClient, reason: str) -> None:
+        self.counters[reason] += 1
+        entry.closing.set()
+
+    async def _own(
+        self,
+        connect: Connect,
+        session_id: str | None,
+        denials: list[str],
+        ready: asyncio.Future[Any],
+        closing: asyncio.Event,
+    ) -> None:
+        try:
+            client = await connect(session_id, denials)
+        except BaseException as exc:
+            if not ready.done():
+                ready.set_exception(exc)
+            if not isinstance(exc, Exception):
+                raise
+            return
+        if not ready.done():
+            ready.set_result(client)
+        else:
+            closing.set()
+        await closing.wait()
+        try:
+            await self._close(client)
+        except Exception as exc:
+            log.warning("failed to close pooled client: %s", type(exc).__name__)
+
+    async def acquire(
+        self, key: str, session_id: str | None, connect: Connect
+    ) -> PooledClient:
+        """Return a client whose conversation is ``session_id``.
+
+        An idle client is reused only when its last turn produced
+        ``session_id``; a reset (``None``) or a mismatched conversation
+        retires it and connects a fresh client that resumes ``session_id``.
+        """
+        entry = self._idle.pop(key, None)
+        if entry is not None:
+            reason = self._expired(entry)
+            if reason is None and entry.session_id != session_id:
+                reason = "evicted_session"
+            if reason is None:
+                self.counters["reuses"] += 1
+                entry.uses += 1
+                entry.denials.clear()
+                return entry
+            self._retire(entry, reason)
+
+        denials: list[str] = []
+        closing = asyncio.Event()
+        ready: asyncio.Future[Any] = asyncio.get_running_loop().create_future()
+        owner = asyncio.create_task(
+            self._own(connect, session_id, denials, ready, closing)
+        )
+        self._owners.add(owner)
+        owner.add_done_callback(self._owners.discard)
+        try:
+            client = await asyncio.shield(ready)
+        except asyncio.CancelledError:
+            # The owner closes the client as soon as its connect finishes.
+            closing.set()
+            raise
+        self.counters["connects"] += 1
+        return PooledClient(
+            key=key,
+            client=client,
+            session_id=session_id,
+            created=self._clock(),
+            uses=1,
+            denials=denials,
+            closing=closing,
+        )
+
+    def release(self, entry: PooledClient, session_id: str | None) -> None:
+        """Return a healthy client after a completed turn."""
+        entry.session_id = session_id
+        reason = self._expired(entry)
+        if self.max_idle == 0 or session_id is None:
+            reason = reason or "discarded"
+        if reason is not None:
+            self._retire(entry, reason)
+            return
+        previous = self._idle.pop(entry.key, None)
+        if previous is not None and previous is not entry:
+            self._retire(previous, "evicted_capacity")
+        self._idle[entry.key] = entry
+        while len(self._idle) > self.max_idle:
+            _, oldest = self._idle.popitem(last=False)
+            self._retire(oldest, "evicted_capacity")
+
+    def discard(self, entry: PooledClient) -> None:
+        """Close a client whose turn failed or was interrupted."""
+        self._retire(entry, "discarded")
+
+    def forget(self, key: str) -> bool:
+        """Close the idle client for ``key``, e.g. before its workspace goes."""
+        entry = self._idle.pop(key, None)
+        if entry is None:
+            return False
+        self._retire(entry, "discarded")
+        return True
+
+    def reap(self) -> int:
+        """Retire idle clients that reached their age limit."""
+        expired = [key for key, entry in self._idle.items() if self._expired(entry)]
+        for key in expired:
+            entry = self._idle.pop(key)
+            self._retire(entry, self._expired(entry) or "evicted_age")
+        return len(expired)
+
+    async def close(self) -> None:
+        """Close every idle client and wait for owner tasks that are retiring."""
+        while self._idle:
+            _, entry = self._idle.popitem(last=False)
+            self._retire(entry, "discarded")
+        retiring = [task for task in self._owners if not task.done()]
+        if retiring:
+            await asyncio.wait(retiring, timeout=10.0)
+
+    def stats(self) -> dict[str, int]:
+        return {"idle": len(self._idle), **self.counters}
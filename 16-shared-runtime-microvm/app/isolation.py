@@ -9,14 +9,21 @@ for a cooperative/weak-threat workload, not tenant-grade sandboxing.
 from __future__ import annotations
 
 import hashlib
+import os
 import re
+import stat
+from collections import OrderedDict
 from pathlib import Path
+from typing import Callable
 
 USER_ID_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$")
 _PATH_KEYS = frozenset(
     {"file_path", "path", "notebook_path", "cwd", "directory", "dir"}
 )
 _PATHLESS_TOOLS = frozenset({"TodoWrite"})
+_WRITE_TOOLS = frozenset({"Write", "Edit", "MultiEdit", "NotebookEdit"})
+# Called with the bytes and files a write would add; returns a denial or None.
+QuotaCheck = Callable[[int, int], str | None]
 
 
 class IsolationError(ValueError):
@@ -68,33 +75,140 @@ def _iter_path_candidates(tool_name: str, tool_input: dict) -> list[str]:
     return candidates
 
 
-def _resolves_inside(candidate: str, workspace: Path) -> bool:
-    if candidate == "~" or candidate.startswith("~/"):
-        candidate = str(workspace) + candidate[1:]
-    elif candidate.startswith("~"):
+def _text_size(value: object) -> int:
+    return len(value.encode("utf-8")) if isinstance(value, str) else 0
+
+
+def write_size(tool_name: str, tool_input: dict) -> tuple[int, int]:
+    """Estimate the bytes and files a write tool call adds to the workspace."""
+    if tool_name == "Write":
+        return _text_size(tool_input.get("content")), 1
+    if tool_name == "NotebookEdit":
+        return _text_size(tool_input.get("new_source")), 0
+    edits = tool_input.get("edits") if tool_name == "MultiEdit" else [tool_input]
+    grown = sum(
+        max(0, _text_size(edit.get("new_string")) - _text_size(edit.get("old_string")))
+        for edit in edits or ()
+        if isinstance(edit, dict)
+    )
+    return grown, 0
+
+
+class PathGuard:
+    """Path decisions for one request, with the workspace root resolved once.
+
+    A candidate that is lexically inside the root and contains no ``..`` is
+    allowed after one ``lstat`` per component below the root shows no
+    symlink; anything else takes the full ``Path.resolve()`` path. Decisions
+    are kept in a small LRU, so the repeated ``Read``/``Glob`` arguments of a
+    turn cost a dict lookup. A cached decision assumes the workspace's
+    symlinks do not change mid-request, which holds while ``Bash`` is
+    disallowed.
+
+    With ``quota`` set, write tools are also denied when the bytes and files
+    they would add exceed the workspace quota.
+    """
+
+    def __init__(
+        self,
+        workspace: Path,
+        *,
+        cache_size: int = 256,
+        quota: QuotaCheck | None = None,
+    ) -> None:
+        self.root = workspace.resolve()
+        self._real = str(self.root)
+        self._lexical = str(workspace.absolute())
+        self._cache_size = cache_size
+        self._decisions: OrderedDict[str, bool] = OrderedDict()
+        self.quota = quota
+        self.hits = 0
+        self.misses = 0
+
+    def allows(self, candidate: str) -> bool:
+        """Return whether ``candidate`` resolves inside the workspace."""
+        decision = self._decisions.get(candidate)
+        if decision is not None:
+            self._decisions.move_to_end(candidate)
+            self.hits += 1
+            return decision
+        self.misses += 1
+        decision = self._decide(candidate)
+        self._decisions[candidate] = decision
+        if len(self._decisions) > self._cache_size:
+            self._decisions.popitem(last=False)
+        return decision
+
+    def check(self, tool_name: str, tool_input: object) -> str | None:
+        """Return a denial reason when a tool path escapes the workspace."""
+        if tool_name in _PATHLESS_TOOLS:
+            return None
+        if not isinstance(tool_input, dict):
+            return "tool input must be an object"
+        for candidate in _iter_path_candidates(tool_name, tool_input):
+            if not self.allows(candidate):
+                return (
+                    f"path {candidate!r} resolves outside the per-user workspace; "
+                    "cross-user access is forbidden"
+                )
+        if self.quota is not None and tool_name in _WRITE_TOOLS:
+            return self.quota(*write_size(tool_name, tool_input))
+        return None
+
+    def _decide(self, candidate: str) -> bool:
+        if candidate == "~" or candidate.startswith("~/"):
+            candidate = self._real + candidate[1:]
+        elif candidate.startswith("~"):
+            return False
+
+        parts = self._lexical_parts(candidate)
+        if parts is not None and not self._crosses_symlink(parts):
+            return True
+        path = Path(candidate)
+        if not path.is_absolute():
+            path = self.root / path
+        resolved = path.resolve()
+        return resolved == self.root or self.root in resolved.parents
+
+    def _lexical_parts(self, candidate: str) -> list[str] | None:
+        """Components below the root, or ``None`` if not lexically inside."""
+        if os.path.isabs(candidate):
+            for prefix in (self._real, self._lexical):
+                if candidate == prefix or candidate.startswith(prefix + os.sep):
+                    candidate = candidate[len(prefix) :]
+                    break
+            else:
+                return None
+        parts = [part for part in candidate.split(os.sep) if part not in ("", ".")]
+        return None if ".." in parts else parts
+
+    def _crosses_symlink(self, parts: list[str]) -> bool:
+        current = self._real
+        for part in parts:
+            current = os.path.join(current, part)
+            try:
+                mode = os.lstat(current).st_mode
+            except OSError:
+                # Nothing below a missing component exists, so nothing can link.
+                return False
+            if stat.S_ISLNK(mode):
+                return True
         return False
 
-    path = Path(candidate)
-    if not path.is_absolute():
-        path = workspace / path
-    resolved = path.resolve()
-    root = workspace.resolve()
-    return resolved == root or root in resolved.parents
 
+def guard_tool_call(
+    tool_name: str,
+    tool_input: object,
+    workspace: Path,
+    *,
+    quota: QuotaCheck | None = None,
+) -> str | None:
+    """Return a denial reason when a tool path escapes ``workspace``.
 
-def guard_tool_call(tool_name: str, tool_input: object, workspace: Path) -> str | None:
-    """Return a denial reason when a tool path escapes ``workspace``."""
-    if tool_name in _PATHLESS_TOOLS:
-        return None
-    if not isinstance(tool_input, dict):
-        return "tool input must be an object"
-    for candidate in _iter_path_candidates(tool_name, tool_input):
-        if not _resolves_inside(candidate, workspace):
-            return (
-                f"path {candidate!r} resolves outside the per-user workspace; "
-                "cross-user access is forbidden"
-            )
-    return None
+    One-shot form of ``PathGuard(workspace, quota=quota).check``; hooks that
+    see many calls for the same request should keep a ``PathGuard`` instead.
+    """
+    return PathGuard(workspace, quota=quota).check(tool_name, tool_input)
 
 
 def resolve_user_id(header_user: object, payload_user: object) -> str:
@@ -8,20 +8,38 @@ import logging
 import os
 import socket
 import sys
+import time
 import uuid
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Any
+from typing import Any, AsyncIterator
 
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse, StreamingResponse
 
 sys.path.insert(0, str(Path(__file__).resolve().parent))
+from accounting import UsageLedger, prefix_fingerprint, turn_usage  # noqa: E402
+from admission import AdmissionRejected, FairScheduler  # noqa: E402
+from cancellation import (  # noqa: E402
+    DuplicateRequestId,
+    RequestRegistry,
+    run_until_cancelled,
+    validate_request_id,
+    watch_disconnect,
+)
+from client_pool import ClientPool, PooledClient, options_fingerprint  # noqa: E402
+from concurrency import AimdController, read_pressure, run_controller  # noqa: E402
 from isolation import (  # noqa: E402
     IsolationError,
+    PathGuard,
     ensure_workspace,
-    guard_tool_call,
     resolve_user_id,
+    workspace_for,
 )
+from session_store import SessionStore, open_backend  # noqa: E402
+from sse import StreamStats, coalesce, frame  # noqa: E402
+from workspace_janitor import Quota, WorkspaceJanitor  # noqa: E402
+from workspace_snapshot import WorkspaceSnapshots, open_store  # noqa: E402
 
 from claude_agent_sdk import (  # noqa: E402
     AssistantMessage,
@@ -41,6 +59,48 @@ USERS_ROOT = Path(os.environ.get("USERS_ROOT", "/tmp/agentcore-users"))
 MODEL = os.environ.get("ANTHROPIC_MODEL", "us.anthropic.claude-sonnet-4-6")
 MAX_TURNS = int(os.environ.get("MAX_TURNS", "64"))
 MAX_PARALLEL_AGENTS = int(os.environ.get("MAX_PARALLEL_AGENTS", "8"))
+# With ADAPTIVE_CONCURRENCY=1, MAX_PARALLEL_AGENTS is only the starting limit.
+ADAPTIVE_CONCURRENCY = os.environ.get("ADAPTIVE_CONCURRENCY", "1") == "1"
+MIN_PARALLEL_AGENTS = int(os.environ.get("MIN_PARALLEL_AGENTS", "1"))
+CEILING_PARALLEL_AGENTS = int(
+    os.environ.get("CEILING_PARALLEL_AGENTS", str(2 * MAX_PARALLEL_AGENTS))
+)
+PRESSURE_INTERVAL_S = float(os.environ.get("PRESSURE_INTERVAL_S", "2"))
+MEMORY_HIGH_RATIO = float(os.environ.get("MEMORY_HIGH_RATIO", "0.85"))
+POOL_MAX_IDLE = int(os.environ.get("POOL_MAX_IDLE", str(MAX_PARALLEL_AGENTS)))
+POOL_MAX_USES = int(os.environ.get("POOL_MAX_USES", "16"))
+POOL_MAX_AGE_S = float(os.environ.get("POOL_MAX_AGE_S", "600"))
+MAX_QUEUED_REQUESTS = int(
+    os.environ.get("MAX_QUEUED_REQUESTS", str(4 * MAX_PARALLEL_AGENTS))
+)
+MAX_QUEUED_PER_USER = int(os.environ.get("MAX_QUEUED_PER_USER", "4"))
+QUEUE_TIMEOUT_S = float(os.environ.get("QUEUE_TIMEOUT_S", "600"))
+SESSION_STORE = os.environ.get("SESSION_STORE", "sqlite")
+SESSION_STORE_PATH = Path(
+    os.environ.get("SESSION_STORE_PATH", str(USERS_ROOT / ".sessions.sqlite3"))
+)
+SESSION_STORE_TABLE = os.environ.get("SESSION_STORE_TABLE")
+SESSION_CACHE_SIZE = int(os.environ.get("SESSION_CACHE_SIZE", "4096"))
+SESSION_CACHE_TTL_S = float(
+    os.environ.get("SESSION_CACHE_TTL_S", "30" if SESSION_STORE == "dynamodb" else "0")
+)
+SESSION_FLUSH_INTERVAL_S = float(os.environ.get("SESSION_FLUSH_INTERVAL_S", "0.5"))
+SNAPSHOT_STORE = os.environ.get("SNAPSHOT_STORE", "")
+SNAPSHOT_PATH = Path(os.environ.get("SNAPSHOT_PATH", "/tmp/agentcore-snapshots"))
+SNAPSHOT_DRAIN_S = float(os.environ.get("SNAPSHOT_DRAIN_S", "30"))
+# Per-user quotas and eviction; 0 turns a limit off.
+WORKSPACE_MAX_BYTES = int(os.environ.get("WORKSPACE_MAX_BYTES", str(256 * 1024 * 1024)))
+WORKSPACE_MAX_INODES = int(os.environ.get("WORKSPACE_MAX_INODES", "20000"))
+WORKSPACE_IDLE_S = float(os.environ.get("WORKSPACE_IDLE_S", "0"))
+USERS_ROOT_MAX_BYTES = int(os.environ.get("USERS_ROOT_MAX_BYTES", "0"))
+JANITOR_INTERVAL_S = float(os.environ.get("JANITOR_INTERVAL_S", "60"))
+SSE_COALESCE_MS = float(os.environ.get("SSE_COALESCE_MS", "0"))
+SSE_COALESCE_BYTES = int(os.environ.get("SSE_COALESCE_BYTES", "16384"))
+MAX_COALESCE_MS = 1000.0
+DISCONNECT_POLL_S = float(os.environ.get("DISCONNECT_POLL_S", "1"))
+USAGE_WINDOW_S = float(os.environ.get("USAGE_WINDOW_S", "3600"))
+USAGE_MAX_USERS = int(os.environ.get("USAGE_MAX_USERS", "1024"))
+USER_WEIGHTS: dict[str, float] = json.loads(os.environ.get("USER_WEIGHTS", "{}"))
 USER_ID_HEADER = "x-amzn-bedrock-agentcore-runtime-user-id"
 
 SERVER_RUN_ID = uuid.uuid4().hex
@@ -59,11 +119,142 @@ Rules:
   after its response, reply exactly: GUARD-PROBE-COMPLETE.
 - Be concise unless the request explicitly asks you to create or inspect files.
 """
+# Everything the model reads before a user's conversation: the same bytes for
+# every user, so Bedrock's prompt cache written by one user serves the next.
+# Per-user values (cwd, HOME, resume) stay out of it; setting_sources=[] keeps
+# a workspace CLAUDE.md from being folded into the system prompt.
+CACHE_PREFIX: dict[str, Any] = {
+    "model": MODEL,
+    "system_prompt": SYSTEM_PROMPT,
+    "allowed_tools": ALLOWED_TOOLS,
+    "disallowed_tools": DISALLOWED_TOOLS,
+    "permission_mode": "acceptEdits",
+    "setting_sources": [],
+}
+CACHE_PREFIX_ID = prefix_fingerprint(**CACHE_PREFIX)
+
+_scheduler = FairScheduler(
+    MAX_PARALLEL_AGENTS,
+    max_queue=MAX_QUEUED_REQUESTS,
+    max_user_queue=MAX_QUEUED_PER_USER,
+    queue_timeout=QUEUE_TIMEOUT_S,
+    weight=lambda user_id: float(USER_WEIGHTS.get(user_id, 1.0)),
+)
+
 
-app = FastAPI()
-_user_locks: dict[str, asyncio.Lock] = {}
-_locks_guard = asyncio.Lock()
-_agent_slots = asyncio.Semaphore(MAX_PARALLEL_AGENTS)
+_controller = AimdController(
+    MAX_PARALLEL_AGENTS,
+    minimum=min(MIN_PARALLEL_AGENTS, MAX_PARALLEL_AGENTS),
+    maximum=max(CEILING_PARALLEL_AGENTS, MAX_PARALLEL_AGENTS),
+    memory_used_high=MEMORY_HIGH_RATIO,
+)
+
+
+def _scheduler_saturated() -> bool:
+    stats = _scheduler.stats()
+    return stats["queued"] > 0 or stats["running"] >= stats["limit"]
+
+
+def _apply_limit(limit: int) -> None:
+    log.info(
+        "agent limit %d -> %d (%s)", _scheduler.limit, limit, _controller.last_reason
+    )
+    _scheduler.set_limit(limit)
+
+
+async def _close_client(client: ClaudeSDKClient) -> None:
+    await client.disconnect()
+
+
+_client_pool = ClientPool(
+    close=_close_client,
+    max_idle=POOL_MAX_IDLE,
+    max_uses=POOL_MAX_USES,
+    max_age=POOL_MAX_AGE_S,
+)
+# Pooled clients outlive a request, so the hook looks up the current request's
+# guard here; each user runs one request at a time.
+_path_guards: dict[Path, PathGuard] = {}
+_session_store = SessionStore(
+    open_backend(
+        SESSION_STORE,
+        path=SESSION_STORE_PATH,
+        table=SESSION_STORE_TABLE,
+        region=os.environ.get("AWS_REGION", "us-west-2"),
+    ),
+    cache_size=SESSION_CACHE_SIZE,
+    cache_ttl=SESSION_CACHE_TTL_S or None,
+)
+_snapshot_store = open_store(
+    SNAPSHOT_STORE,
+    path=SNAPSHOT_PATH,
+    bucket=os.environ.get("SNAPSHOT_BUCKET"),
+    prefix=os.environ.get("SNAPSHOT_PREFIX", ""),
+    region=os.environ.get("AWS_REGION", "us-west-2"),
+    endpoint_url=os.environ.get("SNAPSHOT_ENDPOINT_URL"),
+)
+_snapshots = WorkspaceSnapshots(_snapshot_store) if _snapshot_store else None
+# Only workspaces restored in this process are snapshotted, so an empty
+# directory on a fresh microVM never replaces a user's stored snapshot.
+_restored: set[str] = set()
+_snapshot_tasks: dict[str, asyncio.Task] = {}
+_snapshot_again: set[str] = set()
+_output_totals = StreamStats()
+_requests = RequestRegistry()
+_usage = UsageLedger(window_s=USAGE_WINDOW_S, max_users=USAGE_MAX_USERS)
+
+
+async def _reap_pool() -> None:
+    while True:
+        await asyncio.sleep(min(30.0, POOL_MAX_AGE_S))
+        _client_pool.reap()
+
+
+async def _flush_sessions() -> None:
+    try:
+        await asyncio.to_thread(_session_store.flush)
+    except Exception as exc:
+        log.warning("failed to persist session ids: %s", type(exc).__name__)
+
+
+async def _write_behind() -> None:
+    while True:
+        await asyncio.sleep(SESSION_FLUSH_INTERVAL_S)
+        await _flush_sessions()
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    tasks = [
+        asyncio.create_task(_reap_pool()),
+        asyncio.create_task(_write_behind()),
+        asyncio.create_task(_janitor.run(JANITOR_INTERVAL_S)),
+    ]
+    if ADAPTIVE_CONCURRENCY and read_pressure().available:
+        tasks.append(
+            asyncio.create_task(
+                run_controller(
+                    _controller,
+                    saturated=_scheduler_saturated,
+                    apply=_apply_limit,
+                    interval=PRESSURE_INTERVAL_S,
+                )
+            )
+        )
+    elif ADAPTIVE_CONCURRENCY:
+        log.warning("no PSI or memory readings; agent limit stays fixed")
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        if _snapshot_tasks:
+            await asyncio.wait(list(_snapshot_tasks.values()), timeout=SNAPSHOT_DRAIN_S)
+        await _flush_sessions()
+        await _client_pool.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 def _read_boot_id() -> str:
@@ -85,18 +276,10 @@ def instance_fingerprint() -> dict:
     }
 
 
-async def _lock_for(user_id: str) -> asyncio.Lock:
-    async with _locks_guard:
-        return _user_locks.setdefault(user_id, asyncio.Lock())
-
-
-def _session_meta_path(workspace: Path) -> Path:
-    return workspace / ".session_meta.json"
-
-
-def _load_prev_session(workspace: Path) -> str | None:
+def _legacy_session(workspace: Path) -> str | None:
+    """Session id from the per-workspace file used before the session store."""
     try:
-        value = json.loads(_session_meta_path(workspace).read_text()).get(
+        value = json.loads((workspace / ".session_meta.json").read_text()).get(
             "claude_session_id"
         )
         return value if isinstance(value, str) and value else None
@@ -104,24 +287,126 @@ def _load_prev_session(workspace: Path) -> str | None:
         return None
 
 
-def _store_session(workspace: Path, session_id: str | None) -> None:
-    if not session_id:
+async def _load_prev_session(user_id: str, workspace: Path) -> str | None:
+    found, session_id = _session_store.cached(user_id)
+    if found:
+        return session_id
+    try:
+        session_id = await asyncio.to_thread(_session_store.load, user_id)
+    except Exception as exc:
+        log.warning("session store lookup failed: %s", type(exc).__name__)
+        return None
+    if session_id is None:
+        session_id = _legacy_session(workspace)
+        if session_id is not None:
+            _session_store.put(user_id, session_id)
+    return session_id
+
+
+def _store_session(user_id: str, session_id: str | None) -> None:
+    if session_id:
+        _session_store.put(user_id, session_id)
+
+
+async def _restore_workspace(workspace: Path) -> None:
+    slug = workspace.name
+    if _snapshots is None or slug in _restored:
+        return
+    try:
+        result = await asyncio.to_thread(_snapshots.restore, slug, workspace)
+    except Exception as exc:
+        log.warning("workspace restore failed: %s", type(exc).__name__)
         return
-    path = _session_meta_path(workspace)
-    temporary = path.with_suffix(".tmp")
+    _restored.add(slug)
+    if result["files_written"]:
+        log.info(
+            "restored %d/%d workspace files in %.2fs",
+            result["files_written"],
+            result["files"],
+            result["seconds"],
+        )
+
+
+async def _snapshot_workspace(
+    snapshots: WorkspaceSnapshots, slug: str, workspace: Path
+) -> None:
     try:
-        temporary.write_text(json.dumps({"claude_session_id": session_id}) + "\n")
-        temporary.replace(path)
-    except OSError as exc:
-        log.warning("failed to persist session metadata: %s", type(exc).__name__)
+        while True:
+            _snapshot_again.discard(slug)
+            try:
+                await asyncio.to_thread(snapshots.snapshot, slug, workspace)
+            except Exception as exc:
+                log.warning("workspace snapshot failed: %s", type(exc).__name__)
+            if slug not in _snapshot_again:
+                return
+    finally:
+        if _snapshot_tasks.get(slug) is asyncio.current_task():
+            del _snapshot_tasks[slug]
+
+
+def _schedule_snapshot(workspace: Path) -> None:
+    """Snapshot after a turn without delaying it; coalesce turns that overlap."""
+    slug = workspace.name
+    if _snapshots is None or slug not in _restored:
+        return
+    if slug in _snapshot_tasks:
+        _snapshot_again.add(slug)
+        return
+    _snapshot_tasks[slug] = asyncio.create_task(
+        _snapshot_workspace(_snapshots, slug, workspace)
+    )
+
+
+async def _before_evict(workspace: Path) -> bool:
+    """Snapshot a workspace restored here, then drop its idle CLI process."""
+    slug = workspace.name
+    if _snapshots is not None and slug in _restored:
+        pending = _snapshot_tasks.get(slug)
+        if pending is not None:
+            await asyncio.wait({pending})
         try:
-            temporary.unlink(missing_ok=True)
-        except OSError:
-            pass
+            await asyncio.to_thread(_snapshots.snapshot, slug, workspace)
+        except Exception as exc:
+            log.warning("snapshot before eviction failed: %s", type(exc).__name__)
+            return False
+    _restored.discard(slug)
+    _client_pool.forget(_pool_key(workspace))
+    return True
+
+
+_janitor = WorkspaceJanitor(
+    USERS_ROOT,
+    quota=Quota(WORKSPACE_MAX_BYTES or None, WORKSPACE_MAX_INODES or None),
+    idle_s=WORKSPACE_IDLE_S or None,
+    max_total_bytes=USERS_ROOT_MAX_BYTES or None,
+    before_evict=_before_evict,
+)
+
+
+def _sse(payload: dict) -> bytes:
+    return frame(payload)
 
 
-def _sse(payload: dict) -> str:
-    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+async def _write_stream(
+    frames: AsyncIterator[bytes], coalesce_ms: float
+) -> AsyncIterator[bytes]:
+    stats = StreamStats()
+    try:
+        async for chunk in coalesce(
+            frames,
+            stats,
+            window=coalesce_ms / 1000.0,
+            max_bytes=SSE_COALESCE_BYTES,
+        ):
+            yield chunk
+    finally:
+        _output_totals.add(stats)
+        log.info(
+            "stream frames=%d writes=%d bytes=%d",
+            stats.frames,
+            stats.writes,
+            stats.bytes,
+        )
 
 
 def _build_options(
@@ -134,7 +419,10 @@ def _build_options(
     ) -> HookJSONOutput:
         tool_name = input_data.get("tool_name", "")
         tool_input = input_data.get("tool_input") or {}
-        reason = guard_tool_call(tool_name, tool_input, workspace)
+        guard = _path_guards.get(workspace) or PathGuard(
+            workspace, quota=_janitor.quota_for(workspace)
+        )
+        reason = guard.check(tool_name, tool_input)
         if reason is None:
             return {}
         denials.append(f"{tool_name}: {reason}")
@@ -148,14 +436,9 @@ def _build_options(
         }
 
     return ClaudeAgentOptions(
-        model=MODEL,
+        **CACHE_PREFIX,
         cwd=str(workspace),
-        allowed_tools=ALLOWED_TOOLS,
-        disallowed_tools=DISALLOWED_TOOLS,
-        permission_mode="acceptEdits",
-        system_prompt=SYSTEM_PROMPT,
         max_turns=MAX_TURNS,
-        setting_sources=[],
         resume=resume,
         hooks={"PreToolUse": [HookMatcher(matcher=None, hooks=[path_guard])]},
         env={
@@ -167,16 +450,46 @@ def _build_options(
     )
 
 
-async def _run_agent(user_id: str, prompt: str, reset: bool):
+def _pool_key(workspace: Path) -> str:
+    return options_fingerprint(
+        workspace=str(workspace), max_turns=MAX_TURNS, prefix=CACHE_PREFIX_ID
+    )
+
+
+async def _acquire_client(workspace: Path, resume: str | None) -> PooledClient:
+    async def connect(session_id: str | None, denials: list[str]) -> ClaudeSDKClient:
+        client = ClaudeSDKClient(options=_build_options(workspace, session_id, denials))
+        await client.connect()
+        return client
+
+    return await _client_pool.acquire(_pool_key(workspace), resume, connect)
+
+
+async def _run_agent(user_id: str, prompt: str, reset: bool, request_id: str):
+    # Held for the whole turn, so the janitor never evicts a workspace in use.
+    async with _janitor.hold(workspace_for(USERS_ROOT, user_id)):
+        async for payload in _run_turn(user_id, prompt, reset, request_id):
+            yield payload
+
+
+async def _run_turn(user_id: str, prompt: str, reset: bool, request_id: str):
+    started = time.monotonic()
     workspace = ensure_workspace(USERS_ROOT, user_id)
-    resume = None if reset else _load_prev_session(workspace)
-    denials: list[str] = []
-    options = _build_options(workspace, resume, denials)
+    await _restore_workspace(workspace)
+    await _janitor.refresh(workspace)
+    resume = None if reset else await _load_prev_session(user_id, workspace)
+    if resume and not any(workspace.iterdir()):
+        # An evicted, unsnapshotted workspace no longer holds the transcript.
+        resume = None
     result_text = None
     new_session_id = None
     is_error = False
+    usage = turn_usage(None)
 
-    async with ClaudeSDKClient(options=options) as client:
+    pooled = await _acquire_client(workspace, resume)
+    client = pooled.client
+    _path_guards[workspace] = PathGuard(workspace, quota=_janitor.quota_for(workspace))
+    try:
         await client.query(prompt)
         async for message in client.receive_response():
             if isinstance(message, AssistantMessage):
@@ -191,10 +504,28 @@ async def _run_agent(user_id: str, prompt: str, reset: bool):
                 result_text = message.result
                 new_session_id = message.session_id
                 is_error = bool(message.is_error)
+                usage = turn_usage(
+                    message.usage,
+                    total_cost_usd=message.total_cost_usd,
+                    num_turns=message.num_turns,
+                    duration_ms=message.duration_ms,
+                    duration_api_ms=message.duration_api_ms,
+                )
+    except BaseException:
+        _client_pool.discard(pooled)
+        raise
+    finally:
+        _path_guards.pop(workspace, None)
+    denials = list(pooled.denials)
+    _client_pool.release(pooled, new_session_id)
 
     for reason in denials:
         yield _sse({"event": "denied", "reason": reason})
-    _store_session(workspace, new_session_id)
+    _store_session(user_id, new_session_id)
+    _schedule_snapshot(workspace)
+    await _janitor.refresh(workspace)
+    latency_s = time.monotonic() - started
+    _usage.record(user_id, usage, latency_s, success=not is_error)
     yield _sse(
         {
             "event": "complete",
@@ -203,8 +534,11 @@ async def _run_agent(user_id: str, prompt: str, reset: bool):
             "user_id": user_id,
             "workspace": str(workspace),
             "claude_session_id": new_session_id,
+            "request_id": request_id,
             "resumed_from": resume,
             "denied_count": len(denials),
+            "usage": {**usage, "cache_prefix": CACHE_PREFIX_ID},
+            "latency_ms": round(latency_s * 1000.0, 1),
             "instance": instance_fingerprint(),
         }
     )
@@ -212,7 +546,44 @@ async def _run_agent(user_id: str, prompt: str, reset: bool):
 
 @app.get("/ping")
 async def ping() -> JSONResponse:
-    return JSONResponse({"status": "healthy", **instance_fingerprint()})
+    return JSONResponse(
+        {
+            "status": "HealthyBusy" if _scheduler.busy else "Healthy",
+            "time_of_last_update": int(_scheduler.last_update),
+            **instance_fingerprint(),
+            "queue": _scheduler.stats(),
+            "concurrency": {"adaptive": ADAPTIVE_CONCURRENCY, **_controller.stats()},
+            "pool": _client_pool.stats(),
+            "sessions": _session_store.stats(),
+            "snapshots": _snapshots.stats() if _snapshots else None,
+            "output": {"coalesce_ms": SSE_COALESCE_MS, **_output_totals.to_dict()},
+            "requests": _requests.stats(),
+            "workspaces": _janitor.stats(),
+        }
+    )
+
+
+@app.get("/stats")
+async def stats() -> JSONResponse:
+    """Rolling token, cost and latency totals per user and for this server."""
+    return JSONResponse(
+        {
+            **instance_fingerprint(),
+            "cache_prefix": CACHE_PREFIX_ID,
+            "usage": _usage.stats(),
+        }
+    )
+
+
+def _rejection(user_id: str, exc: AdmissionRejected) -> dict:
+    return {
+        "event": "rejected",
+        "reason": exc.reason,
+        "message": str(exc),
+        "retry_after_s": exc.retry_after,
+        "user_id": user_id,
+        "instance": instance_fingerprint(),
+    }
 
 
 @app.post("/invocations")
@@ -231,6 +602,25 @@ async def invocations(request: Request):
     except IsolationError as exc:
         return JSONResponse({"error": str(exc)}, status_code=400)
 
+    try:
+        request_id = validate_request_id(payload.get("request_id") or uuid.uuid4().hex)
+    except ValueError as exc:
+        return JSONResponse({"error": f"payload.{exc}"}, status_code=400)
+    if payload.get("action") == "cancel":
+        cancelled = _requests.cancel(request_id, user_id)
+        return JSONResponse(
+            {"cancelled": cancelled, "request_id": request_id},
+            status_code=200 if cancelled else 404,
+        )
+    if payload.get("action", "invoke") != "invoke":
+        return JSONResponse(
+            {"error": "payload.action must be 'invoke' or 'cancel'"}, status_code=400
+        )
+    if _requests.running(request_id):
+        return JSONResponse(
+            {"error": f"request {request_id} is already running"}, status_code=409
+        )
+
     prompt = payload.get("prompt")
     if not isinstance(prompt, str) or not prompt.strip():
         return JSONResponse({"error": "payload.prompt is required"}, status_code=400)
@@ -239,27 +629,89 @@ async def invocations(request: Request):
         return JSONResponse(
             {"error": "payload.reset must be a boolean"}, status_code=400
         )
+    coalesce_ms = payload.get("coalesce_ms", SSE_COALESCE_MS)
+    if (
+        isinstance(coalesce_ms, bool)
+        or not isinstance(coalesce_ms, (int, float))
+        or not 0 <= coalesce_ms <= MAX_COALESCE_MS
+    ):
+        return JSONResponse(
+            {"error": "payload.coalesce_ms must be a number from 0 to 1000"},
+            status_code=400,
+        )
     log.info("accepted request prompt_chars=%d reset=%s", len(prompt), reset)
 
+    try:
+        _scheduler.admit(user_id)
+    except AdmissionRejected as exc:
+        return JSONResponse(
+            _rejection(user_id, exc),
+            status_code=429,
+            headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+        )
+
+    async def turn():
+        # Queue only once the body is iterated so an unstarted stream cannot
+        # leave a ticket that is granted and never released.
+        try:
+            ticket = _scheduler.submit(user_id)
+            await _scheduler.wait(ticket)
+        except AdmissionRejected as exc:
+            log.warning("rejected queued request: %s", exc.reason)
+            yield _sse(_rejection(user_id, exc))
+            return
+        started = time.monotonic()
+        try:
+            async for chunk in _run_agent(user_id, prompt, reset, request_id):
+                yield chunk
+        except Exception as exc:
+            log.exception("agent request failed")
+            _usage.record(
+                user_id, turn_usage(None), time.monotonic() - started, success=False
+            )
+            yield _sse(
+                {
+                    "event": "error",
+                    "user_id": user_id,
+                    "message": f"{type(exc).__name__}: {exc}",
+                    "instance": instance_fingerprint(),
+                }
+            )
+        finally:
+            _scheduler.release(ticket)
+
     async def stream():
-        lock = await _lock_for(user_id)
-        async with lock:
-            async with _agent_slots:
-                try:
-                    async for chunk in _run_agent(user_id, prompt, reset):
-                        yield chunk
-                except Exception as exc:
-                    log.exception("agent request failed")
-                    yield _sse(
-                        {
-                            "event": "error",
-                            "user_id": user_id,
-                            "message": f"{type(exc).__name__}: {exc}",
-                            "instance": instance_fingerprint(),
-                        }
-                    )
-
-    return StreamingResponse(stream(), media_type="text/event-stream")
+        try:
+            handle = _requests.register(request_id, user_id)
+        except DuplicateRequestId as exc:
+            yield _sse({"event": "error", "user_id": user_id, "message": str(exc)})
+            return
+        watcher = asyncio.create_task(
+            watch_disconnect(request.is_disconnected, handle, DISCONNECT_POLL_S)
+        )
+        try:
+            # A cancel request or a client disconnect stops the turn: the CLI
+            # is closed and the slot released before this stream ends.
+            async for chunk in run_until_cancelled(turn(), handle):
+                yield chunk
+            if handle.cancelled:
+                log.info("request cancelled: %s", handle.reason)
+                yield _sse(
+                    {
+                        "event": "cancelled",
+                        "reason": handle.reason,
+                        "user_id": user_id,
+                        "request_id": request_id,
+                        "instance": instance_fingerprint(),
+                    }
+                )
+        finally:
+            watcher.cancel()
+            _requests.unregister(handle)
+
+    return StreamingResponse(
+        _write_stream(stream(), coalesce_ms), media_type="text/event-stream"
+    )
 
 
 if __name__ == "__main__":
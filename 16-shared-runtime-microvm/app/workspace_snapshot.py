@@ -0,0 +1,405 @@
+"""Incremental, content-addressed snapshots of per-user workspaces.
+
+A workspace under ``USERS_ROOT`` lives only as long as its microVM. After a
+turn the server snapshots it to object storage; the first request a new
+microVM serves for that user restores it before the agent starts, so both
+files and the Claude CLI transcripts under ``$HOME/.claude`` follow the user.
+
+Layout in the object store (keys are ``/``-separated):
+
+- ``chunks/<sha256>``: a zlib-compressed piece of file content, at most
+  ``CHUNK_SIZE`` bytes before compression. Chunks are addressed by the hash
+  of their plain content, so identical pieces are stored once across files,
+  snapshots and users.
+- ``workspaces/<slug>/manifest.json``: the latest snapshot of one workspace,
+  mapping each regular file's relative path to its size, mode, mtime and
+  chunk list. It is written after every chunk it names.
+
+Files whose size and mtime match the previous snapshot are not reread, and
+only chunks the store does not already hold are uploaded, so a snapshot costs
+roughly the changed bytes. Chunks are fixed-size: appends and in-place edits
+stay incremental, while an insertion near the start of a large file rewrites
+the chunks after it. Unreferenced chunks are never deleted here; expire them
+with a bucket lifecycle rule if needed.
+
+Deduplicating across users means a user could learn whether some content
+already exists in the store by timing uploads; only the server talks to the
+store, never end users. Symlinks and special files are skipped.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+from typing import Any, Iterator, Protocol
+
+CHUNK_SIZE = 1024 * 1024
+COMPRESS_LEVEL = 6
+MANIFEST_VERSION = 1
+
+
+class ObjectStore(Protocol):
+    def get(self, key: str) -> bytes | None: ...
+
+    def put(self, key: str, data: bytes) -> None: ...
+
+    def exists(self, key: str) -> bool: ...
+
+
+class SnapshotError(RuntimeError):
+    """A manifest or chunk is missing, corrupt, or points outside the workspace."""
+
+
+class LocalObjectStore:
+    """S3-like key/value store in a directory, for tests and single-host runs.
+
+    Writes go to a temporary file and are renamed into place, so readers never
+    see a partial object.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.puts = 0
+
+    def _path(self, key: str) -> Path:
+        parts = PurePosixPath(key).parts
+        if not parts or any(part in ("", ".", "..") for part in parts):
+            raise ValueError(f"invalid object key: {key!r}")
+        return self.root.joinpath(*parts)
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f".{path.name}.{threading.get_ident()}.tmp")
+        temporary.write_bytes(data)
+        temporary.replace(path)
+        self.puts += 1
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).is_file()
+
+
+class S3ObjectStore:
+    """``bucket``/``prefix`` in S3 or any S3-compatible endpoint.
+
+    ``client`` is a boto3 ``s3`` client; ``from_region`` builds one, importing
+    boto3 only then.
+    """
+
+    def __init__(self, client: Any, bucket: str, prefix: str = "") -> None:
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+
+    @classmethod
+    def from_region(
+        cls,
+        bucket: str,
+        prefix: str,
+        region: str,
+        endpoint_url: str | None = None,
+    ) -> "S3ObjectStore":
+        import boto3
+
+        client = boto3.client("s3", region_name=region, endpoint_url=endpoint_url)
+        return cls(client, bucket, prefix)
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)
+        except Exception as exc:
+            if _error_code(exc) in ("NoSuchKey", "404"):
+                return None
+            raise
+        return response["Body"].read()
+
+    def put(self, key: str, data: bytes) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data)
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+        except Exception as exc:
+            if _error_code(exc) in ("NoSuchKey", "404", "NotFound"):
+                return False
+            raise
+        return True
+
+
+def _error_code(exc: Exception) -> str | None:
+    response = getattr(exc, "response", None)
+    if isinstance(response, dict):
+        return str(response.get("Error", {}).get("Code"))
+    return None
+
+
+def _chunk_key(digest: str) -> str:
+    return f"chunks/{digest}"
+
+
+def _manifest_key(slug: str) -> str:
+    return f"workspaces/{slug}/manifest.json"
+
+
+def _walk(workspace: Path) -> Iterator[tuple[str, os.stat_result]]:
+    """Yield ``(relative posix path, stat)`` for regular files, no symlinks."""
+    stack = [workspace]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(Path(entry.path))
+            elif entry.is_file(follow_symlinks=False):
+                try:
+                    info = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                relative = Path(entry.path).relative_to(workspace).as_posix()
+                yield relative, info
+
+
+def _safe_target(workspace: Path, relative: str) -> Path:
+    parts = PurePosixPath(relative).parts
+    if (
+        not parts
+        or PurePosixPath(relative).is_absolute()
+        or any(part in ("", ".", "..") for part in parts)
+    ):
+        raise SnapshotError(f"manifest path escapes the workspace: {relative!r}")
+    target = workspace.joinpath(*parts)
+    parent = workspace
+    for part in parts[:-1]:
+        parent = parent / part
+        if parent.is_symlink():
+            raise SnapshotError(f"manifest path crosses a symlink: {relative!r}")
+    if target.is_symlink():
+        raise SnapshotError(f"manifest path is a symlink: {relative!r}")
+    return target
+
+
+class WorkspaceSnapshots:
+    """Snapshot and restore workspaces against one ``ObjectStore``.
+
+    Remembers, per workspace slug, the last manifest it wrote or restored so
+    unchanged files are skipped without rereading, and the chunks it knows the
+    store holds so they are not checked again. Safe to call from worker
+    threads; calls for the same slug must not overlap.
+    """
+
+    def __init__(
+        self,
+        store: ObjectStore,
+        *,
+        chunk_size: int = CHUNK_SIZE,
+        workers: int = 8,
+    ) -> None:
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+        self.store = store
+        self.chunk_size = chunk_size
+        self.workers = max(1, workers)
+        self._manifests: dict[str, dict[str, Any]] = {}
+        self._known: set[str] = set()
+        self._lock = threading.Lock()
+        self.counters = {
+            "snapshots": 0,
+            "restores": 0,
+            "chunks_uploaded": 0,
+            "bytes_uploaded": 0,
+            "chunks_deduplicated": 0,
+            "files_restored": 0,
+            "bytes_downloaded": 0,
+        }
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += amount
+
+    def _upload(self, digest: str, data: bytes) -> None:
+        with self._lock:
+            if digest in self._known:
+                self.counters["chunks_deduplicated"] += 1
+                return
+        key = _chunk_key(digest)
+        if self.store.exists(key):
+            self._count("chunks_deduplicated")
+        else:
+            payload = zlib.compress(data, COMPRESS_LEVEL)
+            self.store.put(key, payload)
+            self._count("chunks_uploaded")
+            self._count("bytes_uploaded", len(payload))
+        with self._lock:
+            self._known.add(digest)
+
+    def _chunk_file(self, path: Path, pool: ThreadPoolExecutor) -> list[str]:
+        digests: list[str] = []
+        uploads: deque[Future[None]] = deque()
+        with path.open("rb") as handle:
+            while data := handle.read(self.chunk_size):
+                digest = hashlib.sha256(data).hexdigest()
+                digests.append(digest)
+                uploads.append(pool.submit(self._upload, digest, data))
+                # Bound the chunks held in memory for a large file.
+                while len(uploads) > 2 * self.workers:
+                    uploads.popleft().result()
+        for upload in uploads:
+            upload.result()
+        return digests
+
+    def snapshot(self, slug: str, workspace: Path) -> dict[str, Any]:
+        """Upload what changed since the last snapshot and write the manifest."""
+        started = time.monotonic()
+        previous = self._manifests.get(slug, {}).get("files", {})
+        files: dict[str, dict[str, Any]] = {}
+        reread = 0
+        with ThreadPoolExecutor(self.workers) as pool:
+            for relative, info in sorted(_walk(workspace)):
+                entry: dict[str, Any] = {
+                    "size": info.st_size,
+                    "mode": info.st_mode & 0o700,
+                    "mtime_ns": info.st_mtime_ns,
+                }
+                old = previous.get(relative)
+                if (
+                    old is not None
+                    and old["size"] == entry["size"]
+                    and old["mtime_ns"] == entry["mtime_ns"]
+                ):
+                    entry["chunks"] = old["chunks"]
+                else:
+                    try:
+                        entry["chunks"] = self._chunk_file(workspace / relative, pool)
+                    except FileNotFoundError:
+                        continue
+                    reread += 1
+                files[relative] = entry
+        changed = files != previous or slug not in self._manifests
+        if changed:
+            manifest = {"version": MANIFEST_VERSION, "created": time.time()}
+            manifest["files"] = files
+            self.store.put(
+                _manifest_key(slug),
+                json.dumps(manifest, separators=(",", ":")).encode("utf-8"),
+            )
+            self._manifests[slug] = manifest
+        self._count("snapshots")
+        return {
+            "files": len(files),
+            "files_reread": reread,
+            "changed": changed,
+            "seconds": round(time.monotonic() - started, 3),
+        }
+
+    def _download(self, digest: str) -> bytes:
+        payload = self.store.get(_chunk_key(digest))
+        if payload is None:
+            raise SnapshotError(f"chunk {digest} is missing from the store")
+        data = zlib.decompress(payload)
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise SnapshotError(f"chunk {digest} does not match its hash")
+        self._count("bytes_downloaded", len(payload))
+        return data
+
+    def _write_file(self, target: Path, entry: dict[str, Any]) -> None:
+        target.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        temporary = target.with_name(f".{target.name}.restore")
+        with temporary.open("wb") as handle:
+            for digest in entry["chunks"]:
+                handle.write(self._download(digest))
+        temporary.chmod(entry["mode"] & 0o700 or 0o600)
+        temporary.replace(target)
+        os.utime(target, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+
+    def restore(self, slug: str, workspace: Path) -> dict[str, Any]:
+        """Bring ``workspace`` up to the stored manifest, if there is one.
+
+        Files that already match the manifest's size and mtime are left alone,
+        so restoring into a workspace that survived costs only the difference.
+        Local files the manifest does not name are kept.
+        """
+        started = time.monotonic()
+        raw = self.store.get(_manifest_key(slug))
+        if raw is None:
+            return {"restored": False, "files": 0, "files_written": 0}
+        try:
+            manifest = json.loads(raw)
+            files = manifest["files"]
+        except (ValueError, KeyError, TypeError) as exc:
+            raise SnapshotError(f"manifest for {slug} is unreadable") from exc
+        if manifest.get("version") != MANIFEST_VERSION:
+            raise SnapshotError(f"unsupported manifest version for {slug}")
+
+        pending: list[tuple[Path, dict[str, Any]]] = []
+        for relative, entry in sorted(files.items()):
+            target = _safe_target(workspace, relative)
+            try:
+                info = target.stat()
+                if (
+                    info.st_size == entry["size"]
+                    and info.st_mtime_ns == entry["mtime_ns"]
+                ):
+                    continue
+            except FileNotFoundError:
+                pass
+            pending.append((target, entry))
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            for write in [pool.submit(self._write_file, *item) for item in pending]:
+                write.result()
+        self._manifests[slug] = manifest
+        with self._lock:
+            self._known.update(digest for e in files.values() for digest in e["chunks"])
+        self._count("restores")
+        self._count("files_restored", len(pending))
+        return {
+            "restored": True,
+            "files": len(files),
+            "files_written": len(pending),
+            "seconds": round(time.monotonic() - started, 3),
+        }
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "store": type(self.store).__name__,
+                "workspaces": len(self._manifests),
+                **self.counters,
+            }
+
+
+def open_store(
+    kind: str,
+    *,
+    path: Path,
+    bucket: str | None = None,
+    prefix: str = "",
+    region: str = "us-west-2",
+    endpoint_url: str | None = None,
+) -> ObjectStore | None:
+    """Build the store named by ``SNAPSHOT_STORE``; ``""`` disables snapshots."""
+    if not kind:
+        return None
+    if kind == "local":
+        return LocalObjectStore(path)
+    if kind == "s3":
+        if not bucket:
+            raise ValueError("the s3 snapshot store needs a bucket")
+        return S3ObjectStore.from_region(bucket, prefix, region, endpoint_url)
+    raise ValueError(f"unknown snapshot store: {kind!r}")
@@ -0,0 +1,195 @@
+"""Open-loop arrival scheduling with coordinated-omission correction.
+
+A closed-loop driver only starts the next request when a worker frees up, so
+when the server slows down it quietly sends less load and the time requests
+spend waiting to be sent never shows up in its latency numbers (coordinated
+omission). The runners here fix every request's *intended* start on a
+timeline before the phase begins, record when it *actually* started, and
+annotate each record with:
+
+``start_lag_ms``
+    actual start minus intended start (client-side queueing or scheduler lag).
+``corrected_latency_ms``
+    completion minus intended start: the latency a user arriving on schedule
+    would have seen. It equals ``latency_ms + start_lag_ms``.
+
+This module and ``histogram.py`` have no third-party dependencies so each
+load tool can share them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import random
+import time
+from typing import Any, Awaitable, Callable
+
+from histogram import Histogram
+
+MODES = ("burst", "constant", "poisson")
+
+Record = dict[str, Any]
+
+
+def arrival_offsets(
+    mode: str,
+    *,
+    count: int = 0,
+    rate: float = 0.0,
+    duration: float = 0.0,
+    rng: random.Random | None = None,
+) -> list[float]:
+    """Return intended start offsets in seconds from the start of a phase.
+
+    ``burst`` starts ``count`` requests at once; ``constant`` spaces
+    ``rate * duration`` starts evenly; ``poisson`` draws exponential gaps at
+    ``rate`` until ``duration`` elapses. With ``duration`` zero, ``constant``
+    and ``poisson`` produce exactly ``count`` starts instead.
+    """
+    if mode == "burst":
+        return [0.0] * count
+    if mode == "constant":
+        total = int(rate * duration) if duration > 0 else count
+        return [index / rate for index in range(total)]
+    if mode == "poisson":
+        rng = rng or random.Random()
+        offsets: list[float] = []
+        offset = rng.expovariate(rate)
+        while offset < duration if duration > 0 else len(offsets) < count:
+            offsets.append(offset)
+            offset += rng.expovariate(rate)
+        return offsets
+    raise ValueError(f"unknown arrival mode: {mode}")
+
+
+def annotate(
+    record: Record,
+    *,
+    intended: float,
+    actual: float,
+    finished: float,
+    phase_epoch: float,
+    offset: float,
+) -> Record:
+    """Add intended/actual start fields to ``record`` in place.
+
+    ``intended``, ``actual`` and ``finished`` are ``time.perf_counter()``
+    readings; ``phase_epoch`` is the wall-clock time of offset zero.
+    """
+    lag_ms = max(0.0, (actual - intended) * 1000.0)
+    record.update(
+        intended_offset_s=round(offset, 4),
+        intended_start_epoch=phase_epoch + offset,
+        start_lag_ms=round(lag_ms, 1),
+    )
+    latency = record.get("latency_ms")
+    if latency is None:
+        latency = (finished - actual) * 1000.0
+    record["corrected_latency_ms"] = round(latency + lag_ms, 1)
+    return record
+
+
+def run_threaded(
+    offsets: list[float],
+    call: Callable[[int], Record],
+    *,
+    max_workers: int | None = None,
+) -> list[Record]:
+    """Call ``call(index)`` at each intended offset on a thread pool.
+
+    The dispatcher never waits for a completion, so the offered rate holds
+    however slow responses get. With ``max_workers`` below the number of
+    overlapping requests, the wait for a free thread is reported as start lag
+    instead of disappearing.
+    """
+    if not offsets:
+        return []
+    phase_epoch = time.time()
+    start = time.perf_counter()
+
+    def timed(index: int, offset: float) -> Record:
+        actual = time.perf_counter()
+        record = call(index)
+        return annotate(
+            record,
+            intended=start + offset,
+            actual=actual,
+            finished=time.perf_counter(),
+            phase_epoch=phase_epoch,
+            offset=offset,
+        )
+
+    workers = max_workers or len(offsets)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for index, offset in enumerate(offsets):
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(timed, index, offset))
+        return [future.result() for future in futures]
+
+
+async def run_async(
+    offsets: list[float],
+    call: Callable[[int], Awaitable[Record]],
+    *,
+    limit: int | None = None,
+) -> list[Record]:
+    """Start ``call(index)`` as a task at each intended offset.
+
+    ``limit`` caps how many calls run at once; time spent waiting for a slot
+    counts as start lag, which is exactly the delay a closed-loop driver with
+    that many workers would have hidden.
+    """
+    if not offsets:
+        return []
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(limit) if limit else None
+    phase_epoch = time.time()
+    start = time.perf_counter()
+    loop_start = loop.time()
+
+    async def timed(index: int, offset: float) -> Record:
+        if semaphore is not None:
+            await semaphore.acquire()
+        try:
+            actual = time.perf_counter()
+            record = await call(index)
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+        return annotate(
+            record,
+            intended=start + offset,
+            actual=actual,
+            finished=time.perf_counter(),
+            phase_epoch=phase_epoch,
+            offset=offset,
+        )
+
+    tasks: list[asyncio.Task[Record]] = []
+    for index, offset in enumerate(offsets):
+        delay = loop_start + offset - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(timed(index, offset)))
+    return list(await asyncio.gather(*tasks))
+
+
+def lag_summary(records: list[Record], success_key: str = "success") -> dict[str, Any]:
+    """Summarize start lag and corrected latency for one phase.
+
+    Lag covers every request; corrected latency covers the successful ones so
+    it lines up with the raw ``latency_*`` percentiles beside it.
+    """
+    lags = Histogram.of(
+        r["start_lag_ms"] for r in records if r.get("start_lag_ms") is not None
+    )
+    corrected = Histogram.of(
+        r["corrected_latency_ms"]
+        for r in records
+        if r.get(success_key) and r.get("corrected_latency_ms") is not None
+    )
+    return {**lags.summary("start_lag"), **corrected.summary("corrected")}
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""asyncio InvokeAgentRuntime client for high-concurrency load generation.
+
+``RuntimeSession`` holds one OS thread per in-flight request because boto3 is
+blocking. This client speaks HTTP/1.1 directly with ``asyncio`` streams, signs
+requests with botocore's SigV4 signer (imported only when signing is needed),
+and folds the SSE body through the same ``InvocationRecorder`` so one process
+can hold thousands of concurrent streams and report identical record fields.
+An ``endpoint_url`` such as ``http://127.0.0.1:8090`` targets the local
+stand-in in ``standin_runtime.py`` without credentials.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import ssl
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable
+from urllib.parse import quote, urlencode, urlsplit
+
+from runtime_session import (
+    InvocationRecorder,
+    SSEDecoder,
+    invocation_payload,
+    load_runtime_config,
+    validate_session_id,
+)
+
+SESSION_HEADER = "X-Amzn-Bedrock-AgentCore-Runtime-Session-Id"
+USER_HEADER = "X-Amzn-Bedrock-AgentCore-Runtime-User-Id"
+STAND_IN_RUNTIME = {
+    "region": "local",
+    "runtimeArn": "arn:aws:bedrock-agentcore:local:000000000000:runtime/stand-in",
+}
+
+Signer = Callable[[str, str, dict[str, str], bytes], dict[str, str]]
+
+
+class HTTPProtocolError(RuntimeError):
+    """Raised when the endpoint's HTTP response cannot be parsed."""
+
+
+def sigv4_signer(region: str, service: str = "bedrock-agentcore") -> Signer:
+    """Return a signer that adds SigV4 headers using the default AWS chain."""
+    from botocore.auth import SigV4Auth
+    from botocore.awsrequest import AWSRequest
+    from botocore.session import get_session
+
+    credentials = get_session().get_credentials()
+    if credentials is None:
+        raise RuntimeError("no AWS credentials found for SigV4 signing")
+
+    def sign(
+        method: str, url: str, headers: dict[str, str], body: bytes
+    ) -> dict[str, str]:
+        request = AWSRequest(method=method, url=url, data=body, headers=headers)
+        SigV4Auth(credentials.get_frozen_credentials(), service, region).add_auth(
+            request
+        )
+        return dict(request.headers.items())
+
+    return sign
+
+
+def invocation_url(endpoint_url: str, runtime: dict[str, Any]) -> str:
+    path = f"/runtimes/{quote(runtime['runtimeArn'], safe='')}/invocations"
+    qualifier = runtime.get("qualifier")
+    if isinstance(qualifier, str) and qualifier:
+        path += "?" + urlencode({"qualifier": qualifier})
+    return endpoint_url.rstrip("/") + path
+
+
+async def _read_head(
+    reader: asyncio.StreamReader,
+) -> tuple[int, dict[str, str]]:
+    status_line = await reader.readline()
+    parts = status_line.decode("latin-1").split(" ", 2)
+    if len(parts) < 2 or not parts[0].startswith("HTTP/") or not parts[1].isdigit():
+        raise HTTPProtocolError(f"bad status line: {status_line[:80]!r}")
+    headers: dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return int(parts[1]), headers
+
+
+async def _iter_body(
+    reader: asyncio.StreamReader, headers: dict[str, str], chunk_size: int = 16384
+) -> AsyncIterator[bytes]:
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        while True:
+            size_line = await reader.readline()
+            if not size_line:
+                raise HTTPProtocolError("connection closed inside chunked body")
+            size = int(size_line.split(b";", 1)[0].strip() or b"0", 16)
+            if size == 0:
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass  # trailers
+                return
+            yield await reader.readexactly(size)
+            await reader.readexactly(2)
+    length = headers.get("content-length")
+    if length is not None:
+        remaining = int(length)
+        while remaining:
+            chunk = await reader.read(min(chunk_size, remaining))
+            if not chunk:
+                raise HTTPProtocolError("connection closed before content-length")
+            remaining -= len(chunk)
+            yield chunk
+        return
+    while chunk := await reader.read(chunk_size):
+        yield chunk
+
+
+class AsyncRuntimeSession:
+    """asyncio counterpart of ``RuntimeSession.invoke`` for one shared session."""
+
+    def __init__(
+        self,
+        runtime: dict[str, Any],
+        session_id: str,
+        *,
+        endpoint_url: str | None = None,
+        signer: Signer | None = None,
+        connect_timeout: float = 30.0,
+        read_timeout: float = 900.0,
+        conflict_attempts: int = 5,
+        keep_events: bool = False,
+    ) -> None:
+        if conflict_attempts < 1:
+            raise ValueError("conflict_attempts must be at least 1")
+        self.runtime = runtime
+        self.session_id = validate_session_id(session_id)
+        self.endpoint_url = (
+            endpoint_url
+            or f"https://bedrock-agentcore.{runtime['region']}.amazonaws.com"
+        )
+        self.signer = signer
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.conflict_attempts = conflict_attempts
+        self.keep_events = keep_events
+        self._ssl = ssl.create_default_context()
+
+    @classmethod
+    def from_config(
+        cls,
+        config_path: str | Path,
+        session_id: str,
+        *,
+        read_timeout: float = 900.0,
+    ) -> "AsyncRuntimeSession":
+        runtime = load_runtime_config(config_path)
+        return cls(
+            runtime,
+            session_id,
+            signer=sigv4_signer(runtime["region"]),
+            read_timeout=read_timeout,
+        )
+
+    @classmethod
+    def stand_in(
+        cls, endpoint_url: str, session_id: str, *, read_timeout: float = 900.0
+    ) -> "AsyncRuntimeSession":
+        return cls(
+            STAND_IN_RUNTIME,
+            session_id,
+            endpoint_url=endpoint_url,
+            read_timeout=read_timeout,
+        )
+
+    async def _open(
+        self, url: str
+    ) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        parts = urlsplit(url)
+        secure = parts.scheme == "https"
+        host = parts.hostname or ""
+        port = parts.port or (443 if secure else 80)
+        return await asyncio.wait_for(
+            asyncio.open_connection(
+                host,
+                port,
+                ssl=self._ssl if secure else None,
+                server_hostname=host if secure else None,
+                limit=1 << 20,
+            ),
+            self.connect_timeout,
+        )
+
+    async def _read(self, awaitable: Any) -> Any:
+        return await asyncio.wait_for(awaitable, self.read_timeout)
+
+    async def _attempt(
+        self, user_id: str, body: bytes, started: float
+    ) -> tuple[int, dict[str, Any] | None, bytes]:
+        url = invocation_url(self.endpoint_url, self.runtime)
+        parts = urlsplit(url)
+        headers = {
+            "Host": parts.netloc,
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream",
+            SESSION_HEADER: self.session_id,
+            USER_HEADER: user_id,
+        }
+        if self.signer is not None:
+            headers = self.signer("POST", url, headers, body)
+        target = parts.path + (f"?{parts.query}" if parts.query else "")
+        head = "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+        reader, writer = await self._open(url)
+        try:
+            writer.write(
+                f"POST {target} HTTP/1.1\r\n{head}"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode(
+                    "latin-1"
+                )
+                + body
+            )
+            await writer.drain()
+            status, response_headers = await self._read(_read_head(reader))
+            chunks = _iter_body(reader, response_headers)
+            if status != 200:
+                error_body = b""
+                while len(error_body) <= 2000:
+                    try:
+                        error_body += await self._read(anext(chunks))
+                    except StopAsyncIteration:
+                        break
+                return status, None, error_body
+            recorder = InvocationRecorder(started, keep_events=self.keep_events)
+            decoder = SSEDecoder()
+            while True:
+                try:
+                    chunk = await self._read(anext(chunks))
+                except StopAsyncIteration:
+                    break
+                recorder.chunk(chunk)
+                for event in decoder.feed(chunk):
+                    recorder.add(event)
+            for event in decoder.close():
+                recorder.add(event)
+            return status, recorder.result(status), b""
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, ssl.SSLError):
+                pass
+
+    async def invoke(self, user_id: str, prompt: str, *, reset: bool) -> dict[str, Any]:
+        body = invocation_payload(user_id, prompt, reset=reset)
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            status, record, error_body = await self._attempt(user_id, body, started)
+            if record is not None:
+                return record
+            attempt += 1
+            if status != 409 or attempt >= self.conflict_attempts:
+                break
+            await asyncio.sleep(min(0.5 * (2 ** (attempt - 1)), 4.0))
+        record = InvocationRecorder(started).result(status)
+        detail = error_body.decode("utf-8", errors="replace").strip()
+        if detail:
+            try:
+                detail = json.loads(detail).get("message") or detail
+            except (json.JSONDecodeError, AttributeError):
+                pass
+            record["error"] = f"{record['error']}: {detail[:300]}"
+        return record
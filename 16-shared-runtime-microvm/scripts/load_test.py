@@ -1,11 +1,18 @@
 #!/usr/bin/env python3
-"""Short-task concurrency ramp in one shared AgentCore microVM session."""
+"""Short-task concurrency ramp in one shared AgentCore microVM session.
+
+By default each level releases that many users at once (``--arrival burst``).
+With ``--arrival constant`` or ``poisson`` each level is instead an offered
+rate in requests per second held for ``--level-duration`` seconds; requests
+start on that timeline whether or not earlier ones have finished, and every
+record carries its start lag and coordinated-omission-corrected latency.
+"""
 
 from __future__ import annotations
 
 import argparse
-import concurrent.futures
 import os
+import random
 import sys
 import threading
 import time
@@ -14,17 +21,20 @@ from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+from arrival import MODES, arrival_offsets, lag_summary, run_threaded
+from histogram import Histogram
 from runtime_session import (
+    MonitorStream,
     RuntimeSession,
+    attribute_requests,
     atomic_write_json,
     cleanup_session,
     enforce_unique_workspaces,
     finalize_before_session_stop,
     new_session_id,
     parse_levels,
-    percentile,
-    read_monitor,
     start_monitor,
+    usage_summary,
     utc_iso,
     validate_session_id,
     window_stats,
@@ -44,8 +54,24 @@ def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     parser.add_argument(
         "--levels",
         default=os.environ.get("LEVELS", "2,4,8"),
-        help="Comma-separated levels or JSON array (default: 2,4,8)",
+        help=(
+            "Comma-separated levels or JSON array (default: 2,4,8); "
+            "requests per second unless --arrival is burst"
+        ),
+    )
+    parser.add_argument(
+        "--arrival",
+        choices=MODES,
+        default=os.environ.get("ARRIVAL", "burst"),
+        help="burst: release each level at once; constant/poisson: open-loop rate",
     )
+    parser.add_argument(
+        "--level-duration",
+        type=float,
+        default=float(os.environ.get("LEVEL_DURATION_S", "30")),
+        help="Seconds each open-loop rate level is held (default: 30)",
+    )
+    parser.add_argument("--seed", type=int, default=None)
     parser.add_argument(
         "--success-floor",
         type=float,
@@ -66,6 +92,12 @@ def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
         type=int,
         default=int(os.environ.get("MONITOR_DURATION_S", "3600")),
     )
+    parser.add_argument(
+        "--monitor-interval",
+        type=float,
+        default=float(os.environ.get("MONITOR_INTERVAL_S", "0.5")),
+        help="In-VM sampling interval in seconds (default: 0.5)",
+    )
     parser.add_argument("--session-id")
     parser.add_argument("--output", help="Result JSON path (default: timestamped)")
     parser.add_argument(
@@ -85,8 +117,12 @@ def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
         parser.error("--request-timeout must be positive")
     if args.level_pause < 0:
         parser.error("--level-pause cannot be negative")
+    if args.level_duration <= 0:
+        parser.error("--level-duration must be positive")
     if not 5 <= args.monitor_duration <= 28800:
         parser.error("--monitor-duration must be 5..28800 seconds")
+    if not 0.1 <= args.monitor_interval <= 10:
+        parser.error("--monitor-interval must be 0.1..10 seconds")
     if args.session_id:
         try:
             validate_session_id(args.session_id)
@@ -114,6 +150,17 @@ def invoke_short(
             "error": f"{type(exc).__name__}: {exc}"[:500],
             "latency_ms": round((time.perf_counter() - started) * 1000.0, 1),
         }
+    return check_short(record, user_id, marker, expected_instance, started_epoch)
+
+
+def check_short(
+    record: dict[str, Any],
+    user_id: str,
+    marker: str,
+    expected_instance: dict[str, Any] | None,
+    started_epoch: float,
+) -> dict[str, Any]:
+    """Apply the short-task contract to one invoke record, in place."""
     record.pop("events", None)
     fingerprint = record.get("instance") or {}
     record.update(
@@ -141,29 +188,37 @@ def run_level(
     level: int,
     run_id: str,
     expected_instance: dict[str, Any] | None,
+    *,
+    arrival: str = "burst",
+    duration: float = 0.0,
+    rng: random.Random | None = None,
 ) -> dict[str, Any]:
-    barrier = threading.Barrier(level)
+    if arrival == "burst":
+        offsets = arrival_offsets("burst", count=level)
+    else:
+        offsets = arrival_offsets(arrival, rate=level, duration=duration, rng=rng)
+
+    def call(index: int) -> dict[str, Any]:
+        return invoke_short(
+            session,
+            f"short-{run_id}-l{level}-u{index:03d}",
+            f"PONG-{run_id}-L{level}-U{index:03d}",
+            None,
+            expected_instance,
+        )
+
     window_start = time.time()
-    with concurrent.futures.ThreadPoolExecutor(max_workers=level) as pool:
-        futures = []
-        for index in range(level):
-            user_id = f"short-{run_id}-l{level}-u{index:03d}"
-            marker = f"PONG-{run_id}-L{level}-U{index:03d}"
-            futures.append(
-                pool.submit(
-                    invoke_short,
-                    session,
-                    user_id,
-                    marker,
-                    barrier,
-                    expected_instance,
-                )
-            )
-        requests = [future.result() for future in futures]
+    requests = run_threaded(offsets, call)
     window_end = time.time()
+    count = len(requests)
     distinct_workspaces = enforce_unique_workspaces(requests, "contract_success")
     successful = [item for item in requests if item["contract_success"]]
-    latencies = [item["latency_ms"] for item in successful]
+    latency = Histogram.of(item["latency_ms"] for item in successful)
+    ttft = Histogram.of(
+        item["first_delta_ms"]
+        for item in successful
+        if item.get("first_delta_ms") is not None
+    )
     fingerprints = {
         str(sorted((item.get("instance") or {}).items()))
         for item in requests
@@ -179,13 +234,21 @@ def run_level(
     ]
     summary = {
         "level": level,
+        "arrival": arrival,
+        "offered_rps": None if arrival == "burst" else float(level),
         "window": [window_start, window_end],
+        "requests_sent": count,
         "success": len(successful),
-        "failed": level - len(successful),
-        "success_rate": round(len(successful) / level, 3),
-        "latency_p50_ms": percentile(latencies, 50),
-        "latency_p90_ms": percentile(latencies, 90),
-        "latency_max_ms": percentile(latencies, 100),
+        "failed": count - len(successful),
+        "success_rate": round(len(successful) / count, 3) if count else None,
+        **latency.summary("latency"),
+        **lag_summary(requests, "contract_success"),
+        **ttft.summary("ttft"),
+        **usage_summary(
+            (item.get("usage") for item in requests),
+            len(successful),
+            window_end - window_start,
+        ),
         "distinct_server_processes": len(fingerprints),
         "single_server_process": len(fingerprints) == 1,
         "distinct_workspaces": distinct_workspaces,
@@ -195,9 +258,14 @@ def run_level(
         "resources": {},
     }
     print(
-        f"  level {level:>3}: ok={summary['success']}/{level} "
+        f"  level {level:>3}: ok={summary['success']}/{count} "
         f"p50={summary['latency_p50_ms']}ms p90={summary['latency_p90_ms']}ms "
         f"max={summary['latency_max_ms']}ms "
+        f"corrected_p90={summary['corrected_p90_ms']}ms "
+        f"ttft_p50={summary['ttft_p50_ms']}ms ttft_p90={summary['ttft_p90_ms']}ms "
+        f"cost/ok=${summary['cost_per_success_usd']} "
+        f"out_tok/s={summary['output_tokens_per_s']} "
+        f"cache_hit={summary['cache_hit_ratio']} "
         f"processes={summary['distinct_server_processes']}"
     )
     return summary
@@ -213,6 +281,11 @@ def main(argv: list[str] | None = None) -> int:
         stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
         result_path = ROOT / "results" / f"load_test_{stamp}.json"
 
+    # Open-loop levels may have every request of a level in flight at once.
+    most_in_flight = max(args.levels)
+    if args.arrival != "burst":
+        most_in_flight = int(most_in_flight * args.level_duration) + 1
+    rng = random.Random(args.seed)
     wall_started = time.perf_counter()
     session: RuntimeSession | None = None
     runtime: dict[str, Any] | None = None
@@ -220,7 +293,7 @@ def main(argv: list[str] | None = None) -> int:
     levels: list[dict[str, Any]] = []
     monitor_samples: list[dict[str, Any]] = []
     monitor_errors: list[dict[str, str]] = []
-    monitor_started = False
+    monitor: MonitorStream | None = None
     fatal_error: str | None = None
     cleanup: dict[str, Any] = {
         "monitor": {"attempted": False, "success": False},
@@ -237,10 +310,16 @@ def main(argv: list[str] | None = None) -> int:
                 "config": {
                     "run_id": run_id,
                     "levels": args.levels,
+                    "arrival": args.arrival,
+                    "level_duration_s": (
+                        None if args.arrival == "burst" else args.level_duration
+                    ),
+                    "seed": args.seed,
                     "success_floor": args.success_floor,
                     "request_timeout_s": args.request_timeout,
                     "level_pause_s": args.level_pause,
                     "monitor_duration_s": args.monitor_duration,
+                    "monitor_interval_s": args.monitor_interval,
                 },
                 "shared_session_id": session_id,
                 "prompt_contract": "unique exact PONG marker",
@@ -258,13 +337,14 @@ def main(argv: list[str] | None = None) -> int:
         )
 
     print(f"shared session : {session_id}")
-    print(f"levels         : {args.levels}")
+    print(f"levels         : {args.levels} ({args.arrival})")
     try:
         session = RuntimeSession.from_config(
             args.config,
             session_id,
             read_timeout=args.request_timeout,
-            max_connections=max(32, max(args.levels) + 8),
+            max_connections=max(32, most_in_flight + 8),
+            keep_events=False,
         )
         runtime = session.runtime
         print(f"runtime        : {runtime['runtimeArn']}\n")
@@ -292,23 +372,37 @@ def main(argv: list[str] | None = None) -> int:
         expected_instance = warmup["instance"]
 
         print("\n== phase 1: start command-channel monitor ==")
-        start_monitor(session, run_id, duration=args.monitor_duration)
-        monitor_started = True
+        start_monitor(
+            session,
+            run_id,
+            duration=args.monitor_duration,
+            interval=args.monitor_interval,
+        )
+        monitor = MonitorStream(session, run_id)
         print("  monitor started")
         checkpoint()
 
         print("\n== phase 2: concurrency ramp ==")
         for index, level in enumerate(args.levels):
-            summary = run_level(session, level, run_id, expected_instance)
+            summary = run_level(
+                session,
+                level,
+                run_id,
+                expected_instance,
+                arrival=args.arrival,
+                duration=args.level_duration,
+                rng=rng,
+            )
             levels.append(summary)
             # Preserve request evidence before any monitor command can fail.
             checkpoint()
             try:
-                monitor_samples, _ = read_monitor(session, run_id, stop=False)
+                monitor_samples, _ = monitor.poll()
                 for completed_level in levels:
                     completed_level["resources"] = window_stats(
                         monitor_samples, *completed_level["window"]
                     )
+                    attribute_requests(monitor_samples, completed_level["requests"])
                     completed_level["monitor_available"] = bool(
                         completed_level["resources"]
                     )
@@ -320,7 +414,7 @@ def main(argv: list[str] | None = None) -> int:
                 )
                 print(f"  monitor unavailable: {error}", file=sys.stderr)
             checkpoint()
-            if summary["success_rate"] < args.success_floor:
+            if (summary["success_rate"] or 0) < args.success_floor:
                 print(
                     f"  stopping ramp: {summary['success_rate']} < {args.success_floor}"
                 )
@@ -335,11 +429,11 @@ def main(argv: list[str] | None = None) -> int:
 
             def finish_monitor() -> None:
                 nonlocal monitor_samples
-                if not monitor_started:
+                if monitor is None:
                     return
                 cleanup["monitor"]["attempted"] = True
                 try:
-                    monitor_samples, _ = read_monitor(session, run_id, stop=True)
+                    monitor_samples, _ = monitor.poll(stop=True)
                     cleanup["monitor"].update(
                         success=True, samples=len(monitor_samples)
                     )
@@ -347,6 +441,7 @@ def main(argv: list[str] | None = None) -> int:
                         summary["resources"] = window_stats(
                             monitor_samples, *summary["window"]
                         )
+                        attribute_requests(monitor_samples, summary["requests"])
                         summary["monitor_available"] = bool(summary["resources"])
                 except Exception as exc:
                     error = f"{type(exc).__name__}: {exc}"[:500]
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""asyncio short-task load generator for one shared AgentCore session.
+
+``load_test.py`` runs one OS thread per virtual user behind a barrier. This
+driver keeps every request as an asyncio task on one event loop, so a single
+client box can hold thousands of concurrent streams. Besides the closed-loop
+``burst`` mode (all users of a level released at once), it supports open-loop
+arrivals: ``constant`` rate, ``poisson`` arrivals, and a ``step`` ramp of
+constant-rate segments. Every request applies the same short-task contract as
+``load_test.py`` and records its intended start, so each phase also reports
+start lag and coordinated-omission-corrected latency (see ``arrival.py``).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from arrival import arrival_offsets, lag_summary, run_async
+from async_runtime import AsyncRuntimeSession
+from histogram import Histogram
+from load_test import check_short
+from runtime_session import (
+    RuntimeSession,
+    atomic_write_json,
+    cleanup_session,
+    enforce_unique_workspaces,
+    new_session_id,
+    parse_levels,
+    usage_summary,
+    utc_iso,
+    validate_session_id,
+)
+
+ROOT = Path(__file__).resolve().parent.parent
+MODES = ("burst", "constant", "poisson", "step")
+
+
+def parse_steps(raw: str) -> list[tuple[float, float]]:
+    """Parse ``rate:seconds`` pairs such as ``"2:60,4:60,8:60"``."""
+    steps: list[tuple[float, float]] = []
+    for item in raw.split(","):
+        rate, sep, duration = item.strip().partition(":")
+        try:
+            step = (float(rate), float(duration))
+        except ValueError:
+            step = (0.0, 0.0)
+        if not sep or step[0] <= 0 or step[1] <= 0:
+            raise ValueError(
+                "steps must be comma-separated positive rate:seconds pairs"
+            )
+        steps.append(step)
+    return steps
+
+
+def plan_phases(args: argparse.Namespace) -> list[dict[str, Any]]:
+    """Expand CLI arguments into named phases with their arrival offsets."""
+    rng = random.Random(args.seed)
+    if args.mode == "burst":
+        return [
+            {
+                "label": f"burst-{level}",
+                "offsets": arrival_offsets("burst", count=level),
+            }
+            for level in args.levels
+        ]
+    if args.mode == "step":
+        return [
+            {
+                "label": f"step-{index}-{rate:g}rps",
+                "offered_rps": rate,
+                "offsets": arrival_offsets("constant", rate=rate, duration=duration),
+            }
+            for index, (rate, duration) in enumerate(args.steps)
+        ]
+    return [
+        {
+            "label": f"{args.mode}-{args.rate:g}rps",
+            "offered_rps": args.rate,
+            "offsets": arrival_offsets(
+                args.mode, rate=args.rate, duration=args.duration, rng=rng
+            ),
+        }
+    ]
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Drive short agent requests into one shared Runtime session from a "
+            "single asyncio event loop, closed-loop or open-loop."
+        )
+    )
+    parser.add_argument("--config", default=str(ROOT / "runtime.json"))
+    parser.add_argument(
+        "--endpoint",
+        help="Unsigned endpoint URL of a local stand-in (skips AWS entirely)",
+    )
+    parser.add_argument(
+        "--mode", choices=MODES, default=os.environ.get("MODE", "burst")
+    )
+    parser.add_argument(
+        "--levels",
+        default=os.environ.get("LEVELS", "2,4,8"),
+        help="burst: comma-separated levels or JSON array (default: 2,4,8)",
+    )
+    parser.add_argument(
+        "--rate", type=float, default=float(os.environ.get("RATE_RPS", "1"))
+    )
+    parser.add_argument(
+        "--duration", type=float, default=float(os.environ.get("DURATION_S", "60"))
+    )
+    parser.add_argument(
+        "--steps",
+        default=os.environ.get("STEPS", "1:60,2:60,4:60"),
+        help="step: comma-separated rate:seconds segments",
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--success-floor",
+        type=float,
+        default=float(os.environ.get("SUCCESS_FLOOR", "0.8")),
+    )
+    parser.add_argument(
+        "--request-timeout",
+        type=int,
+        default=int(os.environ.get("TASK_READ_TIMEOUT_S", "900")),
+    )
+    parser.add_argument(
+        "--phase-pause",
+        type=float,
+        default=float(os.environ.get("LEVEL_PAUSE_S", "10")),
+    )
+    parser.add_argument("--session-id")
+    parser.add_argument("--output", help="Result JSON path (default: timestamped)")
+    parser.add_argument(
+        "--keep-session",
+        action="store_true",
+        default=os.environ.get("STOP_SESSION", "1") == "0",
+        help="Skip StopRuntimeSession (also selected by STOP_SESSION=0; billable)",
+    )
+    args = parser.parse_args(argv)
+    try:
+        args.levels = parse_levels(args.levels)
+        args.steps = parse_steps(args.steps)
+    except ValueError as exc:
+        parser.error(str(exc))
+    if args.mode in {"constant", "poisson"} and (args.rate <= 0 or args.duration <= 0):
+        parser.error("--rate and --duration must be positive")
+    if not 0 <= args.success_floor <= 1:
+        parser.error("--success-floor must be between 0 and 1")
+    if args.request_timeout < 1:
+        parser.error("--request-timeout must be positive")
+    if args.phase_pause < 0:
+        parser.error("--phase-pause cannot be negative")
+    if args.session_id:
+        try:
+            validate_session_id(args.session_id)
+        except ValueError as exc:
+            parser.error(str(exc))
+    return args
+
+
+async def invoke_short_async(
+    session: AsyncRuntimeSession,
+    user_id: str,
+    marker: str,
+    expected_instance: dict[str, Any] | None,
+) -> dict[str, Any]:
+    started_epoch = time.time()
+    started = time.perf_counter()
+    try:
+        record = await session.invoke(
+            user_id, f"Reply with exactly: {marker}", reset=True
+        )
+    except Exception as exc:
+        record = {
+            "success": False,
+            "error": f"{type(exc).__name__}: {exc}"[:500],
+            "latency_ms": round((time.perf_counter() - started) * 1000.0, 1),
+        }
+    return check_short(record, user_id, marker, expected_instance, started_epoch)
+
+
+async def run_phase(
+    session: AsyncRuntimeSession,
+    phase: dict[str, Any],
+    run_id: str,
+    expected_instance: dict[str, Any],
+) -> dict[str, Any]:
+    label = phase["label"]
+    in_flight = 0
+    peak_in_flight = 0
+
+    async def one(index: int) -> dict[str, Any]:
+        nonlocal in_flight, peak_in_flight
+        in_flight += 1
+        peak_in_flight = max(peak_in_flight, in_flight)
+        try:
+            return await invoke_short_async(
+                session,
+                f"async-{run_id}-{label}-u{index:05d}",
+                f"PONG-{run_id}-{label}-U{index:05d}",
+                expected_instance,
+            )
+        finally:
+            in_flight -= 1
+
+    window_start = time.time()
+    requests = await run_async(phase["offsets"], one)
+    window_end = time.time()
+
+    count = len(requests)
+    distinct_workspaces = enforce_unique_workspaces(requests, "contract_success")
+    successful = [item for item in requests if item["contract_success"]]
+    latency = Histogram.of(item["latency_ms"] for item in successful)
+    ttft = Histogram.of(
+        item["first_delta_ms"]
+        for item in successful
+        if item.get("first_delta_ms") is not None
+    )
+    elapsed = max(window_end - window_start, 1e-9)
+    summary = {
+        "label": label,
+        "offered_rps": phase.get("offered_rps"),
+        "window": [window_start, window_end],
+        "requests_sent": count,
+        "success": len(successful),
+        "failed": count - len(successful),
+        "success_rate": round(len(successful) / count, 3) if count else None,
+        "goodput_rps": round(len(successful) / elapsed, 3),
+        "peak_in_flight": peak_in_flight,
+        **latency.summary("latency"),
+        **lag_summary(requests, "contract_success"),
+        **ttft.summary("ttft"),
+        **usage_summary(
+            (item.get("usage") for item in requests), len(successful), elapsed
+        ),
+        "distinct_workspaces": distinct_workspaces,
+        "errors": [
+            {
+                "user_id": item["user_id"],
+                "error": item.get("error") or "short-task contract check failed",
+            }
+            for item in requests
+            if not item["contract_success"]
+        ][:10],
+        "requests": requests,
+    }
+    print(
+        f"  {label:>18}: ok={summary['success']}/{count} "
+        f"peak_in_flight={peak_in_flight} goodput={summary['goodput_rps']}rps "
+        f"p50={summary['latency_p50_ms']}ms p90={summary['latency_p90_ms']}ms "
+        f"corrected_p90={summary['corrected_p90_ms']}ms "
+        f"lag_max={summary['start_lag_max_ms']}ms "
+        f"ttft_p50={summary['ttft_p50_ms']}ms "
+        f"cost/ok=${summary['cost_per_success_usd']} "
+        f"out_tok/s={summary['output_tokens_per_s']} "
+        f"cache_hit={summary['cache_hit_ratio']}",
+        flush=True,
+    )
+    return summary
+
+
+def stop_session(args: argparse.Namespace, session_id: str) -> dict[str, Any]:
+    """Stop the shared session with the blocking control-plane client."""
+    try:
+        control = RuntimeSession.from_config(args.config, session_id)
+    except Exception as exc:
+        error = f"{type(exc).__name__}: {exc}"[:500]
+        return {"attempted": False, "success": False, "error": error}
+    return cleanup_session(control, keep_session=args.keep_session)
+
+
+async def run(args: argparse.Namespace) -> int:
+    run_id = uuid.uuid4().hex[:10]
+    session_id = args.session_id or new_session_id(f"shared-async-{run_id}")
+    if args.output:
+        result_path = Path(args.output)
+    else:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        result_path = ROOT / "results" / f"load_test_async_{stamp}.json"
+
+    wall_started = time.perf_counter()
+    session: AsyncRuntimeSession | None = None
+    warmup: dict[str, Any] | None = None
+    phases: list[dict[str, Any]] = []
+    fatal_error: str | None = None
+    cleanup: dict[str, Any] = {"session": {"attempted": False, "success": False}}
+
+    def checkpoint(completed: bool = False) -> None:
+        atomic_write_json(
+            result_path,
+            {
+                "generated": utc_iso(),
+                "completed": completed,
+                "runtime": session.runtime if session is not None else None,
+                "config": {
+                    "run_id": run_id,
+                    "mode": args.mode,
+                    "levels": args.levels if args.mode == "burst" else None,
+                    "rate_rps": args.rate,
+                    "duration_s": args.duration,
+                    "steps": args.steps if args.mode == "step" else None,
+                    "seed": args.seed,
+                    "endpoint": args.endpoint,
+                    "success_floor": args.success_floor,
+                    "request_timeout_s": args.request_timeout,
+                },
+                "shared_session_id": session_id,
+                "prompt_contract": "unique exact PONG marker",
+                "warmup": warmup,
+                "phases": phases,
+                "fatal_error": fatal_error,
+                "cleanup": cleanup,
+                "total_wall_s": round(time.perf_counter() - wall_started, 1),
+            },
+        )
+
+    print(f"shared session : {session_id}")
+    print(f"mode           : {args.mode}")
+    try:
+        if args.endpoint:
+            session = AsyncRuntimeSession.stand_in(
+                args.endpoint, session_id, read_timeout=args.request_timeout
+            )
+        else:
+            session = AsyncRuntimeSession.from_config(
+                args.config, session_id, read_timeout=args.request_timeout
+            )
+        print(f"runtime        : {session.runtime['runtimeArn']}\n")
+
+        print("== phase 0: warmup ==")
+        warmup = await invoke_short_async(
+            session, f"async-{run_id}-warmup", f"READY-{run_id}", None
+        )
+        warmup["expected_process"] = True
+        warmup["contract_success"] = bool(
+            warmup.get("success")
+            and warmup.get("marker_ok")
+            and warmup.get("fresh_session")
+            and warmup.get("workspace")
+            and (warmup.get("instance") or {}).get("server_run_id")
+        )
+        print(f"  ok={warmup['contract_success']} latency={warmup.get('latency_ms')}ms")
+        if not warmup["contract_success"]:
+            raise RuntimeError(f"warmup failed: {warmup.get('error')}")
+        expected_instance = warmup["instance"]
+        checkpoint()
+
+        print(f"\n== phase 1: {args.mode} arrivals ==")
+        planned = plan_phases(args)
+        for index, phase in enumerate(planned):
+            summary = await run_phase(session, phase, run_id, expected_instance)
+            phases.append(summary)
+            checkpoint()
+            if (summary["success_rate"] or 0) < args.success_floor:
+                print(f"  stopping: {summary['success_rate']} < {args.success_floor}")
+                break
+            if index + 1 < len(planned):
+                await asyncio.sleep(args.phase_pause)
+    except Exception as exc:
+        fatal_error = f"{type(exc).__name__}: {exc}"[:1000]
+        print(f"fatal: {fatal_error}", file=sys.stderr)
+    finally:
+        if args.endpoint:
+            cleanup["session"] = {"attempted": False, "success": True, "stand_in": True}
+        elif session is not None:
+            cleanup["session"] = await asyncio.to_thread(stop_session, args, session_id)
+            if args.keep_session:
+                print(
+                    "WARNING: session retained; compute may remain billable",
+                    file=sys.stderr,
+                )
+            elif not cleanup["session"].get("success"):
+                print(
+                    f"session cleanup failed: {cleanup['session'].get('error')}",
+                    file=sys.stderr,
+                )
+        checkpoint(completed=fatal_error is None)
+
+    print(f"\nresults: {result_path}")
+    return 0 if fatal_error is None and phases else 1
+
+
+def main(argv: list[str] | None = None) -> int:
+    return asyncio.run(run(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
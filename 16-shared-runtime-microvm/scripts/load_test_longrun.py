@@ -16,17 +16,19 @@ from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+from histogram import Histogram
 from runtime_session import (
+    MonitorStream,
     RuntimeSession,
+    attribute_requests,
     atomic_write_json,
     cleanup_session,
     enforce_unique_workspaces,
     finalize_before_session_stop,
     new_session_id,
     parse_levels,
-    percentile,
-    read_monitor,
     start_monitor,
+    usage_summary,
     utc_iso,
     validate_session_id,
     window_stats,
@@ -76,6 +78,12 @@ def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
         type=int,
         default=int(os.environ.get("MONITOR_DURATION_S", "7200")),
     )
+    parser.add_argument(
+        "--monitor-interval",
+        type=float,
+        default=float(os.environ.get("MONITOR_INTERVAL_S", "0.5")),
+        help="In-VM sampling interval in seconds (default: 0.5)",
+    )
     parser.add_argument("--session-id")
     parser.add_argument("--output", help="Result JSON path (default: timestamped)")
     parser.add_argument(
@@ -97,6 +105,8 @@ def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
         parser.error("--level-pause cannot be negative")
     if not 5 <= args.monitor_duration <= 28800:
         parser.error("--monitor-duration must be 5..28800 seconds")
+    if not 0.1 <= args.monitor_interval <= 10:
+        parser.error("--monitor-interval must be 0.1..10 seconds")
     if args.session_id:
         try:
             validate_session_id(args.session_id)
@@ -269,21 +279,27 @@ def run_level(
     window_end = time.time()
     distinct_workspaces = enforce_unique_workspaces(requests, "agent_success")
     successful = [item for item in requests if item["agent_success"]]
-    latencies = [item["latency_ms"] for item in successful]
+    task = Histogram.of(item["latency_ms"] / 1000.0 for item in successful)
+    # Time to first token per phase, across every successful user's phases.
+    ttft = Histogram.of(
+        phase["first_delta_ms"]
+        for item in successful
+        for phase in item["phases"]
+        if phase.get("first_delta_ms") is not None
+    )
     summary = {
         "level": level,
         "window": [window_start, window_end],
         "agent_success": len(successful),
         "agent_failed": level - len(successful),
         "agent_success_rate": round(len(successful) / level, 3),
-        "task_p50_s": (
-            round((percentile(latencies, 50) or 0) / 1000.0, 1) if latencies else None
-        ),
-        "task_p90_s": (
-            round((percentile(latencies, 90) or 0) / 1000.0, 1) if latencies else None
-        ),
-        "task_max_s": (
-            round((percentile(latencies, 100) or 0) / 1000.0, 1) if latencies else None
+        **task.summary("task", unit="s"),
+        **ttft.summary("ttft"),
+        # A success is a user whose whole two-phase project passed.
+        **usage_summary(
+            (phase.get("usage") for item in requests for phase in item["phases"]),
+            len(successful),
+            window_end - window_start,
         ),
         "tool_calls_avg": round(
             sum(item["tool_call_count"] for item in requests) / level, 1
@@ -315,7 +331,11 @@ def run_level(
     print(
         f"  level {level:>3}: agent_ok={len(successful)}/{level} "
         f"p50={summary['task_p50_s']}s p90={summary['task_p90_s']}s "
-        f"max={summary['task_max_s']}s",
+        f"max={summary['task_max_s']}s "
+        f"ttft_p50={summary['ttft_p50_ms']}ms ttft_p90={summary['ttft_p90_ms']}ms "
+        f"cost/ok=${summary['cost_per_success_usd']} "
+        f"out_tok/s={summary['output_tokens_per_s']} "
+        f"cache_hit={summary['cache_hit_ratio']}",
         flush=True,
     )
     return summary
@@ -537,7 +557,7 @@ def main(argv: list[str] | None = None) -> int:
     levels: list[dict[str, Any]] = []
     monitor_samples: list[dict[str, Any]] = []
     monitor_errors: list[dict[str, str]] = []
-    monitor_started = False
+    monitor: MonitorStream | None = None
     fatal_error: str | None = None
     cleanup: dict[str, Any] = {
         "monitor": {"attempted": False, "success": False},
@@ -558,6 +578,7 @@ def main(argv: list[str] | None = None) -> int:
                     "request_timeout_s": args.request_timeout,
                     "level_pause_s": args.level_pause,
                     "monitor_duration_s": args.monitor_duration,
+                    "monitor_interval_s": args.monitor_interval,
                     "phases_per_user": 2,
                     "expected_files": list(EXPECTED_FILES),
                 },
@@ -583,6 +604,7 @@ def main(argv: list[str] | None = None) -> int:
             session_id,
             read_timeout=args.request_timeout,
             max_connections=max(32, max(args.levels) + 8),
+            keep_events=False,
         )
         runtime = session.runtime
         print(f"runtime        : {runtime['runtimeArn']}\n")
@@ -607,8 +629,13 @@ def main(argv: list[str] | None = None) -> int:
             raise RuntimeError("warmup did not return a server process fingerprint")
 
         print("\n== phase 1: start command-channel monitor ==", flush=True)
-        start_monitor(session, run_id, duration=args.monitor_duration)
-        monitor_started = True
+        start_monitor(
+            session,
+            run_id,
+            duration=args.monitor_duration,
+            interval=args.monitor_interval,
+        )
+        monitor = MonitorStream(session, run_id)
         checkpoint()
 
         print("\n== phase 2: two-phase concurrency ramp ==", flush=True)
@@ -643,11 +670,12 @@ def main(argv: list[str] | None = None) -> int:
             checkpoint()
 
             try:
-                monitor_samples, _ = read_monitor(session, run_id, stop=False)
+                monitor_samples, _ = monitor.poll()
                 for completed_level in levels:
                     completed_level["resources"] = window_stats(
                         monitor_samples, *completed_level["window"]
                     )
+                    attribute_requests(monitor_samples, completed_level["requests"])
                     completed_level["monitor_available"] = bool(
                         completed_level["resources"]
                     )
@@ -677,11 +705,11 @@ def main(argv: list[str] | None = None) -> int:
 
             def finish_monitor() -> None:
                 nonlocal monitor_samples
-                if not monitor_started:
+                if monitor is None:
                     return
                 cleanup["monitor"]["attempted"] = True
                 try:
-                    monitor_samples, _ = read_monitor(session, run_id, stop=True)
+                    monitor_samples, _ = monitor.poll(stop=True)
                     cleanup["monitor"].update(
                         success=True, samples=len(monitor_samples)
                     )
@@ -689,6 +717,7 @@ def main(argv: list[str] | None = None) -> int:
                         summary["resources"] = window_stats(
                             monitor_samples, *summary["window"]
                         )
+                        attribute_requests(monitor_samples, summary["requests"])
                         summary["monitor_available"] = bool(summary["resources"])
                 except Exception as exc:
                     error = f"{type(exc).__name__}: {exc}"[:500]
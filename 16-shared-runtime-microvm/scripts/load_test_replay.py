@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""Replay a recorded or synthetic workload against one shared microVM session.
+
+``load_test.py`` and ``load_test_longrun.py`` each drive one fixed task shape.
+This driver replays a JSONL workload (see ``workload.py``): users arrive on
+the recorded timeline, and each runs its own mix of short chats and resumed
+multi-turn builds with the recorded think time between turns. The result
+reports success, latency, cost and the ``/proc`` window per workload kind,
+so a capacity figure reflects the real traffic mix rather than one task.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from arrival import Record, lag_summary
+from histogram import Histogram
+from load_test import invoke_short
+from runtime_session import (
+    MonitorStream,
+    RuntimeSession,
+    attribute_requests,
+    atomic_write_json,
+    cleanup_session,
+    finalize_before_session_stop,
+    new_session_id,
+    start_monitor,
+    usage_summary,
+    utc_iso,
+    validate_session_id,
+    window_stats,
+)
+from workload import WorkloadError, load_workload, replay, workload_stats
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Replay a JSONL workload of user arrivals against one shared microVM "
+            "Runtime session while sampling /proc through InvokeAgentRuntimeCommand."
+        )
+    )
+    parser.add_argument("workload", type=Path, help="JSONL from workload.py")
+    parser.add_argument("--config", default=str(ROOT / "runtime.json"))
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=float(os.environ.get("REPLAY_SPEED", "1")),
+        help="Compress arrival times and think times by this factor (default: 1)",
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=None,
+        help="Cap concurrent users; waits for a worker count as start lag",
+    )
+    parser.add_argument(
+        "--request-timeout",
+        type=int,
+        default=int(os.environ.get("TASK_READ_TIMEOUT_S", "1800")),
+    )
+    parser.add_argument(
+        "--monitor-duration",
+        type=int,
+        default=int(os.environ.get("MONITOR_DURATION_S", "7200")),
+    )
+    parser.add_argument(
+        "--monitor-interval",
+        type=float,
+        default=float(os.environ.get("MONITOR_INTERVAL_S", "0.5")),
+        help="In-VM sampling interval in seconds (default: 0.5)",
+    )
+    parser.add_argument("--session-id")
+    parser.add_argument("--output", help="Result JSON path (default: timestamped)")
+    parser.add_argument(
+        "--keep-session",
+        action="store_true",
+        default=os.environ.get("STOP_SESSION", "1") == "0",
+        help="Skip StopRuntimeSession (also selected by STOP_SESSION=0; billable)",
+    )
+    args = parser.parse_args(argv)
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+    if args.max_workers is not None and args.max_workers < 1:
+        parser.error("--max-workers must be positive")
+    if args.request_timeout < 1:
+        parser.error("--request-timeout must be positive")
+    if not 5 <= args.monitor_duration <= 28800:
+        parser.error("--monitor-duration must be 5..28800 seconds")
+    if not 0.1 <= args.monitor_interval <= 10:
+        parser.error("--monitor-interval must be 0.1..10 seconds")
+    if args.session_id:
+        try:
+            validate_session_id(args.session_id)
+        except ValueError as exc:
+            parser.error(str(exc))
+    try:
+        args.arrivals = load_workload(args.workload)
+    except (OSError, WorkloadError) as exc:
+        parser.error(str(exc))
+    return args
+
+
+def check_workspaces(records: list[Record]) -> int:
+    """Fail arrivals whose workspace another replayed user also reported.
+
+    One trace user can return as several arrivals, so uniqueness is per user
+    id rather than per record as in ``enforce_unique_workspaces``.
+    """
+    owners: dict[str, set[str]] = {}
+    for record in records:
+        for turn in record["turns"]:
+            if isinstance(turn.get("workspace"), str) and turn["workspace"]:
+                owners.setdefault(turn["workspace"], set()).add(record["user_id"])
+    for record in records:
+        shared = any(
+            len(owners.get(turn.get("workspace") or "", ())) > 1
+            for turn in record["turns"]
+        )
+        record["unique_workspace"] = not shared
+        if shared:
+            record["success"] = False
+            record["error"] = record["error"] or "workspace shared with another user"
+    return len(owners)
+
+
+def summarize(records: list[Record], elapsed_s: float) -> dict[str, Any]:
+    """Success, latency and usage for a group of replayed arrivals."""
+    successful = [record for record in records if record["success"]]
+    turns = [turn for record in records for turn in record["turns"]]
+    ok_turns = [turn for turn in turns if turn["turn_success"]]
+    count = len(records)
+    return {
+        "arrivals": count,
+        "success": len(successful),
+        "failed": count - len(successful),
+        "success_rate": round(len(successful) / count, 3) if count else None,
+        "turns_sent": len(turns),
+        "turns_ok": len(ok_turns),
+        **Histogram.of(turn["latency_ms"] for turn in ok_turns).summary("turn"),
+        **Histogram.of(
+            turn["first_delta_ms"]
+            for turn in ok_turns
+            if turn.get("first_delta_ms") is not None
+        ).summary("ttft"),
+        **Histogram.of(record["latency_ms"] / 1000.0 for record in successful).summary(
+            "arrival", unit="s"
+        ),
+        **lag_summary(records),
+        # A success is an arrival whose every turn passed.
+        **usage_summary(
+            (turn.get("usage") for turn in turns), len(successful), elapsed_s
+        ),
+    }
+
+
+def run_replay(
+    session: RuntimeSession,
+    arrivals: list[dict[str, Any]],
+    run_id: str,
+    *,
+    speed: float = 1.0,
+    max_workers: int | None = None,
+) -> dict[str, Any]:
+    window_start = time.time()
+    records = replay(session, arrivals, run_id, speed=speed, max_workers=max_workers)
+    window_end = time.time()
+    distinct_workspaces = check_workspaces(records)
+    elapsed = window_end - window_start
+    kinds = sorted({record["kind"] for record in records})
+    fingerprints = {
+        json.dumps(turn.get("instance"), sort_keys=True)
+        for record in records
+        for turn in record["turns"]
+        if turn.get("instance")
+    }
+    summary = {
+        "window": [window_start, window_end],
+        **summarize(records, elapsed),
+        "kinds": {
+            kind: summarize([r for r in records if r["kind"] == kind], elapsed)
+            for kind in kinds
+        },
+        "distinct_workspaces": distinct_workspaces,
+        "distinct_server_processes": len(fingerprints),
+        "errors": [
+            {
+                "user_id": record["user_id"],
+                "kind": record["kind"],
+                "error": record["error"],
+            }
+            for record in records
+            if not record["success"]
+        ][:10],
+        "requests": records,
+        "monitor_available": False,
+        "resources": {},
+    }
+    print(
+        f"  replay: ok={summary['success']}/{summary['arrivals']} "
+        f"turns={summary['turns_ok']}/{summary['turns_sent']} "
+        f"turn_p50={summary['turn_p50_ms']}ms turn_p90={summary['turn_p90_ms']}ms "
+        f"corrected_p90={summary['corrected_p90_ms']}ms "
+        f"cost/ok=${summary['cost_per_success_usd']} "
+        f"cache_hit={summary['cache_hit_ratio']} "
+        f"processes={summary['distinct_server_processes']}",
+        flush=True,
+    )
+    for kind, stats in summary["kinds"].items():
+        print(
+            f"    {kind:>8}: ok={stats['success']}/{stats['arrivals']} "
+            f"turn_p50={stats['turn_p50_ms']}ms turn_p90={stats['turn_p90_ms']}ms "
+            f"arrival_p90={stats['arrival_p90_s']}s "
+            f"cost/ok=${stats['cost_per_success_usd']}",
+            flush=True,
+        )
+    return summary
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    run_id = uuid.uuid4().hex[:10]
+    session_id = args.session_id or new_session_id(f"shared-replay-{run_id}")
+    if args.output:
+        result_path = Path(args.output)
+    else:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        result_path = ROOT / "results" / f"load_test_replay_{stamp}.json"
+
+    arrivals = args.arrivals
+    shape = workload_stats(arrivals)
+    # Arrivals overlap at most all at once; --max-workers caps that.
+    most_in_flight = args.max_workers or len(arrivals)
+    wall_started = time.perf_counter()
+    session: RuntimeSession | None = None
+    runtime: dict[str, Any] | None = None
+    warmup: dict[str, Any] | None = None
+    result: dict[str, Any] | None = None
+    monitor_samples: list[dict[str, Any]] = []
+    monitor_errors: list[dict[str, str]] = []
+    monitor: MonitorStream | None = None
+    fatal_error: str | None = None
+    cleanup: dict[str, Any] = {
+        "monitor": {"attempted": False, "success": False},
+        "session": {"attempted": False, "success": False},
+    }
+
+    def checkpoint(completed: bool = False) -> None:
+        atomic_write_json(
+            result_path,
+            {
+                "generated": utc_iso(),
+                "completed": completed,
+                "runtime": runtime,
+                "config": {
+                    "run_id": run_id,
+                    "workload": str(args.workload),
+                    "workload_shape": shape,
+                    "speed": args.speed,
+                    "max_workers": args.max_workers,
+                    "request_timeout_s": args.request_timeout,
+                    "monitor_duration_s": args.monitor_duration,
+                    "monitor_interval_s": args.monitor_interval,
+                },
+                "shared_session_id": session_id,
+                "warmup": warmup,
+                "replay": result,
+                "monitor_samples": monitor_samples,
+                "monitor_errors": monitor_errors,
+                "monitor_error": monitor_errors[-1]["error"]
+                if monitor_errors
+                else None,
+                "fatal_error": fatal_error,
+                "cleanup": cleanup,
+                "total_wall_s": round(time.perf_counter() - wall_started, 1),
+            },
+        )
+
+    def collect(stop: bool = False) -> None:
+        nonlocal monitor_samples
+        assert monitor is not None
+        monitor_samples, _ = monitor.poll(stop=stop)
+        if result is not None:
+            result["resources"] = window_stats(monitor_samples, *result["window"])
+            attribute_requests(monitor_samples, result["requests"])
+            result["monitor_available"] = bool(result["resources"])
+
+    print(f"shared session : {session_id}")
+    print(
+        f"workload       : {args.workload} ({shape['arrivals']} arrivals, "
+        f"{shape['turns']} turns, {shape['span_s']}s at speed {args.speed})"
+    )
+    try:
+        session = RuntimeSession.from_config(
+            args.config,
+            session_id,
+            read_timeout=args.request_timeout,
+            max_connections=max(32, most_in_flight + 8),
+            keep_events=False,
+        )
+        runtime = session.runtime
+        print(f"runtime        : {runtime['runtimeArn']}\n")
+
+        print("== phase 0: warmup ==", flush=True)
+        warmup = invoke_short(
+            session, f"replay-{run_id}-warmup", f"READY-{run_id}", None, None
+        )
+        if not (warmup.get("success") and warmup.get("marker_ok")):
+            raise RuntimeError(f"warmup failed: {warmup.get('error')}")
+
+        print("\n== phase 1: start command-channel monitor ==", flush=True)
+        start_monitor(
+            session,
+            run_id,
+            duration=args.monitor_duration,
+            interval=args.monitor_interval,
+        )
+        monitor = MonitorStream(session, run_id)
+        checkpoint()
+
+        print("\n== phase 2: workload replay ==", flush=True)
+        result = run_replay(
+            session,
+            arrivals,
+            run_id,
+            speed=args.speed,
+            max_workers=args.max_workers,
+        )
+        # Request evidence is durable before any monitor command can fail.
+        checkpoint()
+    except Exception as exc:
+        fatal_error = f"{type(exc).__name__}: {exc}"[:1000]
+        print(f"fatal: {fatal_error}", file=sys.stderr)
+    finally:
+        if session is not None:
+
+            def finish_monitor() -> None:
+                if monitor is None:
+                    return
+                cleanup["monitor"]["attempted"] = True
+                try:
+                    collect(stop=True)
+                    cleanup["monitor"].update(
+                        success=True, samples=len(monitor_samples)
+                    )
+                except Exception as exc:
+                    error = f"{type(exc).__name__}: {exc}"[:500]
+                    cleanup["monitor"].update(success=False, error=error)
+                    monitor_errors.append(
+                        {"phase": "final-collection", "at": utc_iso(), "error": error}
+                    )
+                    print(f"final monitor collection failed: {error}", file=sys.stderr)
+
+            def finish_session() -> None:
+                cleanup["session"] = cleanup_session(
+                    session, keep_session=args.keep_session
+                )
+                if args.keep_session:
+                    print(
+                        "WARNING: session retained; compute may remain billable",
+                        file=sys.stderr,
+                    )
+                elif cleanup["session"].get("success"):
+                    print("session stopped")
+                else:
+                    print(
+                        f"session cleanup failed: {cleanup['session'].get('error')}",
+                        file=sys.stderr,
+                    )
+
+            finalize_before_session_stop(finish_monitor, finish_session)
+        checkpoint(completed=fatal_error is None)
+
+    operational_success = (
+        fatal_error is None
+        and result is not None
+        and result.get("monitor_available")
+        and cleanup["monitor"].get("success")
+        and (cleanup["session"].get("success") or args.keep_session)
+    )
+    print(f"\nresults: {result_path}")
+    return 0 if operational_success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,369 @@
+"""DynamoDB-compatible single-table store for the session pool.
+
+The router only needs a handful of DynamoDB behaviours: items addressed by
+``pk``/``sk``, conditional single-item writes, all-or-nothing transactions and
+``begins_with`` queries on the sort key. ``LocalTable`` provides exactly those
+in memory so the router and its service run and are tested without AWS;
+``DynamoTable`` renders the same operations as DynamoDB expressions.
+
+Conditions are tuples of ``(attribute, op, value)`` clauses that must all
+hold. ``op`` is one of ``= <> < <= > >=`` or ``exists``/``not_exists``;
+``value`` may be ``Attr("other")`` to compare two attributes of the item.
+"""
+
+from __future__ import annotations
+
+import copy
+import threading
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Iterable, Union
+
+Item = dict[str, Any]
+Clause = tuple[str, str, Any]
+Condition = tuple[Clause, ...]
+
+_COMPARISONS = {
+    "=": lambda left, right: left == right,
+    "<>": lambda left, right: left != right,
+    "<": lambda left, right: left < right,
+    "<=": lambda left, right: left <= right,
+    ">": lambda left, right: left > right,
+    ">=": lambda left, right: left >= right,
+}
+
+
+class ConditionFailed(RuntimeError):
+    """A conditional write or transaction was rejected; nothing was written."""
+
+
+@dataclass(frozen=True)
+class Attr:
+    """Reference to another attribute of the same item inside a condition."""
+
+    name: str
+
+
+@dataclass
+class Put:
+    item: Item
+    condition: Condition = ()
+
+
+@dataclass
+class Update:
+    """``SET`` values, ``ADD`` numeric deltas and ``REMOVE`` attributes."""
+
+    pk: str
+    sk: str
+    set: Item = field(default_factory=dict)
+    add: dict[str, int | float] = field(default_factory=dict)
+    remove: tuple[str, ...] = ()
+    condition: Condition = ()
+
+
+@dataclass
+class Delete:
+    pk: str
+    sk: str
+    condition: Condition = ()
+
+
+Operation = Union[Put, Update, Delete]
+
+
+def _key(operation: Operation) -> tuple[str, str]:
+    if isinstance(operation, Put):
+        return operation.item["pk"], operation.item["sk"]
+    return operation.pk, operation.sk
+
+
+def matches(item: Item | None, condition: Condition) -> bool:
+    """Evaluate ``condition`` the way DynamoDB would against ``item``."""
+    for name, op, value in condition:
+        present = item is not None and name in item
+        if op == "exists":
+            if not present:
+                return False
+            continue
+        if op == "not_exists":
+            if present:
+                return False
+            continue
+        if op not in _COMPARISONS:
+            raise ValueError(f"unsupported condition operator: {op}")
+        if isinstance(value, Attr):
+            if item is None or value.name not in item:
+                return False
+            value = item[value.name]
+        if not present:
+            return False
+        try:
+            if not _COMPARISONS[op](item[name], value):  # type: ignore[index]
+                return False
+        except TypeError:
+            return False
+    return True
+
+
+def _apply(current: Item | None, operation: Operation) -> Item | None:
+    if isinstance(operation, Put):
+        return copy.deepcopy(operation.item)
+    if isinstance(operation, Delete):
+        return None
+    item: Item = (
+        copy.deepcopy(current)
+        if current is not None
+        else {
+            "pk": operation.pk,
+            "sk": operation.sk,
+        }
+    )
+    item.update(copy.deepcopy(operation.set))
+    for name, delta in operation.add.items():
+        item[name] = item.get(name, 0) + delta
+    for name in operation.remove:
+        item.pop(name, None)
+    return item
+
+
+class LocalTable:
+    """In-memory stand-in with DynamoDB's conditional-write semantics.
+
+    A single lock serializes writes, which is what makes each conditional
+    write and transaction atomic, as they are in DynamoDB.
+    """
+
+    def __init__(self) -> None:
+        self._items: dict[tuple[str, str], Item] = {}
+        self._lock = threading.Lock()
+
+    def get(self, pk: str, sk: str) -> Item | None:
+        with self._lock:
+            item = self._items.get((pk, sk))
+            return copy.deepcopy(item) if item is not None else None
+
+    def query(self, pk: str, sk_prefix: str = "") -> list[Item]:
+        with self._lock:
+            return [
+                copy.deepcopy(item)
+                for (item_pk, sk), item in sorted(self._items.items())
+                if item_pk == pk and sk.startswith(sk_prefix)
+            ]
+
+    def write(self, operation: Operation) -> None:
+        self.transact([operation])
+
+    def transact(self, operations: Iterable[Operation]) -> None:
+        operations = list(operations)
+        keys = [_key(operation) for operation in operations]
+        if len(set(keys)) != len(keys):
+            raise ValueError("a transaction may touch each item only once")
+        with self._lock:
+            for key, operation in zip(keys, operations):
+                if not matches(self._items.get(key), operation.condition):
+                    raise ConditionFailed(f"condition failed for {key[0]}/{key[1]}")
+            for key, operation in zip(keys, operations):
+                item = _apply(self._items.get(key), operation)
+                if item is None:
+                    self._items.pop(key, None)
+                else:
+                    self._items[key] = item
+
+
+def to_attribute(value: Any) -> dict[str, Any]:
+    """Serialize a plain Python value as a DynamoDB AttributeValue."""
+    if value is None:
+        return {"NULL": True}
+    if isinstance(value, bool):
+        return {"BOOL": value}
+    if isinstance(value, (int, float, Decimal)):
+        return {"N": str(value)}
+    if isinstance(value, str):
+        return {"S": value}
+    if isinstance(value, dict):
+        return {"M": {key: to_attribute(item) for key, item in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {"L": [to_attribute(item) for item in value]}
+    raise TypeError(f"cannot store {type(value).__name__} in DynamoDB")
+
+
+def from_attribute(value: dict[str, Any]) -> Any:
+    ((kind, raw),) = value.items()
+    if kind == "NULL":
+        return None
+    if kind == "N":
+        number = Decimal(raw)
+        return int(number) if number == number.to_integral_value() else float(number)
+    if kind == "M":
+        return {key: from_attribute(item) for key, item in raw.items()}
+    if kind == "L":
+        return [from_attribute(item) for item in raw]
+    return raw
+
+
+class _Expression:
+    """Accumulates ``#name``/``:value`` placeholders for one request."""
+
+    def __init__(self) -> None:
+        self.names: dict[str, str] = {}
+        self.values: dict[str, Any] = {}
+
+    def name(self, name: str) -> str:
+        placeholder = f"#n{len(self.names)}"
+        self.names[placeholder] = name
+        return placeholder
+
+    def value(self, value: Any) -> str:
+        placeholder = f":v{len(self.values)}"
+        self.values[placeholder] = to_attribute(value)
+        return placeholder
+
+    def condition(self, condition: Condition) -> str | None:
+        clauses = []
+        for name, op, value in condition:
+            if op == "exists":
+                clauses.append(f"attribute_exists({self.name(name)})")
+            elif op == "not_exists":
+                clauses.append(f"attribute_not_exists({self.name(name)})")
+            else:
+                left = self.name(name)
+                if isinstance(value, Attr):
+                    right = self.name(value.name)
+                else:
+                    right = self.value(value)
+                clauses.append(f"{left} {op} {right}")
+        return " AND ".join(clauses) or None
+
+    def request(self, **fields: Any) -> dict[str, Any]:
+        request = {key: value for key, value in fields.items() if value is not None}
+        if self.names:
+            request["ExpressionAttributeNames"] = self.names
+        if self.values:
+            request["ExpressionAttributeValues"] = self.values
+        return request
+
+
+def _key_attributes(pk: str, sk: str) -> dict[str, Any]:
+    return {"pk": {"S": pk}, "sk": {"S": sk}}
+
+
+def render(operation: Operation, table_name: str) -> tuple[str, dict[str, Any]]:
+    """Return the ``(Put|Update|Delete, request)`` pair for ``operation``."""
+    expression = _Expression()
+    if isinstance(operation, Put):
+        item = {key: to_attribute(value) for key, value in operation.item.items()}
+        condition = expression.condition(operation.condition)
+        return "Put", expression.request(
+            TableName=table_name, Item=item, ConditionExpression=condition
+        )
+    if isinstance(operation, Delete):
+        condition = expression.condition(operation.condition)
+        return "Delete", expression.request(
+            TableName=table_name,
+            Key=_key_attributes(operation.pk, operation.sk),
+            ConditionExpression=condition,
+        )
+    parts = []
+    if operation.set:
+        assignments = [
+            f"{expression.name(name)} = {expression.value(value)}"
+            for name, value in operation.set.items()
+        ]
+        parts.append("SET " + ", ".join(assignments))
+    if operation.add:
+        deltas = [
+            f"{expression.name(name)} {expression.value(delta)}"
+            for name, delta in operation.add.items()
+        ]
+        parts.append("ADD " + ", ".join(deltas))
+    if operation.remove:
+        removed = [expression.name(name) for name in operation.remove]
+        parts.append("REMOVE " + ", ".join(removed))
+    condition = expression.condition(operation.condition)
+    return "Update", expression.request(
+        TableName=table_name,
+        Key=_key_attributes(operation.pk, operation.sk),
+        UpdateExpression=" ".join(parts) or None,
+        ConditionExpression=condition,
+    )
+
+
+class DynamoTable:
+    """The same interface backed by a DynamoDB table keyed by ``pk``/``sk``.
+
+    ``client`` is a boto3 ``dynamodb`` client; boto3 is imported only by
+    ``from_region`` so the rest of the module works without it.
+    """
+
+    def __init__(self, client: Any, table_name: str) -> None:
+        self.client = client
+        self.table_name = table_name
+
+    @classmethod
+    def from_region(cls, table_name: str, region: str) -> "DynamoTable":
+        import boto3
+
+        return cls(boto3.client("dynamodb", region_name=region), table_name)
+
+    def get(self, pk: str, sk: str) -> Item | None:
+        response = self.client.get_item(
+            TableName=self.table_name, Key=_key_attributes(pk, sk), ConsistentRead=True
+        )
+        item = response.get("Item")
+        return {k: from_attribute(v) for k, v in item.items()} if item else None
+
+    def query(self, pk: str, sk_prefix: str = "") -> list[Item]:
+        expression = _Expression()
+        condition = f"{expression.name('pk')} = {expression.value(pk)}"
+        if sk_prefix:
+            sk_name, prefix = expression.name("sk"), expression.value(sk_prefix)
+            condition += f" AND begins_with({sk_name}, {prefix})"
+        request = expression.request(
+            TableName=self.table_name,
+            KeyConditionExpression=condition,
+            ConsistentRead=True,
+        )
+        items: list[Item] = []
+        while True:
+            response = self.client.query(**request)
+            items.extend(
+                {k: from_attribute(v) for k, v in item.items()}
+                for item in response.get("Items", [])
+            )
+            if "LastEvaluatedKey" not in response:
+                return items
+            request["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    def write(self, operation: Operation) -> None:
+        kind, request = render(operation, self.table_name)
+        method = {
+            "Put": self.client.put_item,
+            "Update": self.client.update_item,
+            "Delete": self.client.delete_item,
+        }[kind]
+        try:
+            method(**request)
+        except Exception as exc:
+            if _error_code(exc) == "ConditionalCheckFailedException":
+                raise ConditionFailed(str(exc)) from exc
+            raise
+
+    def transact(self, operations: Iterable[Operation]) -> None:
+        items = [
+            {kind: request}
+            for kind, request in (render(op, self.table_name) for op in operations)
+        ]
+        try:
+            self.client.transact_write_items(TransactItems=items)
+        except Exception as exc:
+            if _error_code(exc) == "TransactionCanceledException":
+                raise ConditionFailed(str(exc)) from exc
+            raise
+
+
+def _error_code(exc: Exception) -> str | None:
+    response = getattr(exc, "response", None)
+    if isinstance(response, dict):
+        return response.get("Error", {}).get("Code")
+    return None
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""Small HTTP service around ``SessionRouter``.
+
+Front ends call it before and after each AgentCore invocation:
+
+``POST /route``      ``{"user_id", "request_id"}`` -> 200 lease, 429 when every
+                     session is full (retry or queue), 409 for a replayed ID
+``POST /heartbeat``  ``{"lease"}`` -> 200, or 410 once the lease was reclaimed
+``POST /release``    ``{"lease", "success", "boot_id"}`` -> 200
+``GET  /pool``       sessions, per-status counts and router counters
+
+A background thread runs ``reconcile`` and ``scale`` every ``--tick``
+seconds. ``--table local`` keeps state in memory (one process only); any other
+value names a DynamoDB table with string keys ``pk``/``sk`` that several
+service replicas can share. With ``--runtime-config``, sessions the scaler
+takes out of service are stopped through StopRuntimeSession.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+
+from pool_store import DynamoTable, LocalTable
+from runtime_session import RuntimeSession, validate_session_id
+from session_router import (
+    Backpressure,
+    DuplicateRequest,
+    Lease,
+    RouterConfig,
+    SessionRouter,
+)
+
+log = logging.getLogger("session-router")
+MAX_BODY_BYTES = 64 * 1024
+
+
+def make_handler(router: SessionRouter) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:
+            log.debug(format, *args)
+
+        def _reply(self, status: int, payload: dict[str, Any]) -> None:
+            body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self) -> dict[str, Any]:
+            length = int(self.headers.get("Content-Length") or 0)
+            if not 0 < length <= MAX_BODY_BYTES:
+                raise ValueError("request body must be 1..65536 bytes of JSON")
+            value = json.loads(self.rfile.read(length))
+            if not isinstance(value, dict):
+                raise ValueError("request body must be a JSON object")
+            return value
+
+        def do_GET(self) -> None:
+            if self.path == "/pool":
+                self._reply(200, router.snapshot())
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self) -> None:
+            routes: dict[str, Callable[[dict[str, Any]], tuple[int, dict]]] = {
+                "/route": self._route,
+                "/heartbeat": self._heartbeat,
+                "/release": self._release,
+            }
+            handler = routes.get(self.path)
+            if handler is None:
+                self._reply(404, {"error": "not found"})
+                return
+            try:
+                status, payload = handler(self._body())
+            except (ValueError, KeyError, TypeError) as exc:
+                status, payload = 400, {"error": f"{type(exc).__name__}: {exc}"}
+            except Exception as exc:
+                log.exception("router request failed")
+                status, payload = 500, {"error": type(exc).__name__}
+            self._reply(status, payload)
+
+        def _route(self, body: dict[str, Any]) -> tuple[int, dict]:
+            user_id, request_id = body["user_id"], body["request_id"]
+            if not isinstance(user_id, str) or not isinstance(request_id, str):
+                raise ValueError("user_id and request_id must be strings")
+            try:
+                lease = router.route(user_id, request_id)
+            except Backpressure as exc:
+                return 429, {"error": "backpressure", "reason": str(exc)}
+            except DuplicateRequest as exc:
+                return 409, {"error": "duplicate", "reason": str(exc)}
+            return 200, {"lease": lease.to_dict()}
+
+        def _heartbeat(self, body: dict[str, Any]) -> tuple[int, dict]:
+            if router.heartbeat(Lease.from_dict(body["lease"])):
+                return 200, {"renewed": True}
+            return 410, {"renewed": False}
+
+        def _release(self, body: dict[str, Any]) -> tuple[int, dict]:
+            released = router.release(
+                Lease.from_dict(body["lease"]),
+                success=bool(body.get("success", True)),
+                boot_id=body.get("boot_id"),
+            )
+            return 200, {"released": released}
+
+    return Handler
+
+
+def run_control_loop(router: SessionRouter, stop: threading.Event, tick: float) -> None:
+    while not stop.wait(tick):
+        try:
+            actions = router.reconcile()
+            plan = router.scale()
+        except Exception:
+            log.exception("reconcile/scale tick failed")
+            continue
+        if any(actions.values()) or plan["started"] or plan["stopped"]:
+            log.info("pool actions=%s plan=%s", actions, plan)
+
+
+def stop_callback(config_path: str) -> Callable[[str], Any]:
+    def stop(session_id: str) -> Any:
+        session = RuntimeSession.from_config(
+            config_path, validate_session_id(session_id), read_timeout=60
+        )
+        return session.stop()
+
+    return stop
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    defaults = RouterConfig()
+    parser = argparse.ArgumentParser(description=(__doc__ or "").split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument(
+        "--table", default="local", help="'local' or a DynamoDB table name"
+    )
+    parser.add_argument("--region", default="us-west-2")
+    parser.add_argument("--pool", default=defaults.pool)
+    parser.add_argument("--max-inflight", type=int, default=defaults.max_inflight)
+    parser.add_argument("--target-inflight", type=int, default=defaults.target_inflight)
+    parser.add_argument("--min-warm", type=int, default=defaults.min_warm)
+    parser.add_argument("--lease-ttl", type=float, default=defaults.lease_ttl_s)
+    parser.add_argument("--idle-stop", type=float, default=defaults.idle_stop_s)
+    parser.add_argument("--tick", type=float, default=10.0)
+    parser.add_argument("--runtime-config", help="runtime.json for StopRuntimeSession")
+    args = parser.parse_args(argv)
+    if args.tick <= 0:
+        parser.error("--tick must be positive")
+    try:
+        args.config = RouterConfig(
+            pool=args.pool,
+            max_inflight=args.max_inflight,
+            target_inflight=args.target_inflight,
+            min_warm=args.min_warm,
+            lease_ttl_s=args.lease_ttl,
+            idle_stop_s=args.idle_stop,
+        )
+    except ValueError as exc:
+        parser.error(str(exc))
+    return args
+
+
+def main(argv: list[str] | None = None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    args = parse_args(argv)
+    table: Any = (
+        LocalTable()
+        if args.table == "local"
+        else DynamoTable.from_region(args.table, args.region)
+    )
+    router = SessionRouter(
+        table,
+        args.config,
+        stop=stop_callback(args.runtime_config) if args.runtime_config else None,
+    )
+    router.scale()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(router))
+    stop = threading.Event()
+    loop = threading.Thread(
+        target=run_control_loop, args=(router, stop, args.tick), daemon=True
+    )
+    loop.start()
+    log.info("session router listening on http://%s:%d", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,7 +18,7 @@ import tempfile
 import time
 import uuid
 from pathlib import Path
-from typing import Any, Callable, Iterable
+from typing import Any, Callable, Iterable, Iterator
 
 SESSION_ID_RE = re.compile(r"^[A-Za-z0-9](?:-*[A-Za-z0-9])*$")
 RUN_ID_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
@@ -34,6 +34,10 @@ MONITOR_HEADER = (
 )
 
 
+# "rejected" is the server's admission-control answer to a queue deadline.
+APP_ERROR_EVENTS = frozenset({"error", "rejected"})
+
+
 class RuntimeConfigError(ValueError):
     """Raised when runtime.json is missing required values."""
 
@@ -149,14 +153,54 @@ def enforce_unique_workspaces(records: list[dict[str, Any]], success_key: str) -
     return len(counts)
 
 
-def percentile(values: list[float], pct: float) -> float | None:
-    if not values:
-        return None
-    ordered = sorted(values)
-    position = (len(ordered) - 1) * pct / 100.0
-    low = int(position)
-    high = min(low + 1, len(ordered) - 1)
-    return round(ordered[low] + (ordered[high] - ordered[low]) * (position - low), 1)
+USAGE_TOKEN_FIELDS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+)
+
+
+def usage_summary(
+    usages: Iterable[dict[str, Any] | None], successes: int, elapsed_s: float
+) -> dict[str, Any]:
+    """Total the ``complete`` events' usage into cost, throughput and caching.
+
+    Cost per success divides everything spent, failed turns included, by the
+    successful ones. Tokens per second use the phase's wall-clock window. The
+    cache hit ratio is the share of input tokens read from the prompt cache;
+    users only share cache entries when they report one ``cache_prefix``.
+    """
+    usages = [usage for usage in usages if isinstance(usage, dict)]
+    totals = {
+        name: sum(int(usage.get(name) or 0) for usage in usages)
+        for name in USAGE_TOKEN_FIELDS
+    }
+    costs = [
+        usage["total_cost_usd"]
+        for usage in usages
+        if isinstance(usage.get("total_cost_usd"), (int, float))
+    ]
+    cost = round(sum(costs), 6) if costs else None
+    elapsed_s = max(elapsed_s, 1e-9)
+    cached = totals["cache_read_input_tokens"]
+    all_input = cached + totals["input_tokens"] + totals["cache_creation_input_tokens"]
+    return {
+        "usage_reported": len(usages),
+        **{f"{name}_total": value for name, value in totals.items()},
+        "cache_hit_ratio": round(cached / all_input, 4) if all_input else None,
+        "distinct_cache_prefixes": len(
+            {usage["cache_prefix"] for usage in usages if usage.get("cache_prefix")}
+        ),
+        "total_cost_usd": cost,
+        "cost_per_success_usd": (
+            round(cost / successes, 6) if cost is not None and successes else None
+        ),
+        "tokens_per_s": round(
+            (totals["input_tokens"] + totals["output_tokens"]) / elapsed_s, 1
+        ),
+        "output_tokens_per_s": round(totals["output_tokens"] / elapsed_s, 1),
+    }
 
 
 def atomic_write_json(path: str | Path, payload: Any) -> None:
@@ -180,12 +224,8 @@ def atomic_write_json(path: str | Path, payload: Any) -> None:
         raise
 
 
-def _decode_blob(value: Any) -> str:
-    if value is None:
-        return ""
-    if isinstance(value, bytes):
-        return value.decode("utf-8", errors="replace")
-    return str(value)
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000.0, 1)
 
 
 def _api_status(response: dict[str, Any]) -> int | None:
@@ -196,22 +236,81 @@ def _api_status(response: dict[str, Any]) -> int | None:
     return status if isinstance(status, int) else None
 
 
-def _read_response_body(body: Any) -> str:
-    value = body.read() if hasattr(body, "read") else body
-    return _decode_blob(value)
+SSE_CHUNK_BYTES = 16 * 1024
+SSE_LINE_END = re.compile(rb"\r\n|\r|\n")
 
 
-def parse_sse(raw: str | bytes) -> list[dict[str, Any]]:
-    """Parse application SSE, including multi-line ``data:`` fields."""
-    text = _decode_blob(raw).replace("\r\n", "\n").replace("\r", "\n")
-    events: list[dict[str, Any]] = []
-    data_lines: list[str] = []
+def iter_body_chunks(body: Any, chunk_size: int = SSE_CHUNK_BYTES) -> Iterator[bytes]:
+    """Yield a response body as it arrives.
 
-    def flush() -> None:
-        if not data_lines:
+    botocore ``StreamingBody`` exposes ``iter_chunks``; anything else with
+    ``read()`` (test doubles, already-buffered bodies) is read in one piece.
+    """
+    if hasattr(body, "iter_chunks"):
+        for chunk in body.iter_chunks(chunk_size):
+            if chunk:
+                yield chunk
+        return
+    value = body.read() if hasattr(body, "read") else body
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    if value:
+        yield bytes(value)
+
+
+class SSEDecoder:
+    """Incremental SSE decoder for JSON ``data:`` events.
+
+    ``feed`` accepts arbitrary byte chunks, including ones that split a line,
+    a CRLF pair, or a multi-byte UTF-8 character, and returns the events that
+    are complete so far. Only the current partial line and the current event's
+    ``data`` lines are buffered.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self._data_lines: list[str] = []
+
+    def feed(self, chunk: bytes) -> list[dict[str, Any]]:
+        self._buffer += chunk
+        events: list[dict[str, Any]] = []
+        start = 0
+        while match := SSE_LINE_END.search(self._buffer, start):
+            if match.group() == b"\r" and match.end() == len(self._buffer):
+                break  # The next chunk may complete a CRLF pair.
+            self._line(bytes(self._buffer[start : match.start()]), events)
+            start = match.end()
+        del self._buffer[:start]
+        return events
+
+    def close(self) -> list[dict[str, Any]]:
+        """Flush a final line and event that were not newline-terminated."""
+        events: list[dict[str, Any]] = []
+        if self._buffer:
+            line = bytes(self._buffer.rstrip(b"\r"))
+            self._buffer.clear()
+            self._line(line, events)
+        self._flush(events)
+        return events
+
+    def _line(self, raw: bytes, events: list[dict[str, Any]]) -> None:
+        if not raw:
+            self._flush(events)
             return
-        data = "\n".join(data_lines)
-        data_lines.clear()
+        line = raw.decode("utf-8", errors="replace")
+        if line.startswith(":"):
+            return
+        if line == "data":
+            self._data_lines.append("")
+        elif line.startswith("data:"):
+            value = line[5:]
+            self._data_lines.append(value[1:] if value.startswith(" ") else value)
+
+    def _flush(self, events: list[dict[str, Any]]) -> None:
+        if not self._data_lines:
+            return
+        data = "\n".join(self._data_lines)
+        self._data_lines.clear()
         if data == "[DONE]":
             return
         try:
@@ -222,18 +321,114 @@ def parse_sse(raw: str | bytes) -> list[dict[str, Any]]:
             raise SSEParseError("SSE data must decode to a JSON object")
         events.append(event)
 
-    for line in text.split("\n"):
-        if not line:
-            flush()
-        elif line.startswith(":"):
-            continue
-        elif line == "data":
-            data_lines.append("")
-        elif line.startswith("data:"):
-            value = line[5:]
-            data_lines.append(value[1:] if value.startswith(" ") else value)
-    flush()
-    return events
+
+def iter_sse(
+    body: Any, on_chunk: Callable[[bytes], None] | None = None
+) -> Iterator[dict[str, Any]]:
+    """Yield application SSE events from a response body as chunks arrive."""
+    decoder = SSEDecoder()
+    for chunk in iter_body_chunks(body):
+        if on_chunk is not None:
+            on_chunk(chunk)
+        yield from decoder.feed(chunk)
+    yield from decoder.close()
+
+
+def parse_sse(raw: str | bytes) -> list[dict[str, Any]]:
+    """Parse application SSE, including multi-line ``data:`` fields."""
+    return list(iter_sse(raw))
+
+
+def invocation_payload(user_id: str, prompt: str, *, reset: bool) -> bytes:
+    if not isinstance(prompt, str) or not prompt.strip():
+        raise ValueError("prompt must be non-empty")
+    return json.dumps(
+        {"prompt": prompt, "user_id": user_id, "reset": reset},
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class InvocationRecorder:
+    """Fold one invocation's SSE events, as they arrive, into a result record.
+
+    Shared by the boto3 ``RuntimeSession`` and the asyncio load driver so both
+    report the same fields. Create it when the response headers arrive, pass
+    ``chunk`` as the body callback, and ``add`` every decoded event.
+    """
+
+    def __init__(self, started: float, *, keep_events: bool = True) -> None:
+        self.started = started
+        self.keep_events = keep_events
+        self.marks: dict[str, float] = {"headers_ms": _elapsed_ms(started)}
+        self.events: list[dict[str, Any]] = []
+        self.complete: dict[str, Any] = {}
+        self.error_event: dict[str, Any] | None = None
+        self.tool_call_count = 0
+
+    def chunk(self, _chunk: bytes) -> None:
+        self.marks.setdefault("ttfb_ms", _elapsed_ms(self.started))
+
+    def add(self, event: dict[str, Any]) -> None:
+        name = event.get("event")
+        if self.keep_events:
+            self.events.append(event)
+        if name == "delta":
+            self.marks.setdefault("first_delta_ms", _elapsed_ms(self.started))
+        elif name == "tool":
+            self.tool_call_count += 1
+        elif name == "complete":
+            self.complete = event
+            self.marks["complete_ms"] = _elapsed_ms(self.started)
+        elif name in APP_ERROR_EVENTS and self.error_event is None:
+            self.error_event = event
+
+    def result(self, status: int | None) -> dict[str, Any]:
+        complete = self.complete
+        error_event = self.error_event
+        result_text = complete.get("result")
+        success = (
+            status == 200
+            and bool(complete)
+            and error_event is None
+            and not complete.get("is_error")
+            and result_text is not None
+        )
+        error = None
+        if status != 200:
+            error = f"InvokeAgentRuntime status {status!r}"
+        elif error_event is not None:
+            error = error_event.get("message") or "application error event"
+        elif not complete:
+            error = "complete SSE event missing"
+        elif complete.get("is_error"):
+            error = "agent returned is_error=true"
+        elif result_text is None:
+            error = "complete SSE event has no result"
+        return {
+            "success": success,
+            "api_status": status,
+            "latency_ms": _elapsed_ms(self.started),
+            "result": result_text,
+            "error": error,
+            "events": self.events,
+            "workspace": complete.get("workspace"),
+            "claude_session_id": complete.get("claude_session_id"),
+            "resumed_from": complete.get("resumed_from"),
+            "denied_count": complete.get("denied_count", 0),
+            "usage": complete.get("usage"),
+            "server_latency_ms": complete.get("latency_ms"),
+            "instance": complete.get("instance") or (error_event or {}).get("instance"),
+            "rejected_reason": (
+                error_event.get("reason")
+                if error_event is not None and error_event.get("event") == "rejected"
+                else None
+            ),
+            "tool_call_count": self.tool_call_count,
+            "headers_ms": self.marks["headers_ms"],
+            "ttfb_ms": self.marks.get("ttfb_ms"),
+            "first_delta_ms": self.marks.get("first_delta_ms"),
+            "complete_ms": self.marks.get("complete_ms"),
+        }
 
 
 def _is_retryable_conflict(exc: BaseException) -> bool:
@@ -458,11 +653,14 @@ class RuntimeSession:
         client: Any,
         *,
         conflict_attempts: int = 5,
+        keep_events: bool = True,
     ) -> None:
         self.runtime = runtime
         self.session_id = validate_session_id(session_id)
         self.client = client
         self.conflict_attempts = conflict_attempts
+        # Load tests fold events as they stream and drop transcripts.
+        self.keep_events = keep_events
 
     @classmethod
     def from_config(
@@ -472,12 +670,13 @@ class RuntimeSession:
         *,
         read_timeout: int = 1200,
         max_connections: int = 64,
+        keep_events: bool = True,
     ) -> "RuntimeSession":
         runtime = load_runtime_config(config_path)
         client = create_agentcore_client(
             runtime, read_timeout=read_timeout, max_connections=max_connections
         )
-        return cls(runtime, session_id, client)
+        return cls(runtime, session_id, client, keep_events=keep_events)
 
     def _base_request(self) -> dict[str, Any]:
         request = {
@@ -490,16 +689,11 @@ class RuntimeSession:
         return request
 
     def invoke(self, user_id: str, prompt: str, *, reset: bool) -> dict[str, Any]:
-        if not isinstance(prompt, str) or not prompt.strip():
-            raise ValueError("prompt must be non-empty")
         request = self._base_request()
         request.update(
             {
                 "runtimeUserId": user_id,
-                "payload": json.dumps(
-                    {"prompt": prompt, "user_id": user_id, "reset": reset},
-                    separators=(",", ":"),
-                ).encode("utf-8"),
+                "payload": invocation_payload(user_id, prompt, reset=reset),
                 "contentType": "application/json",
                 "accept": "text/event-stream",
             }
@@ -509,48 +703,10 @@ class RuntimeSession:
             lambda: self.client.invoke_agent_runtime(**request),
             attempts=self.conflict_attempts,
         )
-        status = _api_status(response)
-        events = parse_sse(_read_response_body(response.get("response", b"")))
-        complete = next(
-            (event for event in reversed(events) if event.get("event") == "complete"),
-            {},
-        )
-        error_event = next(
-            (event for event in events if event.get("event") == "error"), None
-        )
-        result_text = complete.get("result")
-        success = (
-            status == 200
-            and bool(complete)
-            and error_event is None
-            and not complete.get("is_error")
-            and result_text is not None
-        )
-        error = None
-        if status != 200:
-            error = f"InvokeAgentRuntime status {status!r}"
-        elif error_event is not None:
-            error = error_event.get("message") or "application error event"
-        elif not complete:
-            error = "complete SSE event missing"
-        elif complete.get("is_error"):
-            error = "agent returned is_error=true"
-        elif result_text is None:
-            error = "complete SSE event has no result"
-        return {
-            "success": success,
-            "api_status": status,
-            "latency_ms": round((time.perf_counter() - started) * 1000.0, 1),
-            "result": result_text,
-            "error": error,
-            "events": events,
-            "workspace": complete.get("workspace"),
-            "claude_session_id": complete.get("claude_session_id"),
-            "resumed_from": complete.get("resumed_from"),
-            "denied_count": complete.get("denied_count", 0),
-            "instance": complete.get("instance") or (error_event or {}).get("instance"),
-            "tool_call_count": sum(event.get("event") == "tool" for event in events),
-        }
+        recorder = InvocationRecorder(started, keep_events=self.keep_events)
+        for event in iter_sse(response.get("response", b""), recorder.chunk):
+            recorder.add(event)
+        return recorder.result(_api_status(response))
 
     def command(
         self, command: str, *, timeout: int = 60, require_success: bool = False
@@ -654,103 +810,221 @@ def _monitor_dir(run_id: str) -> str:
 
 
 _MONITOR_PROGRAM = r"""#!/usr/bin/env python3
+import json
+import os
 import sys
 import time
-from pathlib import Path
 
-DURATION = int(sys.argv[1])
-OUTPUT = Path(sys.argv[2])
+DURATION = float(sys.argv[1])
+OUTPUT = sys.argv[2]
+INTERVAL = float(sys.argv[3])
+USERS_ROOT = sys.argv[4].rstrip("/") + "/"
+AGENT_COMMS = {"node", "claude"}
+TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_KB = os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def read(path):
+    try:
+        with open(path) as handle:
+            return handle.read()
+    except OSError:
+        return None
 
 
 def cpu_totals():
-    values = [int(v) for v in Path("/proc/stat").read_text().splitlines()[0].split()[1:]]
+    values = [int(v) for v in read("/proc/stat").splitlines()[0].split()[1:]]
     idle = values[3] + (values[4] if len(values) > 4 else 0)
     return sum(values), idle
 
 
 def memory_mb():
     values = {}
-    for line in Path("/proc/meminfo").read_text().splitlines():
+    for line in read("/proc/meminfo").splitlines():
         key, raw = line.split(":", 1)
         values[key] = int(raw.strip().split()[0])
     return (values["MemTotal"] - values["MemAvailable"]) / 1024.0, values["MemAvailable"] / 1024.0
 
 
-def agent_processes():
-    count = 0
-    for path in Path("/proc").glob("[0-9]*/comm"):
+def cgroup_mb(name):
+    raw = (read("/sys/fs/cgroup/" + name) or "").strip()
+    return round(int(raw) / 1048576.0, 3) if raw.isdigit() else None
+
+
+def psi_totals():
+    totals = {}
+    for resource in ("cpu", "memory", "io"):
+        text = read(f"/sys/fs/cgroup/{resource}.pressure") or read(f"/proc/pressure/{resource}")
+        for line in (text or "").splitlines():
+            kind, _, fields = line.partition(" ")
+            for field in fields.split():
+                if field.startswith("total="):
+                    totals[f"{resource}_{kind}"] = int(field[6:])
+    return totals
+
+
+def processes():
+    agents = 0
+    found = {}
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        base = "/proc/" + entry.name
+        stat = read(base + "/stat")
+        if not stat:
+            continue
+        comm, _, rest = stat.partition(" (")[2].rpartition(") ")
+        if comm in AGENT_COMMS:
+            agents += 1
         try:
-            if path.read_text().strip() in {"node", "claude"}:
-                count += 1
+            cwd = os.readlink(base + "/cwd")
         except OSError:
-            pass
-    return count
+            continue
+        if not cwd.startswith(USERS_ROOT):
+            continue
+        fields = rest.split()
+        try:
+            fds = len(os.listdir(base + "/fd"))
+        except OSError:
+            fds = 0
+        found[entry.name] = (
+            cwd[len(USERS_ROOT):].split("/", 1)[0],
+            int(fields[11]) + int(fields[12]),
+            int(fields[21]) * PAGE_KB,
+            fds,
+        )
+    return agents, found
 
 
-def cgroup_mb(name):
-    try:
-        raw = Path("/sys/fs/cgroup", name).read_text().strip()
-        return "" if raw == "max" else str(round(int(raw) / 1048576.0, 3))
-    except (OSError, ValueError):
-        return ""
+def open_fds():
+    text = read("/proc/sys/fs/file-nr")
+    return int(text.split()[0]) if text else None
 
 
-OUTPUT.write_text("epoch,cpu_pct,mem_used_mb,mem_avail_mb,load1,agent_procs,cgroup_memory_current_mb,cgroup_memory_max_mb\n")
 end = time.time() + DURATION
 previous_total, previous_idle = cpu_totals()
-time.sleep(2)
-with OUTPUT.open("a", buffering=1) as output:
+previous_psi = psi_totals()
+previous_ticks = {pid: item[1] for pid, item in processes()[1].items()}
+previous_at = time.monotonic()
+next_at = previous_at + INTERVAL
+with open(OUTPUT, "a", buffering=1) as output:
     while time.time() < end:
+        time.sleep(max(0.0, next_at - time.monotonic()))
+        next_at += INTERVAL
+        now = time.monotonic()
+        elapsed = max(now - previous_at, 1e-6)
+        previous_at = now
         total, idle = cpu_totals()
         delta = max(total - previous_total, 1)
         cpu = round(100.0 * (delta - (idle - previous_idle)) / delta, 1)
         previous_total, previous_idle = total, idle
+        psi = psi_totals()
+        stalls = {
+            key: round((value - previous_psi.get(key, value)) / 1e4 / elapsed, 2)
+            for key, value in psi.items()
+        }
+        previous_psi = psi
+        agents, found = processes()
+        workspaces = {}
+        for pid, (workspace, ticks, rss_kb, fds) in found.items():
+            usage = workspaces.setdefault(
+                workspace, {"procs": 0, "rss_mb": 0.0, "cpu_pct": 0.0, "fds": 0}
+            )
+            usage["procs"] += 1
+            usage["rss_mb"] += rss_kb / 1024.0
+            usage["cpu_pct"] += 100.0 * (ticks - previous_ticks.get(pid, ticks)) / TICKS / elapsed
+            usage["fds"] += fds
+        previous_ticks = {pid: item[1] for pid, item in found.items()}
+        for usage in workspaces.values():
+            usage["rss_mb"] = round(usage["rss_mb"], 1)
+            usage["cpu_pct"] = round(usage["cpu_pct"], 1)
         used, available = memory_mb()
-        output.write(
-            f"{time.time():.3f},{cpu},{used:.3f},{available:.3f},"
-            f"{Path('/proc/loadavg').read_text().split()[0]},{agent_processes()},"
-            f"{cgroup_mb('memory.current')},{cgroup_mb('memory.max')}\n"
-        )
-        time.sleep(2)
+        sample = {
+            "epoch": round(time.time(), 3),
+            "cpu_pct": cpu,
+            "mem_used_mb": round(used, 3),
+            "mem_avail_mb": round(available, 3),
+            "load1": float(read("/proc/loadavg").split()[0]),
+            "agent_procs": agents,
+            "cgroup_memory_current_mb": cgroup_mb("memory.current"),
+            "cgroup_memory_max_mb": cgroup_mb("memory.max"),
+            "fds_open": open_fds(),
+            "psi": stalls,
+            "workspaces": workspaces,
+        }
+        output.write(json.dumps(sample, separators=(",", ":")) + "\n")
 """
 
+MONITOR_FILE = "monitor.jsonl"
+MONITOR_READ_BYTES = 1 << 20
+_SIZE_LINE_RE = re.compile(r"^monitor_size=(\d+)$")
+
 
 def start_monitor(
-    session: RuntimeSession, run_id: str, *, duration: int = 3600
+    session: RuntimeSession,
+    run_id: str,
+    *,
+    duration: int = 3600,
+    interval: float = 0.5,
+    users_root: str = "/tmp/agentcore-users",
 ) -> dict[str, Any]:
+    """Start the detached in-VM sampler writing one JSON line per interval."""
     if not 5 <= duration <= 28800:
         raise ValueError("monitor duration must be 5..28800 seconds")
+    if not 0.1 <= interval <= 10:
+        raise ValueError("monitor interval must be 0.1..10 seconds")
+    if not re.fullmatch(r"/[A-Za-z0-9_./-]+", users_root) or ".." in users_root:
+        raise ValueError("users_root must be a plain absolute path")
     run_dir = _monitor_dir(run_id)
     program = base64.b64encode(_MONITOR_PROGRAM.encode("utf-8")).decode("ascii")
     script = f"""set -euo pipefail
 umask 077
 run_dir='{run_dir}'
+output="$run_dir/{MONITOR_FILE}"
 mkdir -p "$run_dir"
 printf '%s' '{program}' | base64 -d > "$run_dir/monitor.py"
 chmod 700 "$run_dir/monitor.py"
-nohup python3 "$run_dir/monitor.py" '{duration}' "$run_dir/monitor.csv" \
+nohup python3 "$run_dir/monitor.py" '{duration}' "$output" '{interval}' '{users_root}' \
   </dev/null >"$run_dir/monitor.log" 2>&1 &
 pid=$!
 printf '%s\n' "$pid" > "$run_dir/monitor.pid"
-for _ in $(seq 1 50); do
-  [[ -f "$run_dir/monitor.csv" ]] && [[ $(wc -l < "$run_dir/monitor.csv") -ge 2 ]] && break
+for _ in $(seq 1 100); do
+  [[ -s "$output" ]] && break
   kill -0 "$pid" 2>/dev/null || {{ cat "$run_dir/monitor.log" >&2; exit 1; }}
   sleep 0.1
 done
-[[ -f "$run_dir/monitor.csv" ]] && [[ $(wc -l < "$run_dir/monitor.csv") -ge 2 ]] \
-  || {{ echo 'monitor did not produce a sample' >&2; exit 1; }}
+[[ -s "$output" ]] || {{ echo 'monitor did not produce a sample' >&2; exit 1; }}
 echo "monitor_pid=$pid"
 """
     return session.run_shell_script(script, timeout=30)
 
 
-def read_monitor(
-    session: RuntimeSession, run_id: str, *, stop: bool
-) -> tuple[list[dict[str, Any]], dict[str, Any]]:
-    run_dir = _monitor_dir(run_id)
-    stop_block = ""
-    if stop:
-        stop_block = f"""
+class MonitorStream:
+    """Pulls the sampler's JSONL file incrementally, one byte range per poll.
+
+    Only complete lines are consumed, so a line being written while it is read
+    is picked up whole by the next poll. ``samples`` accumulates everything
+    read so far.
+    """
+
+    def __init__(
+        self,
+        session: RuntimeSession,
+        run_id: str,
+        *,
+        max_bytes: int = MONITOR_READ_BYTES,
+    ) -> None:
+        self.session = session
+        self.run_dir = _monitor_dir(run_id)
+        self.max_bytes = max_bytes
+        self.offset = 0
+        self.samples: list[dict[str, Any]] = []
+
+    def _script(self, stop: bool) -> str:
+        run_dir = self.run_dir
+        stop_block = ""
+        if stop:
+            stop_block = f"""
 if [[ -f "$run_dir/monitor.pid" ]]; then
   pid="$(cat "$run_dir/monitor.pid")"
   if [[ "$pid" =~ ^[0-9]+$ ]] && [[ -r "/proc/$pid/cmdline" ]]; then
@@ -772,17 +1046,63 @@ if [[ -f "$run_dir/monitor.pid" ]]; then
   fi
 fi
 """
-    script = f"""set -euo pipefail
+        return f"""set -euo pipefail
 run_dir='{run_dir}'
 {stop_block}
-test -f "$run_dir/monitor.csv"
-cat "$run_dir/monitor.csv"
+output="$run_dir/{MONITOR_FILE}"
+test -f "$output"
+echo "monitor_size=$(stat -c %s "$output")"
+tail -c +{self.offset + 1} "$output" | head -c {self.max_bytes}
 """
-    command_result = session.run_shell_script(script, timeout=30)
-    return parse_monitor_csv(command_result["stdout"]), command_result
+
+    def poll(
+        self, *, stop: bool = False
+    ) -> tuple[list[dict[str, Any]], dict[str, Any]]:
+        """Read every complete line written since the last poll.
+
+        Returns all samples so far and the last command result. With ``stop``
+        the sampler is stopped first, so the final poll drains the file.
+        """
+        while True:
+            result = self.session.run_shell_script(self._script(stop), timeout=30)
+            stop = False
+            size_line, _, body = result["stdout"].partition("\n")
+            match = _SIZE_LINE_RE.fullmatch(size_line.strip())
+            if match is None:
+                raise ValueError(f"unexpected monitor read header: {size_line[:80]!r}")
+            complete = body[: body.rfind("\n") + 1]
+            self.samples.extend(parse_monitor_jsonl(complete))
+            self.offset += len(complete.encode("utf-8"))
+            if not complete or self.offset >= int(match.group(1)):
+                return self.samples, result
+
+
+def read_monitor(
+    session: RuntimeSession, run_id: str, *, stop: bool
+) -> tuple[list[dict[str, Any]], dict[str, Any]]:
+    """Read the whole sampler file once; prefer ``MonitorStream`` for polling."""
+    return MonitorStream(session, run_id).poll(stop=stop)
+
+
+def parse_monitor_jsonl(text: str) -> list[dict[str, Any]]:
+    samples: list[dict[str, Any]] = []
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            sample = json.loads(line)
+            sample["epoch"] = float(sample["epoch"])
+            sample["cpu_pct"] = float(sample["cpu_pct"])
+        except (KeyError, TypeError, ValueError) as exc:
+            raise ValueError(
+                f"invalid monitor JSONL line {line_number}: {line[:120]!r}"
+            ) from exc
+        samples.append(sample)
+    return samples
 
 
 def parse_monitor_csv(text: str) -> list[dict[str, Any]]:
+    """Parse the CSV written by samplers before the JSONL format."""
     reader = csv.DictReader(io.StringIO(text))
     if tuple(reader.fieldnames or ()) != MONITOR_HEADER:
         raise ValueError(f"unexpected monitor CSV header: {reader.fieldnames!r}")
@@ -849,4 +1169,88 @@ def window_stats(
             round(max(cgroup_current), 1) if cgroup_current else None
         ),
         "cgroup_memory_limits_mb": cgroup_limits,
+        **_extended_window_stats(window),
     }
+
+
+def _extended_window_stats(window: list[dict[str, Any]]) -> dict[str, Any]:
+    """PSI, fd and per-workspace peaks; absent for CSV-era samples."""
+    stats: dict[str, Any] = {}
+    fds = [
+        sample["fds_open"] for sample in window if sample.get("fds_open") is not None
+    ]
+    if fds:
+        stats["fds_open_max"] = max(fds)
+    psi: dict[str, float] = {}
+    for sample in window:
+        for key, value in (sample.get("psi") or {}).items():
+            psi[key] = max(psi.get(key, 0.0), value)
+    if psi:
+        stats["psi_max_pct"] = psi
+    workspaces = _workspace_usage(window)
+    if workspaces:
+        stats["workspaces"] = workspaces
+    return stats
+
+
+def _workspace_usage(window: list[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    usage: dict[str, dict[str, Any]] = {}
+    for sample in window:
+        for name, current in (sample.get("workspaces") or {}).items():
+            peak = usage.setdefault(
+                name,
+                {
+                    "samples": 0,
+                    "procs_max": 0,
+                    "rss_max_mb": 0.0,
+                    "cpu_sum": 0.0,
+                    "cpu_max_pct": 0.0,
+                    "fds_max": 0,
+                },
+            )
+            peak["samples"] += 1
+            peak["procs_max"] = max(peak["procs_max"], current.get("procs", 0))
+            peak["rss_max_mb"] = max(peak["rss_max_mb"], current.get("rss_mb", 0.0))
+            peak["cpu_sum"] += current.get("cpu_pct", 0.0)
+            peak["cpu_max_pct"] = max(peak["cpu_max_pct"], current.get("cpu_pct", 0.0))
+            peak["fds_max"] = max(peak["fds_max"], current.get("fds", 0))
+    for peak in usage.values():
+        # Averaged over the samples where the workspace had live processes.
+        peak["cpu_avg_pct"] = round(peak.pop("cpu_sum") / peak["samples"], 1)
+    return usage
+
+
+def attribute_requests(
+    samples: list[dict[str, Any]],
+    requests: Iterable[dict[str, Any]],
+    *,
+    users_root: str = "/tmp/agentcore-users",
+) -> None:
+    """Attach the resources of each request's workspace while it ran.
+
+    The sampler groups processes by the first directory under ``users_root``
+    in their cwd, which is the per-user workspace the server reports. Each
+    request's ``resources`` entry holds that directory's peaks between
+    ``start_epoch`` and ``end_epoch``; requests with no sampled processes in
+    the window are left untouched.
+    """
+    root = users_root.rstrip("/") + "/"
+    for request in requests:
+        workspace = request.get("workspace")
+        start = request.get("start_epoch")
+        end = request.get("end_epoch")
+        if not isinstance(workspace, str) or start is None or end is None:
+            continue
+        if workspace.startswith(root):
+            name = workspace[len(root) :].split("/", 1)[0]
+        else:
+            name = os.path.basename(workspace.rstrip("/"))
+        window = [
+            {"workspaces": {name: sample["workspaces"][name]}}
+            for sample in samples
+            if start <= sample["epoch"] <= end
+            and name in (sample.get("workspaces") or {})
+        ]
+        usage = _workspace_usage(window).get(name)
+        if usage:
+            request["resources"] = usage
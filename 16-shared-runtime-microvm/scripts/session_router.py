@@ -0,0 +1,743 @@
+"""``userId -> runtimeSessionId`` router for a pool of shared microVM sessions.
+
+Implements the assignment path of ``SESSION_POOL_ARCHITECTURE.zh.md``:
+
+- each user has a short-lived affinity to one session and runs one request at
+  a time;
+- every executing request holds a lease on its session, taken in the same
+  conditional transaction that raises the session's ``inflight`` count, so a
+  session never exceeds ``max_inflight`` (10) however many routers race;
+- new placements only go to sessions below ``target_inflight`` (7) when one
+  exists, while a user's own session may be filled up to the hard cap;
+- ``scale`` sizes the pool from the arrival rate and mean request duration
+  (Little's law), ``reconcile`` reclaims expired leases and drains sessions
+  that are due for microVM replacement, and ``observe_boot`` bumps a
+  session's generation when its microVM was replaced underneath it.
+
+All state lives in a ``pool_store`` table, so any number of stateless routers
+can share one DynamoDB table; ``LocalTable`` stands in for it locally.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, NoReturn
+
+from pool_store import Attr, ConditionFailed, Delete, Item, Put, Update
+from runtime_session import new_session_id
+
+COLD = "COLD"
+WARMING = "WARMING"
+ACTIVE = "ACTIVE"
+DRAINING = "DRAINING"
+QUARANTINED = "QUARANTINED"
+STATUSES = (COLD, WARMING, ACTIVE, DRAINING, QUARANTINED)
+
+
+class Backpressure(RuntimeError):
+    """No session can take the request now; the caller should queue or retry."""
+
+
+class DuplicateRequest(RuntimeError):
+    """The request ID was already claimed by an earlier route call."""
+
+
+@dataclass(frozen=True)
+class RouterConfig:
+    pool: str = "default"
+    max_inflight: int = 10
+    target_inflight: int = 7
+    lease_ttl_s: float = 300.0
+    affinity_ttl_s: float = 1800.0
+    # Leave time to drain before the 8 h microVM maxLifetime ends the instance.
+    drain_after_s: float = 7.25 * 3600
+    idle_stop_s: float = 600.0
+    # A session still WARMING after this long is assumed lost and recycled.
+    warm_timeout_s: float = 600.0
+    min_warm: int = 1
+    shards: int = 4
+    max_strikes: int = 3
+    rate_window_s: float = 60.0
+    expected_duration_s: float = 60.0
+
+    def __post_init__(self) -> None:
+        if not 1 <= self.target_inflight <= self.max_inflight:
+            raise ValueError("target_inflight must be between 1 and max_inflight")
+        if self.shards < 1 or self.min_warm < 0:
+            raise ValueError("shards must be positive and min_warm non-negative")
+
+
+@dataclass(frozen=True)
+class Lease:
+    """One request's slot on a session; pass it back to heartbeat/release."""
+
+    session_id: str
+    request_id: str
+    user_id: str
+    token: str
+    generation: int
+    started: float
+    # True when the session cannot hold the user's earlier local state: a new
+    # or moved affinity, or a microVM generation the user has not run on.
+    fresh_context: bool
+
+    def to_dict(self) -> dict[str, Any]:
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "Lease":
+        return cls(**{name: data[name] for name in cls.__dataclass_fields__})
+
+
+def _session_key(session_id: str) -> tuple[str, str]:
+    return f"SESSION#{session_id}", "META"
+
+
+def _user_key(user_id: str) -> tuple[str, str]:
+    return f"USER#{user_id}", "AFFINITY"
+
+
+def _request_key(request_id: str) -> tuple[str, str]:
+    return f"REQUEST#{request_id}", "IDEMPOTENCY"
+
+
+class SessionRouter:
+    """Assigns requests to pooled sessions through conditional writes.
+
+    ``warm(session_id)`` is called for sessions the scaler adds and returns
+    the new microVM's boot ID (or ``None``); without it sessions become
+    ``ACTIVE`` immediately. ``stop(session_id)`` is called for sessions taken
+    out of service. Callback failures are counted, never raised into the
+    routing path; a session whose warm failed, or that stayed ``WARMING`` past
+    ``warm_timeout_s``, goes back to ``COLD`` so the scaler replaces it.
+    """
+
+    def __init__(
+        self,
+        table: Any,
+        config: RouterConfig | None = None,
+        *,
+        warm: Callable[[str], str | None] | None = None,
+        stop: Callable[[str], Any] | None = None,
+        clock: Callable[[], float] = time.time,
+        rng: random.Random | None = None,
+    ) -> None:
+        self.table = table
+        self.config = config or RouterConfig()
+        self._warm = warm
+        self._stop = stop
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._arrivals: deque[float] = deque()
+        self._mean_duration = self.config.expected_duration_s
+        self._rejected_since_scale = 0
+        self.counters = {
+            "routed": 0,
+            "remapped": 0,
+            "backpressure": 0,
+            "duplicates": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "reclaimed": 0,
+            "boot_changes": 0,
+            "callback_errors": 0,
+        }
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    # -- pool membership -------------------------------------------------
+
+    def _shard_of(self, session_id: str) -> int:
+        digest = hashlib.sha256(session_id.encode("utf-8")).hexdigest()
+        return int(digest[:8], 16) % self.config.shards
+
+    def _pool_pk(self, shard: int) -> str:
+        return f"POOL#{self.config.pool}#{shard}"
+
+    def sessions(self, shards: list[int] | None = None) -> list[Item]:
+        """Session records of the pool, optionally limited to some shards."""
+        records = []
+        for shard in range(self.config.shards) if shards is None else shards:
+            for member in self.table.query(self._pool_pk(shard), "SESSION#"):
+                meta = self.table.get(*_session_key(member["sessionId"]))
+                if meta is not None:
+                    records.append(meta)
+        return records
+
+    def add_session(self, session_id: str | None = None) -> str:
+        """Register a session as ``WARMING`` and warm it."""
+        now = self._clock()
+        session_id = session_id or new_session_id(f"pool-{self.config.pool}")
+        shard = self._shard_of(session_id)
+        pk, sk = _session_key(session_id)
+        self.table.transact(
+            [
+                Put(
+                    {
+                        "pk": pk,
+                        "sk": sk,
+                        "sessionId": session_id,
+                        "pool": self.config.pool,
+                        "shard": shard,
+                        "status": WARMING,
+                        "inflight": 0,
+                        "maxInflight": self.config.max_inflight,
+                        "assignedUsers": 0,
+                        "generation": 1,
+                        "strikes": 0,
+                        "createdAt": now,
+                        "environmentStartedAt": now,
+                        "warmDeadline": now + self.config.warm_timeout_s,
+                        "drainAt": now + self.config.drain_after_s,
+                        "lastActiveAt": now,
+                    },
+                    condition=(("pk", "not_exists", None),),
+                ),
+                Put(
+                    {
+                        "pk": self._pool_pk(shard),
+                        "sk": f"SESSION#{session_id}",
+                        "sessionId": session_id,
+                    }
+                ),
+            ]
+        )
+        self._activate(session_id)
+        return session_id
+
+    def _activate(self, session_id: str) -> None:
+        boot_id = None
+        if self._warm is not None:
+            try:
+                boot_id = self._warm(session_id)
+            except Exception:
+                self._count("callback_errors")
+                self._take_out_of_service(
+                    {"sessionId": session_id, "status": WARMING}, COLD
+                )
+                return
+        updates: Item = {"status": ACTIVE, "lastActiveAt": self._clock()}
+        if boot_id:
+            updates["bootId"] = boot_id
+        self.table.write(
+            Update(
+                *_session_key(session_id),
+                set=updates,
+                condition=(("status", "=", WARMING),),
+            )
+        )
+
+    def _rewarm(self, meta: Item) -> None:
+        now = self._clock()
+        self.table.write(
+            Update(
+                *_session_key(meta["sessionId"]),
+                set={
+                    "status": WARMING,
+                    "environmentStartedAt": now,
+                    "warmDeadline": now + self.config.warm_timeout_s,
+                    "drainAt": now + self.config.drain_after_s,
+                    "strikes": 0,
+                },
+                add={"generation": 1},
+                remove=("bootId",),
+                condition=(("status", "=", COLD),),
+            )
+        )
+        self._activate(meta["sessionId"])
+
+    def _take_out_of_service(self, meta: Item, status: str) -> bool:
+        try:
+            self.table.write(
+                Update(
+                    *_session_key(meta["sessionId"]),
+                    set={"status": status},
+                    condition=(("status", "=", meta["status"]), ("inflight", "=", 0)),
+                )
+            )
+        except ConditionFailed:
+            return False
+        if self._stop is not None:
+            try:
+                self._stop(meta["sessionId"])
+            except Exception:
+                self._count("callback_errors")
+        return True
+
+    # -- request path ----------------------------------------------------
+
+    def _candidates(self, affinity_session: str | None, now: float) -> list[Item]:
+        shards = list(range(self.config.shards))
+        sampled = self._rng.sample(shards, min(2, len(shards)))
+        pool = self.sessions(sampled)
+        if not any(self._open(meta, now) for meta in pool):
+            pool = self.sessions()
+        usable = [
+            meta
+            for meta in pool
+            if self._open(meta, now) and meta["sessionId"] != affinity_session
+        ]
+        # Power of two choices over the sampled shards: least loaded first,
+        # and sessions at or above target only when nothing is below it.
+        usable.sort(key=lambda meta: (meta["inflight"], meta["lastActiveAt"]))
+        below = [m for m in usable if m["inflight"] < self.config.target_inflight]
+        return below or usable
+
+    def _open(self, meta: Item, now: float) -> bool:
+        return (
+            meta["status"] == ACTIVE
+            and meta["inflight"] < meta["maxInflight"]
+            and meta["drainAt"] > now
+        )
+
+    def route(self, user_id: str, request_id: str) -> Lease:
+        """Take a slot for ``request_id`` or raise ``Backpressure``."""
+        now = self._clock()
+        with self._lock:
+            self._arrivals.append(now)
+        request_pk, request_sk = _request_key(request_id)
+        try:
+            self.table.write(
+                Put(
+                    {
+                        "pk": request_pk,
+                        "sk": request_sk,
+                        "userId": user_id,
+                        "status": "CLAIMED",
+                        "createdAt": now,
+                        "expiresAt": int(now + 86400),
+                    },
+                    condition=(("pk", "not_exists", None),),
+                )
+            )
+        except ConditionFailed:
+            self._count("duplicates")
+            raise DuplicateRequest(f"request {request_id!r} was already routed")
+
+        affinity = self.table.get(*_user_key(user_id))
+        if affinity is not None and affinity.get("activeUntil", 0) > now:
+            self._reject(request_id, "user already has a request in flight")
+        current = None
+        if affinity is not None and affinity["leaseUntil"] > now:
+            meta = self.table.get(*_session_key(affinity["sessionId"]))
+            if meta is not None and self._open(meta, now):
+                current = meta
+        candidates = ([current] if current else []) + self._candidates(
+            current["sessionId"] if current else None, now
+        )
+        for meta in candidates:
+            lease = self._try_acquire(meta, user_id, request_id, affinity, now)
+            if lease is not None:
+                self._count("routed")
+                return lease
+        self._reject(request_id, "every session is at its in-flight cap")
+
+    def _reject(self, request_id: str, reason: str) -> NoReturn:
+        with self._lock:
+            self.counters["backpressure"] += 1
+            self._rejected_since_scale += 1
+        # Free the claim so the caller can retry the same request ID later.
+        self.table.write(
+            Delete(*_request_key(request_id), condition=(("status", "=", "CLAIMED"),))
+        )
+        raise Backpressure(reason)
+
+    def _try_acquire(
+        self,
+        meta: Item,
+        user_id: str,
+        request_id: str,
+        affinity: Item | None,
+        now: float,
+    ) -> Lease | None:
+        session_id = meta["sessionId"]
+        previous = affinity["sessionId"] if affinity is not None else None
+        moved = previous != session_id
+        token = uuid.uuid4().hex
+        session_pk, session_sk = _session_key(session_id)
+        user_pk, user_sk = _user_key(user_id)
+        affinity_fields = {
+            "sessionId": session_id,
+            "generation": meta["generation"],
+            "leaseUntil": now + self.config.affinity_ttl_s,
+            "lastActiveAt": now,
+            "activeRequest": request_id,
+            "activeUntil": now + self.config.lease_ttl_s,
+        }
+        operations: list[Any] = [
+            Update(
+                session_pk,
+                session_sk,
+                set={"lastActiveAt": now},
+                add={"inflight": 1, **({"assignedUsers": 1} if moved else {})},
+                condition=(
+                    ("status", "=", ACTIVE),
+                    ("inflight", "<", Attr("maxInflight")),
+                    ("drainAt", ">", now),
+                ),
+            ),
+            Put(
+                {
+                    "pk": session_pk,
+                    "sk": f"LEASE#{request_id}",
+                    "requestId": request_id,
+                    "userId": user_id,
+                    "leaseToken": token,
+                    "leaseUntil": now + self.config.lease_ttl_s,
+                    "createdAt": now,
+                },
+                condition=(("pk", "not_exists", None),),
+            ),
+            Update(
+                *_request_key(request_id),
+                set={"status": "RUNNING", "sessionId": session_id},
+            ),
+        ]
+        if affinity is None:
+            operations.append(
+                Put(
+                    {
+                        "pk": user_pk,
+                        "sk": user_sk,
+                        "userId": user_id,
+                        "version": 1,
+                        **affinity_fields,
+                    },
+                    condition=(("pk", "not_exists", None),),
+                )
+            )
+        else:
+            operations.append(
+                Update(
+                    user_pk,
+                    user_sk,
+                    set={**affinity_fields, "version": affinity["version"] + 1},
+                    condition=(
+                        ("version", "=", affinity["version"]),
+                        ("activeUntil", "<=", now),
+                    ),
+                )
+            )
+            if moved and previous is not None:
+                operations.append(
+                    Update(*_session_key(previous), add={"assignedUsers": -1})
+                )
+        try:
+            self.table.transact(operations)
+        except ConditionFailed:
+            return None
+        if moved and affinity is not None:
+            self._count("remapped")
+        return Lease(
+            session_id=session_id,
+            request_id=request_id,
+            user_id=user_id,
+            token=token,
+            generation=meta["generation"],
+            started=now,
+            fresh_context=(
+                moved
+                or affinity is None
+                or affinity["generation"] != meta["generation"]
+            ),
+        )
+
+    def heartbeat(self, lease: Lease) -> bool:
+        """Extend a long request's lease; False once it has been reclaimed."""
+        now = self._clock()
+        session_pk, _ = _session_key(lease.session_id)
+        try:
+            self.table.transact(
+                [
+                    Update(
+                        session_pk,
+                        f"LEASE#{lease.request_id}",
+                        set={"leaseUntil": now + self.config.lease_ttl_s},
+                        condition=(("leaseToken", "=", lease.token),),
+                    ),
+                    Update(
+                        *_user_key(lease.user_id),
+                        set={"activeUntil": now + self.config.lease_ttl_s},
+                        condition=(("activeRequest", "=", lease.request_id),),
+                    ),
+                ]
+            )
+        except ConditionFailed:
+            return False
+        return True
+
+    def release(
+        self, lease: Lease, *, success: bool = True, boot_id: str | None = None
+    ) -> bool:
+        """Free the slot. Repeated or late releases are no-ops returning False.
+
+        ``success`` should be False when the invocation ended without the
+        final ``complete`` event; repeated failures quarantine the session.
+        ``boot_id`` is the instance fingerprint the response reported.
+        """
+        now = self._clock()
+        session_pk, session_sk = _session_key(lease.session_id)
+        counts: dict[str, int | float] = {"inflight": -1}
+        if not success:
+            counts["strikes"] = 1
+        try:
+            self.table.transact(
+                [
+                    Delete(
+                        session_pk,
+                        f"LEASE#{lease.request_id}",
+                        condition=(("leaseToken", "=", lease.token),),
+                    ),
+                    Update(
+                        session_pk,
+                        session_sk,
+                        set={"lastActiveAt": now} | ({"strikes": 0} if success else {}),
+                        add=counts,
+                    ),
+                    Update(
+                        *_request_key(lease.request_id),
+                        set={"status": "COMPLETED" if success else "FAILED"},
+                    ),
+                ]
+            )
+        except ConditionFailed:
+            return False
+        try:
+            self.table.write(
+                Update(
+                    *_user_key(lease.user_id),
+                    set={
+                        "activeUntil": 0,
+                        "lastActiveAt": now,
+                        "leaseUntil": now + self.config.affinity_ttl_s,
+                    },
+                    condition=(("activeRequest", "=", lease.request_id),),
+                )
+            )
+        except ConditionFailed:
+            pass
+        self._count("succeeded" if success else "failed")
+        with self._lock:
+            # EWMA of request duration feeds the Little's-law estimate.
+            self._mean_duration += 0.2 * ((now - lease.started) - self._mean_duration)
+        if boot_id:
+            self.observe_boot(lease.session_id, boot_id)
+        return True
+
+    def observe_boot(self, session_id: str, boot_id: str) -> bool:
+        """Record the session's microVM; True when it was replaced.
+
+        A new boot ID means the logical session moved to a fresh microVM whose
+        local workspaces are empty, so the generation is bumped and every
+        affinity recorded against the old generation gets ``fresh_context``.
+        """
+        meta = self.table.get(*_session_key(session_id))
+        if meta is None or meta.get("bootId") == boot_id:
+            return False
+        now = self._clock()
+        replaced = meta.get("bootId") is not None
+        updates: Item = {"bootId": boot_id}
+        if replaced:
+            updates.update(
+                environmentStartedAt=now, drainAt=now + self.config.drain_after_s
+            )
+        if replaced:
+            condition: tuple = (("bootId", "=", meta["bootId"]),)
+        else:
+            condition = (("bootId", "not_exists", None),)
+        try:
+            self.table.write(
+                Update(
+                    *_session_key(session_id),
+                    set=updates,
+                    add={"generation": 1} if replaced else {},
+                    condition=condition,
+                )
+            )
+        except ConditionFailed:
+            return False
+        if replaced:
+            self._count("boot_changes")
+        return replaced
+
+    # -- control loop ----------------------------------------------------
+
+    def reconcile(self) -> dict[str, list[str]]:
+        """Reclaim expired leases, repair counts and drain or stop sessions.
+
+        The meta is read before the live leases are counted, so the repair is
+        conditional on an ``inflight`` value no later than that count: a
+        request routed or released in between makes the write fail instead of
+        being overwritten with a stale count.
+        """
+        now = self._clock()
+        actions: dict[str, list[str]] = {
+            "reclaimed": [],
+            "draining": [],
+            "stopped": [],
+            "quarantined": [],
+        }
+        for meta in self.sessions():
+            session_id = meta["sessionId"]
+            session_pk, session_sk = _session_key(session_id)
+            for lease in self.table.query(session_pk, "LEASE#"):
+                if lease["leaseUntil"] >= now:
+                    continue
+                try:
+                    self.table.transact(
+                        [
+                            Delete(
+                                session_pk,
+                                lease["sk"],
+                                condition=(("leaseToken", "=", lease["leaseToken"]),),
+                            ),
+                            Update(session_pk, session_sk, add={"inflight": -1}),
+                        ]
+                    )
+                except ConditionFailed:
+                    continue
+                actions["reclaimed"].append(lease["requestId"])
+                self._count("reclaimed")
+            meta = self.table.get(session_pk, session_sk) or meta
+            live = sum(
+                1
+                for lease in self.table.query(session_pk, "LEASE#")
+                if lease["leaseUntil"] >= now
+            )
+            if meta["inflight"] != live:
+                try:
+                    self.table.write(
+                        Update(
+                            session_pk,
+                            session_sk,
+                            set={"inflight": live},
+                            condition=(("inflight", "=", meta["inflight"]),),
+                        )
+                    )
+                    meta["inflight"] = live
+                except ConditionFailed:
+                    pass
+            status = meta["status"]
+            if status == WARMING and meta.get("warmDeadline", math.inf) <= now:
+                if self._take_out_of_service(meta, COLD):
+                    actions["stopped"].append(session_id)
+                continue
+            if status == ACTIVE and meta.get("strikes", 0) >= self.config.max_strikes:
+                status = self._transition(meta, QUARANTINED)
+                actions["quarantined"].append(session_id)
+            elif status == ACTIVE and meta["drainAt"] <= now:
+                status = self._transition(meta, DRAINING)
+                actions["draining"].append(session_id)
+            if status in (DRAINING, QUARANTINED) and meta["inflight"] == 0:
+                target = COLD if status == DRAINING else QUARANTINED
+                if self._take_out_of_service({**meta, "status": status}, target):
+                    actions["stopped"].append(session_id)
+        return actions
+
+    def _transition(self, meta: Item, status: str) -> str:
+        try:
+            self.table.write(
+                Update(
+                    *_session_key(meta["sessionId"]),
+                    set={"status": status},
+                    condition=(("status", "=", meta["status"]),),
+                )
+            )
+        except ConditionFailed:
+            return meta["status"]
+        return status
+
+    def scale(self) -> dict[str, Any]:
+        """Size the pool for ``arrival rate x mean duration / target``.
+
+        Backpressure since the last call counts as extra demand, so a burst
+        that found every session full adds capacity on the next tick. Only
+        idle sessions are scaled down, oldest activity first.
+        """
+        now = self._clock()
+        with self._lock:
+            horizon = now - self.config.rate_window_s
+            while self._arrivals and self._arrivals[0] < horizon:
+                self._arrivals.popleft()
+            rate = len(self._arrivals) / self.config.rate_window_s
+            mean_duration = self._mean_duration
+            rejected, self._rejected_since_scale = self._rejected_since_scale, 0
+        sessions = self.sessions()
+        serving = [m for m in sessions if m["status"] in (ACTIVE, WARMING)]
+        inflight = sum(m["inflight"] for m in serving)
+        predicted = max(rate * mean_duration, inflight) + rejected
+        required = max(
+            self.config.min_warm, math.ceil(predicted / self.config.target_inflight)
+        )
+        plan: dict[str, Any] = {
+            "arrival_rps": round(rate, 3),
+            "mean_duration_s": round(mean_duration, 1),
+            "predicted_inflight": round(predicted, 1),
+            "required_sessions": required,
+            "serving_sessions": len(serving),
+            "started": [],
+            "stopped": [],
+        }
+        cold = sorted(
+            (m for m in sessions if m["status"] == COLD),
+            key=lambda m: m["lastActiveAt"],
+            reverse=True,
+        )
+        for _ in range(required - len(serving)):
+            if cold:
+                meta = cold.pop(0)
+                self._rewarm(meta)
+                plan["started"].append(meta["sessionId"])
+            else:
+                plan["started"].append(self.add_session())
+        idle = sorted(
+            (
+                m
+                for m in serving
+                if m["status"] == ACTIVE
+                and m["inflight"] == 0
+                and now - m["lastActiveAt"] >= self.config.idle_stop_s
+            ),
+            key=lambda m: m["lastActiveAt"],
+        )
+        for meta in idle[: max(0, len(serving) - required)]:
+            if self._take_out_of_service(meta, COLD):
+                plan["stopped"].append(meta["sessionId"])
+        return plan
+
+    def snapshot(self) -> dict[str, Any]:
+        sessions = self.sessions()
+        by_status = {status: 0 for status in STATUSES}
+        for meta in sessions:
+            by_status[meta["status"]] += 1
+        return {
+            "pool": self.config.pool,
+            "sessions": [
+                {
+                    key: meta.get(key)
+                    for key in (
+                        "sessionId",
+                        "status",
+                        "inflight",
+                        "assignedUsers",
+                        "generation",
+                        "strikes",
+                        "drainAt",
+                    )
+                }
+                for meta in sorted(sessions, key=lambda m: m["createdAt"])
+            ],
+            "by_status": by_status,
+            "inflight": sum(meta["inflight"] for meta in sessions),
+            "counters": dict(self.counters),
+        }
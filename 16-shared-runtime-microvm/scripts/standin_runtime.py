@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""Local stand-in for the AgentCore InvokeAgentRuntime HTTP endpoint.
+
+It accepts the same ``POST /runtimes/{arn}/invocations`` requests as the real
+data plane (signatures are not checked) and streams the microVM server's SSE
+contract with configurable think time, so the asyncio load driver can be
+exercised and capacity-tested on one box without AWS or Claude.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+import uuid
+from typing import Any
+
+SESSION_HEADER = "x-amzn-bedrock-agentcore-runtime-session-id"
+USER_HEADER = "x-amzn-bedrock-agentcore-runtime-user-id"
+
+
+def _sse(payload: dict[str, Any]) -> bytes:
+    data = f"data: {json.dumps(payload, separators=(',', ':'))}\n\n".encode("utf-8")
+    return f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n"
+
+
+class StandInRuntime:
+    """One fake shared Runtime session process behind an HTTP listener."""
+
+    def __init__(self, *, first_token_s: float = 0.05, duration_s: float = 0.2) -> None:
+        self.first_token_s = first_token_s
+        self.duration_s = duration_s
+        self.instance = {
+            "boot_id": "stand-in",
+            "server_run_id": uuid.uuid4().hex,
+            "pid": 0,
+            "hostname": "stand-in",
+        }
+        self.sessions: dict[str, str] = {}
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._server: asyncio.Server | None = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._server = await asyncio.start_server(
+            self._handle, host, port, backlog=4096
+        )
+        bound_host, bound_port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{bound_host}:{bound_port}"
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _respond(
+        self, writer: asyncio.StreamWriter, status: str, payload: dict[str, Any]
+    ) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("ascii")
+            + body
+        )
+        await writer.drain()
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers: dict[str, str] = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", "0")))
+            path = request_line[1].split("?", 1)[0] if len(request_line) > 1 else ""
+            if request_line[:1] != ["POST"] or not (
+                path.startswith("/runtimes/") and path.endswith("/invocations")
+            ):
+                await self._respond(writer, "404 Not Found", {"message": "not found"})
+                return
+            if not headers.get(SESSION_HEADER):
+                await self._respond(
+                    writer, "400 Bad Request", {"message": "session id header required"}
+                )
+                return
+            await self._stream(writer, headers, json.loads(body))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _stream(
+        self,
+        writer: asyncio.StreamWriter,
+        headers: dict[str, str],
+        payload: dict[str, Any],
+    ) -> None:
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            user_id = headers.get(USER_HEADER) or str(payload.get("user_id"))
+            prompt = str(payload.get("prompt", ""))
+            result = (
+                prompt.rsplit(":", 1)[1].strip()
+                if "Reply with exactly:" in prompt
+                else "OK"
+            )
+            previous = None if payload.get("reset") else self.sessions.get(user_id)
+            session_id = self.sessions[user_id] = uuid.uuid4().hex
+            digest = hashlib.sha256(user_id.encode("utf-8")).hexdigest()[:12]
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n"
+            )
+            await writer.drain()
+            await asyncio.sleep(self.first_token_s)
+            writer.write(_sse({"event": "delta", "text": result}))
+            await writer.drain()
+            await asyncio.sleep(max(0.0, self.duration_s - self.first_token_s))
+            writer.write(
+                _sse(
+                    {
+                        "event": "complete",
+                        "result": result,
+                        "is_error": False,
+                        "user_id": user_id,
+                        "workspace": f"/tmp/agentcore-users/u-{digest}",
+                        "claude_session_id": session_id,
+                        "resumed_from": previous,
+                        "denied_count": 0,
+                        "usage": {
+                            "input_tokens": len(prompt.split()),
+                            "output_tokens": 1,
+                            "cache_creation_input_tokens": 0,
+                            "cache_read_input_tokens": 0,
+                            "total_cost_usd": 0.0,
+                            "num_turns": 1,
+                            "duration_ms": round(self.duration_s * 1000),
+                            "duration_api_ms": round(self.duration_s * 1000),
+                            "cache_prefix": "standin",
+                        },
+                        "latency_ms": round(self.duration_s * 1000.0, 1),
+                        "instance": self.instance,
+                    }
+                )
+                + b"0\r\n\r\n"
+            )
+            await writer.drain()
+        finally:
+            self.in_flight -= 1
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    runtime = StandInRuntime(first_token_s=args.first_token, duration_s=args.duration)
+    url = await runtime.start(args.host, args.port)
+    print(f"stand-in runtime listening on {url}", flush=True)
+    await asyncio.Event().wait()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Serve a local stand-in for the InvokeAgentRuntime endpoint."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--first-token", type=float, default=0.05)
+    parser.add_argument("--duration", type=float, default=0.2)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""Replayable multi-user workloads for shared-runtime capacity tests.
+
+A workload is JSONL with one user arrival per line::
+
+    {"user": "u-17", "at": 12.5, "kind": "chat",
+     "turns": [{"prompt": "...", "reset": true},
+               {"prompt": "...", "think_s": 20.0, "expect": "DONE"}]}
+
+``at`` is seconds from the start of the replay. Arrivals are open loop, so a
+slow server never delays later users (see ``arrival.py``). The turns of one
+arrival are closed loop: each waits ``think_s`` after the previous reply, as
+a person reading it would. ``reset`` starts a new Claude conversation, and
+``expect``, when present, must appear in the reply for the turn to succeed.
+
+Workloads come from recorded traces (``from_trace`` groups a per-turn log by
+user) or from a mix of synthetic profiles (``synthesize``). ``python3
+scripts/workload.py convert|synth`` writes either as JSONL, and
+``load_test_replay.py`` replays it against one shared Runtime session.
+Like ``arrival.py`` this module has no third-party dependencies.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+from arrival import Record, arrival_offsets, run_threaded
+
+Arrival = dict[str, Any]
+
+# A new arrival starts when a user has been quiet this long in a trace.
+SESSION_GAP_S = 1800.0
+
+
+class WorkloadError(ValueError):
+    """Raised for a malformed workload line or trace record."""
+
+
+def _number(value: Any, name: str, where: str) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise WorkloadError(f"{where}: {name} must be a number")
+    if not math.isfinite(value) or value < 0:
+        raise WorkloadError(f"{where}: {name} must be finite and non-negative")
+    return float(value)
+
+
+def _turn(raw: Any, where: str) -> dict[str, Any]:
+    if not isinstance(raw, dict):
+        raise WorkloadError(f"{where}: a turn must be an object")
+    prompt = raw.get("prompt")
+    if not isinstance(prompt, str) or not prompt.strip():
+        raise WorkloadError(f"{where}: prompt must be a non-empty string")
+    expect = raw.get("expect")
+    if expect is not None and not isinstance(expect, str):
+        raise WorkloadError(f"{where}: expect must be a string")
+    return {
+        "prompt": prompt,
+        "reset": bool(raw.get("reset", False)),
+        "think_s": _number(raw.get("think_s", 0.0), "think_s", where),
+        "expect": expect or None,
+    }
+
+
+def validate_arrival(raw: Any, where: str = "arrival") -> Arrival:
+    """Return a normalized copy of one workload line or raise ``WorkloadError``."""
+    if not isinstance(raw, dict):
+        raise WorkloadError(f"{where}: an arrival must be an object")
+    user = raw.get("user")
+    if not isinstance(user, str) or not user:
+        raise WorkloadError(f"{where}: user must be a non-empty string")
+    turns = raw.get("turns")
+    if not isinstance(turns, list) or not turns:
+        raise WorkloadError(f"{where}: turns must be a non-empty list")
+    return {
+        "user": user,
+        "at": _number(raw.get("at", 0.0), "at", where),
+        "kind": str(raw.get("kind") or "trace"),
+        "turns": [
+            _turn(turn, f"{where} turn {index}") for index, turn in enumerate(turns)
+        ],
+    }
+
+
+def load_workload(path: str | Path) -> list[Arrival]:
+    """Read a JSONL workload, skipping blank lines, ordered by ``at``."""
+    arrivals = []
+    with open(path, encoding="utf-8") as handle:
+        for number, line in enumerate(handle, 1):
+            if not line.strip():
+                continue
+            try:
+                raw = json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise WorkloadError(f"line {number}: invalid JSON ({exc})") from exc
+            arrivals.append(validate_arrival(raw, f"line {number}"))
+    if not arrivals:
+        raise WorkloadError(f"{path}: workload is empty")
+    return sorted(arrivals, key=lambda arrival: arrival["at"])
+
+
+def dump_workload(arrivals: Iterable[Arrival], handle: Any) -> int:
+    count = 0
+    for arrival in arrivals:
+        handle.write(json.dumps(arrival, separators=(",", ":")) + "\n")
+        count += 1
+    return count
+
+
+def from_trace(
+    records: Iterable[dict[str, Any]], *, session_gap_s: float = SESSION_GAP_S
+) -> list[Arrival]:
+    """Group a recorded per-turn log into arrivals.
+
+    Each record needs ``ts`` (epoch seconds the turn was sent), ``user_id``
+    and ``prompt``; ``reset`` and ``latency_ms`` are optional. Think time is
+    the gap between a reply and the user's next turn, so it needs
+    ``latency_ms``; without it the whole gap counts as think time. A think
+    time of ``session_gap_s`` or more starts a new arrival for the user.
+    """
+    by_user: dict[str, list[dict[str, Any]]] = {}
+    for index, record in enumerate(records):
+        where = f"trace record {index}"
+        if not isinstance(record, dict):
+            raise WorkloadError(f"{where}: must be an object")
+        user = record.get("user_id")
+        if not isinstance(user, str) or not user:
+            raise WorkloadError(f"{where}: user_id must be a non-empty string")
+        by_user.setdefault(user, []).append(
+            {
+                "ts": _number(record.get("ts"), "ts", where),
+                "latency_s": _number(record.get("latency_ms") or 0, "latency_ms", where)
+                / 1000.0,
+                **_turn(record, where),
+            }
+        )
+    if not by_user:
+        return []
+
+    origin = min(turn["ts"] for turns in by_user.values() for turn in turns)
+    arrivals = []
+    for user, turns in by_user.items():
+        turns.sort(key=lambda turn: turn["ts"])
+        current: Arrival | None = None
+        replied = 0.0  # when the user's previous turn was answered
+        for turn in turns:
+            if current is None or turn["ts"] - replied >= session_gap_s:
+                current = {
+                    "user": user,
+                    "at": round(turn["ts"] - origin, 3),
+                    "kind": "trace",
+                    "turns": [],
+                }
+                arrivals.append(current)
+                think = 0.0
+            else:
+                think = max(0.0, turn["ts"] - replied)
+            current["turns"].append(
+                {
+                    "prompt": turn["prompt"],
+                    "reset": turn["reset"],
+                    "think_s": round(think, 3),
+                    "expect": turn["expect"],
+                }
+            )
+            replied = turn["ts"] + turn["latency_s"]
+    return sorted(arrivals, key=lambda arrival: arrival["at"])
+
+
+def _chat_turns(rng: random.Random, token: str) -> list[dict[str, Any]]:
+    turns = []
+    for index in range(rng.randint(1, 3)):
+        marker = f"CHAT-{token}-{index}"
+        turns.append(
+            {
+                "prompt": f"Reply with exactly: {marker}",
+                "reset": index == 0,
+                "think_s": 0.0 if index == 0 else round(rng.uniform(5.0, 30.0), 1),
+                "expect": marker,
+            }
+        )
+    return turns
+
+
+def _build_turns(rng: random.Random, token: str) -> list[dict[str, Any]]:
+    steps = rng.randint(3, 6)
+    turns = [
+        {
+            "prompt": (
+                f"Create notes-{token}/README.md describing a small offline "
+                f"notes app, then plan {steps - 1} follow-up steps. "
+                f"Reply with BUILD-{token}-0 when done."
+            ),
+            "reset": True,
+            "think_s": 0.0,
+            "expect": f"BUILD-{token}-0",
+        }
+    ]
+    for index in range(1, steps):
+        turns.append(
+            {
+                "prompt": (
+                    f"Continue the notes app in notes-{token}/: implement step "
+                    f"{index} of your plan in its own file, read it back, and "
+                    f"update README.md. Reply with BUILD-{token}-{index} when done."
+                ),
+                "reset": False,
+                "think_s": round(rng.uniform(20.0, 90.0), 1),
+                "expect": f"BUILD-{token}-{index}",
+            }
+        )
+    return turns
+
+
+PROFILES: dict[str, Callable[[random.Random, str], list[dict[str, Any]]]] = {
+    "chat": _chat_turns,
+    "build": _build_turns,
+}
+
+
+def parse_mix(raw: str) -> dict[str, float]:
+    """Parse ``profile:weight`` pairs such as ``"chat:0.8,build:0.2"``."""
+    mix: dict[str, float] = {}
+    for item in raw.split(","):
+        name, sep, weight = item.strip().partition(":")
+        try:
+            value = float(weight)
+        except ValueError:
+            value = 0.0
+        if not sep or name not in PROFILES or value <= 0:
+            raise ValueError(
+                "mix must be comma-separated profile:weight pairs with "
+                f"profiles from {sorted(PROFILES)} and positive weights"
+            )
+        mix[name] = value
+    return mix
+
+
+def synthesize(
+    mix: dict[str, float],
+    *,
+    rate: float,
+    duration: float,
+    arrival: str = "poisson",
+    rng: random.Random | None = None,
+) -> list[Arrival]:
+    """Draw arrivals at ``rate`` per second for ``duration`` seconds.
+
+    Each arrival picks a profile with probability proportional to its weight
+    in ``mix``; ``chat`` is one to three exact-marker replies, ``build`` is a
+    three- to six-turn resumed project with minutes of think time between
+    turns. The same ``rng`` seed yields the same workload.
+    """
+    rng = rng or random.Random()
+    names = sorted(mix)
+    weights = [mix[name] for name in names]
+    arrivals = []
+    for index, offset in enumerate(
+        arrival_offsets(arrival, rate=rate, duration=duration, rng=rng)
+    ):
+        kind = rng.choices(names, weights)[0]
+        token = f"{index:05d}"
+        arrivals.append(
+            {
+                "user": f"{kind}-{token}",
+                "at": round(offset, 3),
+                "kind": kind,
+                "turns": PROFILES[kind](rng, token),
+            }
+        )
+    return arrivals
+
+
+def replay_user_id(run_id: str, user: str) -> str:
+    """Per-run user id; trace ids are hashed so none reach the runtime."""
+    return f"replay-{run_id}-{hashlib.sha256(user.encode('utf-8')).hexdigest()[:12]}"
+
+
+def invoke_turn(session: Any, user_id: str, turn: dict[str, Any]) -> dict[str, Any]:
+    started_epoch = time.time()
+    started = time.perf_counter()
+    try:
+        record = session.invoke(user_id, turn["prompt"], reset=turn["reset"])
+    except Exception as exc:
+        record = {
+            "success": False,
+            "error": f"{type(exc).__name__}: {exc}"[:500],
+            "latency_ms": round((time.perf_counter() - started) * 1000.0, 1),
+        }
+    result = record.pop("result", None) or ""
+    record.pop("events", None)
+    record.update(
+        reset=turn["reset"],
+        think_s=turn["think_s"],
+        expect=turn["expect"],
+        marker_ok=turn["expect"] is None or turn["expect"] in result,
+        result_tail=result[-200:],
+        start_epoch=started_epoch,
+        end_epoch=time.time(),
+    )
+    record["turn_success"] = bool(record.get("success") and record["marker_ok"])
+    return record
+
+
+def replay_arrival(
+    session: Any,
+    arrival: Arrival,
+    user_id: str,
+    *,
+    speed: float = 1.0,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Record:
+    """Run one arrival's turns in order, stopping at the first failed turn."""
+    started = time.perf_counter()
+    record: Record = {
+        "user_id": user_id,
+        "kind": arrival["kind"],
+        "at": arrival["at"],
+        "planned_turns": len(arrival["turns"]),
+        "start_epoch": time.time(),
+        "turns": [],
+    }
+    for turn in arrival["turns"]:
+        if record["turns"] and turn["think_s"] > 0:
+            sleep(turn["think_s"] / speed)
+        result = invoke_turn(session, user_id, turn)
+        record["turns"].append(result)
+        if not result["turn_success"]:
+            break
+    turns = record["turns"]
+    record.update(
+        success=len(turns) == record["planned_turns"]
+        and all(turn["turn_success"] for turn in turns),
+        workspace=next((t["workspace"] for t in turns if t.get("workspace")), None),
+        error=next((t.get("error") for t in turns if not t["turn_success"]), None),
+        end_epoch=time.time(),
+        latency_ms=round((time.perf_counter() - started) * 1000.0, 1),
+    )
+    if record["error"] is None and not record["success"]:
+        record["error"] = "expected marker missing from reply"
+    return record
+
+
+def replay(
+    session: Any,
+    arrivals: list[Arrival],
+    run_id: str,
+    *,
+    speed: float = 1.0,
+    max_workers: int | None = None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> list[Record]:
+    """Replay ``arrivals`` against ``session`` on their recorded timeline.
+
+    ``speed`` compresses arrival offsets and think times alike (2.0 replays
+    an hour of trace in thirty minutes). Each record carries the arrival's
+    start lag and corrected latency from ``arrival.run_threaded``.
+    """
+    if speed <= 0:
+        raise ValueError("speed must be positive")
+
+    def call(index: int) -> Record:
+        arrival = arrivals[index]
+        return replay_arrival(
+            session,
+            arrival,
+            replay_user_id(run_id, arrival["user"]),
+            speed=speed,
+            sleep=sleep,
+        )
+
+    offsets = [arrival["at"] / speed for arrival in arrivals]
+    return run_threaded(offsets, call, max_workers=max_workers)
+
+
+def workload_stats(arrivals: list[Arrival]) -> dict[str, Any]:
+    """Shape of a workload: arrivals and turns per kind, span and think time."""
+    kinds: dict[str, dict[str, int]] = {}
+    for arrival in arrivals:
+        kind = kinds.setdefault(arrival["kind"], {"arrivals": 0, "turns": 0})
+        kind["arrivals"] += 1
+        kind["turns"] += len(arrival["turns"])
+    thinks = [turn["think_s"] for arrival in arrivals for turn in arrival["turns"][1:]]
+    return {
+        "arrivals": len(arrivals),
+        "turns": sum(len(arrival["turns"]) for arrival in arrivals),
+        "users": len({arrival["user"] for arrival in arrivals}),
+        "span_s": round(max((a["at"] for a in arrivals), default=0.0), 3),
+        "think_s_avg": round(sum(thinks) / len(thinks), 1) if thinks else None,
+        "kinds": kinds,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Write a replayable JSONL workload from a trace or a mix."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert = commands.add_parser(
+        "convert", help="group a per-turn JSONL trace into user arrivals"
+    )
+    convert.add_argument("trace", type=Path)
+    convert.add_argument("--session-gap", type=float, default=SESSION_GAP_S)
+    convert.add_argument("--output", type=Path, help="JSONL path (default: stdout)")
+    synth = commands.add_parser("synth", help="draw arrivals from a profile mix")
+    synth.add_argument("--mix", default="chat:0.8,build:0.2")
+    synth.add_argument("--rate", type=float, default=0.5, help="arrivals/s")
+    synth.add_argument("--duration", type=float, default=600.0)
+    synth.add_argument("--arrival", choices=("constant", "poisson"), default="poisson")
+    synth.add_argument("--seed", type=int, default=None)
+    synth.add_argument("--output", type=Path, help="JSONL path (default: stdout)")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "convert":
+            with args.trace.open(encoding="utf-8") as handle:
+                records = [json.loads(line) for line in handle if line.strip()]
+            arrivals = from_trace(records, session_gap_s=args.session_gap)
+        else:
+            if args.rate <= 0 or args.duration <= 0:
+                parser.error("--rate and --duration must be positive")
+            arrivals = synthesize(
+                parse_mix(args.mix),
+                rate=args.rate,
+                duration=args.duration,
+                arrival=args.arrival,
+                rng=random.Random(args.seed),
+            )
+    except (ValueError, json.JSONDecodeError) as exc:
+        print(f"workload: {exc}", file=sys.stderr)
+        return 1
+    if args.output:
+        with args.output.open("w", encoding="utf-8") as handle:
+            dump_workload(arrivals, handle)
+    else:
+        dump_workload(arrivals, sys.stdout)
+    print(json.dumps(workload_stats(arrivals)), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
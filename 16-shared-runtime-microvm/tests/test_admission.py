@@ -0,0 +1,127 @@
+"""Unit tests for app/admission.py."""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from admission import AdmissionRejected, FairScheduler  # noqa: E402
+
+
+class TestFairScheduler(unittest.IsolatedAsyncioTestCase):
+    def scheduler(self, limit=1, **overrides):
+        options = {"max_queue": 16, "max_user_queue": 8, "queue_timeout": 5.0}
+        options.update(overrides)
+        return FairScheduler(limit, **options)
+
+    async def test_grants_round_robin_across_users_not_fifo(self):
+        scheduler = self.scheduler()
+        first = scheduler.submit("hog")
+        await scheduler.wait(first)
+        burst = [scheduler.submit("hog") for _ in range(3)]
+        others = [scheduler.submit("alice"), scheduler.submit("bob")]
+        order = []
+        for ticket in (first, *burst, *others):
+            ticket.granted.add_done_callback(
+                lambda _future, user=ticket.user_id: order.append(user)
+            )
+        running = first
+        for _ in range(5):
+            scheduler.release(running)
+            running = next(
+                ticket
+                for ticket in (*burst, *others)
+                if ticket.started is not None and not ticket.released
+            )
+        await asyncio.sleep(0)
+        # FIFO would run all four "hog" requests before alice and bob.
+        self.assertEqual(order[:5], ["hog", "hog", "alice", "bob", "hog"])
+
+    async def test_same_user_never_runs_twice_at_once(self):
+        scheduler = self.scheduler(limit=4)
+        first = scheduler.submit("alice")
+        second = scheduler.submit("alice")
+        other = scheduler.submit("bob")
+        self.assertTrue(first.granted.done())
+        self.assertFalse(second.granted.done())
+        self.assertTrue(other.granted.done())
+        scheduler.release(first)
+        self.assertTrue(second.granted.done())
+        self.assertEqual(scheduler.stats()["running"], 2)
+
+    async def test_per_user_state_is_dropped_when_idle(self):
+        scheduler = self.scheduler(limit=2)
+        tickets = [scheduler.submit(f"user-{index}") for index in range(5)]
+        self.assertEqual(scheduler.stats()["live_users"], 5)
+        for ticket in tickets:
+            if not ticket.granted.done():
+                await scheduler.wait(ticket)
+            scheduler.release(ticket)
+        self.assertEqual(scheduler.stats()["live_users"], 0)
+        self.assertEqual(
+            (scheduler._queues, scheduler._running, scheduler._deficit), ({}, {}, {})
+        )
+
+    async def test_weights_favor_heavier_users(self):
+        weights = {"gold": 2.0}
+        scheduler = self.scheduler(limit=2, weight=lambda user: weights.get(user, 1.0))
+        blockers = [scheduler.submit("x"), scheduler.submit("y")]
+        gold = scheduler.submit("gold")
+        silver = scheduler.submit("silver")
+        scheduler.release(blockers[0])
+        self.assertTrue(gold.granted.done())
+        self.assertFalse(silver.granted.done())
+
+    async def test_bounded_queues_reject_immediately(self):
+        scheduler = self.scheduler(max_queue=1, max_user_queue=1)
+        scheduler.submit("alice")
+        scheduler.submit("alice")
+        with self.assertRaises(AdmissionRejected) as user_full:
+            scheduler.submit("alice")
+        self.assertEqual(user_full.exception.reason, "user_queue_full")
+        with self.assertRaises(AdmissionRejected) as global_full:
+            scheduler.submit("bob")
+        self.assertEqual(global_full.exception.reason, "queue_full")
+        self.assertEqual(scheduler.stats()["rejected_full"], 2)
+
+    async def test_queue_deadline_rejects_and_dequeues(self):
+        scheduler = self.scheduler(queue_timeout=0.01)
+        holder = scheduler.submit("alice")
+        waiting = scheduler.submit("bob")
+        with self.assertRaises(AdmissionRejected) as rejected:
+            await scheduler.wait(waiting)
+        self.assertEqual(rejected.exception.reason, "queue_timeout")
+        self.assertEqual(scheduler.stats()["queued"], 0)
+        scheduler.release(holder)
+        self.assertFalse(scheduler.busy)
+
+    async def test_cancelled_waiter_leaves_queue(self):
+        scheduler = self.scheduler()
+        holder = scheduler.submit("alice")
+        waiting = scheduler.submit("bob")
+        task = asyncio.create_task(scheduler.wait(waiting))
+        await asyncio.sleep(0)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(scheduler.stats()["queued_users"], 0)
+        scheduler.release(holder)
+        scheduler.release(holder)
+        self.assertEqual(scheduler.stats()["running"], 0)
+
+    async def test_raising_limit_dispatches_queued_users(self):
+        scheduler = self.scheduler()
+        scheduler.submit("alice")
+        bob = scheduler.submit("bob")
+        self.assertFalse(bob.granted.done())
+        scheduler.set_limit(2)
+        self.assertTrue(bob.granted.done())
+        self.assertEqual(scheduler.stats()["limit"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+"""Tests for open-loop arrival scheduling and coordinated-omission correction."""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+import time
+import unittest
+from pathlib import Path
+from typing import Any, cast
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from arrival import (  # noqa: E402
+    annotate,
+    arrival_offsets,
+    lag_summary,
+    run_async,
+    run_threaded,
+)
+from load_test import run_level  # noqa: E402
+
+INSTANCE = {"boot_id": "b", "server_run_id": "r", "pid": 1, "hostname": "h"}
+
+
+def slow_call(index: int) -> dict[str, Any]:
+    started = time.perf_counter()
+    time.sleep(0.05)
+    return {
+        "index": index,
+        "success": True,
+        "latency_ms": (time.perf_counter() - started) * 1000.0,
+    }
+
+
+class EchoSession:
+    def invoke(self, user_id: str, prompt: str, *, reset: bool) -> dict[str, Any]:
+        del reset
+        return {
+            "success": True,
+            "result": prompt.rsplit(":", 1)[1].strip(),
+            "claude_session_id": f"{user_id}-c1",
+            "resumed_from": None,
+            "workspace": f"/tmp/agentcore-users/{user_id}",
+            "instance": INSTANCE,
+            "latency_ms": 5.0,
+        }
+
+
+class TestOffsets(unittest.TestCase):
+    def test_zero_duration_yields_exactly_count_starts(self):
+        self.assertEqual(arrival_offsets("constant", count=3, rate=2), [0.0, 0.5, 1.0])
+        poisson = arrival_offsets("poisson", count=50, rate=10)
+        self.assertEqual(len(poisson), 50)
+        self.assertEqual(poisson, sorted(poisson))
+
+
+class TestAnnotate(unittest.TestCase):
+    def test_corrected_latency_adds_the_start_lag(self):
+        record = annotate(
+            {"latency_ms": 100.0},
+            intended=10.0,
+            actual=10.25,
+            finished=10.35,
+            phase_epoch=1000.0,
+            offset=2.0,
+        )
+        self.assertEqual(record["start_lag_ms"], 250.0)
+        self.assertEqual(record["corrected_latency_ms"], 350.0)
+        self.assertEqual(record["intended_start_epoch"], 1002.0)
+
+    def test_summary_uses_successful_requests_for_corrected_latency(self):
+        records = [
+            {"success": True, "start_lag_ms": 0.0, "corrected_latency_ms": 10.0},
+            {"success": False, "start_lag_ms": 40.0, "corrected_latency_ms": 999.0},
+        ]
+        summary = lag_summary(records)
+        self.assertEqual(summary["start_lag_max_ms"], 40.0)
+        self.assertEqual(summary["corrected_max_ms"], 10.0)
+
+
+class TestRunners(unittest.TestCase):
+    def test_threads_keep_the_timeline_when_workers_are_free(self):
+        offsets = arrival_offsets("constant", rate=40, duration=0.25)
+        records = run_threaded(offsets, slow_call)
+        self.assertEqual([r["index"] for r in records], list(range(10)))
+        self.assertLess(max(r["start_lag_ms"] for r in records), 30)
+
+    def test_a_saturated_pool_reports_lag_instead_of_hiding_it(self):
+        records = run_threaded([0.0] * 4, slow_call, max_workers=1)
+        lags = sorted(r["start_lag_ms"] for r in records)
+        self.assertGreaterEqual(lags[-1], 140)
+        slowest = max(records, key=lambda r: r["start_lag_ms"])
+        self.assertGreaterEqual(slowest["corrected_latency_ms"], 190)
+        self.assertLess(slowest["latency_ms"], 100)
+
+    def test_async_limit_counts_slot_waits_as_lag(self):
+        async def call(index: int) -> dict[str, Any]:
+            await asyncio.sleep(0.05)
+            return {"index": index, "success": True, "latency_ms": 50.0}
+
+        records = asyncio.run(run_async([0.0, 0.0, 0.0], call, limit=1))
+        self.assertEqual([r["index"] for r in records], [0, 1, 2])
+        self.assertGreaterEqual(records[2]["start_lag_ms"], 90)
+        self.assertGreaterEqual(records[2]["corrected_latency_ms"], 140)
+
+
+class TestOpenLoopRamp(unittest.TestCase):
+    def test_rate_level_sends_rate_times_duration_requests(self):
+        summary = run_level(
+            cast(Any, EchoSession()),
+            20,
+            "run1",
+            INSTANCE,
+            arrival="constant",
+            duration=0.25,
+        )
+        self.assertEqual(summary["requests_sent"], 5)
+        self.assertEqual(summary["success"], 5)
+        self.assertEqual(summary["offered_rps"], 20.0)
+        self.assertIsNotNone(summary["corrected_p90_ms"])
+        offsets = [r["intended_offset_s"] for r in summary["requests"]]
+        self.assertEqual(offsets, [0.0, 0.05, 0.1, 0.15, 0.2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+"""No-AWS tests for the asyncio load driver against the local stand-in."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from async_runtime import (  # noqa: E402
+    STAND_IN_RUNTIME,
+    AsyncRuntimeSession,
+    invocation_url,
+)
+from load_test_async import (  # noqa: E402
+    arrival_offsets,
+    parse_args,
+    parse_steps,
+    plan_phases,
+    run,
+    run_phase,
+)
+from standin_runtime import StandInRuntime  # noqa: E402
+
+SESSION_ID = "shared-async-1234567890123456789012"
+
+
+class TestArrivals(unittest.TestCase):
+    def test_burst_and_constant_offsets(self):
+        self.assertEqual(arrival_offsets("burst", count=3), [0.0, 0.0, 0.0])
+        self.assertEqual(
+            arrival_offsets("constant", rate=4, duration=1), [0.0, 0.25, 0.5, 0.75]
+        )
+
+    def test_poisson_is_seeded_and_near_the_offered_rate(self):
+        first = arrival_offsets("poisson", rate=50, duration=20, rng=random.Random(7))
+        second = arrival_offsets("poisson", rate=50, duration=20, rng=random.Random(7))
+        self.assertEqual(first, second)
+        self.assertEqual(first, sorted(first))
+        self.assertLess(abs(len(first) - 1000), 100)
+        self.assertLess(first[-1], 20)
+
+    def test_step_ramp_becomes_one_phase_per_segment(self):
+        args = parse_args(["--mode", "step", "--steps", "2:1,4:0.5", "--endpoint", "x"])
+        phases = plan_phases(args)
+        self.assertEqual([phase["offered_rps"] for phase in phases], [2.0, 4.0])
+        self.assertEqual([len(phase["offsets"]) for phase in phases], [2, 2])
+
+    def test_rejects_bad_steps(self):
+        for raw in ("2", "0:10", "a:b"):
+            with self.subTest(raw=raw), self.assertRaises(ValueError):
+                parse_steps(raw)
+
+
+class TestAsyncRuntimeSession(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.runtime = StandInRuntime(first_token_s=0.05, duration_s=0.1)
+        self.endpoint = await self.runtime.start()
+        self.session = AsyncRuntimeSession.stand_in(
+            self.endpoint, SESSION_ID, read_timeout=10
+        )
+
+    async def asyncTearDown(self):
+        await self.runtime.close()
+
+    def test_invocation_url_encodes_the_arn(self):
+        url = invocation_url(
+            "https://example.test/", {**STAND_IN_RUNTIME, "qualifier": "DEFAULT"}
+        )
+        self.assertTrue(url.startswith("https://example.test/runtimes/arn%3Aaws%3A"))
+        self.assertTrue(url.endswith("/invocations?qualifier=DEFAULT"))
+
+    async def test_invoke_streams_the_contract_and_timestamps(self):
+        record = await self.session.invoke(
+            "alice", "Reply with exactly: PONG", reset=True
+        )
+        self.assertTrue(record["success"], record["error"])
+        self.assertEqual(record["result"], "PONG")
+        self.assertIsNone(record["resumed_from"])
+        self.assertGreaterEqual(record["first_delta_ms"], 40)
+        self.assertGreater(record["complete_ms"], record["first_delta_ms"])
+        again = await self.session.invoke("alice", "continue", reset=False)
+        self.assertEqual(again["resumed_from"], record["claude_session_id"])
+
+    async def test_holds_hundreds_of_concurrent_streams_on_one_loop(self):
+        records = await asyncio.gather(
+            *(
+                self.session.invoke(
+                    f"user-{index}", "Reply with exactly: OK", reset=True
+                )
+                for index in range(300)
+            )
+        )
+        self.assertTrue(all(record["success"] for record in records))
+        self.assertGreaterEqual(self.runtime.peak_in_flight, 250)
+
+    async def test_http_errors_become_failed_records(self):
+        session = AsyncRuntimeSession(
+            {**STAND_IN_RUNTIME},
+            SESSION_ID,
+            endpoint_url=self.endpoint + "/missing",
+            read_timeout=10,
+        )
+        record = await session.invoke("alice", "hello", reset=True)
+        self.assertFalse(record["success"])
+        self.assertEqual(record["api_status"], 404)
+        self.assertIn("not found", record["error"])
+
+    async def test_rejects_fewer_than_one_conflict_attempt(self):
+        with self.assertRaises(ValueError):
+            AsyncRuntimeSession(
+                {**STAND_IN_RUNTIME},
+                SESSION_ID,
+                endpoint_url=self.endpoint,
+                conflict_attempts=0,
+            )
+
+    async def test_stalled_error_body_hits_the_read_timeout(self):
+        release = asyncio.Event()
+
+        async def stall(
+            reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+        ) -> None:
+            await reader.readuntil(b"\r\n\r\n")
+            writer.write(b"HTTP/1.1 500 Oops\r\nContent-Length: 100\r\n\r\npartial")
+            await writer.drain()
+            await release.wait()
+            writer.close()
+
+        server = await asyncio.start_server(stall, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        session = AsyncRuntimeSession(
+            {**STAND_IN_RUNTIME},
+            SESSION_ID,
+            endpoint_url=f"http://127.0.0.1:{port}",
+            read_timeout=0.2,
+        )
+        try:
+            with self.assertRaises(TimeoutError):
+                await session.invoke("alice", "hello", reset=True)
+        finally:
+            release.set()
+            server.close()
+            await server.wait_closed()
+
+    async def test_open_loop_phase_keeps_arrivals_on_schedule(self):
+        warm = await self.session.invoke("warm", "Reply with exactly: X", reset=True)
+        phase = {
+            "label": "constant-20rps",
+            "offered_rps": 20.0,
+            "offsets": arrival_offsets("constant", rate=20, duration=0.5),
+        }
+        summary = await run_phase(self.session, phase, "t1", warm["instance"])
+        self.assertEqual(summary["requests_sent"], 10)
+        self.assertEqual(summary["success"], 10)
+        starts = [item["start_epoch"] for item in summary["requests"]]
+        self.assertAlmostEqual(starts[-1] - starts[0], 0.45, delta=0.1)
+        self.assertGreater(summary["peak_in_flight"], 1)
+
+    async def test_run_writes_results_against_the_stand_in(self):
+        with tempfile.TemporaryDirectory() as temporary:
+            output = Path(temporary) / "result.json"
+            args = parse_args(
+                [
+                    "--endpoint",
+                    self.endpoint,
+                    "--levels",
+                    "2,5",
+                    "--phase-pause",
+                    "0",
+                    "--output",
+                    str(output),
+                ]
+            )
+            self.assertEqual(await run(args), 0)
+            result: dict[str, Any] = json.loads(output.read_text())
+        self.assertTrue(result["completed"])
+        self.assertEqual([phase["success"] for phase in result["phases"]], [2, 5])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+"""Unit tests for app/client_pool.py; no Claude CLI is started."""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from client_pool import ClientPool, options_fingerprint  # noqa: E402
+
+
+class FakeClient:
+    def __init__(self, session_id: str | None) -> None:
+        self.session_id = session_id
+        self.connect_task: asyncio.Task | None = asyncio.current_task()
+        self.close_task: asyncio.Task | None = None
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestClientPool(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.clock = Clock()
+        self.closed: list[FakeClient] = []
+        self.connected: list[FakeClient] = []
+
+        async def close(client: FakeClient) -> None:
+            client.close_task = asyncio.current_task()
+            self.closed.append(client)
+
+        self.pool = ClientPool(
+            close=close, max_idle=2, max_uses=3, max_age=60.0, clock=self.clock
+        )
+
+    async def connect(self, session_id, denials):
+        del denials
+        client = FakeClient(session_id)
+        self.connected.append(client)
+        return client
+
+    async def settle(self):
+        for _ in range(5):
+            await asyncio.sleep(0)
+
+    async def test_reuses_client_that_continues_the_same_conversation(self):
+        first = await self.pool.acquire("alice", None, self.connect)
+        first.denials.append("Read: denied")
+        self.pool.release(first, "c1")
+        second = await self.pool.acquire("alice", "c1", self.connect)
+        self.assertIs(second.client, first.client)
+        self.assertEqual(second.denials, [])
+        self.assertEqual(self.pool.stats()["reuses"], 1)
+        self.assertEqual(len(self.connected), 1)
+
+    async def test_reset_or_other_conversation_replaces_idle_client(self):
+        first = await self.pool.acquire("alice", None, self.connect)
+        self.pool.release(first, "c1")
+        fresh = await self.pool.acquire("alice", None, self.connect)
+        await self.settle()
+        self.assertIsNot(fresh.client, first.client)
+        self.assertIsNone(fresh.client.session_id)
+        self.assertEqual(self.closed, [first.client])
+        self.assertEqual(self.pool.stats()["evicted_session"], 1)
+
+    async def test_max_uses_and_max_age_evict(self):
+        entry = await self.pool.acquire("alice", None, self.connect)
+        for _ in range(2):
+            self.pool.release(entry, "c1")
+            entry = await self.pool.acquire("alice", "c1", self.connect)
+        self.pool.release(entry, "c1")
+        await self.settle()
+        self.assertEqual(self.pool.stats()["evicted_uses"], 1)
+        self.assertEqual(self.pool.stats()["idle"], 0)
+
+        aged = await self.pool.acquire("bob", None, self.connect)
+        self.pool.release(aged, "c2")
+        self.clock.now = 61.0
+        self.assertEqual(self.pool.reap(), 1)
+        await self.settle()
+        self.assertIn(aged.client, self.closed)
+
+    async def test_capacity_evicts_least_recently_released(self):
+        for user in ("a", "b", "c"):
+            entry = await self.pool.acquire(user, None, self.connect)
+            self.pool.release(entry, f"{user}-1")
+        await self.settle()
+        self.assertEqual(self.pool.stats()["idle"], 2)
+        self.assertEqual(self.pool.stats()["evicted_capacity"], 1)
+        self.assertEqual(self.closed[0].session_id, None)
+        self.assertEqual(len(self.closed), 1)
+
+    async def test_failed_turn_is_discarded(self):
+        entry = await self.pool.acquire("alice", None, self.connect)
+        self.pool.discard(entry)
+        await self.settle()
+        self.assertEqual(self.closed, [entry.client])
+        self.assertEqual(self.pool.stats()["idle"], 0)
+
+    async def test_forget_closes_the_idle_client_for_a_key(self):
+        entry = await self.pool.acquire("alice", None, self.connect)
+        self.pool.release(entry, "c1")
+        self.assertTrue(self.pool.forget("alice"))
+        self.assertFalse(self.pool.forget("alice"))
+        await self.settle()
+        self.assertEqual(self.closed, [entry.client])
+        self.assertEqual(self.pool.stats()["discarded"], 1)
+
+    async def test_connect_and_close_run_in_the_same_owner_task(self):
+        entry = await self.pool.acquire("alice", None, self.connect)
+        self.assertIsNot(entry.client.connect_task, asyncio.current_task())
+        self.pool.release(entry, "c1")
+        await self.pool.close()
+        self.assertIs(entry.client.close_task, entry.client.connect_task)
+
+    async def test_connect_failure_propagates(self):
+        async def broken(_session_id, _denials):
+            raise ConnectionError("cli missing")
+
+        with self.assertRaises(ConnectionError):
+            await self.pool.acquire("alice", None, broken)
+        self.assertEqual(self.pool.stats()["connects"], 0)
+
+
+class TestFingerprint(unittest.TestCase):
+    def test_fingerprint_is_stable_and_option_sensitive(self):
+        base = options_fingerprint(workspace="/w/a", model="m", tools=["Read"])
+        self.assertEqual(
+            base, options_fingerprint(tools=["Read"], model="m", workspace="/w/a")
+        )
+        self.assertNotEqual(
+            base, options_fingerprint(workspace="/w/b", model="m", tools=["Read"])
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+"""Unit tests for app/concurrency.py."""
+
+from __future__ import annotations
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from concurrency import (  # noqa: E402
+    AimdController,
+    PressureSample,
+    parse_psi,
+    read_pressure,
+)
+
+PSI = (
+    "some avg10=12.50 avg60=3.00 avg300=1.00 total=123\n"
+    "full avg10=0.40 avg60=0.10 avg300=0.00 total=45\n"
+)
+CALM = PressureSample(0.0, 0.0, 5.0, 0.4)
+
+
+class TestPressureReading(unittest.TestCase):
+    def test_parse_psi_some_and_full(self):
+        values = parse_psi(PSI)
+        self.assertEqual(values["some_avg10"], 12.5)
+        self.assertEqual(values["full_avg10"], 0.4)
+        self.assertEqual(values["some_avg60"], 3.0)
+
+    def test_prefers_cgroup_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cgroup = Path(tmp, "cgroup")
+            cgroup.mkdir()
+            (cgroup / "memory.pressure").write_text(PSI)
+            (cgroup / "cpu.pressure").write_text(
+                "some avg10=30.00 avg60=0 avg300=0 total=1\n"
+            )
+            (cgroup / "memory.current").write_text("750\n")
+            (cgroup / "memory.max").write_text("1000\n")
+            sample = read_pressure(cgroup, Path(tmp, "proc"))
+        self.assertEqual(sample.memory_some_avg10, 12.5)
+        self.assertEqual(sample.cpu_some_avg10, 30.0)
+        self.assertEqual(sample.memory_used_ratio, 0.75)
+
+    def test_falls_back_to_host_files_when_cgroup_is_unlimited(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cgroup = Path(tmp, "cgroup")
+            proc = Path(tmp, "proc")
+            (proc / "pressure").mkdir(parents=True)
+            cgroup.mkdir()
+            (cgroup / "memory.current").write_text("750\n")
+            (cgroup / "memory.max").write_text("max\n")
+            (proc / "pressure" / "memory").write_text(PSI)
+            (proc / "meminfo").write_text(
+                "MemTotal:       1000 kB\nMemFree:         100 kB\n"
+                "MemAvailable:    250 kB\n"
+            )
+            sample = read_pressure(cgroup, proc)
+        self.assertEqual(sample.memory_full_avg10, 0.4)
+        self.assertIsNone(sample.cpu_some_avg10)
+        self.assertEqual(sample.memory_used_ratio, 0.75)
+        self.assertTrue(sample.available)
+
+    def test_nothing_readable_is_unavailable(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sample = read_pressure(Path(tmp, "a"), Path(tmp, "b"))
+        self.assertFalse(sample.available)
+
+
+class TestAimdController(unittest.TestCase):
+    def test_increases_only_while_saturated(self):
+        controller = AimdController(4, maximum=6)
+        self.assertEqual(controller.update(CALM, saturated=False), 4)
+        self.assertEqual(controller.last_reason, "idle")
+        self.assertEqual(controller.update(CALM, saturated=True), 5)
+        self.assertEqual(controller.update(CALM, saturated=True), 6)
+        self.assertEqual(controller.update(CALM, saturated=True), 6)
+        self.assertEqual(controller.last_reason, "ceiling")
+
+    def test_memory_pressure_halves_and_cools_down(self):
+        controller = AimdController(8, maximum=16, cooldown=2)
+        stalled = PressureSample(memory_full_avg10=2.0)
+        self.assertEqual(controller.update(stalled, saturated=True), 4)
+        self.assertEqual(controller.update(stalled, saturated=True), 2)
+        self.assertEqual(controller.update(CALM, saturated=True), 2)
+        self.assertEqual(controller.update(CALM, saturated=True), 2)
+        self.assertEqual(controller.last_reason, "cooldown")
+        self.assertEqual(controller.update(CALM, saturated=True), 3)
+        self.assertEqual(controller.counters, {"increases": 1, "decreases": 2})
+
+    def test_never_drops_below_minimum(self):
+        controller = AimdController(2, minimum=2, maximum=4)
+        full = PressureSample(memory_used_ratio=0.95)
+        self.assertEqual(controller.update(full, saturated=True), 2)
+        self.assertEqual(controller.last_reason, "memory_used")
+
+    def test_cpu_pressure_holds_without_cutting(self):
+        controller = AimdController(3, maximum=8)
+        busy = PressureSample(cpu_some_avg10=95.0, memory_used_ratio=0.5)
+        self.assertEqual(controller.update(busy, saturated=True), 3)
+        self.assertEqual(controller.last_reason, "cpu_some")
+
+    def test_rejects_inverted_bounds(self):
+        with self.assertRaises(ValueError):
+            AimdController(10, maximum=4)
+
+
+if __name__ == "__main__":
+    unittest.main()
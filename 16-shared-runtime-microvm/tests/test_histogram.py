@@ -0,0 +1,105 @@
+"""Tests for the mergeable log-bucketed latency histogram."""
+
+from __future__ import annotations
+
+import json
+import random
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from histogram import Histogram, main, merge_results  # noqa: E402
+
+
+def exact(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+class TestHistogram(unittest.TestCase):
+    def test_percentiles_stay_within_the_relative_error(self):
+        rng = random.Random(3)
+        values = [rng.lognormvariate(7, 1.2) for _ in range(20000)]
+        histogram = Histogram.of(values)
+        for pct in (1, 50, 90, 99, 99.9):
+            with self.subTest(pct=pct):
+                expected = exact(values, pct)
+                actual = histogram.percentile(pct)
+                assert actual is not None
+                self.assertLessEqual(abs(actual - expected), expected * 0.005 + 1e-9)
+        self.assertEqual(histogram.percentile(100), max(values))
+        self.assertEqual(histogram.percentile(0), min(values))
+        self.assertLess(len(histogram.buckets), 1500)
+
+    def test_merge_equals_recording_everything_in_one(self):
+        rng = random.Random(5)
+        first = [rng.uniform(0, 5000) for _ in range(3000)]
+        second = [rng.uniform(100, 90000) for _ in range(3000)] + [0.0]
+        merged = Histogram.of(first).merge(Histogram.of(second))
+        whole = Histogram.of(first + second)
+        self.assertEqual(merged.buckets, whole.buckets)
+        self.assertEqual(
+            (merged.count, merged.zero_count, merged.min, merged.max),
+            (whole.count, whole.zero_count, whole.min, whole.max),
+        )
+        self.assertAlmostEqual(merged.total, whole.total, places=3)
+        with self.assertRaises(ValueError):
+            merged.merge(Histogram(relative_error=0.01))
+
+    def test_round_trips_through_json(self):
+        histogram = Histogram.of([0.0, 1.5, 12.0, 12.0, 930.0])
+        restored = Histogram.from_dict(json.loads(json.dumps(histogram.to_dict())))
+        self.assertEqual(restored.to_dict(), histogram.to_dict())
+        self.assertEqual(restored.percentile(50), histogram.percentile(50))
+        self.assertEqual(restored.percentile(10), 0.0)
+
+    def test_summary_fields_and_empty_histograms(self):
+        fields = Histogram.of([10.0, 20.0]).summary("latency")
+        self.assertEqual(fields["latency_max_ms"], 20.0)
+        self.assertIn("latency_p99_9_ms", fields)
+        self.assertEqual(fields["latency_histogram"]["count"], 2)
+        empty = Histogram().summary("ttft")
+        self.assertIsNone(empty["ttft_p50_ms"])
+        self.assertIsNone(empty["ttft_max_ms"])
+        with self.assertRaises(ValueError):
+            Histogram().record(-1)
+
+
+class TestMergeResults(unittest.TestCase):
+    def result(self, values: list[float]) -> dict:
+        return {
+            "levels": [
+                {"level": 4, **Histogram.of(values).summary("latency")},
+                {"level": 8, **Histogram.of(v * 2 for v in values).summary("latency")},
+            ]
+        }
+
+    def test_matches_histograms_by_level_across_hosts(self):
+        merged = merge_results([self.result([1.0, 2.0]), self.result([3.0])])
+        self.assertEqual(
+            sorted(merged),
+            ["levels[level=4].latency_histogram", "levels[level=8].latency_histogram"],
+        )
+        self.assertEqual(merged["levels[level=4].latency_histogram"].count, 3)
+        self.assertEqual(merged["levels[level=8].latency_histogram"].max, 6.0)
+
+    def test_cli_writes_the_merged_histograms(self):
+        with tempfile.TemporaryDirectory() as temporary:
+            root = Path(temporary)
+            for name, values in (("a.json", [1.0]), ("b.json", [5.0, 9.0])):
+                (root / name).write_text(json.dumps(self.result(values)))
+            output = root / "merged.json"
+            code = main(
+                [str(root / "a.json"), str(root / "b.json"), "--output", str(output)]
+            )
+            merged = json.loads(output.read_text())
+        self.assertEqual(code, 0)
+        self.assertEqual(merged["levels[level=4].latency_histogram"]["count"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
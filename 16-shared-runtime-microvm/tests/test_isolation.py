@@ -5,17 +5,20 @@ import sys
 import tempfile
 import unittest
 from pathlib import Path
+from unittest import mock
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
 
 from isolation import (  # noqa: E402
     IsolationError,
+    PathGuard,
     ensure_workspace,
     guard_tool_call,
     resolve_user_id,
     user_slug,
     validate_user_id,
     workspace_for,
+    write_size,
 )
 
 
@@ -147,5 +150,105 @@ class TestPathGuard(unittest.TestCase):
         )
 
 
+class TestCachedPathGuard(unittest.TestCase):
+    def setUp(self):
+        self.temporary = tempfile.TemporaryDirectory()
+        self.root = Path(self.temporary.name)
+        self.alice = ensure_workspace(self.root, "alice")
+        self.bob = ensure_workspace(self.root, "bob")
+        (self.alice / "src").mkdir()
+
+    def tearDown(self):
+        self.temporary.cleanup()
+
+    def test_plain_workspace_paths_skip_resolve(self):
+        guard = PathGuard(self.alice)
+        with mock.patch.object(Path, "resolve", side_effect=AssertionError):
+            for candidate in (
+                "src/app.py",
+                str(self.alice / "src" / "new" / "file.txt"),
+                "./notes.txt",
+                "**/*.py",
+                "~/notes.txt",
+            ):
+                self.assertTrue(guard.allows(candidate), candidate)
+
+    def test_repeated_candidates_hit_the_cache(self):
+        guard = PathGuard(self.alice, cache_size=2)
+        for _ in range(3):
+            self.assertIsNone(guard.check("Read", {"file_path": "src/a.py"}))
+            self.assertIsNotNone(guard.check("Read", {"file_path": "/etc/passwd"}))
+        self.assertEqual((guard.misses, guard.hits), (2, 4))
+        guard.allows("src/b.py")
+        guard.allows("src/a.py")
+        self.assertEqual(guard.misses, 4)
+
+    def test_symlinks_and_dotdot_take_the_full_resolve(self):
+        os.symlink(self.bob, self.alice / "src" / "linked")
+        os.symlink(self.alice / "src", self.alice / "inner")
+        guard = PathGuard(self.alice)
+        self.assertFalse(guard.allows("src/linked/secret.txt"))
+        self.assertFalse(guard.allows(f"src/../../{self.bob.name}/x"))
+        self.assertTrue(guard.allows("inner/app.py"))
+        self.assertTrue(guard.allows("src/../notes.txt"))
+
+    def test_matches_one_shot_guard(self):
+        os.symlink(self.bob, self.alice / "linked")
+        guard = PathGuard(self.alice)
+        for candidate in (
+            "notes.txt",
+            "linked/x",
+            "../x",
+            "/proc/1/environ",
+            "~root/x",
+            str(self.alice),
+            str(self.alice) + "-suffix/x",
+        ):
+            self.assertEqual(
+                guard.check("Read", {"file_path": candidate}),
+                guard_tool_call("Read", {"file_path": candidate}, self.alice),
+                msg=candidate,
+            )
+
+
+class TestWriteQuota(unittest.TestCase):
+    def setUp(self):
+        self.temporary = tempfile.TemporaryDirectory()
+        self.alice = ensure_workspace(Path(self.temporary.name), "alice")
+
+    def tearDown(self):
+        self.temporary.cleanup()
+
+    def test_write_size_estimates(self):
+        self.assertEqual(write_size("Write", {"content": "héllo"}), (6, 1))
+        self.assertEqual(
+            write_size("Edit", {"old_string": "abc", "new_string": "abcdef"}), (3, 0)
+        )
+        self.assertEqual(
+            write_size("Edit", {"old_string": "abcdef", "new_string": "a"}), (0, 0)
+        )
+        edits = [{"old_string": "", "new_string": "xy"}, "bad"]
+        self.assertEqual(write_size("MultiEdit", {"edits": edits}), (2, 0))
+
+    def test_quota_applies_to_write_tools_after_the_path_check(self):
+        calls = []
+
+        def quota(added_bytes, added_inodes):
+            calls.append((added_bytes, added_inodes))
+            return "workspace quota exceeded" if added_bytes > 4 else None
+
+        guard = PathGuard(self.alice, quota=quota)
+        self.assertIsNone(guard.check("Write", {"file_path": "a", "content": "1234"}))
+        self.assertEqual(
+            guard.check("Write", {"file_path": "a", "content": "12345"}),
+            "workspace quota exceeded",
+        )
+        self.assertIsNotNone(
+            guard.check("Write", {"file_path": "/etc/x", "content": ""})
+        )
+        self.assertIsNone(guard.check("Read", {"file_path": "a"}))
+        self.assertEqual(calls, [(4, 1), (5, 1)])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -58,6 +58,32 @@ class DuplicateWorkspaceSession:
         }
 
 
+class TimedSession:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def invoke(self, user_id: str, prompt: str, *, reset: bool) -> dict[str, Any]:
+        with self.lock:
+            self.calls += 1
+            first_delta = 100.0 * self.calls
+        if "Reply with exactly:" in prompt:
+            result = prompt.rsplit(":", 1)[1].strip()
+        else:
+            result = "PHASE-1-DONE 4" if reset else "PROJECT-DONE 6"
+        return {
+            "success": True,
+            "result": result,
+            "claude_session_id": f"{user_id}-c{'1' if reset else '2'}",
+            "resumed_from": None if reset else f"{user_id}-c1",
+            "workspace": f"/tmp/agentcore-users/{user_id}",
+            "instance": INSTANCE,
+            "latency_ms": first_delta + 50.0,
+            "first_delta_ms": first_delta,
+            "tool_call_count": 0,
+        }
+
+
 class ShellSession:
     def __init__(self) -> None:
         self.script = ""
@@ -136,6 +162,20 @@ class TestExactMarkersAndFingerprints(unittest.TestCase):
         self.assertEqual(long["agent_success"], 0)
         self.assertTrue(all(not item["unique_workspace"] for item in long["requests"]))
 
+    def test_ramps_report_time_to_first_token_percentiles(self):
+        short = run_short_level(cast(Any, TimedSession()), 3, "run1", INSTANCE)
+        self.assertEqual(short["success"], 3)
+        # Nearest-rank percentiles from the log-bucketed histogram (0.5%).
+        self.assertAlmostEqual(short["ttft_p50_ms"], 200.0, delta=1.0)
+        self.assertEqual(short["ttft_p90_ms"], 300.0)
+        self.assertEqual(short["ttft_histogram"]["count"], 3)
+
+        long = run_long_level(cast(Any, TimedSession()), 2, "run1", INSTANCE)
+        self.assertEqual(long["agent_success"], 2)
+        self.assertAlmostEqual(long["ttft_p50_ms"], 200.0, delta=1.0)
+        self.assertEqual(long["ttft_p99_ms"], 400.0)
+        self.assertEqual(long["ttft_histogram"]["count"], 4)
+
     def test_long_project_compares_the_whole_process_fingerprint(self):
         changed_process = {**INSTANCE, "pid": 11}
         responses = [
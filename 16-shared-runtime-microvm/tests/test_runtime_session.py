@@ -5,6 +5,7 @@ from __future__ import annotations
 import base64
 import json
 import re
+import subprocess
 import sys
 import tempfile
 import unittest
@@ -14,12 +15,16 @@ from typing import Any
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
 
 from runtime_session import (  # noqa: E402
+    _MONITOR_PROGRAM,
     CommandExecutionError,
+    MonitorStream,
     RuntimeConfigError,
     RuntimeSession,
+    SSEDecoder,
     SSEParseError,
     SessionStopError,
     atomic_write_json,
+    attribute_requests,
     cleanup_session,
     finalize_before_session_stop,
     load_runtime_config,
@@ -27,8 +32,10 @@ from runtime_session import (  # noqa: E402
     parse_command_stream,
     parse_levels,
     parse_monitor_csv,
+    parse_monitor_jsonl,
     parse_sse,
     retry_conflicts,
+    usage_summary,
     validate_session_id,
     window_stats,
 )
@@ -48,6 +55,20 @@ class Body:
         return self.value
 
 
+class ChunkedBody:
+    """Mimics botocore StreamingBody.iter_chunks with fixed-size chunks."""
+
+    def __init__(self, value: bytes, size: int):
+        self.value = value
+        self.size = size
+        self.reads = 0
+
+    def iter_chunks(self, _chunk_size: int):
+        for start in range(0, len(self.value), self.size):
+            self.reads += 1
+            yield self.value[start : start + self.size]
+
+
 class FakeClient:
     def __init__(
         self,
@@ -106,6 +127,38 @@ class TestConfiguration(unittest.TestCase):
             with self.assertRaises(RuntimeConfigError):
                 load_runtime_config(path)
 
+    def test_usage_summary_reports_cost_per_success_and_throughput(self):
+        usages = [
+            {"input_tokens": 100, "output_tokens": 50, "total_cost_usd": 0.02},
+            {"input_tokens": 40, "output_tokens": 10, "total_cost_usd": 0.01},
+            None,
+        ]
+        summary = usage_summary(usages, successes=2, elapsed_s=2.0)
+        self.assertEqual(summary["usage_reported"], 2)
+        self.assertEqual(summary["output_tokens_total"], 60)
+        self.assertEqual(summary["total_cost_usd"], 0.03)
+        self.assertEqual(summary["cost_per_success_usd"], 0.015)
+        self.assertEqual(summary["tokens_per_s"], 100.0)
+        self.assertEqual(summary["output_tokens_per_s"], 30.0)
+        self.assertEqual(summary["cache_hit_ratio"], 0.0)
+        cached = usage_summary(
+            [
+                {"input_tokens": 5, "cache_read_input_tokens": 15, "cache_prefix": "p"},
+                {
+                    "input_tokens": 5,
+                    "cache_creation_input_tokens": 15,
+                    "cache_prefix": "p",
+                },
+            ],
+            successes=2,
+            elapsed_s=1.0,
+        )
+        self.assertEqual(cached["cache_hit_ratio"], 0.375)
+        self.assertEqual(cached["distinct_cache_prefixes"], 1)
+        empty = usage_summary([None], successes=0, elapsed_s=1.0)
+        self.assertIsNone(empty["total_cost_usd"])
+        self.assertIsNone(empty["cost_per_success_usd"])
+
 
 class TestSSE(unittest.TestCase):
     def test_parses_json_events_and_done(self):
@@ -117,6 +170,32 @@ class TestSSE(unittest.TestCase):
         events = parse_sse(raw)
         self.assertEqual([item["event"] for item in events], ["delta", "complete"])
 
+    def test_decoder_handles_any_chunk_boundary(self):
+        raw = (
+            'data: {"event":"delta",\r\ndata: "text":"héllo"}\r\n\r\n'
+            ": keep-alive\r\r"
+            'data: {"event":"complete","result":"ok"}\n\n'
+        ).encode("utf-8")
+        expected = [
+            {"event": "delta", "text": "héllo"},
+            {"event": "complete", "result": "ok"},
+        ]
+        for size in range(1, len(raw) + 1):
+            with self.subTest(size=size):
+                decoder = SSEDecoder()
+                events = []
+                for start in range(0, len(raw), size):
+                    events.extend(decoder.feed(raw[start : start + size]))
+                events.extend(decoder.close())
+                self.assertEqual(events, expected)
+
+    def test_decoder_yields_events_before_the_body_ends(self):
+        decoder = SSEDecoder()
+        self.assertEqual(decoder.feed(b'data: {"event":"delta"}\n'), [])
+        self.assertEqual(decoder.feed(b"\ndata: {"), [{"event": "delta"}])
+        with self.assertRaises(SSEParseError):
+            decoder.close()  # truncated final event
+
     def test_rejects_malformed_or_non_object_data(self):
         with self.assertRaises(SSEParseError):
             parse_sse("data: {nope}\n\n")
@@ -131,6 +210,7 @@ class TestSSE(unittest.TestCase):
                 b'data: {"event":"complete","result":"PONG",'
                 b'"workspace":"/tmp/agentcore-users/a",'
                 b'"claude_session_id":"c1","resumed_from":null,'
+                b'"usage":{"output_tokens":3},'
                 b'"instance":{"server_run_id":"r1"}}\n\n'
             ),
         }
@@ -140,11 +220,55 @@ class TestSSE(unittest.TestCase):
         self.assertTrue(result["success"])
         self.assertEqual(result["tool_call_count"], 1)
         self.assertEqual(result["workspace"], "/tmp/agentcore-users/a")
+        self.assertEqual(result["usage"], {"output_tokens": 3})
         request = client.invoke_request
         self.assertIsNotNone(request)
         assert request is not None
         self.assertEqual(request["runtimeUserId"], "alice")
 
+    def test_runtime_invoke_streams_chunks_and_records_timestamps(self):
+        body = ChunkedBody(
+            b'data: {"event":"delta","text":"PO"}\n\n'
+            b'data: {"event":"delta","text":"NG"}\n\n'
+            b'data: {"event":"complete","result":"PONG"}\n\n',
+            size=7,
+        )
+        session = RuntimeSession(
+            RUNTIME,
+            SESSION_ID,
+            FakeClient(invoke_response={"statusCode": 200, "response": body}),
+            keep_events=False,
+        )
+        result = session.invoke("alice", "say PONG", reset=True)
+        self.assertTrue(result["success"])
+        self.assertGreater(body.reads, 1)
+        self.assertEqual(result["events"], [])
+        marks = [
+            result[key]
+            for key in ("headers_ms", "ttfb_ms", "first_delta_ms", "complete_ms")
+        ]
+        self.assertNotIn(None, marks)
+        self.assertEqual(marks, sorted(marks))
+        self.assertLessEqual(result["complete_ms"], result["latency_ms"])
+
+    def test_runtime_invoke_reports_admission_rejection(self):
+        response = {
+            "statusCode": 200,
+            "response": Body(
+                b'data: {"event":"rejected","reason":"queue_timeout",'
+                b'"message":"no agent slot within 600s",'
+                b'"instance":{"server_run_id":"r1"}}\n\n'
+            ),
+        }
+        session = RuntimeSession(
+            RUNTIME, SESSION_ID, FakeClient(invoke_response=response)
+        )
+        result = session.invoke("alice", "say PONG", reset=True)
+        self.assertFalse(result["success"])
+        self.assertEqual(result["rejected_reason"], "queue_timeout")
+        self.assertEqual(result["error"], "no agent slot within 600s")
+        self.assertEqual(result["instance"], {"server_run_id": "r1"})
+
 
 class TestCommandEvents(unittest.TestCase):
     def test_folds_stdout_stderr_and_stop(self):
@@ -401,6 +525,151 @@ class TestMonitoringAndCheckpoints(unittest.TestCase):
         with self.assertRaises(ValueError):
             parse_monitor_csv(self.HEADER + "oops,1,2,3,4,5,6,7\n")
 
+    def test_jsonl_window_stats_include_psi_fds_and_workspaces(self):
+        samples = parse_monitor_jsonl(
+            json.dumps(
+                {
+                    "epoch": 100.0,
+                    "cpu_pct": 10,
+                    "mem_used_mb": 500,
+                    "mem_avail_mb": 1500,
+                    "load1": 0.5,
+                    "agent_procs": 1,
+                    "fds_open": 40,
+                    "psi": {"cpu_some": 2.5},
+                    "workspaces": {
+                        "alice-1": {
+                            "procs": 1,
+                            "rss_mb": 80.0,
+                            "cpu_pct": 20.0,
+                            "fds": 9,
+                        }
+                    },
+                }
+            )
+            + "\n"
+            + json.dumps(
+                {
+                    "epoch": 101.0,
+                    "cpu_pct": 30,
+                    "mem_used_mb": 700,
+                    "mem_avail_mb": 1300,
+                    "load1": 1.5,
+                    "agent_procs": 2,
+                    "fds_open": 55,
+                    "psi": {"cpu_some": 7.0},
+                    "workspaces": {
+                        "alice-1": {
+                            "procs": 2,
+                            "rss_mb": 120.0,
+                            "cpu_pct": 60.0,
+                            "fds": 14,
+                        }
+                    },
+                }
+            )
+            + "\n"
+        )
+        stats = window_stats(samples, 100.0, 101.0)
+        self.assertEqual(stats["fds_open_max"], 55)
+        self.assertEqual(stats["psi_max_pct"], {"cpu_some": 7.0})
+        alice = stats["workspaces"]["alice-1"]
+        self.assertEqual(alice["rss_max_mb"], 120.0)
+        self.assertEqual(alice["cpu_avg_pct"], 40.0)
+        self.assertEqual(alice["procs_max"], 2)
+
+        requests: list[dict[str, Any]] = [
+            {
+                "workspace": "/tmp/agentcore-users/alice-1",
+                "start_epoch": 100.5,
+                "end_epoch": 101.5,
+            },
+            {
+                "workspace": "/tmp/agentcore-users/bob-2",
+                "start_epoch": 100.0,
+                "end_epoch": 101.0,
+            },
+        ]
+        attribute_requests(samples, requests)
+        self.assertEqual(requests[0]["resources"]["rss_max_mb"], 120.0)
+        self.assertEqual(requests[0]["resources"]["samples"], 1)
+        self.assertNotIn("resources", requests[1])
+
+    def test_jsonl_rejects_bad_lines(self):
+        with self.assertRaises(ValueError):
+            parse_monitor_jsonl('{"cpu_pct": 1}\n')
+        with self.assertRaises(ValueError):
+            parse_monitor_jsonl("not json\n")
+
+    def test_stream_reads_only_complete_lines_in_pages(self):
+        class FileSession:
+            def __init__(self):
+                self.data = b""
+                self.scripts: list[str] = []
+
+            def run_shell_script(self, script: str, *, timeout: int):
+                del timeout
+                self.scripts.append(script)
+                tail = re.search(r"tail -c \+(\d+)", script)
+                head = re.search(r"head -c (\d+)", script)
+                assert tail is not None and head is not None
+                start = int(tail.group(1)) - 1
+                limit = int(head.group(1))
+                body = self.data[start : start + limit].decode()
+                return {"stdout": f"monitor_size={len(self.data)}\n{body}"}
+
+        def line(epoch: float) -> bytes:
+            return (json.dumps({"epoch": epoch, "cpu_pct": 1.0}) + "\n").encode()
+
+        session = FileSession()
+        stream = MonitorStream(session, "run1", max_bytes=64)  # type: ignore[arg-type]
+        session.data = line(1) + line(2) + line(3) + b'{"epoch": 4'
+        samples, _ = stream.poll()
+        self.assertEqual([s["epoch"] for s in samples], [1.0, 2.0, 3.0])
+        self.assertGreater(len(session.scripts), 1)
+        self.assertEqual(stream.offset, len(line(1)) * 3)
+
+        session.data += b', "cpu_pct": 2}\n'
+        session.scripts.clear()
+        samples, _ = stream.poll(stop=True)
+        self.assertEqual([s["epoch"] for s in samples], [1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(len(session.scripts), 1)
+        self.assertIn("kill", session.scripts[0])
+
+    @unittest.skipUnless(Path("/proc/stat").exists(), "needs Linux /proc")
+    def test_sampler_attributes_processes_to_workspaces(self):
+        with tempfile.TemporaryDirectory() as temporary:
+            root = Path(temporary)
+            workspace = root / "users" / "alice-0123456789ab"
+            workspace.mkdir(parents=True)
+            program = root / "monitor.py"
+            program.write_text(_MONITOR_PROGRAM)
+            output = root / "monitor.jsonl"
+            sleeper = subprocess.Popen(["sleep", "5"], cwd=workspace)
+            try:
+                subprocess.run(
+                    [
+                        sys.executable,
+                        str(program),
+                        "0.7",
+                        str(output),
+                        "0.2",
+                        str(root / "users"),
+                    ],
+                    check=True,
+                    timeout=10,
+                )
+            finally:
+                sleeper.kill()
+                sleeper.wait()
+            samples = parse_monitor_jsonl(output.read_text())
+        self.assertGreaterEqual(len(samples), 2)
+        usage = samples[-1]["workspaces"]["alice-0123456789ab"]
+        self.assertEqual(usage["procs"], 1)
+        self.assertGreater(usage["rss_mb"], 0)
+        self.assertGreaterEqual(samples[-1]["fds_open"] or 0, 0)
+        self.assertIn("mem_avail_mb", samples[-1])
+
     def test_atomic_json_replaces_destination(self):
         with tempfile.TemporaryDirectory() as temporary:
             path = Path(temporary) / "result.json"
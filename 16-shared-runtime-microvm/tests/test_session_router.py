@@ -0,0 +1,399 @@
+"""No-AWS tests for the session pool store, router and router service."""
+
+from __future__ import annotations
+
+import json
+import random
+import sys
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from pool_store import (  # noqa: E402
+    Attr,
+    ConditionFailed,
+    Delete,
+    DynamoTable,
+    Item,
+    LocalTable,
+    Put,
+    Update,
+    from_attribute,
+    render,
+    to_attribute,
+)
+from router_service import make_handler  # noqa: E402
+from session_router import (  # noqa: E402
+    ACTIVE,
+    COLD,
+    QUARANTINED,
+    WARMING,
+    Backpressure,
+    DuplicateRequest,
+    RouterConfig,
+    SessionRouter,
+)
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class RacingTable(LocalTable):
+    """Runs ``race`` once, right after the next read matching ``race_on``."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.race: Any = None
+        self.race_on = ""
+
+    def _after(self, read: str) -> None:
+        if self.race is not None and read == self.race_on:
+            race, self.race = self.race, None
+            race()
+
+    def get(self, pk: str, sk: str) -> Item | None:
+        item = super().get(pk, sk)
+        if sk == "META":
+            self._after("meta")
+        return item
+
+    def query(self, pk: str, sk_prefix: str = "") -> list[Item]:
+        items = super().query(pk, sk_prefix)
+        if sk_prefix == "LEASE#":
+            self._after("leases")
+        return items
+
+
+def make_router(**overrides: Any) -> tuple[SessionRouter, Clock]:
+    clock = Clock()
+    config = RouterConfig(**{"min_warm": 0, "shards": 2, **overrides})
+    router = SessionRouter(LocalTable(), config, clock=clock, rng=random.Random(1))
+    return router, clock
+
+
+class TestLocalTable(unittest.TestCase):
+    def test_conditions_and_attribute_comparisons(self):
+        table = LocalTable()
+        table.write(Put({"pk": "s", "sk": "m", "inflight": 0, "max": 1}))
+        guarded = Update(
+            "s", "m", add={"inflight": 1}, condition=(("inflight", "<", Attr("max")),)
+        )
+        table.write(guarded)
+        with self.assertRaises(ConditionFailed):
+            table.write(guarded)
+        item = table.get("s", "m")
+        assert item is not None
+        self.assertEqual(item["inflight"], 1)
+
+    def test_transactions_are_all_or_nothing(self):
+        table = LocalTable()
+        table.write(Put({"pk": "a", "sk": "1", "n": 1}))
+        with self.assertRaises(ConditionFailed):
+            table.transact(
+                [
+                    Update("a", "1", add={"n": 1}),
+                    Put({"pk": "a", "sk": "1-lease"}),
+                    Delete("missing", "x", condition=(("pk", "exists", None),)),
+                ]
+            )
+        item = table.get("a", "1")
+        assert item is not None
+        self.assertEqual(item["n"], 1)
+        self.assertEqual(table.query("a", "1-"), [])
+
+
+class TestDynamoRendering(unittest.TestCase):
+    def test_update_renders_placeholders_and_round_trips_values(self):
+        kind, request = render(
+            Update(
+                "SESSION#s",
+                "META",
+                set={"status": "ACTIVE"},
+                add={"inflight": 1},
+                condition=(("inflight", "<", Attr("maxInflight")),),
+            ),
+            "pool",
+        )
+        self.assertEqual(kind, "Update")
+        self.assertEqual(request["UpdateExpression"], "SET #n0 = :v0 ADD #n1 :v1")
+        self.assertEqual(request["ConditionExpression"], "#n2 < #n3")
+        self.assertEqual(request["ExpressionAttributeNames"]["#n3"], "maxInflight")
+        value = {"a": [1, 2.5, None, True], "b": "x"}
+        self.assertEqual(from_attribute(to_attribute(value)), value)
+
+    def test_conditional_failures_map_to_condition_failed(self):
+        class Failure(Exception):
+            response = {"Error": {"Code": "TransactionCanceledException"}}
+
+        class Client:
+            def transact_write_items(self, **_kwargs):
+                raise Failure()
+
+        with self.assertRaises(ConditionFailed):
+            DynamoTable(Client(), "pool").transact([Put({"pk": "a", "sk": "b"})])
+
+
+class TestRouting(unittest.TestCase):
+    def test_affinity_is_kept_and_user_requests_are_serialized(self):
+        router, _ = make_router()
+        router.add_session()
+        first = router.route("alice", "r1")
+        self.assertTrue(first.fresh_context)
+        with self.assertRaises(Backpressure):
+            router.route("alice", "r2")
+        self.assertTrue(router.release(first))
+        self.assertFalse(router.release(first))
+        second = router.route("alice", "r2")
+        self.assertEqual(second.session_id, first.session_id)
+        self.assertFalse(second.fresh_context)
+        with self.assertRaises(DuplicateRequest):
+            router.route("alice", "r2")
+
+    def test_hard_cap_holds_under_concurrent_routers(self):
+        router, _ = make_router()
+        session_id = router.add_session()
+        results: list[Any] = []
+
+        def attempt(index: int) -> None:
+            try:
+                results.append(router.route(f"user-{index}", f"req-{index}"))
+            except Backpressure:
+                results.append(None)
+
+        threads = [threading.Thread(target=attempt, args=(i,)) for i in range(25)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        leases = [lease for lease in results if lease is not None]
+        self.assertEqual(len(leases), 10)
+        meta = router.table.get(f"SESSION#{session_id}", "META")
+        self.assertEqual(meta["inflight"], 10)
+        self.assertEqual(len(router.table.query(f"SESSION#{session_id}", "LEASE#")), 10)
+
+    def test_new_users_spread_below_target_before_filling(self):
+        router, _ = make_router()
+        first, second = router.add_session(), router.add_session()
+        leases = [router.route(f"u{i}", f"r{i}") for i in range(12)]
+        counts = {first: 0, second: 0}
+        for lease in leases:
+            counts[lease.session_id] += 1
+        self.assertEqual(sorted(counts.values()), [6, 6])
+
+    def test_full_affinity_session_remaps_the_user(self):
+        router, _ = make_router(max_inflight=2, target_inflight=1)
+        home = router.add_session()
+        router.release(router.route("alice", "a1"))
+        fillers = [router.route(f"f{i}", f"f{i}") for i in range(2)]
+        self.assertTrue(all(lease.session_id == home for lease in fillers))
+        other = router.add_session()
+        moved = router.route("alice", "a2")
+        self.assertEqual(moved.session_id, other)
+        self.assertTrue(moved.fresh_context)
+        self.assertEqual(router.counters["remapped"], 1)
+
+
+class TestLifecycle(unittest.TestCase):
+    def test_expired_leases_are_reclaimed_and_late_release_is_ignored(self):
+        router, clock = make_router(lease_ttl_s=30)
+        session_id = router.add_session()
+        lease = router.route("alice", "r1")
+        clock.now += 10
+        self.assertTrue(router.heartbeat(lease))
+        clock.now += 35
+        self.assertEqual(router.reconcile()["reclaimed"], ["r1"])
+        self.assertFalse(router.heartbeat(lease))
+        self.assertFalse(router.release(lease))
+        meta = router.table.get(f"SESSION#{session_id}", "META")
+        self.assertEqual(meta["inflight"], 0)
+        self.assertEqual(router.route("alice", "r2").session_id, session_id)
+
+    def test_reconcile_never_lowers_inflight_below_a_racing_route(self):
+        for race_on in ("leases", "meta"):
+            with self.subTest(race_on=race_on):
+                table = RacingTable()
+                router = SessionRouter(
+                    table,
+                    RouterConfig(
+                        min_warm=0, shards=1, max_inflight=2, target_inflight=2
+                    ),
+                    clock=Clock(),
+                )
+                session_id = router.add_session()
+                router.route("alice", "r1")
+                table.race = lambda: router.route("bob", "r2")
+                table.race_on = race_on
+                router.reconcile()
+                self.assertIsNone(table.race)
+                with self.assertRaises(Backpressure):
+                    router.route("carol", "r3")
+                meta = table.get(f"SESSION#{session_id}", "META")
+                assert meta is not None
+                self.assertEqual(meta["inflight"], 2)
+                self.assertEqual(len(table.query(f"SESSION#{session_id}", "LEASE#")), 2)
+
+    def test_failed_warm_goes_cold_and_is_retried(self):
+        attempts: list[str] = []
+
+        def warm(session_id: str) -> str:
+            attempts.append(session_id)
+            if len(attempts) == 1:
+                raise RuntimeError("warm failed")
+            return "boot-a"
+
+        router = SessionRouter(
+            LocalTable(), RouterConfig(min_warm=1, shards=1), warm=warm, clock=Clock()
+        )
+        session_id = router.scale()["started"][0]
+        meta = router.table.get(f"SESSION#{session_id}", "META")
+        assert meta is not None
+        self.assertEqual(meta["status"], COLD)
+        self.assertEqual(router.counters["callback_errors"], 1)
+        self.assertEqual(router.scale()["started"], [session_id])
+        self.assertEqual(router.route("alice", "r1").session_id, session_id)
+
+    def test_stuck_warming_session_is_recycled_after_timeout(self):
+        router, clock = make_router(min_warm=1, warm_timeout_s=60)
+        session_id = router.add_session()
+        # As if the router died between registering and activating the session.
+        router.table.write(
+            Update(f"SESSION#{session_id}", "META", set={"status": WARMING})
+        )
+        clock.now += 30
+        self.assertEqual(router.reconcile()["stopped"], [])
+        self.assertEqual(router.scale()["started"], [])
+        clock.now += 31
+        self.assertEqual(router.reconcile()["stopped"], [session_id])
+        self.assertEqual(router.scale()["started"], [session_id])
+        self.assertEqual(router.route("alice", "r1").session_id, session_id)
+
+    def test_sessions_drain_before_replacement_and_then_stop(self):
+        stopped: list[str] = []
+        clock = Clock()
+        router = SessionRouter(
+            LocalTable(),
+            RouterConfig(min_warm=0, drain_after_s=100),
+            stop=stopped.append,
+            clock=clock,
+        )
+        session_id = router.add_session()
+        lease = router.route("alice", "r1")
+        clock.now += 101
+        self.assertEqual(router.reconcile()["draining"], [session_id])
+        with self.assertRaises(Backpressure):
+            router.route("bob", "r2")
+        router.release(lease)
+        self.assertEqual(router.reconcile()["stopped"], [session_id])
+        self.assertEqual(stopped, [session_id])
+        meta = router.table.get(f"SESSION#{session_id}", "META")
+        self.assertEqual(meta["status"], COLD)
+
+    def test_boot_change_bumps_generation_and_resets_context(self):
+        router, _ = make_router()
+        router.add_session()
+        lease = router.route("alice", "r1")
+        router.release(lease, boot_id="boot-a")
+        lease = router.route("alice", "r2")
+        self.assertFalse(lease.fresh_context)
+        router.release(lease, boot_id="boot-b")
+        self.assertEqual(router.counters["boot_changes"], 1)
+        lease = router.route("alice", "r3")
+        self.assertEqual(lease.generation, 2)
+        self.assertTrue(lease.fresh_context)
+
+    def test_repeated_failures_quarantine_a_session(self):
+        router, _ = make_router(max_strikes=2)
+        session_id = router.add_session()
+        for index in range(2):
+            router.release(router.route("alice", f"r{index}"), success=False)
+        actions = router.reconcile()
+        self.assertEqual(actions["quarantined"], [session_id])
+        meta = router.table.get(f"SESSION#{session_id}", "META")
+        self.assertEqual(meta["status"], QUARANTINED)
+
+    def test_scale_follows_demand_and_releases_idle_sessions(self):
+        router, clock = make_router(
+            min_warm=1, rate_window_s=30, expected_duration_s=20, idle_stop_s=30
+        )
+        self.assertEqual(len(router.scale()["started"]), 1)
+        leases = [router.route(f"u{index}", f"r{index}") for index in range(8)]
+        clock.now += 1
+        plan = router.scale()
+        # Eight in flight is above the target of seven for one session.
+        self.assertEqual(plan["predicted_inflight"], 8)
+        self.assertEqual(plan["required_sessions"], 2)
+        self.assertEqual(len(plan["started"]), 1)
+        for lease in leases:
+            router.release(lease)
+        clock.now += 60
+        plan = router.scale()
+        self.assertEqual(plan["required_sessions"], 1)
+        self.assertEqual(len(plan["stopped"]), 1)
+        statuses = sorted(meta["status"] for meta in router.sessions())
+        self.assertEqual(statuses, [ACTIVE, COLD])
+
+    def test_scale_counts_arrival_rate_and_rewarms_cold_sessions(self):
+        router, clock = make_router(rate_window_s=10, expected_duration_s=30)
+        cold = router.add_session()
+        router.table.write(Update(f"SESSION#{cold}", "META", set={"status": COLD}))
+        for index in range(5):
+            with self.assertRaises(Backpressure):
+                router.route(f"u{index}", f"r{index}")
+        clock.now += 1
+        plan = router.scale()
+        # 0.5 req/s x 30 s = 15 in flight plus 5 rejected: ceil(20 / 7) = 3.
+        self.assertEqual(plan["required_sessions"], 3)
+        self.assertEqual(plan["started"][0], cold)
+        meta = router.table.get(f"SESSION#{cold}", "META")
+        self.assertEqual((meta["status"], meta["generation"]), (ACTIVE, 2))
+
+
+class TestRouterService(unittest.TestCase):
+    def setUp(self):
+        self.router, _ = make_router(max_inflight=1, target_inflight=1)
+        self.router.add_session()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(self.router))
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def call(self, path: str, body: dict[str, Any] | None = None) -> tuple[int, Any]:
+        data = None if body is None else json.dumps(body).encode()
+        request = urllib.request.Request(self.base + path, data=data)
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as exc:
+            return exc.code, json.loads(exc.read())
+
+    def test_route_release_and_backpressure_over_http(self):
+        status, body = self.call("/route", {"user_id": "alice", "request_id": "r1"})
+        self.assertEqual(status, 200)
+        lease = body["lease"]
+        status, _ = self.call("/route", {"user_id": "bob", "request_id": "r2"})
+        self.assertEqual(status, 429)
+        self.assertEqual(self.call("/heartbeat", {"lease": lease})[0], 200)
+        status, body = self.call("/release", {"lease": lease, "boot_id": "b1"})
+        self.assertEqual((status, body["released"]), (200, True))
+        status, body = self.call("/pool")
+        self.assertEqual(body["inflight"], 0)
+        self.assertEqual(body["counters"]["backpressure"], 1)
+        self.assertEqual(self.call("/route", {"user_id": "bob"})[0], 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+"""Tests for replayable workloads and the trace-driven replay driver."""
+
+from __future__ import annotations
+
+import io
+import json
+import random
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from typing import Any, cast
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from load_test_replay import run_replay  # noqa: E402
+from workload import (  # noqa: E402
+    WorkloadError,
+    dump_workload,
+    from_trace,
+    load_workload,
+    parse_mix,
+    replay,
+    synthesize,
+    validate_arrival,
+    workload_stats,
+)
+
+INSTANCE = {"boot_id": "b", "server_run_id": "r", "pid": 1, "hostname": "h"}
+
+
+class ScriptedSession:
+    """Echoes the marker of ``Reply with exactly:`` prompts, else ``DONE``."""
+
+    def __init__(self, *, workspace: str | None = None) -> None:
+        self.calls: list[tuple[str, str, bool]] = []
+        self.workspace = workspace
+
+    def invoke(self, user_id: str, prompt: str, *, reset: bool) -> dict[str, Any]:
+        self.calls.append((user_id, prompt, reset))
+        if "Reply with exactly:" in prompt:
+            result = prompt.rsplit(":", 1)[1].strip()
+        else:
+            result = "DONE"
+        return {
+            "success": True,
+            "result": result,
+            "events": [{"event": "complete"}],
+            "workspace": self.workspace or f"/tmp/agentcore-users/{user_id}",
+            "instance": INSTANCE,
+            "latency_ms": 2.0,
+            "first_delta_ms": 1.0,
+            "usage": {"output_tokens": 10, "total_cost_usd": 0.01},
+        }
+
+
+def arrival(user: str, at: float, *turns: dict[str, Any], kind: str = "chat"):
+    return validate_arrival(
+        {"user": user, "at": at, "kind": kind, "turns": list(turns)}
+    )
+
+
+class TestFormat(unittest.TestCase):
+    def test_round_trips_and_orders_by_arrival_time(self):
+        arrivals = [
+            arrival("bob", 5, {"prompt": "hi", "reset": True}),
+            arrival("alice", 1, {"prompt": "a"}, {"prompt": "b", "think_s": 3}),
+        ]
+        buffer = io.StringIO()
+        self.assertEqual(dump_workload(arrivals, buffer), 2)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "workload.jsonl"
+            path.write_text(buffer.getvalue() + "\n")
+            loaded = load_workload(path)
+        self.assertEqual([item["user"] for item in loaded], ["alice", "bob"])
+        self.assertEqual(loaded[0]["turns"][1]["think_s"], 3.0)
+        self.assertIs(loaded[1]["turns"][0]["reset"], True)
+        self.assertEqual(workload_stats(loaded)["turns"], 3)
+
+    def test_rejects_malformed_lines(self):
+        for raw in (
+            [],
+            {"user": "", "turns": [{"prompt": "x"}]},
+            {"user": "a", "turns": []},
+            {"user": "a", "turns": [{"prompt": " "}]},
+            {"user": "a", "at": -1, "turns": [{"prompt": "x"}]},
+            {"user": "a", "turns": [{"prompt": "x", "think_s": float("nan")}]},
+        ):
+            with self.assertRaises(WorkloadError, msg=json.dumps(raw, default=str)):
+                validate_arrival(raw)
+
+
+class TestTrace(unittest.TestCase):
+    def test_groups_turns_and_derives_think_time_from_replies(self):
+        trace = [
+            {"ts": 1000.0, "user_id": "bob", "prompt": "q1", "reset": True},
+            {"ts": 990.0, "user_id": "alice", "prompt": "a1", "latency_ms": 4000},
+            {"ts": 1004.0, "user_id": "alice", "prompt": "a2", "latency_ms": 1000},
+            # An hour later alice returns: a new arrival for the same user.
+            {"ts": 4605.0, "user_id": "alice", "prompt": "a3", "reset": True},
+        ]
+        arrivals = from_trace(trace, session_gap_s=1800)
+        self.assertEqual(
+            [(item["user"], item["at"]) for item in arrivals],
+            [("alice", 0.0), ("bob", 10.0), ("alice", 3615.0)],
+        )
+        self.assertEqual([t["think_s"] for t in arrivals[0]["turns"]], [0.0, 10.0])
+        self.assertIs(arrivals[2]["turns"][0]["reset"], True)
+        with self.assertRaises(WorkloadError):
+            from_trace([{"ts": 1, "prompt": "x"}])
+
+
+class TestSynthesize(unittest.TestCase):
+    def test_seeded_mix_is_reproducible(self):
+        mix = parse_mix("chat:3,build:1")
+        first = synthesize(mix, rate=2, duration=30, rng=random.Random(7))
+        second = synthesize(mix, rate=2, duration=30, rng=random.Random(7))
+        self.assertEqual(first, second)
+        self.assertEqual({item["kind"] for item in first}, {"chat", "build"})
+        for item in first:
+            validate_arrival(item)
+            self.assertIs(item["turns"][0]["reset"], True)
+            if item["kind"] == "build":
+                self.assertGreaterEqual(len(item["turns"]), 3)
+                self.assertFalse(any(turn["reset"] for turn in item["turns"][1:]))
+
+    def test_parse_mix_rejects_unknown_profiles(self):
+        for raw in ("chat", "chat:0", "video:1"):
+            with self.assertRaises(ValueError):
+                parse_mix(raw)
+
+
+class TestReplay(unittest.TestCase):
+    def test_turns_keep_order_reset_and_scaled_think_time(self):
+        session = ScriptedSession()
+        slept: list[float] = []
+        workload = [
+            arrival(
+                "alice",
+                0,
+                {"prompt": "Reply with exactly: ONE", "reset": True, "expect": "ONE"},
+                {"prompt": "go on", "think_s": 4.0, "expect": "DONE"},
+            )
+        ]
+        records = replay(session, workload, "run1", speed=4.0, sleep=slept.append)
+        self.assertEqual(slept, [1.0])
+        self.assertEqual([call[2] for call in session.calls], [True, False])
+        self.assertEqual(len({call[0] for call in session.calls}), 1)
+        self.assertNotIn("alice", session.calls[0][0])
+        record = records[0]
+        self.assertTrue(record["success"])
+        self.assertNotIn("events", record["turns"][0])
+        self.assertIn("start_lag_ms", record)
+
+    def test_missing_marker_stops_the_arrival(self):
+        session = ScriptedSession()
+        workload = [
+            arrival(
+                "bob",
+                0,
+                {"prompt": "anything", "expect": "NOPE"},
+                {"prompt": "never sent"},
+            )
+        ]
+        record = replay(session, workload, "run1", sleep=lambda _s: None)[0]
+        self.assertFalse(record["success"])
+        self.assertEqual(len(session.calls), 1)
+        self.assertEqual(record["error"], "expected marker missing from reply")
+
+    def test_summary_groups_by_kind_and_flags_shared_workspaces(self):
+        workload = [
+            arrival("a", 0, {"prompt": "Reply with exactly: A"}),
+            arrival("b", 0, {"prompt": "x"}, {"prompt": "y"}, kind="build"),
+        ]
+        summary = run_replay(cast(Any, ScriptedSession()), workload, "run1")
+        self.assertEqual((summary["success"], summary["turns_ok"]), (2, 3))
+        self.assertEqual(sorted(summary["kinds"]), ["build", "chat"])
+        self.assertEqual(summary["kinds"]["build"]["turns_sent"], 2)
+        self.assertEqual(summary["total_cost_usd"], 0.03)
+        self.assertEqual(summary["distinct_workspaces"], 2)
+
+        shared = run_replay(
+            cast(Any, ScriptedSession(workspace="/tmp/agentcore-users/shared")),
+            workload,
+            "run2",
+        )
+        self.assertEqual(shared["success"], 0)
+        self.assertEqual(
+            shared["errors"][0]["error"], "workspace shared with another user"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+"""Unit tests for app/workspace_janitor.py."""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from workspace_janitor import Quota, WorkspaceJanitor, measure  # noqa: E402
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestWorkspaceJanitor(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.temporary = tempfile.TemporaryDirectory()
+        self.root = Path(self.temporary.name)
+        self.clock = Clock()
+        self.clock.now = 10_000_000_000.0  # later than any file's mtime
+
+    async def asyncTearDown(self):
+        self.temporary.cleanup()
+
+    def workspace(self, name: str, size: int) -> Path:
+        path = self.root / name
+        (path / "src").mkdir(parents=True)
+        (path / "src" / "data.bin").write_bytes(b"x" * size)
+        return path
+
+    async def test_measure_counts_bytes_and_inodes(self):
+        alice = self.workspace("alice", 100)
+        (alice / "notes.txt").write_text("hello")
+        self.assertEqual(measure(alice), (105, 3))
+        self.assertEqual(measure(self.root / "missing"), (0, 0))
+
+    async def test_quota_counts_allowed_writes(self):
+        alice = self.workspace("alice", 100)
+        janitor = WorkspaceJanitor(self.root, quota=Quota(max_bytes=150, max_inodes=4))
+        await janitor.refresh(alice)
+        check = janitor.quota_for(alice)
+        self.assertIsNone(check(40, 1))
+        over_bytes = check(20, 0)
+        assert over_bytes is not None
+        self.assertIn("bytes", over_bytes)
+        self.assertIsNone(check(0, 1))
+        over_files = check(0, 1)
+        assert over_files is not None
+        self.assertIn("files", over_files)
+        stats = janitor.stats()
+        self.assertEqual((stats["bytes"], stats["inodes"]), (140, 4))
+        self.assertEqual(stats["quota_denials"], 2)
+
+    async def test_sweep_evicts_idle_workspaces_only(self):
+        alice, bob = self.workspace("alice", 10), self.workspace("bob", 10)
+        (self.root / ".sessions.sqlite3").write_text("keep")
+        janitor = WorkspaceJanitor(self.root, idle_s=60, clock=self.clock)
+        async with janitor.hold(bob):
+            result = await janitor.sweep()
+        self.assertEqual(result["evicted"], 1)
+        self.assertFalse(alice.exists())
+        self.assertTrue(bob.exists())
+        self.assertTrue((self.root / ".sessions.sqlite3").exists())
+        self.assertEqual(janitor.stats()["reclaimed_bytes"], 10)
+
+        self.clock.now += 30
+        self.assertEqual((await janitor.sweep())["evicted"], 0)
+        self.clock.now += 31
+        self.assertEqual((await janitor.sweep())["evicted"], 1)
+        self.assertFalse(bob.exists())
+
+    async def test_total_budget_evicts_least_recently_used_first(self):
+        paths = [self.workspace(name, 100) for name in ("a", "b", "c")]
+        janitor = WorkspaceJanitor(self.root, max_total_bytes=250, clock=self.clock)
+        for offset, path in enumerate((paths[1], paths[0], paths[2])):
+            self.clock.now += offset
+            async with janitor.hold(path):
+                pass
+        result = await janitor.sweep()
+        self.assertEqual((result["evicted"], result["total_bytes"]), (1, 200))
+        self.assertEqual([path.exists() for path in paths], [True, False, True])
+
+    async def test_held_only_leaves_other_workers_workspaces_alone(self):
+        alice, bob = self.workspace("alice", 10), self.workspace("bob", 10)
+        janitor = WorkspaceJanitor(
+            self.root, idle_s=0, held_only=True, clock=self.clock
+        )
+        async with janitor.hold(alice):
+            pass
+        self.assertEqual((await janitor.sweep())["evicted"], 1)
+        self.assertFalse(alice.exists())
+        self.assertTrue(bob.exists())
+
+    async def test_before_evict_can_keep_a_workspace(self):
+        alice = self.workspace("alice", 10)
+        seen = []
+
+        async def before_evict(path: Path) -> bool:
+            seen.append(path.name)
+            return False
+
+        janitor = WorkspaceJanitor(
+            self.root, idle_s=0, before_evict=before_evict, clock=self.clock
+        )
+        await janitor.sweep()
+        self.assertEqual(seen, ["alice"])
+        self.assertTrue(alice.exists())
+        self.assertEqual(janitor.stats()["evict_skipped"], 1)
+
+    async def test_turn_waits_for_a_running_eviction(self):
+        alice = self.workspace("alice", 10)
+        entered = asyncio.Event()
+        release = asyncio.Event()
+
+        async def before_evict(path: Path) -> bool:
+            entered.set()
+            await release.wait()
+            return True
+
+        janitor = WorkspaceJanitor(
+            self.root, idle_s=0, before_evict=before_evict, clock=self.clock
+        )
+        sweep = asyncio.create_task(janitor.sweep())
+        await entered.wait()
+
+        async def turn() -> bool:
+            async with janitor.hold(alice):
+                return alice.exists()
+
+        waiting = asyncio.create_task(turn())
+        await asyncio.sleep(0.01)
+        self.assertFalse(waiting.done())
+        release.set()
+        await sweep
+        self.assertFalse(await waiting)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+"""Unit tests for app/workspace_snapshot.py against the local object store."""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+import zlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from workspace_snapshot import (  # noqa: E402
+    LocalObjectStore,
+    S3ObjectStore,
+    SnapshotError,
+    WorkspaceSnapshots,
+    open_store,
+)
+
+
+class TestWorkspaceSnapshots(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.store = LocalObjectStore(self.root / "store")
+        self.workspace = self.root / "vm-a" / "alice-123"
+        self.workspace.mkdir(parents=True)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def snapshots(self) -> WorkspaceSnapshots:
+        return WorkspaceSnapshots(self.store, chunk_size=4, workers=2)
+
+    def test_restore_on_a_new_microvm_reproduces_the_tree(self):
+        (self.workspace / "src").mkdir()
+        (self.workspace / "src" / "app.py").write_text("print('hi')\n")
+        (self.workspace / ".claude").mkdir()
+        (self.workspace / ".claude" / "log.jsonl").write_text("{}\n")
+        (self.workspace / "empty").write_bytes(b"")
+        os.symlink("/etc/passwd", self.workspace / "link")
+        result = self.snapshots().snapshot("alice-123", self.workspace)
+        self.assertEqual(result["files"], 3)
+
+        target = self.root / "vm-b" / "alice-123"
+        target.mkdir(parents=True)
+        restorer = self.snapshots()
+        result = restorer.restore("alice-123", target)
+        self.assertEqual((result["restored"], result["files_written"]), (True, 3))
+        self.assertEqual((target / "src" / "app.py").read_text(), "print('hi')\n")
+        self.assertEqual((target / ".claude" / "log.jsonl").read_text(), "{}\n")
+        self.assertEqual((target / "empty").read_bytes(), b"")
+        self.assertFalse((target / "link").exists())
+        self.assertEqual(restorer.restore("alice-123", target)["files_written"], 0)
+        # Restored files match the manifest, so nothing is reread or rewritten.
+        result = restorer.snapshot("alice-123", target)
+        self.assertEqual((result["files_reread"], result["changed"]), (0, False))
+
+    def test_snapshots_upload_only_changed_chunks_and_dedup_across_users(self):
+        snapshots = self.snapshots()
+        big = self.workspace / "big.txt"
+        big.write_text("aaaabbbbccccdddd")
+        snapshots.snapshot("alice-123", self.workspace)
+        self.assertEqual(snapshots.counters["chunks_uploaded"], 4)
+
+        with big.open("a") as handle:
+            handle.write("eeee")
+        result = snapshots.snapshot("alice-123", self.workspace)
+        self.assertEqual((result["files_reread"], result["changed"]), (1, True))
+        self.assertEqual(snapshots.counters["chunks_uploaded"], 5)
+
+        other = self.root / "vm-a" / "bob-456"
+        other.mkdir()
+        (other / "copy.txt").write_text("ccccdddd")
+        WorkspaceSnapshots(self.store, chunk_size=4).snapshot("bob-456", other)
+        self.assertEqual(len(list((self.root / "store" / "chunks").iterdir())), 5)
+
+        self.assertFalse(snapshots.snapshot("alice-123", self.workspace)["changed"])
+
+    def test_missing_manifest_is_not_an_error(self):
+        result = self.snapshots().restore("nobody-000", self.workspace)
+        self.assertEqual(result["restored"], False)
+
+    def test_manifest_paths_cannot_escape_the_workspace(self):
+        manifest = {
+            "version": 1,
+            "files": {
+                "../evil": {"size": 0, "mode": 0o600, "mtime_ns": 0, "chunks": []}
+            },
+        }
+        self.store.put(
+            "workspaces/alice-123/manifest.json", json.dumps(manifest).encode()
+        )
+        with self.assertRaises(SnapshotError):
+            self.snapshots().restore("alice-123", self.workspace)
+        self.assertFalse((self.workspace.parent / "evil").exists())
+
+    def test_corrupt_chunks_are_detected(self):
+        (self.workspace / "a.txt").write_text("abcd")
+        self.snapshots().snapshot("alice-123", self.workspace)
+        (chunk,) = (self.root / "store" / "chunks").iterdir()
+        chunk.write_bytes(zlib.compress(b"evil"))
+        target = self.root / "vm-b" / "alice-123"
+        target.mkdir(parents=True)
+        with self.assertRaises(SnapshotError):
+            self.snapshots().restore("alice-123", target)
+
+
+class TestStores(unittest.TestCase):
+    def test_s3_store_maps_missing_keys(self):
+        class Missing(Exception):
+            response = {"Error": {"Code": "404"}}
+
+        class Body:
+            def read(self) -> bytes:
+                return b"data"
+
+        class Client:
+            def __init__(self) -> None:
+                self.keys: list[str] = []
+
+            def head_object(self, Bucket, Key):
+                raise Missing()
+
+            def get_object(self, Bucket, Key):
+                self.keys.append(Key)
+                return {"Body": Body()}
+
+        client = Client()
+        store = S3ObjectStore(client, "bucket", "/snapshots/")
+        self.assertFalse(store.exists("chunks/x"))
+        self.assertEqual(store.get("chunks/x"), b"data")
+        self.assertEqual(client.keys, ["snapshots/chunks/x"])
+
+    def test_open_store(self):
+        self.assertIsNone(open_store("", path=Path("unused")))
+        with self.assertRaises(ValueError):
+            open_store("s3", path=Path("unused"))
+        with self.assertRaises(ValueError):
+            LocalObjectStore(Path("unused")).get("../x")
+
+
+if __name__ == "__main__":
+    unittest.main()